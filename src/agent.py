@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""Build agent entrypoint (``python -m src.agent``)."""
+
+import logging
+
+from .core.settings import bootstrap_environment, get_settings
+from .internal.application import AgentBuildRepository, BuildAgent, ConfigDiagnostics
+from .internal.application.build_agent import detect_agent_labels
+from .internal.core.config import get_build_cgroup_enabled
+from .internal.infrastructure import (
+    AsyncCommandRunner,
+    AsyncExecutionEngine,
+    CgroupManager,
+    CoordinatorClient,
+    GitMirrorPrefetcher,
+)
+from .services.build_pipeline_service import BuildService
+
+
+logging.basicConfig(level=logging.INFO)
+
+
+def main() -> None:
+    settings = bootstrap_environment(get_settings())
+    diagnostics = ConfigDiagnostics()
+    diagnostics.validate_keychain_on_startup()
+    execution_engine = AsyncExecutionEngine() if settings.execution_engine == "asyncio" else None
+    build_service = BuildService(
+        config_diagnostics=diagnostics,
+        repository=AgentBuildRepository(),
+        command_runner=AsyncCommandRunner(execution_engine) if execution_engine else None,
+        cgroups=CgroupManager() if get_build_cgroup_enabled() else None,
+    )
+    build_service.start()
+    agent = BuildAgent(
+        build_service.orchestrator,
+        CoordinatorClient(settings.coordinator_url, token=settings.agent_shared_token),
+        agent_id=settings.agent_id,
+        labels=detect_agent_labels(settings.agent_labels.split(",")),
+        max_jobs=settings.agent_max_jobs,
+        poll_seconds=settings.agent_poll_seconds,
+    )
+    mirror_prefetcher = GitMirrorPrefetcher.from_config(build_service.workspace_manager.git_mirrors)
+    if mirror_prefetcher is not None:
+        mirror_prefetcher.start()
+    try:
+        agent.run_forever()
+    finally:
+        if mirror_prefetcher is not None:
+            mirror_prefetcher.stop()
+        build_service.stop()
+        if execution_engine is not None:
+            execution_engine.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -10,10 +10,13 @@ from pathlib import Path
 
 from fastapi import FastAPI
 
-from ..internal.application import ConfigDiagnostics
+from ..internal.application import BuildQueueStore, ConfigDiagnostics, JobDispatcher
+from ..internal.core.config import get_build_cgroup_enabled, get_prewarm_branches, get_prewarm_schedule
+from ..internal.infrastructure import AsyncCommandRunner, AsyncExecutionEngine, CgroupManager, GitMirrorPrefetcher
 from ..services.build_pipeline_service import BuildService
 from ..services.trigger_service import GitHubActionService
 from ..utils.cleanup import start_cleanup_scheduler
+from ..utils.prewarm import start_prewarm_scheduler
 from .dependencies import ServiceContainer
 from .settings import AppSettings, bootstrap_environment, get_settings
 
@@ -40,6 +43,8 @@ def _log_startup_details(settings: AppSettings, diagnostics: ConfigDiagnostics)
 
     _validate_keychain_at_startup(diagnostics)
 
+    logger.info("Server role: %s", settings.ci_role)
+    logger.info("Execution engine: %s", settings.execution_engine)
     logger.info("Cleanup scheduler started (keeping %s days)", settings.cache_cleanup_days)
     logger.info("Server ready at http://localhost:8000")
 
@@ -62,7 +67,22 @@ def _validate_keychain_at_startup(diagnostics: ConfigDiagnostics) -> None:
 
 def build_container(settings: AppSettings) -> ServiceContainer:
     diagnostics = ConfigDiagnostics()
-    build_service = BuildService(config_diagnostics=diagnostics)
+    dispatcher = JobDispatcher() if settings.ci_role == "coordinator" else None
+    execution_engine = AsyncExecutionEngine() if settings.execution_engine == "asyncio" else None
+    build_service = BuildService(
+        config_diagnostics=diagnostics,
+        dispatcher=dispatcher,
+        command_runner=AsyncCommandRunner(execution_engine) if execution_engine else None,
+        cgroups=CgroupManager() if get_build_cgroup_enabled() else None,
+        # Agents keep no durable queue; the coordinator (or a standalone server) owns queued work.
+        queue_store=BuildQueueStore(),
+    )
+    # A coordinator never checks out code; its agents keep their own mirrors warm.
+    mirror_prefetcher = (
+        GitMirrorPrefetcher.from_config(build_service.workspace_manager.git_mirrors)
+        if settings.ci_role != "coordinator"
+        else None
+    )
     return ServiceContainer(
         settings=settings,
         diagnostics=diagnostics,
@@ -70,7 +90,10 @@ def build_container(settings: AppSettings) -> ServiceContainer:
         github_action_service=GitHubActionService(
             build_service=build_service,
             webhook_secret=settings.github_webhook_secret,
+            mirror_prefetcher=mirror_prefetcher,
         ),
+        execution_engine=execution_engine,
+        mirror_prefetcher=mirror_prefetcher,
     )
 
 
@@ -81,6 +104,11 @@ def create_app(settings: AppSettings | None = None) -> FastAPI:
     @asynccontextmanager
     async def lifespan(app: FastAPI):
         app.state.container = container
+        if container.execution_engine is not None:
+            container.execution_engine.start()
+        if container.mirror_prefetcher is not None:
+            container.mirror_prefetcher.start()
+        container.build_service.start()
         cleanup_thread = threading.Thread(
             target=start_cleanup_scheduler,
             args=(resolved_settings.cache_cleanup_days,),
@@ -88,8 +116,28 @@ def create_app(settings: AppSettings | None = None) -> FastAPI:
         )
         cleanup_thread.start()
         app.state.cleanup_thread = cleanup_thread
+        if get_prewarm_branches() and get_prewarm_schedule():
+            prewarm_thread = threading.Thread(
+                target=start_prewarm_scheduler,
+                args=(container.build_service,),
+                daemon=True,
+            )
+            prewarm_thread.start()
+            app.state.prewarm_thread = prewarm_thread
+        recovered = container.build_service.recover_queued_builds(resolved_settings.queue_recovery_policy)
+        if recovered:
+            logger.info(
+                "Re-queued %s build(s) from the persisted queue (policy=%s)",
+                recovered,
+                resolved_settings.queue_recovery_policy,
+            )
         _log_startup_details(resolved_settings, container.diagnostics)
         yield
+        container.build_service.stop()
+        if container.mirror_prefetcher is not None:
+            container.mirror_prefetcher.stop()
+        if container.execution_engine is not None:
+            container.execution_engine.stop()
 
     app = FastAPI(
         title=resolved_settings.app_name,
@@ -100,13 +148,21 @@ def create_app(settings: AppSettings | None = None) -> FastAPI:
         lifespan=lifespan,
     )
 
-    from ..routers import actions_router, builds_router, health_router, maintenance_router, ui_router
+    from ..routers import (
+        actions_router,
+        agents_router,
+        builds_router,
+        health_router,
+        maintenance_router,
+        ui_router,
+    )
 
     app.include_router(health_router)
     app.include_router(ui_router)
     app.include_router(builds_router)
     app.include_router(actions_router)
     app.include_router(maintenance_router)
+    app.include_router(agents_router)
     return app
 
 
@@ -4,9 +4,10 @@ from __future__ import annotations
 
 from dataclasses import dataclass
 
-from fastapi import Depends, Request
+from fastapi import Depends, Header, HTTPException, Request
 
-from ..internal.application import ConfigDiagnostics
+from ..internal.application import BuildCoordinator, ConfigDiagnostics
+from ..internal.infrastructure import AsyncExecutionEngine, GitMirrorPrefetcher
 from ..services.build_pipeline_service import BuildService
 from ..services.trigger_service import GitHubActionService
 from .settings import AppSettings
@@ -18,6 +19,8 @@ class ServiceContainer:
     diagnostics: ConfigDiagnostics
     build_service: BuildService
     github_action_service: GitHubActionService
+    execution_engine: AsyncExecutionEngine | None = None
+    mirror_prefetcher: GitMirrorPrefetcher | None = None
 
 
 def get_container(request: Request) -> ServiceContainer:
@@ -36,6 +39,19 @@ def get_build_service(container: ServiceContainer = Depends(get_container)) -> B
     return container.build_service
 
 
+def get_build_coordinator(
+    container: ServiceContainer = Depends(get_container),
+    x_agent_token: str | None = Header(None, description="Shared token configured via AGENT_SHARED_TOKEN"),
+) -> BuildCoordinator:
+    coordinator = container.build_service.coordinator
+    if coordinator is None:
+        raise HTTPException(status_code=404, detail="Server is not running in coordinator mode (CI_ROLE=coordinator)")
+    expected_token = container.settings.agent_shared_token
+    if expected_token and x_agent_token != expected_token:
+        raise HTTPException(status_code=403, detail="Invalid agent token")
+    return coordinator
+
+
 def get_github_action_service(
     container: ServiceContainer = Depends(get_container),
 ) -> GitHubActionService:
@@ -3,9 +3,10 @@
 from __future__ import annotations
 
 import os
+import socket
 from functools import lru_cache
 from pathlib import Path
-from typing import Optional
+from typing import Literal, Optional
 
 from pydantic import Field
 from dotenv import dotenv_values
@@ -40,6 +41,21 @@ class AppSettings(BaseSettings):
         alias="WORKSPACE_ROOT",
     )
 
+    queue_recovery_policy: Literal["retry", "resume", "fail"] = Field(
+        default="retry",
+        alias="QUEUE_RECOVERY_POLICY",
+    )
+
+    execution_engine: Literal["threads", "asyncio"] = Field(default="threads", alias="EXECUTION_ENGINE")
+
+    ci_role: Literal["standalone", "coordinator", "agent"] = Field(default="standalone", alias="CI_ROLE")
+    coordinator_url: str = Field(default="http://127.0.0.1:8000", alias="COORDINATOR_URL")
+    agent_id: str = Field(default_factory=socket.gethostname, alias="AGENT_ID")
+    agent_labels: str = Field(default="", alias="AGENT_LABELS")
+    agent_max_jobs: int = Field(default=1, alias="AGENT_MAX_JOBS")
+    agent_poll_seconds: float = Field(default=25.0, alias="AGENT_POLL_SECONDS")
+    agent_shared_token: Optional[str] = Field(default=None, alias="AGENT_SHARED_TOKEN")
+
     model_config = SettingsConfigDict(
         env_file=DOTENV_FILES,
         env_file_encoding="utf-8",
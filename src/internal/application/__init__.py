@@ -1,20 +1,29 @@
 """Application layer services."""
 
+from .build_agent import AgentBuildRepository, BuildAgent
+from .build_coordinator import BuildCoordinator
 from .build_orchestrator import BuildOrchestrator
 from .build_environment import BuildEnvironmentAssembler
+from .build_queue_store import BuildQueueStore
 from .build_repository import BuildRepository
 from .build_status_presenter import BuildStatusPresenter
 from .config_diagnostics import ConfigDiagnostics
+from .job_dispatcher import JobDispatcher
 from .validators import BuildRequestValidator
 from .version_resolver import VersionResolver
 from .webhook_policy import WebhookPolicy
 
 __all__ = [
+    "AgentBuildRepository",
+    "BuildAgent",
+    "BuildCoordinator",
     "BuildOrchestrator",
     "BuildEnvironmentAssembler",
+    "BuildQueueStore",
     "BuildRepository",
     "BuildStatusPresenter",
     "ConfigDiagnostics",
+    "JobDispatcher",
     "BuildRequestValidator",
     "VersionResolver",
     "WebhookPolicy",
@@ -0,0 +1,205 @@
+"""Build agent that pulls jobs from a coordinator and runs them locally."""
+
+from __future__ import annotations
+
+import logging
+import platform
+import threading
+from typing import Dict, Iterable, List, Optional
+
+from ..core.config import get_fvm_cache_dir
+from ..domain import BuildJob, BuildLogEntry, BuildRequestData, BuildStatus
+from ..infrastructure import BuildLogger
+from ..infrastructure.coordinator_client import CoordinatorClient, CoordinatorUnavailableError
+from .build_orchestrator import BuildOrchestrator
+from .job_dispatcher import FLUTTER_LABEL_PREFIX
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_POLL_SECONDS = 25.0
+DEFAULT_FLUSH_INTERVAL = 1.0
+RETRY_BACKOFF_SECONDS = 5.0
+
+
+def detect_agent_labels(configured: Iterable[str] = ()) -> List[str]:
+    """Combine configured labels with host platforms and cached Flutter SDKs."""
+    labels = {label.strip() for label in configured if label.strip()}
+    if not any(label in {"ios", "android"} for label in labels):
+        labels.add("android")
+        if platform.system() == "Darwin":
+            labels.add("ios")
+
+    versions_dir = get_fvm_cache_dir() / "versions"
+    if versions_dir.is_dir():
+        for entry in versions_dir.iterdir():
+            if entry.is_dir():
+                labels.add(f"{FLUTTER_LABEL_PREFIX}{entry.name}")
+    return sorted(labels)
+
+
+class AgentBuildRepository:
+    """In-memory job store for builds executing on this agent."""
+
+    def __init__(self) -> None:
+        self._jobs: Dict[str, BuildJob] = {}
+
+    def save(self, job: BuildJob) -> None:
+        self._jobs[job.build_id] = job
+
+    def get(self, build_id: str) -> Optional[BuildJob]:
+        return self._jobs.get(build_id)
+
+    def list_all(self) -> List[BuildJob]:
+        return list(self._jobs.values())
+
+    def forget(self, build_id: str) -> None:
+        self._jobs.pop(build_id, None)
+
+
+class BuildAgent:
+    """Long-poll the coordinator, run leased builds and stream their events back."""
+
+    def __init__(
+        self,
+        orchestrator: BuildOrchestrator,
+        client: CoordinatorClient,
+        *,
+        agent_id: str,
+        labels: List[str],
+        max_jobs: int = 1,
+        poll_seconds: float = DEFAULT_POLL_SECONDS,
+        flush_interval: float = DEFAULT_FLUSH_INTERVAL,
+    ) -> None:
+        self.orchestrator = orchestrator
+        self.client = client
+        self.agent_id = agent_id
+        self.labels = labels
+        self.max_jobs = max(1, max_jobs)
+        self.poll_seconds = poll_seconds
+        self.flush_interval = flush_interval
+        self._outbox: Dict[str, List[BuildLogEntry]] = {}
+        self._outbox_lock = threading.Lock()
+        self._stop = threading.Event()
+        self.orchestrator.log_listeners.append(self._capture_log)
+
+    def run_forever(self) -> None:
+        logger.info("🤖 Build agent %s polling with labels %s", self.agent_id, ", ".join(self.labels))
+        workers = [
+            threading.Thread(target=self._worker_loop, name=f"agent-worker-{index}", daemon=True)
+            for index in range(self.max_jobs)
+        ]
+        flusher = threading.Thread(target=self._flush_loop, name="agent-flusher", daemon=True)
+        for thread in [*workers, flusher]:
+            thread.start()
+        try:
+            for thread in workers:
+                thread.join()
+        finally:
+            self._stop.set()
+            flusher.join(timeout=self.flush_interval * 2)
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def run_once(self) -> bool:
+        """Lease and execute at most one build. Returns True when a build ran."""
+        lease = self.client.lease(self.agent_id, self.labels, self.poll_seconds)
+        if not lease:
+            return False
+        self._execute(lease)
+        return True
+
+    def _worker_loop(self) -> None:
+        while not self._stop.is_set():
+            try:
+                self.run_once()
+            except CoordinatorUnavailableError as exc:
+                logger.warning("⚠️ %s", exc)
+                self._stop.wait(RETRY_BACKOFF_SECONDS)
+            except Exception:
+                logger.exception("Build agent worker failed")
+                self._stop.wait(RETRY_BACKOFF_SECONDS)
+
+    def _flush_loop(self) -> None:
+        while not self._stop.wait(self.flush_interval):
+            for job in self.orchestrator.repository.list_all():
+                self._flush(job)
+
+    def _execute(self, lease: Dict) -> None:
+        job = BuildJob.from_dict(lease["job"])
+        request = BuildRequestData(**lease["request"])
+        job.assigned_agent = self.agent_id
+        with self._outbox_lock:
+            self._outbox[job.build_id] = []
+        self.orchestrator.repository.save(job)
+        self.orchestrator.build_loggers[job.build_id] = BuildLogger(job.build_id)
+        try:
+            self.orchestrator.run_leased(job, request, self.agent_id)
+        finally:
+            self._complete(job)
+
+    def _complete(self, job: BuildJob) -> None:
+        try:
+            self.client.complete(job.build_id, self.agent_id, self._drain_payload(job))
+        except CoordinatorUnavailableError as exc:
+            logger.error("Failed to report completion of %s: %s", job.build_id, exc)
+        finally:
+            with self._outbox_lock:
+                self._outbox.pop(job.build_id, None)
+            self.orchestrator.repository.forget(job.build_id)
+            self.orchestrator.build_loggers.pop(job.build_id, None)
+
+    def _flush(self, job: BuildJob) -> None:
+        payload = self._drain_payload(job)
+        try:
+            response = self.client.send_events(job.build_id, self.agent_id, payload)
+        except CoordinatorUnavailableError as exc:
+            logger.warning("⚠️ Failed to stream events for %s: %s", job.build_id, exc)
+            self._requeue(job.build_id, payload["log_entries"])
+            return
+        if response.get("cancel_requested") and job.status != BuildStatus.CANCELED:
+            self.orchestrator.cancel_build(job.build_id)
+
+    def _capture_log(self, job: BuildJob, entry: BuildLogEntry) -> None:
+        with self._outbox_lock:
+            outbox = self._outbox.get(job.build_id)
+            if outbox is not None:
+                outbox.append(entry)
+
+    def _drain_payload(self, job: BuildJob) -> Dict:
+        with self._outbox_lock:
+            entries = self._outbox.get(job.build_id, [])
+            if job.build_id in self._outbox:
+                self._outbox[job.build_id] = []
+        snapshot = job.to_dict()
+        return {
+            "log_entries": [
+                {"message": entry.message, "timestamp": entry.timestamp, "stages": list(entry.stages)}
+                for entry in entries
+            ],
+            "state": {
+                key: snapshot[key]
+                for key in (
+                    "status",
+                    "stages",
+                    "progress",
+                    "resolved_flutter_sdk_version",
+                    "cancel_reason",
+                    "cancel_requested_at",
+                    "canceled_at",
+                    "target_commit",
+                    "commit_sha",
+                    "slot_key",
+                    "slot_id",
+                )
+            },
+        }
+
+    def _requeue(self, build_id: str, entries: List[Dict]) -> None:
+        restored = [
+            BuildLogEntry(message=entry["message"], timestamp=entry["timestamp"], stages=entry["stages"])
+            for entry in entries
+        ]
+        with self._outbox_lock:
+            if build_id in self._outbox:
+                self._outbox[build_id] = restored + self._outbox[build_id]
@@ -0,0 +1,146 @@
+"""Coordinator-side bridge between queued builds and remote build agents."""
+
+from __future__ import annotations
+
+import logging
+import threading
+from dataclasses import asdict
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from ..domain import BuildLogEntry, BuildStatus
+from .build_orchestrator import FINAL_STATUSES, KEEP_LOG_LINES, MAX_LOG_LINES, BuildOrchestrator
+from .job_dispatcher import JobDispatcher
+
+logger = logging.getLogger(__name__)
+
+LEASE_SWEEP_INTERVAL = 15.0
+
+
+class BuildCoordinator:
+    """Lease queued builds to agents and fold their streamed events into build state.
+
+    Expired agent leases are failed on every lease poll and, between polls,
+    by a sweeper thread started with :meth:`start`, so a build whose agent
+    died does not stay RUNNING when no other agent polls.
+    """
+
+    def __init__(
+        self,
+        orchestrator: BuildOrchestrator,
+        dispatcher: JobDispatcher,
+        *,
+        sweep_interval: Optional[float] = None,
+    ) -> None:
+        self.orchestrator = orchestrator
+        self.dispatcher = dispatcher
+        self.sweep_interval = (
+            min(LEASE_SWEEP_INTERVAL, dispatcher.lease_timeout / 2) if sweep_interval is None else sweep_interval
+        )
+        self._stopped = threading.Event()
+        self._sweeper: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        if self._sweeper is not None:
+            return
+        self._stopped.clear()
+        self._sweeper = threading.Thread(target=self._sweep_loop, name="agent-lease-sweeper", daemon=True)
+        self._sweeper.start()
+
+    def stop(self) -> None:
+        self._stopped.set()
+        if self._sweeper is not None:
+            self._sweeper.join(timeout=self.sweep_interval)
+            self._sweeper = None
+
+    def lease(self, agent_id: str, labels: List[str], wait_seconds: float) -> Optional[Dict[str, Any]]:
+        self.fail_expired_leases()
+        entry = self.dispatcher.lease(agent_id, set(labels), wait_seconds)
+        if entry is None:
+            return None
+
+        job = self.orchestrator.repository.get(entry.build_id)
+        if job is None or job.status in FINAL_STATUSES:
+            self.dispatcher.release(entry.build_id)
+            self.orchestrator.forget(entry.build_id)
+            return None
+
+        self.orchestrator.mark_leased(job, agent_id)
+        return {
+            "build_id": job.build_id,
+            "job": job.to_dict(),
+            "request": asdict(entry.request),
+        }
+
+    def record_events(self, build_id: str, agent_id: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+        job = self.orchestrator.repository.get(build_id)
+        if job is None or not self.dispatcher.heartbeat(build_id, agent_id):
+            return {"accepted": False, "cancel_requested": True}
+
+        self._apply(job, payload)
+        return {
+            "accepted": True,
+            "cancel_requested": job.status == BuildStatus.CANCELED,
+        }
+
+    def complete(self, build_id: str, agent_id: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+        job = self.orchestrator.repository.get(build_id)
+        entry = self.dispatcher.release(build_id)
+        if job is None or entry is None or entry.agent_id != agent_id:
+            return {"accepted": False, "cancel_requested": False}
+
+        self._apply(job, payload)
+        self.orchestrator.forget(build_id)
+        if job.status not in FINAL_STATUSES:
+            self.orchestrator.fail_build(job, f"Agent {agent_id} finished without a final status")
+        return {"accepted": True, "cancel_requested": False}
+
+    def fail_expired_leases(self) -> None:
+        for entry in self.dispatcher.expired_leases():
+            self.orchestrator.forget(entry.build_id)
+            job = self.orchestrator.repository.get(entry.build_id)
+            if job is None or job.status in FINAL_STATUSES:
+                continue
+            self.orchestrator.fail_build(job, f"Agent {entry.agent_id} stopped reporting; build marked as failed")
+
+    def _sweep_loop(self) -> None:
+        while not self._stopped.wait(self.sweep_interval):
+            try:
+                self.fail_expired_leases()
+            except Exception:
+                logger.exception("Failing expired agent leases failed")
+
+    def agents(self) -> List[Dict[str, Any]]:
+        return [
+            {
+                "agent_id": agent.agent_id,
+                "labels": sorted(agent.labels),
+                "last_seen": datetime.fromtimestamp(agent.last_seen).isoformat(),
+                "active_builds": sorted(agent.active_builds),
+            }
+            for agent in self.dispatcher.agents()
+        ]
+
+    def _apply(self, job, payload: Dict[str, Any]) -> None:
+        entries = [
+            BuildLogEntry(
+                message=str(entry.get("message", "")),
+                timestamp=str(entry.get("timestamp", "")),
+                stages=list(entry.get("stages", [])),
+            )
+            for entry in payload.get("log_entries", [])
+        ]
+        job.apply_remote_update(payload.get("state", {}))
+        with job.lock:
+            for entry in entries:
+                job.logs.append(entry.message)
+                job.log_entries.append(entry)
+            if len(job.logs) > MAX_LOG_LINES:
+                job.logs = job.logs[-KEEP_LOG_LINES:]
+            if len(job.log_entries) > MAX_LOG_LINES:
+                job.log_entries = job.log_entries[-KEEP_LOG_LINES:]
+        logger_instance = self.orchestrator.build_loggers.get(job.build_id)
+        if logger_instance:
+            for entry in entries:
+                logger_instance.log(entry.message)
+        self.orchestrator.repository.save(job)
@@ -20,6 +20,7 @@ class BuildEnvironmentAssembler:
         self.repository_workspace_manager = repository_workspace_manager
 
     def assemble(self, job: BuildJob, versions: ResolvedVersions, log, should_cancel=None) -> BuildRuntimeContext:
+        sync_checkpoint = job.checkpoints.get("repository_synced", {})
         isolated = get_isolated_env(
             job.build_id,
             flutter_version=versions.flutter_sdk_version,
@@ -54,12 +55,34 @@ class BuildEnvironmentAssembler:
             platform=job.platform,
             log=log,
             should_cancel=should_cancel,
+            preferred_slot_id=sync_checkpoint.get("slot_id") or job.slot_id,
+            reuse_commit=sync_checkpoint.get("commit_sha"),
+            target_commit=job.target_commit,
         )
         env["LOCAL_DIR"] = prepared.repo_dir
         env["IOS_USE_BUNDLER"] = self._resolve_ios_use_bundler(job, Path(prepared.repo_dir) / "ios")
         # Force pod install auto-detection when iOS precache had to repair SDK state.
         env["IOS_FLUTTER_SDK_CHANGED"] = "true" if (prepared.flutter_version_changed or prepared.precache_ran) else "false"
-        job.mark_stage_completed("repository_synced", f"Repository synchronized for {job.branch_name}")
+        job.commit_sha = prepared.commit_sha
+        job.target_commit = job.target_commit or prepared.commit_sha
+        if prepared.workspace_lease is not None:
+            job.slot_key = prepared.workspace_lease.slot_key
+            job.slot_id = prepared.workspace_lease.slot_id
+        if prepared.sync_skipped and prepared.commit_sha == sync_checkpoint.get("commit_sha"):
+            job.mark_stage_reused(
+                "repository_synced",
+                job.retry_of,
+                f"Reused checkout at {(prepared.commit_sha or '')[:12]}",
+            )
+        elif prepared.sync_skipped:
+            job.mark_stage_completed("repository_synced", f"Slot already at {(prepared.commit_sha or '')[:12]}; sync skipped")
+        else:
+            job.mark_stage_completed("repository_synced", f"Repository synchronized for {job.branch_name}")
+        if prepared.commit_sha:
+            job.record_stage_inputs(
+                "repository_synced",
+                {"commit_sha": prepared.commit_sha, "slot_id": job.slot_id or ""},
+            )
         resolved_flutter_version = prepared.flutter_version
         if resolved_flutter_version:
             env["FLUTTER_SDK_VERSION"] = resolved_flutter_version
@@ -96,6 +119,8 @@ class BuildEnvironmentAssembler:
         if prepared.workspace_lease is not None:
             summary_rows.append(("Slot key", prepared.workspace_lease.slot_key))
             summary_rows.append(("Slot id", prepared.workspace_lease.slot_id))
+        for fetch in prepared.fetches:
+            summary_rows.append((f"Git fetch ({fetch.ref})", f"{fetch.describe()} from {fetch.source}"))
         if versions.gradle_version:
             summary_rows.append(("Gradle version", versions.gradle_version))
         if versions.cocoapods_version:
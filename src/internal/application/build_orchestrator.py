@@ -4,19 +4,33 @@ from __future__ import annotations
 
 import logging
 import os
-import threading
 from datetime import datetime
-from typing import Dict, Optional
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
 from uuid import uuid4
 
+from ..core.config import get_build_script_pty
 from ..core.queue_manager import queue_manager
-from ..domain import BuildJob, BuildLogEntry, BuildProgress, BuildRequestData, BuildStatus, StageStatus
+from ..domain import (
+    PREWARM_TRIGGER_SOURCE,
+    BuildJob,
+    BuildLogEntry,
+    BuildProgress,
+    BuildRequestData,
+    BuildStatus,
+    StageStatus,
+)
 from ..infrastructure import BuildLogger, CommandRunner, SetupExecutor
-from ..infrastructure.command_runner import CommandCancelledError
+from ..infrastructure.cgroups import CgroupManager, running_in_cgroup
+from ..infrastructure.command_runner import CommandCancelledError, CommandTimeoutError, recording_usage
+from ..infrastructure.fingerprints import dependency_fingerprints
+from ..infrastructure.output_pipeline import OutputPipeline, OutputPipelineStats
 from .build_environment import BuildEnvironmentAssembler
+from .build_queue_store import RUNNING, BuildQueueStore
 from .build_repository import BuildRepository
 from .build_status_presenter import BuildStatusPresenter
 from .config_diagnostics import ConfigDiagnostics
+from .job_dispatcher import DispatchEntry, JobDispatcher, required_labels_for
 from .validators import BuildRequestValidator
 from .version_resolver import VersionResolver
 
@@ -25,6 +39,9 @@ logger = logging.getLogger(__name__)
 MAX_LOG_LINES = 500
 KEEP_LOG_LINES = 400
 
+FINAL_STATUSES = {BuildStatus.COMPLETED, BuildStatus.FAILED, BuildStatus.CANCELED}
+RECOVERY_POLICIES = ("retry", "resume", "fail")
+
 
 class BuildOrchestrator:
     """Coordinates validated build requests end-to-end."""
@@ -39,6 +56,9 @@ class BuildOrchestrator:
         environment_assembler: BuildEnvironmentAssembler,
         setup_executor: SetupExecutor,
         status_presenter: BuildStatusPresenter,
+        dispatcher: JobDispatcher | None = None,
+        queue_store: BuildQueueStore | None = None,
+        cgroups: CgroupManager | None = None,
     ) -> None:
         self.repository = repository
         self.validator = validator
@@ -48,15 +68,25 @@ class BuildOrchestrator:
         self.environment_assembler = environment_assembler
         self.setup_executor = setup_executor
         self.status_presenter = status_presenter
+        self.dispatcher = dispatcher
+        self.queue_store = queue_store
+        self.cgroups = cgroups
         self.build_loggers: Dict[str, BuildLogger] = {}
+        self.output_pipelines: Dict[str, OutputPipeline] = {}
+        self.output_totals = OutputPipelineStats()
+        self.log_listeners: List[Callable[[BuildJob, BuildLogEntry], None]] = []
 
-    def start_build(self, request: BuildRequestData) -> str:
+    def start_build(
+        self,
+        request: BuildRequestData,
+        *,
+        retry_of: BuildJob | None = None,
+        from_stage: str | None = None,
+    ) -> str:
         validated_request = self.validator.validate(request)
-        diagnostic = self.config_diagnostics.get_build_diagnostics(validated_request)
-        if not diagnostic.ready:
-            raise ValueError(
-                f"Missing required environment variables for build: {', '.join(diagnostic.missing)}"
-            )
+        # Remote agents validate their own signing and toolchain environment; pre-warm jobs never sign.
+        if self.dispatcher is None and validated_request.trigger_source != PREWARM_TRIGGER_SOURCE:
+            self.ensure_build_ready(validated_request)
         branch_name = validated_request.branch_name or os.environ.get(
             f"{validated_request.flavor.upper()}_BRANCH_NAME", "develop"
         )
@@ -65,18 +95,85 @@ class BuildOrchestrator:
 
         job = BuildJob.create(build_id, validated_request, branch_name, queue_key)
         job.mark_stage_completed("request_validated", "Build request validated")
+        if retry_of is not None:
+            job.retry_of = retry_of.build_id
+            job.resume_from_stage = from_stage
+            job.checkpoints = retry_of.reusable_checkpoints(from_stage)
         self.repository.save(job)
         self.build_loggers[build_id] = BuildLogger(build_id)
-
-        thread = threading.Thread(
-            target=lambda: queue_manager.execute_with_queue(
-                queue_key, build_id, self._run_pipeline, job, validated_request
-            ),
-            daemon=True,
-        )
-        thread.start()
+        if retry_of is not None:
+            self._log(
+                job,
+                f"[{build_id}] 🔁 Retrying {retry_of.build_id} from {from_stage} "
+                f"({len(job.checkpoints)} checkpoint(s) to verify)",
+            )
+        sequence = None
+        if self.queue_store is not None:
+            sequence = self.queue_store.add(build_id, validated_request, branch_name, queue_key).sequence
+        self._dispatch(job, validated_request, sequence)
         return build_id
 
+    def retry_build(self, build_id: str, from_stage: str | None = None) -> Optional[str]:
+        """Start a new build that reuses the checkpoints of a failed or canceled one."""
+        original = self.repository.get(build_id)
+        if original is None:
+            return None
+        if original.status not in {BuildStatus.FAILED, BuildStatus.CANCELED}:
+            raise ValueError(f"Only failed or canceled builds can be retried (status: {original.status.value})")
+        from_stage = from_stage or original.first_incomplete_stage() or next(iter(original.stages))
+        if from_stage not in original.stages:
+            raise ValueError(
+                f"Unknown stage '{from_stage}'. Available stages: {', '.join(original.stages)}"
+            )
+        return self.start_build(original.to_request(), retry_of=original, from_stage=from_stage)
+
+    def recover_queued_builds(self, policy: str = "retry") -> int:
+        """Re-enqueue builds persisted before a restart; returns how many were re-queued.
+
+        Queued builds are always re-enqueued in their original order. Builds that
+        were running are re-run from the start (``retry``), resumed from their
+        first unfinished stage (``resume``) or marked failed (``fail``).
+        """
+        if policy not in RECOVERY_POLICIES:
+            raise ValueError(f"Unknown queue recovery policy: {policy}")
+        recovered = 0
+        known_ids = set()
+        for entry in self.queue_store.list_entries() if self.queue_store is not None else []:
+            known_ids.add(entry.build_id)
+            job = self.repository.get(entry.build_id)
+            if job is None or job.status in FINAL_STATUSES:
+                self.queue_store.remove(entry.build_id)
+                continue
+            self.build_loggers.setdefault(job.build_id, BuildLogger(job.build_id))
+            if entry.state == RUNNING:
+                if policy == "fail":
+                    self._fail_interrupted(job)
+                    self.queue_store.remove(entry.build_id)
+                    continue
+                if policy == "resume":
+                    from_stage = job.first_incomplete_stage()
+                    job.resume_from_stage = from_stage
+                    job.checkpoints = job.reusable_checkpoints(from_stage)
+                job.reset_for_retry()
+                self.queue_store.requeue(entry.build_id)
+                self._log(job, f"[{job.build_id}] ♻️ Server restarted mid-build; re-queued (attempt {entry.attempts + 1})")
+            else:
+                self._log(job, f"[{job.build_id}] ♻️ Server restarted; build re-queued")
+            self._dispatch(job, entry.request, entry.sequence)
+            recovered += 1
+
+        for job in self.repository.list_all():
+            if job.build_id not in known_ids and job.status in {BuildStatus.PENDING, BuildStatus.RUNNING}:
+                self._fail_interrupted(job)
+        return recovered
+
+    def ensure_build_ready(self, request: BuildRequestData) -> None:
+        diagnostic = self.config_diagnostics.get_build_diagnostics(request)
+        if not diagnostic.ready:
+            raise ValueError(
+                f"Missing required environment variables for build: {', '.join(diagnostic.missing)}"
+            )
+
     def get_build_status(self, build_id: str) -> Optional[Dict]:
         job = self.repository.get(build_id)
         if not job:
@@ -88,6 +185,26 @@ class BuildOrchestrator:
             logger_instance.get_log_path() if logger_instance else None,
         )
 
+    def resource_metrics(self) -> Dict:
+        """Build counts and cgroup usage counters for the metrics endpoint."""
+        jobs = self.repository.list_all()
+        metrics: Dict = {
+            "builds": {status.value: sum(1 for job in jobs if job.status == status) for status in BuildStatus},
+            "queued": queue_manager.worker_pool.pending_count(),
+            "output": self.output_metrics(),
+            "cgroups_enabled": False,
+        }
+        if self.cgroups is None or not self.cgroups.available:
+            return metrics
+        metrics.update(
+            cgroups_enabled=True,
+            memory_pressure=self.cgroups.memory_pressure(),
+            completed_builds=self.cgroups.completed_builds,
+            totals=self.cgroups.totals.to_dict(),
+            running={build_id: usage.to_dict() for build_id, usage in self.cgroups.snapshot().items()},
+        )
+        return metrics
+
     def list_builds(self) -> list[Dict]:
         builds = []
         for job in self.repository.list_all():
@@ -104,17 +221,120 @@ class BuildOrchestrator:
 
         with job.lock:
             job.mark_canceled("Build canceled by user request")
-
+        # Wakes queue/slot waiters and signals running commands without waiting for a poll.
+        job.cancel_token.cancel()
+
+        if self.dispatcher is not None:
+            self.dispatcher.cancel_pending(build_id)
+        else:
+            queue_manager.cancel_pending(build_id)
+        # A canceled build never needs recovery, whether it was queued or running.
+        self._forget_queue_entry(build_id)
         self._log(job, f"[{job.build_id}] 🛑 Cancellation requested")
         self._terminate_processes(job)
         self.repository.save(job)
         return self.get_build_status(build_id)
 
+    def mark_leased(self, job: BuildJob, agent_id: str) -> None:
+        """Record that a remote agent took ``job`` off the dispatch queue."""
+        self._mark_queue_running(job.build_id)
+        with job.lock:
+            job.assigned_agent = agent_id
+        self._log(job, f"[{job.build_id}] 🤖 Build leased by agent {agent_id}")
+
+    def run_leased(self, job: BuildJob, request: BuildRequestData, agent_id: str) -> None:
+        """Run a build leased from the coordinator in this (agent) process."""
+        try:
+            self.ensure_build_ready(request)
+        except ValueError as exc:
+            self.fail_build(job, f"Agent {agent_id} cannot run build: {exc}")
+            return
+        self._log(job, f"[{job.build_id}] 🤖 Running on agent {agent_id}")
+        self._run_pipeline(job, request)
+
+    def fail_build(self, job: BuildJob, reason: str) -> None:
+        """Mark ``job`` and its running stages failed with ``reason``."""
+        with job.lock:
+            job.status = BuildStatus.FAILED
+        self._fail_running_stages(job, reason)
+        self._log(job, f"[{job.build_id}] 💥 {reason}")
+        self.repository.save(job)
+
+    def forget(self, build_id: str) -> None:
+        """Drop ``build_id`` from the persisted queue; it no longer needs recovery after a restart."""
+        self._forget_queue_entry(build_id)
+
+    def _dispatch(self, job: BuildJob, request: BuildRequestData, sequence: Optional[int]) -> None:
+        if self.dispatcher is not None:
+            self.dispatcher.enqueue(
+                DispatchEntry(
+                    build_id=job.build_id,
+                    request=request,
+                    branch_name=job.branch_name,
+                    queue_key=job.queue_key,
+                    required_labels=required_labels_for(request.platform),
+                )
+            )
+            self._log(job, f"[{job.build_id}] 📮 Build queued for a remote agent")
+            return
+
+        queue_manager.submit(
+            job.queue_key,
+            job.build_id,
+            self._run_queued_pipeline,
+            job,
+            request,
+            queue_priority=job.priority,
+            queue_sequence=sequence,
+            cancel_token=job.cancel_token,
+        )
+
+    def _run_queued_pipeline(self, job: BuildJob, request: BuildRequestData) -> None:
+        self._mark_queue_running(job.build_id)
+        try:
+            self._run_pipeline(job, request)
+        finally:
+            self._forget_queue_entry(job.build_id)
+
+    def _mark_queue_running(self, build_id: str) -> None:
+        if self.queue_store is not None:
+            self.queue_store.mark_running(build_id)
+
+    def _forget_queue_entry(self, build_id: str) -> None:
+        if self.queue_store is not None:
+            self.queue_store.remove(build_id)
+
+    def _fail_interrupted(self, job: BuildJob) -> None:
+        with job.lock:
+            job.status = BuildStatus.FAILED
+        self._log(job, f"[{job.build_id}] ⚠️ Server restarted while build was running. Build marked as failed.")
+
     def _generate_build_id(self, flavor: str, platform: str) -> str:
         timestamp = datetime.now().strftime("%Y%m%d-%H%M%S")
         return f"{flavor}-{platform}-{timestamp}-{uuid4().hex[:8]}"
 
     def _run_pipeline(self, job: BuildJob, request: BuildRequestData) -> None:
+        cgroup = self.cgroups.create(job.build_id) if self.cgroups is not None else None
+        if cgroup is None:
+            self._run_pipeline_steps(job, request)
+            return
+        self._log(job, f"[{job.build_id}] 🧱 Running in cgroup {cgroup.path.name}")
+        try:
+            with running_in_cgroup(cgroup):
+                self._run_pipeline_steps(job, request)
+        finally:
+            usage = self.cgroups.release(job.build_id)
+            if usage is not None:
+                job.cgroup_usage = usage.to_dict()
+                self._log(
+                    job,
+                    f"[{job.build_id}] 📊 CPU {usage.cpu_user_seconds + usage.cpu_system_seconds:.1f}s, "
+                    f"peak memory {usage.memory_peak_bytes / 1024 ** 2:.0f} MiB, "
+                    f"I/O {usage.io_read_bytes / 1024 ** 2:.0f}/{usage.io_write_bytes / 1024 ** 2:.0f} MiB read/written",
+                )
+                self.repository.save(job)
+
+    def _run_pipeline_steps(self, job: BuildJob, request: BuildRequestData) -> None:
         runtime = None
         if self._is_canceled(job):
             self._log(job, f"[{job.build_id}] 🛑 Skipping pipeline because cancellation was requested before execution")
@@ -126,18 +346,28 @@ class BuildOrchestrator:
             versions = self.version_resolver.resolve(request)
             job.resolved_flutter_sdk_version = versions.flutter_sdk_version
             job.mark_stage_running("environment_prepared", "Preparing isolated build environment")
-            runtime = self.environment_assembler.assemble(
-                job,
-                versions,
-                lambda message: self._log(job, message),
-                should_cancel=lambda: self._is_canceled(job),
-            )
+            with self._recording_usage(job, "environment_prepared"):
+                runtime = self.environment_assembler.assemble(
+                    job,
+                    versions,
+                    lambda message: self._log(job, message),
+                    should_cancel=job.cancel_token,
+                )
             if self._is_canceled(job):
                 self.repository.save(job)
                 return
             job.mark_stage_completed("environment_prepared", "Isolated build environment ready")
             if not self._run_setup_script(job, runtime):
                 return
+            if job.is_prewarm:
+                job.status = BuildStatus.COMPLETED
+                self._log(
+                    job,
+                    f"[{job.build_id}] 🔥 Workspace slot {runtime.slot_id or ''} pre-warmed at "
+                    f"{(job.commit_sha or '')[:12]}; dependencies installed for the next build",
+                )
+                self.repository.save(job)
+                return
 
             if not self._run_build_scripts(job, runtime):
                 if not self._is_canceled(job):
@@ -160,6 +390,7 @@ class BuildOrchestrator:
                 self.repository.save(job)
                 return
             job.status = BuildStatus.FAILED
+            self._fail_running_stages(job, str(exc))
             self._log(job, f"[{job.build_id}] 💥 Build pipeline failed: {exc}")
             logger.exception("Build pipeline failed for %s", job.build_id)
             self.repository.save(job)
@@ -179,20 +410,31 @@ class BuildOrchestrator:
             self._mark_canceled(job, "Build canceled before setup")
             self.repository.save(job)
             return False
+        fingerprints = dependency_fingerprints(Path(runtime.repo_dir))
+        inputs = self._stage_inputs(
+            job,
+            flutter_sdk_version=job.resolved_flutter_sdk_version or "",
+            pub=fingerprints["pub"],
+        )
+        if self._reuse_stage(job, "dependencies_installed", inputs):
+            return True
         self._log(job, f"[{job.build_id}] 📦 Running setup...")
         job.mark_stage_running("dependencies_installed", "Resolving Flutter dependencies")
         try:
-            self.setup_executor.run_setup(
-                build_id=job.build_id,
-                context=runtime,
-                log=lambda message: self._log(job, message),
-                should_cancel=lambda: self._is_canceled(job),
-            )
+            with self._recording_usage(job, "dependencies_installed"):
+                self.setup_executor.run_setup(
+                    build_id=job.build_id,
+                    context=runtime,
+                    log=lambda message: self._log(job, message),
+                    should_cancel=job.cancel_token,
+                )
             if self._is_canceled(job):
                 self._mark_canceled(job, "Build canceled during setup")
                 self.repository.save(job)
                 return False
             job.mark_stage_completed("dependencies_installed", "Flutter dependencies resolved")
+            if inputs is not None:
+                job.record_stage_inputs("dependencies_installed", inputs)
             return True
         except CommandCancelledError:
             self._mark_canceled(job, "Build canceled during setup")
@@ -219,89 +461,198 @@ class BuildOrchestrator:
             self._log(job, f"[{job.build_id}] ❌ No build processes started")
             return False
 
+        fingerprints = dependency_fingerprints(Path(runtime.repo_dir))
+        build_inputs = {}
         processes = []
-        for platform_name, command in commands:
-            try:
+        waited = set()
+        try:
+            for platform_name, command in commands:
                 preflight_stage = f"{platform_name}_preflight"
                 toolchain_stage = f"{platform_name}_toolchain_ready"
                 build_stage = f"{platform_name}_build"
-                if preflight_stage in job.stages:
-                    job.mark_stage_running(preflight_stage, f"Running {platform_name} preflight checks")
-                    self.setup_executor.prepare_platform_preflight(
-                        build_id=job.build_id,
-                        platform=platform_name,
-                        context=runtime,
-                        log=lambda message: self._log(job, message),
-                        should_cancel=lambda: self._is_canceled(job),
-                    )
+                build_inputs[platform_name] = self._stage_inputs(job, **{platform_name: fingerprints[platform_name]})
+                if self._reuse_stage(job, build_stage, build_inputs[platform_name]):
+                    # The artifact for this platform was already built and shipped by the checkpointed run.
+                    for stage_name in (preflight_stage, toolchain_stage):
+                        if stage_name in job.stages:
+                            job.mark_stage_reused(stage_name, job.retry_of, f"Skipped with {build_stage}")
+                    continue
+                try:
+                    if preflight_stage in job.stages:
+                        job.mark_stage_running(preflight_stage, f"Running {platform_name} preflight checks")
+                        with self._recording_usage(job, preflight_stage):
+                            self.setup_executor.prepare_platform_preflight(
+                                build_id=job.build_id,
+                                platform=platform_name,
+                                context=runtime,
+                                log=lambda message: self._log(job, message),
+                                should_cancel=job.cancel_token,
+                            )
+                        if self._is_canceled(job):
+                            self._mark_canceled(job, f"{platform_name.title()} build canceled during preflight")
+                            return False
+                        job.mark_stage_completed(preflight_stage, f"{platform_name.title()} preflight checks passed")
+                    job.mark_stage_running(toolchain_stage, f"Preparing {platform_name} toolchain")
+                    with self._recording_usage(job, toolchain_stage):
+                        self.setup_executor.prepare_platform_toolchain(
+                            build_id=job.build_id,
+                            platform=platform_name,
+                            context=runtime,
+                            log=lambda message: self._log(job, message),
+                            should_cancel=job.cancel_token,
+                        )
                     if self._is_canceled(job):
-                        self._mark_canceled(job, f"{platform_name.title()} build canceled during preflight")
+                        self._mark_canceled(job, f"{platform_name.title()} build canceled during toolchain setup")
                         return False
-                    job.mark_stage_completed(preflight_stage, f"{platform_name.title()} preflight checks passed")
-                job.mark_stage_running(toolchain_stage, f"Preparing {platform_name} toolchain")
-                self.setup_executor.prepare_platform_toolchain(
-                    build_id=job.build_id,
-                    platform=platform_name,
-                    context=runtime,
-                    log=lambda message: self._log(job, message),
-                    should_cancel=lambda: self._is_canceled(job),
-                )
+                    job.mark_stage_completed(toolchain_stage, f"{platform_name.title()} toolchain ready")
+                except CommandCancelledError:
+                    self._mark_canceled(job, f"{platform_name.title()} build canceled during setup")
+                    return False
+                except Exception as exc:
+                    failed_stage = (
+                        preflight_stage
+                        if preflight_stage in job.stages and job.stages[preflight_stage].status == StageStatus.RUNNING
+                        else toolchain_stage
+                    )
+                    job.mark_stage_failed(failed_stage, str(exc))
+                    self._log(job, f"[{job.build_id}] ❌ {platform_name.title()} setup failed: {exc}")
+                    return False
+                job.mark_stage_running(build_stage, f"{platform_name.title()} build started")
+                self._log(job, f"[{job.build_id}] Starting {platform_name} build...")
+                command_env = runtime.build_env()
+                use_tty = get_build_script_pty()
+                if use_tty:
+                    # A terminal that cannot redraw keeps gradle/flutter from drawing cursor-moving progress UIs.
+                    command_env["TERM"] = "dumb"
+                process = self.command_runner.start(command, env=command_env, cwd=os.getcwd(), tty=use_tty)
+                job.processes[platform_name] = process
+                processes.append((platform_name, process))
+                self._monitor_process_output(job, platform_name, process)
+
+            if not processes:
+                return True
+
+            success = True
+            for platform_name, process in processes:
+                waited.add(platform_name)
+                try:
+                    with self._recording_usage(job, f"{platform_name}_build"):
+                        self.command_runner.wait(process)
+                except CommandTimeoutError as exc:
+                    job.mark_stage_failed(f"{platform_name}_build", f"Killed: {exc.reason}")
+                    self._log(job, f"[{job.build_id}] ⏱️ {platform_name.title()} build killed: {exc.reason}")
+                    success = False
+                    continue
+                finally:
+                    self._close_output(job, platform_name)
                 if self._is_canceled(job):
-                    self._mark_canceled(job, f"{platform_name.title()} build canceled during toolchain setup")
+                    self._mark_canceled(job, f"{platform_name.title()} build canceled")
+                    self.repository.save(job)
                     return False
-                job.mark_stage_completed(toolchain_stage, f"{platform_name.title()} toolchain ready")
-            except CommandCancelledError:
-                self._mark_canceled(job, f"{platform_name.title()} build canceled during setup")
-                return False
-            except Exception as exc:
-                failed_stage = (
-                    preflight_stage
-                    if preflight_stage in job.stages and job.stages[preflight_stage].status == StageStatus.RUNNING
-                    else toolchain_stage
-                )
-                job.mark_stage_failed(failed_stage, str(exc))
-                self._log(job, f"[{job.build_id}] ❌ {platform_name.title()} setup failed: {exc}")
-                return False
-            job.mark_stage_running(build_stage, f"{platform_name.title()} build started")
-            self._log(job, f"[{job.build_id}] Starting {platform_name} build...")
-            command_env = runtime.build_env()
-            process = self.command_runner.start(command, env=command_env, cwd=os.getcwd())
-            job.processes[platform_name] = process
-            processes.append((platform_name, process))
-            threading.Thread(
-                target=self._monitor_process_output,
-                args=(job, platform_name, process),
-                daemon=True,
-            ).start()
-
-        success = True
-        for platform_name, process in processes:
+                if process.returncode != 0:
+                    job.mark_stage_failed(f"{platform_name}_build", f"Exit code {process.returncode}")
+                    self._log(
+                        job,
+                        f"[{job.build_id}] ❌ {platform_name.title()} build failed with code {process.returncode}",
+                    )
+                    success = False
+                else:
+                    job.mark_stage_completed(f"{platform_name}_build", "Build completed successfully")
+                    if build_inputs[platform_name] is not None:
+                        job.record_stage_inputs(f"{platform_name}_build", build_inputs[platform_name])
+                    self._log(job, f"[{job.build_id}] ✅ {platform_name.title()} build completed successfully")
+            return success
+        finally:
+            # Early returns (a later platform's setup failed, cancellation) leave started builds behind.
+            for platform_name, process in processes:
+                if platform_name not in waited:
+                    self._stop_build_process(job, platform_name, process)
+                self._close_output(job, platform_name)
+
+    def _stop_build_process(self, job: BuildJob, platform_name: str, process) -> None:
+        """Terminate and reap a build that was started but will not be waited on."""
+        stage_name = f"{platform_name}_build"
+        self._log(job, f"[{job.build_id}] 🧹 Stopping {platform_name} build process")
+        try:
+            self.command_runner.terminate(process)
             self.command_runner.wait(process)
+        except Exception as exc:
+            self._log(job, f"[{job.build_id}] ⚠️ Could not stop {platform_name} build process: {exc}")
+        if stage_name in job.stages and job.stages[stage_name].status == StageStatus.RUNNING:
             if self._is_canceled(job):
-                self._mark_canceled(job, f"{platform_name.title()} build canceled")
-                self.repository.save(job)
-                return False
-            if process.returncode != 0:
-                job.mark_stage_failed(f"{platform_name}_build", f"Exit code {process.returncode}")
-                self._log(
-                    job,
-                    f"[{job.build_id}] ❌ {platform_name.title()} build failed with code {process.returncode}",
-                )
-                success = False
+                job.mark_stage_canceled(stage_name, "Build canceled by user request")
             else:
-                job.mark_stage_completed(f"{platform_name}_build", "Build completed successfully")
-                self._log(job, f"[{job.build_id}] ✅ {platform_name.title()} build completed successfully")
-        return success
+                job.mark_stage_failed(stage_name, "Stopped because another platform failed")
+
+    def _stage_inputs(self, job: BuildJob, **fingerprints: str) -> Optional[Dict[str, str]]:
+        """Checkpoint inputs for a stage; None when the checkout commit is unknown."""
+        if not job.commit_sha:
+            return None
+        return {"commit_sha": job.commit_sha, "slot_id": job.slot_id or "", **fingerprints}
+
+    def _reuse_stage(self, job: BuildJob, stage_name: str, inputs: Optional[Dict[str, str]]) -> bool:
+        if inputs is None or job.checkpoints.get(stage_name) != inputs:
+            return False
+        source = job.retry_of or "previous attempt"
+        job.mark_stage_reused(stage_name, job.retry_of, f"Inputs unchanged; reused from {source}")
+        self._log(job, f"[{job.build_id}] ⏭️ Skipping {stage_name}: inputs unchanged since {source}")
+        return True
 
     def _build_command(self, script_path: str) -> list[str]:
         return ["bash", script_path]
 
     def _monitor_process_output(self, job: BuildJob, platform_name: str, process) -> None:
+        """Drain the build's output into a bounded queue that is logged in batches.
+
+        The reader never waits for the log sinks, so a slow consumer cannot fill
+        the pipe and stall the build process itself.
+        """
         self._initialize_progress(job, platform_name)
-        for line in self.command_runner.iter_lines(process):
-            if not line:
-                continue
-            self._log(job, self._parse_progress_line(job, platform_name, line))
+
+        def consume(lines: List[Tuple[float, str]]) -> None:
+            lines = [(received_at, line) for received_at, line in lines if line]
+            self._log_batch(
+                job,
+                [self._parse_progress_line(job, platform_name, line) for _, line in lines],
+                timestamps=[datetime.fromtimestamp(received_at).isoformat() for received_at, _ in lines],
+            )
+
+        pipeline = OutputPipeline(
+            consume,
+            name=f"{job.build_id}-{platform_name}",
+            # Entries keep the time the build printed them, not the time the batch was logged.
+            timed=True,
+            # A newer progress report makes a still-queued one obsolete.
+            coalesce_key=lambda line: "progress" if line.startswith("PROGRESS:") else None,
+        )
+        self.output_pipelines[f"{job.build_id}:{platform_name}"] = pipeline
+        self.command_runner.follow_output(process, pipeline.put)
+
+    def _close_output(self, job: BuildJob, platform_name: str) -> None:
+        pipeline = self.output_pipelines.pop(f"{job.build_id}:{platform_name}", None)
+        if pipeline is None:
+            return
+        stats = pipeline.close()
+        for name in ("lines", "batches", "coalesced", "dropped"):
+            setattr(self.output_totals, name, getattr(self.output_totals, name) + getattr(stats, name))
+        self.output_totals.max_depth = max(self.output_totals.max_depth, stats.max_depth)
+        if stats.dropped:
+            self._log(
+                job,
+                f"[{job.build_id}][{platform_name.upper()}] ⚠️ {stats.dropped} output line(s) dropped "
+                f"(queue peaked at {stats.max_depth} lines)",
+            )
+
+    def output_metrics(self) -> Dict[str, int]:
+        """Output queue counters: totals of finished builds plus the live queues."""
+        live = list(self.output_pipelines.values())
+        metrics = self.output_totals.to_dict()
+        metrics["depth"] = sum(pipeline.stats.depth for pipeline in live)
+        for pipeline in live:
+            for name in ("lines", "batches", "coalesced", "dropped"):
+                metrics[name] += getattr(pipeline.stats, name)
+            metrics["max_depth"] = max(metrics["max_depth"], pipeline.stats.max_depth)
+        return metrics
 
     def _initialize_progress(self, job: BuildJob, platform_name: str) -> None:
         with job.lock:
@@ -334,36 +685,58 @@ class BuildOrchestrator:
         return f"[{job.build_id}][{platform_name.upper()}] {line}"
 
     def _log(self, job: BuildJob, message: str) -> None:
-        timestamp = datetime.now().isoformat()
+        self._log_batch(job, [message])
+
+    def _log_batch(self, job: BuildJob, messages: List[str], timestamps: Optional[List[str]] = None) -> None:
+        """Append ``messages`` with one lock, one build.log write and one state save.
+
+        ``timestamps`` gives each message's arrival time; without it they are stamped now.
+        """
+        if not messages:
+            return
+        timestamps = timestamps or [datetime.now().isoformat()] * len(messages)
         active_stages = [
             name for name, stage in job.stages.items() if stage.status == StageStatus.RUNNING
         ]
-        with job.lock:
-            job.logs.append(message)
-            job.log_entries.append(
-                BuildLogEntry(
-                    message=message,
-                    timestamp=timestamp,
-                    stages=active_stages,
-                )
+        entries = [
+            BuildLogEntry(
+                message=message,
+                timestamp=timestamp,
+                stages=list(active_stages),
             )
+            for message, timestamp in zip(messages, timestamps)
+        ]
+        with job.lock:
+            job.logs.extend(messages)
+            job.log_entries.extend(entries)
             if len(job.logs) > MAX_LOG_LINES:
                 job.logs = job.logs[-KEEP_LOG_LINES:]
             if len(job.log_entries) > MAX_LOG_LINES:
                 job.log_entries = job.log_entries[-KEEP_LOG_LINES:]
         logger_instance = self.build_loggers.get(job.build_id)
         if logger_instance:
-            logger_instance.log(message)
+            logger_instance.log_many(messages)
+        for entry in entries:
+            for listener in self.log_listeners:
+                listener(job, entry)
         self.repository.save(job)
 
     def _is_canceled(self, job: BuildJob) -> bool:
-        return job.status == BuildStatus.CANCELED
+        return job.cancel_token.canceled or job.status == BuildStatus.CANCELED
 
     def _mark_canceled(self, job: BuildJob, reason: str) -> None:
         with job.lock:
             job.mark_canceled(reason)
         self._log(job, f"[{job.build_id}] 🛑 {reason}")
 
+    def _recording_usage(self, job: BuildJob, stage_name: str):
+        return recording_usage(lambda usage: job.record_stage_usage(stage_name, usage))
+
+    def _fail_running_stages(self, job: BuildJob, reason: str) -> None:
+        for name, stage in list(job.stages.items()):
+            if stage.status == StageStatus.RUNNING:
+                job.mark_stage_failed(name, reason)
+
     def _terminate_processes(self, job: BuildJob) -> None:
         for platform_name, process in list(job.processes.items()):
             if process.poll() is not None:
@@ -0,0 +1,155 @@
+"""Durable record of queued and running builds so work survives a restart."""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import threading
+import time
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from ..core.config import WORKSPACE_ROOT
+from ..domain import BuildRequestData
+
+logger = logging.getLogger(__name__)
+
+QUEUE_STATE_FILE = WORKSPACE_ROOT / "queue_state.json"
+
+QUEUED = "queued"
+RUNNING = "running"
+
+
+@dataclass
+class QueuedBuild:
+    """One build the scheduler still owes a result for."""
+
+    build_id: str
+    sequence: int
+    priority: int
+    branch_name: str
+    queue_key: str
+    request: BuildRequestData
+    state: str = QUEUED
+    attempts: int = 0
+    enqueued_at: float = field(default_factory=time.time)
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = asdict(self)
+        data["request"] = asdict(self.request)
+        return data
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "QueuedBuild":
+        return cls(
+            build_id=data["build_id"],
+            sequence=int(data["sequence"]),
+            priority=int(data.get("priority", 0)),
+            branch_name=data["branch_name"],
+            queue_key=data["queue_key"],
+            request=BuildRequestData(**data["request"]),
+            state=data.get("state", QUEUED),
+            attempts=int(data.get("attempts", 0)),
+            enqueued_at=float(data.get("enqueued_at", time.time())),
+        )
+
+
+def scheduling_order(entry: QueuedBuild) -> tuple[int, int]:
+    """Higher priority first, then submission order."""
+    return (-entry.priority, entry.sequence)
+
+
+class BuildQueueStore:
+    """JSON-file journal of the scheduler queue (order, priority, request payload)."""
+
+    def __init__(self, path: Path = QUEUE_STATE_FILE) -> None:
+        self.path = path
+        self._lock = threading.Lock()
+        self._next_sequence = 1
+        self._entries: Dict[str, QueuedBuild] = {}
+        self._load()
+
+    def add(
+        self,
+        build_id: str,
+        request: BuildRequestData,
+        branch_name: str,
+        queue_key: str,
+    ) -> QueuedBuild:
+        with self._lock:
+            entry = QueuedBuild(
+                build_id=build_id,
+                sequence=self._next_sequence,
+                priority=request.priority,
+                branch_name=branch_name,
+                queue_key=queue_key,
+                request=request,
+            )
+            self._next_sequence += 1
+            self._entries[build_id] = entry
+            self._flush()
+            return entry
+
+    def mark_running(self, build_id: str) -> None:
+        with self._lock:
+            entry = self._entries.get(build_id)
+            if entry is None:
+                return
+            entry.state = RUNNING
+            entry.attempts += 1
+            self._flush()
+
+    def requeue(self, build_id: str) -> None:
+        with self._lock:
+            entry = self._entries.get(build_id)
+            if entry is None:
+                return
+            entry.state = QUEUED
+            self._flush()
+
+    def remove(self, build_id: str) -> None:
+        with self._lock:
+            if self._entries.pop(build_id, None) is not None:
+                self._flush()
+
+    def get(self, build_id: str) -> Optional[QueuedBuild]:
+        with self._lock:
+            return self._entries.get(build_id)
+
+    def list_entries(self) -> List[QueuedBuild]:
+        with self._lock:
+            return sorted(self._entries.values(), key=scheduling_order)
+
+    def _load(self) -> None:
+        if not self.path.exists():
+            return
+        try:
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+        except (OSError, json.JSONDecodeError) as exc:
+            logger.error("Failed to read queue state %s: %s", self.path, exc)
+            return
+        for raw in data.get("entries", []):
+            try:
+                entry = QueuedBuild.from_dict(raw)
+            except (KeyError, TypeError, ValueError) as exc:
+                logger.error("Skipping unreadable queue entry %s: %s", raw, exc)
+                continue
+            self._entries[entry.build_id] = entry
+        self._next_sequence = max(
+            [int(data.get("next_sequence", 1))] + [entry.sequence + 1 for entry in self._entries.values()]
+        )
+
+    def _flush(self) -> None:
+        payload = {
+            "next_sequence": self._next_sequence,
+            "entries": [entry.to_dict() for entry in sorted(self._entries.values(), key=scheduling_order)],
+        }
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.path.with_suffix(".tmp")
+            tmp_path.write_text(json.dumps(payload, ensure_ascii=False, indent=2), encoding="utf-8")
+            os.replace(tmp_path, self.path)
+        except OSError as exc:
+            logger.error("Failed to persist queue state %s: %s", self.path, exc)
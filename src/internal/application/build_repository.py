@@ -44,11 +44,8 @@ class BuildRepository:
                         data = json.loads(state_file.read_text(encoding="utf-8"))
                         job = BuildJob.from_dict(data)
                         
-                        # 강제 종료된 빌드 복구 처리 (실행 중이던 것은 FAILED로 변경)
-                        if job.status in (BuildStatus.RUNNING, BuildStatus.PENDING):
-                            job.status = BuildStatus.FAILED
-                            job.logs.append(f"[{job.build_id}] ⚠️ Server restarted while build was running. Build marked as failed.")
-                            
+                        # 실행 중/대기 중이던 빌드는 상태를 그대로 두고,
+                        # BuildOrchestrator.recover_queued_builds()가 큐 정책에 따라 재개/실패 처리
                         self._jobs[job.build_id] = job
                         loaded_count += 1
                     except Exception as e:
@@ -33,6 +33,13 @@ class BuildStatusPresenter:
             "cancel_reason": job.cancel_reason,
             "cancel_requested_at": job.cancel_requested_at,
             "canceled_at": job.canceled_at,
+            "assigned_agent": job.assigned_agent,
+            "priority": job.priority,
+            "target_commit": job.target_commit,
+            "commit_sha": job.commit_sha,
+            "slot_id": job.slot_id,
+            "retry_of": job.retry_of,
+            "resume_from_stage": job.resume_from_stage,
             "queue_key": job.queue_key,
             "platform_statuses": self._platform_statuses(job),
             "processes": {
@@ -59,10 +66,13 @@ class BuildStatusPresenter:
                     "message": stage.message,
                     "started_at": stage.started_at,
                     "completed_at": stage.completed_at,
+                    "reused_from": stage.reused_from,
+                    "resources": stage.resources.to_dict() if stage.resources else None,
                     "logs": stage_logs.get(stage.name, []),
                 }
                 for stage in job.stages.values()
             ],
+            "cgroup_usage": job.cgroup_usage or None,
             "logs": job.logs,
             "log_file_path": log_file_path,
         }
@@ -87,6 +97,13 @@ class BuildStatusPresenter:
             "cancel_reason": job.cancel_reason,
             "cancel_requested_at": job.cancel_requested_at,
             "canceled_at": job.canceled_at,
+            "assigned_agent": job.assigned_agent,
+            "priority": job.priority,
+            "target_commit": job.target_commit,
+            "commit_sha": job.commit_sha,
+            "slot_id": job.slot_id,
+            "retry_of": job.retry_of,
+            "resume_from_stage": job.resume_from_stage,
             "queue_key": job.queue_key,
             "platform_statuses": self._platform_statuses(job),
             "stages": [
@@ -96,6 +113,8 @@ class BuildStatusPresenter:
                     "message": stage.message,
                     "started_at": stage.started_at,
                     "completed_at": stage.completed_at,
+                    "reused_from": stage.reused_from,
+                    "resources": stage.resources.to_dict() if stage.resources else None,
                 }
                 for stage in job.stages.values()
             ],
@@ -0,0 +1,178 @@
+"""Coordinator-side job queue handed out to remote build agents."""
+
+from __future__ import annotations
+
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Set
+
+from ..domain import BuildRequestData
+
+DEFAULT_AGENT_LEASE_TIMEOUT = 120.0
+FLUTTER_LABEL_PREFIX = "flutter:"
+
+
+def required_labels_for(platform: str) -> Set[str]:
+    """Capability labels an agent must advertise to run a build for ``platform``."""
+    if platform == "all":
+        return {"android", "ios"}
+    return {platform}
+
+
+@dataclass
+class DispatchEntry:
+    """A queued build waiting for, or leased by, a build agent."""
+
+    build_id: str
+    request: BuildRequestData
+    branch_name: str
+    queue_key: str
+    required_labels: Set[str]
+    enqueued_at: float = field(default_factory=time.time)
+    agent_id: Optional[str] = None
+    leased_at: Optional[float] = None
+    last_heartbeat: Optional[float] = None
+
+
+@dataclass
+class AgentRecord:
+    """Last known state of a build agent that polled the coordinator."""
+
+    agent_id: str
+    labels: Set[str]
+    last_seen: float
+    active_builds: Set[str] = field(default_factory=set)
+
+    def cached_flutter_versions(self) -> Set[str]:
+        return {
+            label[len(FLUTTER_LABEL_PREFIX):]
+            for label in self.labels
+            if label.startswith(FLUTTER_LABEL_PREFIX)
+        }
+
+
+class JobDispatcher:
+    """Hand queued builds to long-polling agents whose labels match the job."""
+
+    def __init__(self, *, lease_timeout: float = DEFAULT_AGENT_LEASE_TIMEOUT) -> None:
+        self.lease_timeout = lease_timeout
+        self._pending: List[DispatchEntry] = []
+        self._leased: Dict[str, DispatchEntry] = {}
+        self._agents: Dict[str, AgentRecord] = {}
+        self._condition = threading.Condition()
+
+    def enqueue(self, entry: DispatchEntry) -> None:
+        with self._condition:
+            self._pending.append(entry)
+            self._condition.notify_all()
+
+    def lease(self, agent_id: str, labels: Set[str], wait_seconds: float) -> Optional[DispatchEntry]:
+        """Block up to ``wait_seconds`` for a job this agent can run."""
+        deadline = time.time() + max(wait_seconds, 0.0)
+        with self._condition:
+            agent = self._touch_agent(agent_id, labels)
+            while True:
+                entry = self._select_entry(agent)
+                if entry is not None:
+                    self._pending.remove(entry)
+                    now = time.time()
+                    entry.agent_id = agent_id
+                    entry.leased_at = now
+                    entry.last_heartbeat = now
+                    self._leased[entry.build_id] = entry
+                    agent.active_builds.add(entry.build_id)
+                    return entry
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    return None
+                self._condition.wait(timeout=remaining)
+                agent.last_seen = time.time()
+
+    def heartbeat(self, build_id: str, agent_id: str) -> bool:
+        """Refresh a lease; returns False when the agent no longer owns the build."""
+        with self._condition:
+            entry = self._leased.get(build_id)
+            if entry is None or entry.agent_id != agent_id:
+                return False
+            now = time.time()
+            entry.last_heartbeat = now
+            agent = self._agents.get(agent_id)
+            if agent is not None:
+                agent.last_seen = now
+            return True
+
+    def release(self, build_id: str) -> Optional[DispatchEntry]:
+        with self._condition:
+            entry = self._leased.pop(build_id, None)
+            if entry is not None and entry.agent_id in self._agents:
+                self._agents[entry.agent_id].active_builds.discard(build_id)
+            return entry
+
+    def cancel_pending(self, build_id: str) -> bool:
+        """Drop a build that no agent has picked up yet."""
+        with self._condition:
+            for entry in self._pending:
+                if entry.build_id == build_id:
+                    self._pending.remove(entry)
+                    return True
+            return False
+
+    def is_leased(self, build_id: str) -> bool:
+        with self._condition:
+            return build_id in self._leased
+
+    def expired_leases(self) -> List[DispatchEntry]:
+        """Remove and return leases whose agent stopped sending heartbeats."""
+        cutoff = time.time() - self.lease_timeout
+        with self._condition:
+            expired = [
+                entry
+                for entry in self._leased.values()
+                if (entry.last_heartbeat or entry.leased_at or 0.0) < cutoff
+            ]
+            for entry in expired:
+                self._leased.pop(entry.build_id, None)
+                agent = self._agents.get(entry.agent_id or "")
+                if agent is not None:
+                    agent.active_builds.discard(entry.build_id)
+            return expired
+
+    def pending_count(self) -> int:
+        with self._condition:
+            return len(self._pending)
+
+    def agents(self) -> List[AgentRecord]:
+        with self._condition:
+            return [
+                AgentRecord(
+                    agent_id=agent.agent_id,
+                    labels=set(agent.labels),
+                    last_seen=agent.last_seen,
+                    active_builds=set(agent.active_builds),
+                )
+                for agent in self._agents.values()
+            ]
+
+    def _touch_agent(self, agent_id: str, labels: Set[str]) -> AgentRecord:
+        agent = self._agents.get(agent_id)
+        if agent is None:
+            agent = AgentRecord(agent_id=agent_id, labels=set(labels), last_seen=time.time())
+            self._agents[agent_id] = agent
+        else:
+            agent.labels = set(labels)
+            agent.last_seen = time.time()
+        return agent
+
+    def _select_entry(self, agent: AgentRecord) -> Optional[DispatchEntry]:
+        candidates = [entry for entry in self._pending if entry.required_labels <= agent.labels]
+        if not candidates:
+            return None
+        # Highest priority wins; the cached-SDK preference only reorders within that tier.
+        top_priority = max(entry.request.priority for entry in candidates)
+        candidates = [entry for entry in candidates if entry.request.priority == top_priority]
+        cached_versions = agent.cached_flutter_versions()
+        for entry in candidates:
+            if entry.request.flutter_sdk_version and entry.request.flutter_sdk_version in cached_versions:
+                return entry
+        return candidates[0]
@@ -16,6 +16,7 @@ class BuildRequestValidator:
     _SAFE_TEXT_PATTERN = re.compile(r"^[A-Za-z0-9._/+:-]+$")
     _SAFE_VERSION_PATTERN = re.compile(r"^[A-Za-z0-9._-]+$")
     _SAFE_BRANCH_PATTERN = re.compile(r"^[A-Za-z0-9._/-]+$")
+    _COMMIT_SHA_PATTERN = re.compile(r"^(?:[0-9a-f]{40}|[0-9a-f]{64})$")
 
     def validate(self, request: BuildRequestData) -> BuildRequestData:
         if request.flavor not in self.ALLOWED_FLAVORS:
@@ -33,6 +34,9 @@ class BuildRequestValidator:
         request.branch_name = self._validate_optional(
             "branch_name", request.branch_name, self._SAFE_BRANCH_PATTERN
         )
+        request.commit_sha = self._validate_optional(
+            "commit_sha", request.commit_sha.lower() if request.commit_sha else None, self._COMMIT_SHA_PATTERN
+        )
         request.flutter_sdk_version = self._validate_optional(
             "flutter_sdk_version", request.flutter_sdk_version, self._SAFE_VERSION_PATTERN
         )
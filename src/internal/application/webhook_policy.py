@@ -7,11 +7,18 @@ import re
 from dataclasses import dataclass
 from typing import Optional
 
+from ..core.config import get_prewarm_branches
+
+PREWARM_FLAVORS = ("dev", "stage", "prod")
+
 
 @dataclass
 class WebhookTrigger:
     flavor: str
     platform: str = "all"
+    commit_sha: Optional[str] = None
+    branch_name: Optional[str] = None
+    prewarm: bool = False
 
 
 class WebhookPolicy:
@@ -27,9 +34,21 @@ class WebhookPolicy:
             and payload.get("action") == "closed"
             and payload.get("pull_request", {}).get("merged")
         ):
-            base_ref = payload.get("pull_request", {}).get("base", {}).get("ref", "")
+            pull_request = payload.get("pull_request", {})
+            base_ref = pull_request.get("base", {}).get("ref", "")
             if base_ref.startswith(self.dev_base_prefix):
-                return WebhookTrigger(flavor="dev")
+                # Pin the build to the merge commit instead of whatever the branch points at later.
+                return WebhookTrigger(flavor="dev", commit_sha=pull_request.get("merge_commit_sha"))
+
+        branch_name = self.pushed_branch(payload, event_type)
+        if branch_name:
+            if branch_name in get_prewarm_branches():
+                return WebhookTrigger(
+                    flavor=self.prewarm_flavor(branch_name),
+                    commit_sha=payload.get("after"),
+                    branch_name=branch_name,
+                    prewarm=True,
+                )
 
         if event_type == "create" and payload.get("ref_type") == "tag":
             tag_name = payload.get("ref", "")
@@ -37,3 +56,17 @@ class WebhookPolicy:
                 return WebhookTrigger(flavor="prod")
 
         return None
+
+    def pushed_branch(self, payload: dict, event_type: str) -> Optional[str]:
+        """Branch a push event updated (None for tags and branch deletions)."""
+        ref = payload.get("ref", "")
+        if event_type != "push" or payload.get("deleted") or not ref.startswith("refs/heads/"):
+            return None
+        return ref[len("refs/heads/"):] or None
+
+    def prewarm_flavor(self, branch_name: str) -> str:
+        """Flavor whose ``<FLAVOR>_BRANCH_NAME`` is ``branch_name`` (dev otherwise)."""
+        for flavor in PREWARM_FLAVORS:
+            if os.environ.get(f"{flavor.upper()}_BRANCH_NAME") == branch_name:
+                return flavor
+        return "dev"
@@ -4,9 +4,21 @@ Flutter CI/CD Server - Core Package
 핵심 기능 모듈들
 - config: 설정 관리
 - queue_manager: 빌드 큐 관리
+- lease_lock: 하트비트/펜싱 토큰 기반 lease 락
+- cancellation: 빌드별 취소 토큰
 """
 from .config import *
 from .build_runtime import BuildRuntimeContext
+from .cancellation import CancellationToken, OperationCanceledError
+from .lease_lock import FileLeaseBackend, LeaseLock, LeaseTimeout
 from .queue_manager import queue_manager
 
-__all__ = ["BuildRuntimeContext", "queue_manager"]
+__all__ = [
+    "BuildRuntimeContext",
+    "CancellationToken",
+    "FileLeaseBackend",
+    "LeaseLock",
+    "LeaseTimeout",
+    "OperationCanceledError",
+    "queue_manager",
+]
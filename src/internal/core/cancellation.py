@@ -0,0 +1,87 @@
+"""Per-build cancellation tokens that wake every waiter the moment a build is canceled."""
+
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from typing import Callable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class OperationCanceledError(RuntimeError):
+    """Raised when a wait or command is abandoned because its build was canceled."""
+
+
+class CancellationToken:
+    """Event-backed cancel signal.
+
+    Calling the token returns whether it was canceled, so it can be passed
+    anywhere a ``should_cancel`` callable is accepted. Waiters that understand
+    tokens block on :meth:`wait` and callbacks run as soon as :meth:`cancel`
+    is called, instead of being noticed on the next poll.
+    """
+
+    def __init__(self) -> None:
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._callbacks: List[Callable[[], None]] = []
+
+    @property
+    def canceled(self) -> bool:
+        return self._event.is_set()
+
+    def __call__(self) -> bool:
+        return self._event.is_set()
+
+    def cancel(self) -> bool:
+        """Signal cancellation; returns False when the token was already canceled."""
+        with self._lock:
+            if self._event.is_set():
+                return False
+            self._event.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            self._run_callback(callback)
+        return True
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Block until canceled or ``timeout`` elapses; returns True when canceled."""
+        return self._event.wait(timeout)
+
+    def add_callback(self, callback: Callable[[], None]) -> Callable[[], None]:
+        """Run ``callback`` on cancellation (immediately if already canceled); returns an unregister function."""
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(callback)
+                return lambda: self._remove_callback(callback)
+        self._run_callback(callback)
+        return lambda: None
+
+    def _remove_callback(self, callback: Callable[[], None]) -> None:
+        with self._lock:
+            if callback in self._callbacks:
+                self._callbacks.remove(callback)
+
+    @staticmethod
+    def _run_callback(callback: Callable[[], None]) -> None:
+        try:
+            callback()
+        except Exception:
+            logger.exception("Cancellation callback failed")
+
+
+def wait_unless_canceled(should_cancel: Optional[Callable[[], bool]], timeout: float) -> bool:
+    """Sleep for ``timeout`` seconds, waking early on cancellation; returns True when canceled."""
+    if isinstance(should_cancel, CancellationToken):
+        return should_cancel.wait(timeout)
+    time.sleep(timeout)
+    return bool(should_cancel and should_cancel())
+
+
+def on_cancel(should_cancel: Optional[Callable[[], bool]], callback: Callable[[], None]) -> Callable[[], None]:
+    """Register ``callback`` when ``should_cancel`` is a token; plain callables are left to polling."""
+    if isinstance(should_cancel, CancellationToken):
+        return should_cancel.add_callback(callback)
+    return lambda: None
@@ -7,6 +7,7 @@ import os
 from pathlib import Path
 import logging
 import shutil
+from typing import Optional
 
 from .logging_utils import build_log_block, build_log_line
 
@@ -469,3 +470,351 @@ def get_max_parallel_builds() -> int:
         최대 병렬 빌드 수 (기본: 3)
     """
     return int(os.environ.get("MAX_PARALLEL_BUILDS", 3))
+
+
+def get_queue_lease_ttl() -> float:
+    """
+    큐 락 lease TTL (초)
+    
+    하트비트가 이 시간 동안 갱신되지 않으면 lease가 만료된 것으로 보고
+    다른 프로세스가 즉시 인계받을 수 있습니다.
+    
+    Returns:
+        lease TTL (기본: 30초)
+    """
+    return float(os.environ.get("QUEUE_LEASE_TTL_SECONDS", 30))
+
+
+# 명령 종류별 기본 최대 실행 시간 (초)
+DEFAULT_COMMAND_TIMEOUTS = {
+    "git": 900,
+    "flutter": 1800,
+    "cocoapods": 1800,
+    "ruby": 1800,
+    "security": 120,
+    "build": 7200,
+    "default": 1800,
+}
+
+
+def get_command_timeout(command_class: str) -> float:
+    """
+    명령 종류별 최대 실행 시간 (초)
+    
+    COMMAND_TIMEOUT_<CLASS>_SECONDS 환경변수로 덮어쓸 수 있습니다
+    (예: COMMAND_TIMEOUT_GIT_SECONDS=600). 0이면 제한하지 않습니다.
+    
+    Args:
+        command_class: git, flutter, cocoapods, ruby, security, build, default
+        
+    Returns:
+        최대 실행 시간 (초)
+    """
+    default = DEFAULT_COMMAND_TIMEOUTS.get(command_class, DEFAULT_COMMAND_TIMEOUTS["default"])
+    return float(os.environ.get(f"COMMAND_TIMEOUT_{command_class.upper()}_SECONDS", default))
+
+
+def get_command_idle_timeout() -> float:
+    """
+    출력 없는 명령 강제 종료 시간 (초)
+    
+    이 시간 동안 한 줄도 출력하지 않은 명령은 멈춘 것으로 보고 종료합니다.
+    0이면 감시하지 않습니다.
+    
+    Returns:
+        무출력 허용 시간 (기본: 1200초)
+    """
+    return float(os.environ.get("COMMAND_IDLE_TIMEOUT_SECONDS", 1200))
+
+
+def get_probe_cache_ttl() -> float:
+    """
+    툴체인 조회 명령 결과 캐시 유지 시간 (초)
+    
+    `gem list -i`, `rbenv versions`, `file` 같이 상태를 바꾸지 않는 조회 명령의
+    결과를 이 시간 동안 재사용합니다. 설치 후에는 즉시 무효화됩니다.
+    0이면 캐시하지 않습니다.
+    
+    Returns:
+        캐시 유지 시간 (기본: 600초)
+    """
+    return float(os.environ.get("PROBE_CACHE_TTL_SECONDS", 600))
+
+
+def get_ruby_gem_helper_enabled() -> bool:
+    """
+    Ruby gem 조회 헬퍼 프로세스 사용 여부
+    
+    활성화하면 Ruby 버전/GEM_HOME 조합마다 상주 ruby 프로세스를 하나 띄워
+    gem 설치 여부를 `gem list -i` 실행 없이 파이프로 조회합니다.
+    
+    Returns:
+        헬퍼 사용 여부 (기본: False)
+    """
+    return os.environ.get("RUBY_GEM_HELPER_ENABLED", "false").lower() == "true"
+
+
+def get_build_cgroup_enabled() -> bool:
+    """
+    빌드별 cgroup v2 격리 사용 여부 (Linux 전용)
+    
+    활성화하면 빌드마다 서버 cgroup 아래에 하위 cgroup을 만들고 그 빌드의 모든 명령을
+    그 안에서 실행합니다. cgroup v2가 없거나 위임되지 않은 환경에서는 격리 없이 실행합니다.
+    
+    Returns:
+        격리 사용 여부 (기본: False)
+    """
+    return os.environ.get("BUILD_CGROUP_ENABLED", "false").lower() == "true"
+
+
+def get_build_cgroup_limit(name: str) -> Optional[str]:
+    """
+    빌드 cgroup 제한값
+    
+    BUILD_CGROUP_<NAME> 환경변수 값을 그대로 cgroup 인터페이스 파일에 씁니다.
+    (예: CPU_MAX="200000 100000", CPU_WEIGHT=100, MEMORY_HIGH=8G, IO_WEIGHT=100)
+    
+    Args:
+        name: cpu_max, cpu_weight, memory_high, io_weight 중 하나
+    
+    Returns:
+        설정값 (비어 있으면 None → 커널 기본값)
+    """
+    value = os.environ.get(f"BUILD_CGROUP_{name.upper()}", "").strip()
+    return value or None
+
+
+def get_build_cgroup_max_memory_pressure() -> float:
+    """
+    새 빌드 시작을 미루는 메모리 압박 기준 (%)
+    
+    실행 중인 빌드들의 memory.pressure `some avg10` 값이 이 값 이상이면
+    대기 중인 빌드를 바로 시작하지 않고 압박이 줄어들 때까지 기다립니다. 0이면 사용하지 않습니다.
+    
+    Returns:
+        메모리 압박 기준 (기본: 40)
+    """
+    return float(os.environ.get("BUILD_CGROUP_MAX_MEMORY_PRESSURE", 40))
+
+
+def get_build_script_pty() -> bool:
+    """
+    빌드 스크립트를 pseudo-terminal에서 실행할지 여부
+    
+    xcodebuild, gradle, flutter는 출력이 터미널이 아니면 블록 버퍼링하거나 진행 상황을
+    생략합니다. 활성화하면 action/1_*.sh를 pty에서 실행하고, ANSI 이스케이프와
+    캐리지 리턴으로 다시 그리는 진행 표시줄을 일반 로그 줄로 정리합니다.
+    
+    Returns:
+        pty 사용 여부 (기본: False)
+    """
+    return os.environ.get("BUILD_SCRIPT_PTY", "false").lower() == "true"
+
+
+def get_git_mirror_enabled() -> bool:
+    """
+    공유 git 미러 사용 여부
+    
+    활성화하면 REPO_URL마다 공유 캐시에 bare 미러를 하나 두고 빌드마다 미러만 fetch합니다.
+    워크스페이스 슬롯은 미러 객체를 alternates로 참조하므로 슬롯 동기화는 로컬 ref 갱신과 checkout만 합니다.
+    
+    Returns:
+        미러 사용 여부 (기본: True)
+    """
+    return os.environ.get("GIT_MIRROR_ENABLED", "true").lower() == "true"
+
+
+def get_git_fetch_depth() -> int:
+    """
+    워크스페이스 슬롯이 원격에서 직접 fetch할 때의 히스토리 깊이
+    
+    빌드 브랜치(refs/heads/<branch>)만 이 깊이로 가져옵니다. 공유 git 미러는
+    슬롯이 객체를 빌려 쓰므로 항상 전체 히스토리를 받습니다.
+    
+    Returns:
+        fetch 깊이 (기본: 1, 0이면 전체 히스토리)
+    """
+    return int(os.environ.get("GIT_FETCH_DEPTH", 1))
+
+
+def get_git_fetch_filter() -> Optional[str]:
+    """
+    워크스페이스 슬롯이 원격에서 직접 fetch할 때의 partial clone 필터
+    
+    기본값 blob:none은 커밋/트리만 받고 파일 내용은 checkout할 때 필요한 것만 받습니다.
+    
+    Returns:
+        --filter 값 (비어 있으면 None → 필터 없이 fetch)
+    """
+    value = os.environ.get("GIT_FETCH_FILTER", "blob:none").strip()
+    return value or None
+
+
+def get_workspace_clean_policy() -> str:
+    """
+    워크스페이스 슬롯 동기화 시 정리(clean) 정책
+    
+    preserve: .dart_tool, build/, ios/Pods, android/.gradle 같은 증분 빌드 캐시를
+    Flutter SDK 버전과 lock 파일 해시가 이전 빌드와 같을 때만 남기고 나머지는 삭제합니다.
+    full: 매번 git clean -fdx로 추적되지 않는 파일을 모두 삭제합니다.
+    
+    Returns:
+        정리 정책 (기본: preserve)
+    """
+    policy = os.environ.get("WORKSPACE_CLEAN_POLICY", "preserve").strip().lower()
+    return policy if policy in {"preserve", "full"} else "preserve"
+
+
+def get_workspace_clean_excludes() -> list:
+    """
+    정리 정책과 관계없이 항상 남길 경로 패턴 목록
+    
+    git clean -e 패턴 형식이며 쉼표로 구분합니다. (예: "/tool/cache/,/ios/build/")
+    
+    Returns:
+        제외 패턴 목록 (기본: 빈 목록)
+    """
+    raw = os.environ.get("WORKSPACE_CLEAN_EXCLUDES", "")
+    return [pattern.strip() for pattern in raw.split(",") if pattern.strip()]
+
+
+def get_workspace_max_slots() -> int:
+    """
+    모든 슬롯 키(저장소·브랜치·Flutter 버전·플랫폼)를 합친 워크스페이스 슬롯 최대 개수
+    
+    한도에 도달하면 가장 오래 사용되지 않은 유휴 슬롯을 삭제하고 새 슬롯을 만듭니다.
+    
+    Returns:
+        최대 슬롯 수 (기본: 12, 0이면 제한 없음)
+    """
+    return max(0, int(os.environ.get("WORKSPACE_MAX_SLOTS", 12)))
+
+
+def get_workspace_disk_budget_bytes() -> int:
+    """
+    워크스페이스 슬롯 전체가 사용할 수 있는 디스크 용량
+    
+    빌드가 끝나 슬롯을 반납할 때 측정한 크기의 합이 이 값을 넘으면
+    가장 오래 사용되지 않은 유휴 슬롯부터 삭제합니다.
+    
+    Returns:
+        바이트 단위 예산 (WORKSPACE_DISK_BUDGET_GB 기준, 기본: 0 → 제한 없음)
+    """
+    return int(float(os.environ.get("WORKSPACE_DISK_BUDGET_GB", 0)) * 1024 ** 3)
+
+
+def get_workspace_slot_clone_enabled() -> bool:
+    """
+    새 워크스페이스 슬롯을 유휴 슬롯 복제로 만들지 여부
+    
+    같은 저장소의 유휴 슬롯(같은 키, 같은 브랜치 우선)에서 checkout을 복사해
+    git clone과 pub/pod 설치를 처음부터 하지 않습니다.
+    CoW 복제(btrfs/xfs의 reflink, APFS clonefile) → git 객체 하드링크 → 일반 복사 순서로 시도합니다.
+    
+    Returns:
+        복제 사용 여부 (기본: True)
+    """
+    return os.environ.get("WORKSPACE_SLOT_CLONE", "true").lower() == "true"
+
+
+def get_fvm_cache_dir() -> Path:
+    """
+    FVM이 Flutter SDK 버전을 설치하는 캐시 디렉토리
+    
+    Returns:
+        FVM_CACHE_PATH 경로 (기본: ~/fvm), SDK는 그 아래 versions/<버전>에 있습니다.
+    """
+    return Path(os.environ.get("FVM_CACHE_PATH", Path.home() / "fvm")).expanduser()
+
+
+def get_flutter_sdk_disk_budget_bytes() -> int:
+    """
+    FVM에 설치된 Flutter SDK 버전 전체가 사용할 수 있는 디스크 용량
+    
+    넘으면 임대 중인 슬롯이 쓰지 않는 버전부터, 가장 오래 사용되지 않은 순서로 삭제합니다.
+    
+    Returns:
+        바이트 단위 예산 (FLUTTER_SDK_DISK_BUDGET_GB 기준, 기본: 0 → 제한 없음)
+    """
+    return int(float(os.environ.get("FLUTTER_SDK_DISK_BUDGET_GB", 0)) * 1024 ** 3)
+
+
+def get_prewarm_branches() -> list:
+    """
+    push 웹훅이나 스케줄로 워크스페이스 슬롯을 미리 준비할 브랜치 목록
+    
+    쉼표로 구분합니다. (예: "develop,release/dev")
+    
+    Returns:
+        브랜치 목록 (기본: 빈 목록 → 사전 준비 안 함)
+    """
+    raw = os.environ.get("PREWARM_BRANCHES", "")
+    return [branch.strip() for branch in raw.split(",") if branch.strip()]
+
+
+def get_prewarm_platforms() -> list:
+    """
+    사전 준비할 플랫폼 목록
+    
+    플랫폼마다 슬롯이 따로 있으므로 플랫폼별로 사전 준비 작업이 하나씩 실행됩니다.
+    
+    Returns:
+        android/ios 중 설정된 플랫폼 목록 (기본: android,ios)
+    """
+    raw = os.environ.get("PREWARM_PLATFORMS", "android,ios")
+    return [platform for platform in (item.strip().lower() for item in raw.split(",")) if platform in {"android", "ios"}]
+
+
+def get_prewarm_schedule() -> list:
+    """
+    매일 사전 준비를 실행할 시각 목록
+    
+    HH:MM 형식, 쉼표로 구분합니다. (예: "07:30,13:00")
+    
+    Returns:
+        시각 목록 (기본: 빈 목록 → push 웹훅으로만 실행)
+    """
+    raw = os.environ.get("PREWARM_SCHEDULE", "")
+    return [time_of_day.strip() for time_of_day in raw.split(",") if time_of_day.strip()]
+
+
+def get_mirror_prefetch_interval() -> float:
+    """
+    공유 git 미러에 추적 브랜치를 백그라운드로 fetch하는 주기(초)
+    
+    서버끼리 같은 시각에 몰리지 않도록 매 회차 ±20% 범위에서 흔들립니다.
+    
+    Returns:
+        주기 (기본: 300초, 0이면 백그라운드 fetch 안 함)
+    """
+    return max(0.0, float(os.environ.get("MIRROR_PREFETCH_INTERVAL_SECONDS", 300)))
+
+
+def get_mirror_prefetch_concurrency() -> int:
+    """
+    백그라운드 미러 fetch를 동시에 몇 개까지 실행할지
+    
+    Returns:
+        동시 실행 수 (기본: 2)
+    """
+    return max(1, int(os.environ.get("MIRROR_PREFETCH_CONCURRENCY", 2)))
+
+
+def get_mirror_prefetch_branches() -> list:
+    """
+    공유 git 미러에 미리 fetch해 둘 브랜치 목록
+    
+    MIRROR_PREFETCH_BRANCHES(쉼표 구분)가 비어 있으면 DEV/STAGE/PROD_BRANCH_NAME과
+    PREWARM_BRANCHES에 설정된 브랜치를 사용합니다.
+    
+    Returns:
+        브랜치 목록 (아무것도 설정되지 않았으면 ["develop"])
+    """
+    raw = os.environ.get("MIRROR_PREFETCH_BRANCHES", "")
+    branches = [branch.strip() for branch in raw.split(",") if branch.strip()]
+    if branches:
+        return branches
+    for flavor in ("DEV", "STAGE", "PROD"):
+        branches.append(os.environ.get(f"{flavor}_BRANCH_NAME", "").strip())
+    branches.extend(get_prewarm_branches())
+    return list(dict.fromkeys(branch for branch in branches if branch)) or ["develop"]
@@ -0,0 +1,345 @@
+"""Renewable lease locks with owner identity, heartbeats and fencing tokens."""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import socket
+import threading
+import time
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Protocol
+from uuid import uuid4
+
+import psutil
+from filelock import FileLock
+
+from .cancellation import wait_unless_canceled
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LEASE_TTL = 30.0
+DEFAULT_POLL_INTERVAL = 0.5
+GUARD_LOCK_TIMEOUT = 10
+RELEASED_LEASE_RETENTION = 24 * 3600.0
+
+
+class LeaseTimeout(TimeoutError):
+    """Raised when a lease could not be acquired before the deadline."""
+
+
+class LeaseLostError(RuntimeError):
+    """Raised when a held lease was taken over or could not be renewed."""
+
+
+@dataclass
+class LeaseRecord:
+    """Persisted state of one lease key."""
+
+    key: str
+    owner_id: Optional[str]
+    hostname: str
+    pid: int
+    pid_started_at: Optional[float]
+    fencing_token: int
+    acquired_at: float
+    heartbeat_at: float
+    ttl: float
+
+    @property
+    def held(self) -> bool:
+        return self.owner_id is not None
+
+    def is_stale(self, now: float | None = None) -> bool:
+        """A lease is stale once its heartbeat lapses or its local holder process is gone."""
+        if not self.held:
+            return True
+        now = time.time() if now is None else now
+        if now - self.heartbeat_at > self.ttl:
+            return True
+        if self.hostname == socket.gethostname():
+            return not _process_alive(self.pid, self.pid_started_at)
+        return False
+
+
+def _process_started_at(pid: int) -> Optional[float]:
+    try:
+        return psutil.Process(pid).create_time()
+    except (psutil.Error, OSError):
+        return None
+
+
+def _process_alive(pid: int, started_at: Optional[float]) -> bool:
+    current_started_at = _process_started_at(pid)
+    if current_started_at is None:
+        return False
+    # A different start time means the PID was recycled by an unrelated process.
+    return started_at is None or abs(current_started_at - started_at) < 1.0
+
+
+class LeaseBackend(Protocol):
+    """Storage for lease records; implementations must make each call atomic per key."""
+
+    def try_acquire(self, key: str, owner_id: str, ttl: float) -> Optional[LeaseRecord]:
+        ...
+
+    def renew(self, key: str, owner_id: str, fencing_token: int, ttl: float) -> bool:
+        ...
+
+    def release(self, key: str, owner_id: str, fencing_token: int) -> None:
+        ...
+
+    def read(self, key: str) -> Optional[LeaseRecord]:
+        ...
+
+    def purge_stale(self, retention: float = RELEASED_LEASE_RETENTION) -> List[str]:
+        ...
+
+
+class FileLeaseBackend:
+    """Lease records stored as JSON files guarded by short-lived file locks.
+
+    Works across processes on one host; on a shared filesystem it also works
+    across hosts, where staleness falls back to heartbeat expiry.
+    """
+
+    def __init__(self, root: Path) -> None:
+        self.root = root
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def try_acquire(self, key: str, owner_id: str, ttl: float) -> Optional[LeaseRecord]:
+        with self._guard(key):
+            current = self._read_unlocked(key)
+            now = time.time()
+            if current is not None and current.held and not current.is_stale(now):
+                if current.owner_id != owner_id:
+                    return None
+            if current is not None and current.held and current.owner_id != owner_id:
+                logger.warning(
+                    "Taking over stale lease %s from %s (pid=%s, host=%s)",
+                    key,
+                    current.owner_id,
+                    current.pid,
+                    current.hostname,
+                )
+            pid = os.getpid()
+            record = LeaseRecord(
+                key=key,
+                owner_id=owner_id,
+                hostname=socket.gethostname(),
+                pid=pid,
+                pid_started_at=_process_started_at(pid),
+                fencing_token=(current.fencing_token if current else 0) + 1,
+                acquired_at=now,
+                heartbeat_at=now,
+                ttl=ttl,
+            )
+            self._write_unlocked(record)
+            return record
+
+    def renew(self, key: str, owner_id: str, fencing_token: int, ttl: float) -> bool:
+        with self._guard(key):
+            current = self._read_unlocked(key)
+            if current is None or current.owner_id != owner_id or current.fencing_token != fencing_token:
+                return False
+            current.heartbeat_at = time.time()
+            current.ttl = ttl
+            self._write_unlocked(current)
+            return True
+
+    def release(self, key: str, owner_id: str, fencing_token: int) -> None:
+        with self._guard(key):
+            current = self._read_unlocked(key)
+            if current is None or current.owner_id != owner_id or current.fencing_token != fencing_token:
+                return
+            # Keep the record so the next holder receives a higher fencing token.
+            current.owner_id = None
+            self._write_unlocked(current)
+
+    def read(self, key: str) -> Optional[LeaseRecord]:
+        with self._guard(key):
+            return self._read_unlocked(key)
+
+    def purge_stale(self, retention: float = RELEASED_LEASE_RETENTION) -> List[str]:
+        """Free leases whose holder is gone and drop long-idle released records.
+
+        Released records are kept for ``retention`` seconds so fencing tokens
+        stay monotonic for keys that are reused soon after.
+        """
+        purged: List[str] = []
+        now = time.time()
+        for lease_file in self.root.glob("*.lease.json"):
+            key = lease_file.name[: -len(".lease.json")]
+            guard = self._guard(key)
+            with guard:
+                current = self._read_unlocked(key)
+                if current is not None and current.held:
+                    if not current.is_stale(now):
+                        continue
+                    current.owner_id = None
+                    self._write_unlocked(current)
+                    purged.append(key)
+                elif current is None or now - current.heartbeat_at > retention:
+                    lease_file.unlink(missing_ok=True)
+                    Path(guard.lock_file).unlink(missing_ok=True)
+                    purged.append(key)
+        return purged
+
+    def _guard(self, key: str) -> FileLock:
+        return FileLock(str(self.root / f"{key}.lease.guard"), timeout=GUARD_LOCK_TIMEOUT)
+
+    def _path(self, key: str) -> Path:
+        return self.root / f"{key}.lease.json"
+
+    def _read_unlocked(self, key: str) -> Optional[LeaseRecord]:
+        path = self._path(key)
+        if not path.exists():
+            return None
+        try:
+            return LeaseRecord(**json.loads(path.read_text(encoding="utf-8")))
+        except (json.JSONDecodeError, TypeError) as exc:
+            logger.warning("Ignoring unreadable lease record %s: %s", path, exc)
+            return None
+
+    def _write_unlocked(self, record: LeaseRecord) -> None:
+        path = self._path(record.key)
+        tmp_path = path.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps(asdict(record), ensure_ascii=True, indent=2), encoding="utf-8")
+        os.replace(tmp_path, path)
+
+
+class LeaseHeartbeat:
+    """One thread renewing every lease this process holds, each every ``ttl / 3`` seconds."""
+
+    def __init__(self) -> None:
+        self._due: Dict["LeaseLock", float] = {}
+        self._condition = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+
+    def add(self, lease: "LeaseLock") -> None:
+        with self._condition:
+            self._due[lease] = time.monotonic() + lease.heartbeat_interval
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="lease-heartbeat", daemon=True)
+                self._thread.start()
+            self._condition.notify()
+
+    def remove(self, lease: "LeaseLock") -> None:
+        with self._condition:
+            self._due.pop(lease, None)
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                now = time.monotonic()
+                due = [lease for lease, at in self._due.items() if at <= now]
+                if not due:
+                    self._condition.wait(min(self._due.values(), default=now + 60.0) - now)
+                    continue
+                for lease in due:
+                    self._due[lease] = now + lease.heartbeat_interval
+            for lease in due:
+                lease.renew()
+
+
+_heartbeat = LeaseHeartbeat()
+
+
+class LeaseLock:
+    """Exclusive, self-renewing lease on ``key`` held by this process."""
+
+    def __init__(
+        self,
+        key: str,
+        backend: LeaseBackend,
+        *,
+        ttl: float = DEFAULT_LEASE_TTL,
+        owner_id: Optional[str] = None,
+        poll_interval: float = DEFAULT_POLL_INTERVAL,
+        on_lost: Optional[Callable[[], None]] = None,
+    ) -> None:
+        self.key = key
+        self.backend = backend
+        self.ttl = ttl
+        self.owner_id = owner_id or f"{socket.gethostname()}:{os.getpid()}:{uuid4().hex[:8]}"
+        self.poll_interval = poll_interval
+        # Called from the heartbeat thread once another holder has taken the lease over.
+        self.on_lost = on_lost
+        self.record: Optional[LeaseRecord] = None
+        self._lost = threading.Event()
+        # Keeps a renewal from racing with release() and reporting a released lease as lost.
+        self._renew_lock = threading.Lock()
+
+    @property
+    def fencing_token(self) -> Optional[int]:
+        return self.record.fencing_token if self.record else None
+
+    @property
+    def lost(self) -> bool:
+        return self._lost.is_set()
+
+    @property
+    def heartbeat_interval(self) -> float:
+        return max(self.ttl / 3.0, 0.05)
+
+    def acquire(
+        self,
+        timeout: Optional[float] = None,
+        should_cancel: Optional[Callable[[], bool]] = None,
+    ) -> LeaseRecord:
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            record = self.backend.try_acquire(self.key, self.owner_id, self.ttl)
+            if record is not None:
+                self.record = record
+                self._lost.clear()
+                _heartbeat.add(self)
+                return record
+            if should_cancel and should_cancel():
+                raise LeaseTimeout(f"Lease acquisition canceled: {self.key}")
+            if deadline is not None and time.monotonic() >= deadline:
+                raise LeaseTimeout(f"Timed out acquiring lease: {self.key}")
+            if wait_unless_canceled(should_cancel, self.poll_interval):
+                raise LeaseTimeout(f"Lease acquisition canceled: {self.key}")
+
+    def ensure_held(self) -> None:
+        if self.record is None or self.lost:
+            raise LeaseLostError(f"Lease no longer held: {self.key}")
+
+    def release(self) -> None:
+        _heartbeat.remove(self)
+        with self._renew_lock:
+            if self.record is not None:
+                self.backend.release(self.key, self.owner_id, self.record.fencing_token)
+                self.record = None
+
+    def renew(self) -> None:
+        """Extend the lease; marks it lost and calls ``on_lost`` once another holder has taken it over."""
+        with self._renew_lock:
+            record = self.record
+            if record is None or self.lost:
+                return
+            try:
+                renewed = self.backend.renew(self.key, self.owner_id, record.fencing_token, self.ttl)
+            except Exception as exc:
+                logger.warning("Lease heartbeat failed for %s: %s", self.key, exc)
+                return
+            if renewed:
+                return
+            logger.error("Lease %s was taken over (fencing token %s)", self.key, record.fencing_token)
+            self._lost.set()
+            _heartbeat.remove(self)
+        if self.on_lost is not None:
+            try:
+                self.on_lost()
+            except Exception:
+                logger.exception("Lease loss handler failed for %s", self.key)
+
+    def __enter__(self) -> "LeaseLock":
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.release()
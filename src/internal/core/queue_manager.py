@@ -1,37 +1,151 @@
 """
 Flutter CI/CD Server - Queue Manager Module
 
-파일 기반 락을 사용한 빌드 큐 관리 시스템
+lease 기반 락을 사용한 빌드 큐 관리 시스템
 - 동일 (branch, flutter_sdk_version, flavor) 조합: 순차 실행
 - 서로 다른 조합: 병렬 실행
 """
+import heapq
+import itertools
 import threading
-from typing import Dict, Callable
-from filelock import FileLock
+from typing import Dict, Callable, List, Optional, Tuple
 from pathlib import Path
-from .config import QUEUE_LOCKS_DIR, get_max_parallel_builds
+from .cancellation import CancellationToken
+from .config import QUEUE_LOCKS_DIR, get_max_parallel_builds, get_queue_lease_ttl
+from .lease_lock import FileLeaseBackend, LeaseBackend, LeaseLock, LeaseTimeout
 from .logging_utils import build_log_block, build_log_line
 import logging
 
 logger = logging.getLogger(__name__)
 
 # 상수 정의
-QUEUE_LOCK_TIMEOUT = 3600  # 1시간 (초)
+QUEUE_LOCK_TIMEOUT = 3600  # 살아있는 빌드를 기다리는 최대 시간 (초)
+ADMISSION_RECHECK_SECONDS = 2.0  # 시작이 보류된 빌드의 admission 재확인 주기 (초)
+
+
+class PriorityWorkerPool:
+    """
+    우선순위 기반 고정 크기 워커 풀
+    
+    빌드마다 스레드를 만드는 대신 최대 병렬 빌드 수만큼의 워커 스레드만 유지합니다.
+    대기 중인 작업은 스레드를 점유하지 않고 힙에 남아 있다가
+    높은 우선순위 → 먼저 들어온 순서로 실행됩니다.
+    admission이 설정되어 있으면 실행 중인 작업이 있는 동안 admission()이
+    False를 반환하는 한 다음 작업 시작을 미룹니다 (예: 호스트 메모리 압박).
+    """
+    
+    def __init__(self, size: int, admission: Optional[Callable[[], bool]] = None):
+        self.size = size
+        self.admission = admission
+        self.pending: List[Tuple[int, int, int, Optional[str], Callable[[], None]]] = []
+        self.condition = threading.Condition()
+        self.workers: List[threading.Thread] = []
+        self.active = 0
+        self._arrivals = itertools.count()
+    
+    def submit(
+        self,
+        work: Callable[[], None],
+        priority: int = 0,
+        sequence: Optional[int] = None,
+        key: Optional[str] = None,
+    ) -> None:
+        """
+        작업 등록
+        
+        Args:
+            work: 워커 스레드에서 실행할 작업
+            priority: 우선순위 (높을수록 먼저)
+            sequence: 같은 우선순위 내 순서. None이면 도착 순서
+            key: discard()로 대기 중인 작업을 찾을 때 쓰는 식별자 (빌드 ID)
+        """
+        arrival = next(self._arrivals)
+        with self.condition:
+            heapq.heappush(
+                self.pending,
+                (-priority, sequence if sequence is not None else arrival, arrival, key, work),
+            )
+            if len(self.workers) < self.size:
+                worker = threading.Thread(
+                    target=self._worker_loop,
+                    name=f"build-worker-{len(self.workers) + 1}",
+                    daemon=True,
+                )
+                self.workers.append(worker)
+                worker.start()
+            self.condition.notify()
+    
+    def pending_count(self) -> int:
+        with self.condition:
+            return len(self.pending)
+    
+    def discard(self, key: str) -> bool:
+        """
+        아직 시작되지 않은 작업 제거
+        
+        Returns:
+            대기 중인 작업을 찾아 제거했으면 True
+        """
+        with self.condition:
+            remaining = [item for item in self.pending if item[3] != key]
+            if len(remaining) == len(self.pending):
+                return False
+            heapq.heapify(remaining)
+            self.pending = remaining
+            return True
+    
+    def _worker_loop(self) -> None:
+        while True:
+            with self.condition:
+                while not self._can_start():
+                    self.condition.wait(ADMISSION_RECHECK_SECONDS if self.pending else None)
+                *_, work = heapq.heappop(self.pending)
+                self.active += 1
+            try:
+                work()
+            except Exception:
+                logger.exception("Build worker task failed")
+            finally:
+                with self.condition:
+                    self.active -= 1
+                    self.condition.notify()
+    
+    def _can_start(self) -> bool:
+        if not self.pending:
+            return False
+        # 아무 작업도 실행 중이 아니면 항상 시작해 대기열이 멈추지 않게 합니다
+        if self.active == 0 or self.admission is None:
+            return True
+        try:
+            return self.admission()
+        except Exception:
+            logger.exception("Build admission check failed")
+            return True
 
 
 class BuildQueueManager:
     """
     빌드 큐 관리자
     
-    파일 락을 사용하여 동일한 큐 키를 가진 빌드는 순차적으로 실행되고,
+    lease 락을 사용하여 동일한 큐 키를 가진 빌드는 순차적으로 실행되고,
     다른 큐 키를 가진 빌드는 병렬로 실행됩니다.
+    lease는 하트비트로 갱신되며, 보유 프로세스가 죽거나 하트비트가 끊기면
+    다음 빌드가 즉시 인계받습니다.
     """
     
-    def __init__(self):
-        """큐 관리자 초기화"""
+    def __init__(self, lease_backend: Optional[LeaseBackend] = None):
+        """
+        큐 관리자 초기화
+        
+        Args:
+            lease_backend: lease 저장소. None이면 QUEUE_LOCKS_DIR 아래 파일 백엔드 사용
+                (여러 호스트에서 공유하려면 공유 저장소 백엔드를 주입)
+        """
         self.queues: Dict[str, threading.Lock] = {}
         self.locks_lock = threading.Lock()
-        self.parallel_semaphore = threading.BoundedSemaphore(get_max_parallel_builds())
+        self.worker_pool = PriorityWorkerPool(get_max_parallel_builds())
+        self.lease_backend = lease_backend or FileLeaseBackend(QUEUE_LOCKS_DIR)
+        self.lease_ttl = get_queue_lease_ttl()
         logger.info("🚀 Build Queue Manager initialized")
     
     def get_queue_key(self, branch_name: str, flutter_sdk_version: str, flavor: str) -> str:
@@ -63,15 +177,61 @@ class BuildQueueManager:
     
     def get_lock_file(self, queue_key: str) -> Path:
         """
-        큐별 락 파일 경로
+        큐별 lease 파일 경로
         
         Args:
             queue_key: 큐 식별자
             
         Returns:
-            락 파일 경로
+            lease 파일 경로
         """
-        return QUEUE_LOCKS_DIR / f"{queue_key}.lock"
+        return QUEUE_LOCKS_DIR / f"{queue_key}.lease.json"
+    
+    def submit(
+        self,
+        queue_key: str,
+        build_id: str,
+        task: Callable,
+        *args,
+        queue_priority: int = 0,
+        queue_sequence: Optional[int] = None,
+        cancel_token: Optional[CancellationToken] = None,
+        **kwargs
+    ) -> None:
+        """
+        워커 풀에 빌드 작업 등록
+        
+        최대 병렬 빌드 수만큼의 워커가 우선순위 → 제출 순서로 작업을 꺼내
+        execute_with_queue()로 실행합니다.
+        
+        Args:
+            queue_key: 큐 식별자
+            build_id: 빌드 ID
+            task: 실행할 작업 (Callable)
+            *args: task에 전달할 위치 인자
+            queue_priority: 우선순위 (높을수록 먼저)
+            queue_sequence: 같은 우선순위 내 순서 (영속 큐의 제출 순번)
+            cancel_token: 취소 시 lease 대기를 즉시 중단시키는 토큰
+            **kwargs: task에 전달할 키워드 인자
+        """
+        self.worker_pool.submit(
+            lambda: self.execute_with_queue(queue_key, build_id, task, *args, cancel_token=cancel_token, **kwargs),
+            priority=queue_priority,
+            sequence=queue_sequence,
+            key=build_id,
+        )
+    
+    def cancel_pending(self, build_id: str) -> bool:
+        """
+        워커를 기다리는 빌드를 큐에서 제거
+        
+        Returns:
+            아직 시작되지 않은 작업을 제거했으면 True
+        """
+        removed = self.worker_pool.discard(build_id)
+        if removed:
+            logger.info(build_log_line(build_id, "🛑 Removed from build queue before start"))
+        return removed
     
     def execute_with_queue(
         self,
@@ -79,12 +239,13 @@ class BuildQueueManager:
         build_id: str,
         task: Callable,
         *args,
+        cancel_token: Optional[CancellationToken] = None,
         **kwargs
     ):
         """
         큐에 따라 순차/병렬 실행
         
-        같은 queue_key를 가진 빌드는 파일 락을 사용하여 순차 실행됩니다.
+        같은 queue_key를 가진 빌드는 lease 락을 사용하여 순차 실행됩니다.
         다른 queue_key를 가진 빌드는 병렬로 실행됩니다.
         
         Args:
@@ -92,13 +253,15 @@ class BuildQueueManager:
             build_id: 빌드 ID
             task: 실행할 작업 (Callable)
             *args: task에 전달할 위치 인자
+            cancel_token: 취소되면 lease 대기를 즉시 중단 (task는 실행하지 않음).
+                실행 중 lease를 빼앗기면 이 토큰을 트리거해 task를 멈춥니다
             **kwargs: task에 전달할 키워드 인자
             
         Returns:
-            task의 반환값
+            task의 반환값 (lease 대기 중 취소되면 None)
             
         Raises:
-            FileLock timeout 시 Timeout 예외
+            LeaseTimeout: QUEUE_LOCK_TIMEOUT 안에 lease를 얻지 못한 경우
         """
         lock_file = self.get_lock_file(queue_key)
         
@@ -113,23 +276,61 @@ class BuildQueueManager:
             )
         )
         
-        with self.parallel_semaphore:
-            logger.info(build_log_line(build_id, "🎛️ Parallel slot acquired"))
-            # 파일 기반 락으로 프로세스 간 동기화
-            with FileLock(str(lock_file), timeout=QUEUE_LOCK_TIMEOUT):
-                logger.info(build_log_line(build_id, f"✅ Queue lock acquired: {queue_key}"))
-                
-                try:
-                    result = task(*args, **kwargs)
-                    logger.info(build_log_line(build_id, "🎉 Task completed successfully"))
-                    return result
-                    
-                except Exception as e:
-                    logger.error(build_log_line(build_id, f"❌ Task failed: {str(e)}"))
-                    raise
-                    
-                finally:
-                    logger.info(build_log_line(build_id, f"🔓 Queue lock released: {queue_key}"))
+        logger.info(build_log_line(build_id, "🎛️ Parallel slot acquired"))
+        # lease 락으로 프로세스 간 동기화 (죽은 보유자의 lease는 즉시 인계)
+        # lease를 빼앗기면 다른 빌드가 같은 작업 디렉토리를 쓰기 시작하므로 이 빌드를 즉시 취소합니다
+        lease = LeaseLock(
+            queue_key,
+            self.lease_backend,
+            ttl=self.lease_ttl,
+            on_lost=lambda: self._stop_on_lease_loss(build_id, queue_key, cancel_token),
+        )
+        try:
+            lease.acquire(timeout=QUEUE_LOCK_TIMEOUT, should_cancel=cancel_token)
+        except LeaseTimeout:
+            if cancel_token is not None and cancel_token.canceled:
+                logger.info(build_log_line(build_id, f"🛑 Canceled while waiting for queue lock: {queue_key}"))
+                return None
+            raise
+        logger.info(
+            build_log_line(
+                build_id,
+                f"✅ Queue lock acquired: {queue_key} (fencing token {lease.fencing_token})",
+            )
+        )
+    
+        try:
+            result = task(*args, **kwargs)
+            logger.info(build_log_line(build_id, "🎉 Task completed successfully"))
+            return result
+        
+        except Exception as e:
+            logger.error(build_log_line(build_id, f"❌ Task failed: {str(e)}"))
+            raise
+        
+        finally:
+            if lease.lost:
+                logger.warning(build_log_line(build_id, f"⚠️ Queue lease was lost while running: {queue_key}"))
+            lease.release()
+            logger.info(build_log_line(build_id, f"🔓 Queue lock released: {queue_key}"))
+    
+    def _stop_on_lease_loss(
+        self,
+        build_id: str,
+        queue_key: str,
+        cancel_token: Optional[CancellationToken],
+    ) -> None:
+        """
+        lease를 잃은 빌드 중단 (하트비트 스레드에서 호출)
+        
+        취소 토큰을 트리거해 실행 중인 명령을 종료하고 대기를 깨웁니다.
+        토큰이 없으면 경고만 남깁니다.
+        """
+        if cancel_token is None:
+            logger.error(build_log_line(build_id, f"❌ Queue lease lost and no cancel token to stop the task: {queue_key}"))
+            return
+        logger.error(build_log_line(build_id, f"🛑 Queue lease taken over, stopping build: {queue_key}"))
+        cancel_token.cancel()
 
 
 # 전역 인스턴스
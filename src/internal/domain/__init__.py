@@ -1,12 +1,23 @@
 """Domain layer for build orchestration."""
 
-from .builds import BuildJob, BuildLogEntry, BuildProgress, BuildRequestData, BuildStatus, StageStatus
+from .builds import (
+    PREWARM_TRIGGER_SOURCE,
+    BuildJob,
+    BuildLogEntry,
+    BuildProgress,
+    BuildRequestData,
+    BuildStatus,
+    ResourceUsage,
+    StageStatus,
+)
 
 __all__ = [
+    "PREWARM_TRIGGER_SOURCE",
     "BuildJob",
     "BuildLogEntry",
     "BuildProgress",
     "BuildRequestData",
     "BuildStatus",
+    "ResourceUsage",
     "StageStatus",
 ]
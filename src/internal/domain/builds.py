@@ -2,12 +2,17 @@
 
 from __future__ import annotations
 
-from dataclasses import dataclass, field
+from dataclasses import asdict, dataclass, field
 from datetime import datetime
 from enum import Enum
 from threading import Lock
 from typing import Any, Dict, List, Optional
 
+from ..core.cancellation import CancellationToken
+
+# Jobs with this trigger only sync a workspace slot and install dependencies, leaving it warm for the next build.
+PREWARM_TRIGGER_SOURCE = "prewarm"
+
 
 class BuildStatus(str, Enum):
     """High-level lifecycle for a build job."""
@@ -44,6 +49,8 @@ class BuildRequestData:
     gradle_version: Optional[str] = None
     cocoapods_version: Optional[str] = None
     fastlane_version: Optional[str] = None
+    priority: int = 0
+    commit_sha: Optional[str] = None
 
 
 @dataclass
@@ -65,6 +72,43 @@ class BuildProgress:
     steps_completed: List[Dict[str, Any]] = field(default_factory=list)
 
 
+@dataclass
+class ResourceUsage:
+    """Resources consumed by commands; fields stay None where the platform cannot measure them."""
+
+    commands: int = 0
+    wall_seconds: float = 0.0
+    user_cpu_seconds: Optional[float] = None
+    system_cpu_seconds: Optional[float] = None
+    max_rss_kb: Optional[int] = None
+    block_input_ops: Optional[int] = None
+    block_output_ops: Optional[int] = None
+
+    def add(self, other: "ResourceUsage") -> None:
+        """Accumulate ``other``: times and I/O are summed, RSS keeps the peak."""
+        self.commands += other.commands
+        self.wall_seconds += other.wall_seconds
+        self.user_cpu_seconds = _sum_optional(self.user_cpu_seconds, other.user_cpu_seconds)
+        self.system_cpu_seconds = _sum_optional(self.system_cpu_seconds, other.system_cpu_seconds)
+        self.block_input_ops = _sum_optional(self.block_input_ops, other.block_input_ops)
+        self.block_output_ops = _sum_optional(self.block_output_ops, other.block_output_ops)
+        if other.max_rss_kb is not None:
+            self.max_rss_kb = max(self.max_rss_kb or 0, other.max_rss_kb)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "ResourceUsage":
+        return cls(**{key: value for key, value in data.items() if key in cls.__dataclass_fields__})
+
+
+def _sum_optional(left, right):
+    if right is None:
+        return left
+    return right if left is None else left + right
+
+
 @dataclass
 class StageState:
     """Structured state for one pipeline stage."""
@@ -74,6 +118,9 @@ class StageState:
     message: str = ""
     started_at: Optional[str] = None
     completed_at: Optional[str] = None
+    inputs: Dict[str, str] = field(default_factory=dict)
+    reused_from: Optional[str] = None
+    resources: Optional[ResourceUsage] = None
 
 
 @dataclass
@@ -98,12 +145,23 @@ class BuildJob:
     cancel_reason: Optional[str] = None
     cancel_requested_at: Optional[str] = None
     canceled_at: Optional[str] = None
+    assigned_agent: Optional[str] = None
+    priority: int = 0
+    target_commit: Optional[str] = None
+    commit_sha: Optional[str] = None
+    slot_key: Optional[str] = None
+    slot_id: Optional[str] = None
+    retry_of: Optional[str] = None
+    resume_from_stage: Optional[str] = None
+    checkpoints: Dict[str, Dict[str, str]] = field(default_factory=dict)
+    cgroup_usage: Dict[str, float] = field(default_factory=dict)
     status: BuildStatus = BuildStatus.PENDING
     logs: List[str] = field(default_factory=list)
     log_entries: List[BuildLogEntry] = field(default_factory=list)
     progress: Dict[str, BuildProgress] = field(default_factory=dict)
     stages: Dict[str, StageState] = field(default_factory=dict)
     processes: Dict[str, Any] = field(default_factory=dict)
+    cancel_token: CancellationToken = field(default_factory=CancellationToken, repr=False)
     lock: Lock = field(default_factory=Lock, repr=False)
 
     @classmethod
@@ -123,11 +181,12 @@ class BuildJob:
             "flutter_precached",
             "dependencies_installed",
         ]
-        if request.platform in {"all", "android"}:
+        platforms = set() if request.trigger_source == PREWARM_TRIGGER_SOURCE else {request.platform}
+        if platforms & {"all", "android"}:
             if request.trigger_source.startswith("shorebird"):
                 stage_names.append("android_preflight")
             stage_names.extend(["android_toolchain_ready", "android_build"])
-        if request.platform in {"all", "ios"}:
+        if platforms & {"all", "ios"}:
             stage_names.extend(["ios_toolchain_ready", "ios_build"])
 
         return cls(
@@ -145,9 +204,15 @@ class BuildJob:
             fastlane_version=request.fastlane_version,
             build_name=request.build_name,
             build_number=request.build_number,
+            priority=request.priority,
+            target_commit=request.commit_sha,
             stages={name: StageState(name=name) for name in stage_names},
         )
 
+    @property
+    def is_prewarm(self) -> bool:
+        return self.trigger_source == PREWARM_TRIGGER_SOURCE
+
     def mark_stage_running(self, name: str, message: str = "") -> None:
         stage = self.stages.setdefault(name, StageState(name=name))
         stage.status = StageStatus.RUNNING
@@ -163,6 +228,25 @@ class BuildJob:
         stage.message = message
         stage.completed_at = datetime.now().isoformat()
 
+    def record_stage_inputs(self, name: str, inputs: Dict[str, str]) -> None:
+        """Remember what a completed stage depended on so a retry can reuse it."""
+        stage = self.stages.setdefault(name, StageState(name=name))
+        stage.inputs = dict(inputs)
+
+    def record_stage_usage(self, name: str, usage: ResourceUsage) -> None:
+        """Add the resources used by one command to the stage that ran it."""
+        with self.lock:
+            stage = self.stages.setdefault(name, StageState(name=name))
+            if stage.resources is None:
+                stage.resources = ResourceUsage()
+            stage.resources.add(usage)
+
+    def mark_stage_reused(self, name: str, source_build_id: Optional[str], message: str = "") -> None:
+        self.mark_stage_completed(name, message)
+        stage = self.stages[name]
+        stage.inputs = dict(self.checkpoints.get(name, {}))
+        stage.reused_from = source_build_id or self.build_id
+
     def mark_stage_failed(self, name: str, message: str = "") -> None:
         stage = self.stages.setdefault(name, StageState(name=name))
         if not stage.started_at:
@@ -179,6 +263,51 @@ class BuildJob:
         stage.message = message
         stage.completed_at = datetime.now().isoformat()
 
+    def to_request(self) -> BuildRequestData:
+        """Rebuild the request that produced this job (used for retries)."""
+        return BuildRequestData(
+            flavor=self.flavor,
+            platform=self.platform,
+            trigger_source=self.trigger_source,
+            trigger_event_id=self.trigger_event_id,
+            build_name=self.build_name,
+            build_number=self.build_number,
+            branch_name=self.branch_name,
+            flutter_sdk_version=self.flutter_sdk_version,
+            gradle_version=self.gradle_version,
+            cocoapods_version=self.cocoapods_version,
+            fastlane_version=self.fastlane_version,
+            priority=self.priority,
+            # Retries rebuild exactly what the original build checked out.
+            commit_sha=self.commit_sha or self.target_commit,
+        )
+
+    def first_incomplete_stage(self) -> Optional[str]:
+        for name, stage in self.stages.items():
+            if stage.status != StageStatus.COMPLETED:
+                return name
+        return None
+
+    def reusable_checkpoints(self, from_stage: str) -> Dict[str, Dict[str, str]]:
+        """Inputs of completed stages that precede ``from_stage`` in pipeline order."""
+        checkpoints: Dict[str, Dict[str, str]] = {}
+        for name, stage in self.stages.items():
+            if name == from_stage:
+                break
+            if stage.status == StageStatus.COMPLETED and stage.inputs:
+                checkpoints[name] = dict(stage.inputs)
+        return checkpoints
+
+    def reset_for_retry(self, keep_stages: tuple[str, ...] = ("request_validated",)) -> None:
+        """Return the job to the queue with every stage outside ``keep_stages`` pending again."""
+        with self.lock:
+            self.status = BuildStatus.PENDING
+            self.progress = {}
+            self.processes = {}
+            for name, stage in self.stages.items():
+                if name not in keep_stages:
+                    self.stages[name] = StageState(name=name)
+
     def mark_canceled(self, reason: str) -> None:
         timestamp = datetime.now().isoformat()
         self.status = BuildStatus.CANCELED
@@ -210,6 +339,16 @@ class BuildJob:
                 "cancel_reason": self.cancel_reason,
                 "cancel_requested_at": self.cancel_requested_at,
                 "canceled_at": self.canceled_at,
+                "assigned_agent": self.assigned_agent,
+                "priority": self.priority,
+                "target_commit": self.target_commit,
+                "commit_sha": self.commit_sha,
+                "slot_key": self.slot_key,
+                "slot_id": self.slot_id,
+                "retry_of": self.retry_of,
+                "resume_from_stage": self.resume_from_stage,
+                "checkpoints": {name: dict(inputs) for name, inputs in self.checkpoints.items()},
+                "cgroup_usage": dict(self.cgroup_usage),
                 "status": self.status.value,
                 "logs": list(self.logs),
                 "log_entries": [
@@ -236,6 +375,9 @@ class BuildJob:
                         "message": v.message,
                         "started_at": v.started_at,
                         "completed_at": v.completed_at,
+                        "inputs": dict(v.inputs),
+                        "reused_from": v.reused_from,
+                        "resources": v.resources.to_dict() if v.resources else None,
                     }
                     for k, v in self.stages.items()
                 },
@@ -258,11 +400,21 @@ class BuildJob:
             fastlane_version=data.get("fastlane_version"),
             build_name=data.get("build_name"),
             build_number=data.get("build_number"),
+            priority=data.get("priority", 0),
         )
         job.resolved_flutter_sdk_version = data.get("resolved_flutter_sdk_version")
         job.cancel_reason = data.get("cancel_reason")
         job.cancel_requested_at = data.get("cancel_requested_at")
         job.canceled_at = data.get("canceled_at")
+        job.assigned_agent = data.get("assigned_agent")
+        job.target_commit = data.get("target_commit")
+        job.commit_sha = data.get("commit_sha")
+        job.slot_key = data.get("slot_key")
+        job.slot_id = data.get("slot_id")
+        job.retry_of = data.get("retry_of")
+        job.resume_from_stage = data.get("resume_from_stage")
+        job.checkpoints = {name: dict(inputs) for name, inputs in data.get("checkpoints", {}).items()}
+        job.cgroup_usage = dict(data.get("cgroup_usage", {}))
         job.status = BuildStatus(data.get("status", "pending"))
         job.logs = data.get("logs", [])
         job.log_entries = [
@@ -274,22 +426,57 @@ class BuildJob:
             for entry in data.get("log_entries", [])
         ]
 
-        if "progress" in data:
-            for k, p_data in data["progress"].items():
-                job.progress[k] = BuildProgress(
-                    current_step=p_data.get("current_step", ""),
-                    percentage=p_data.get("percentage", 0),
-                    current_message=p_data.get("current_message", ""),
-                    steps_completed=p_data.get("steps_completed", []),
-                )
-        
-        if "stages" in data:
-            for k, s_data in data["stages"].items():
-                job.stages[k] = StageState(
-                    name=s_data.get("name", k),
-                    status=StageStatus(s_data.get("status", "pending")),
-                    message=s_data.get("message", ""),
-                    started_at=s_data.get("started_at"),
-                    completed_at=s_data.get("completed_at"),
-                )
+        job.progress.update(_progress_from_dict(data.get("progress", {})))
+        job.stages.update(_stages_from_dict(data.get("stages", {})))
         return job
+
+    def apply_remote_update(self, data: Dict[str, Any]) -> None:
+        """Merge a state snapshot reported by a remote build agent."""
+        with self.lock:
+            if data.get("resolved_flutter_sdk_version"):
+                self.resolved_flutter_sdk_version = data["resolved_flutter_sdk_version"]
+            if "progress" in data:
+                self.progress = _progress_from_dict(data["progress"])
+            if "stages" in data:
+                self.stages = _stages_from_dict(data["stages"])
+            if self.status != BuildStatus.CANCELED and data.get("status"):
+                self.status = BuildStatus(data["status"])
+            for key in (
+                "cancel_reason",
+                "cancel_requested_at",
+                "canceled_at",
+                "target_commit",
+                "commit_sha",
+                "slot_key",
+                "slot_id",
+            ):
+                if data.get(key):
+                    setattr(self, key, data[key])
+
+
+def _progress_from_dict(data: Dict[str, Any]) -> Dict[str, BuildProgress]:
+    return {
+        k: BuildProgress(
+            current_step=p_data.get("current_step", ""),
+            percentage=p_data.get("percentage", 0),
+            current_message=p_data.get("current_message", ""),
+            steps_completed=p_data.get("steps_completed", []),
+        )
+        for k, p_data in data.items()
+    }
+
+
+def _stages_from_dict(data: Dict[str, Any]) -> Dict[str, StageState]:
+    return {
+        k: StageState(
+            name=s_data.get("name", k),
+            status=StageStatus(s_data.get("status", "pending")),
+            message=s_data.get("message", ""),
+            started_at=s_data.get("started_at"),
+            completed_at=s_data.get("completed_at"),
+            inputs=dict(s_data.get("inputs", {})),
+            reused_from=s_data.get("reused_from"),
+            resources=ResourceUsage.from_dict(s_data["resources"]) if s_data.get("resources") else None,
+        )
+        for k, s_data in data.items()
+    }
@@ -1,18 +1,35 @@
 """Infrastructure adapters."""
 
+from .async_execution import AsyncCommandRunner, AsyncExecutionEngine
+from .cgroups import CgroupManager
 from .command_runner import CommandRunner
+from .coordinator_client import CoordinatorClient, CoordinatorUnavailableError
+from .flutter_sdk import FlutterSdkManager
+from .git_mirror import GitMirrorCache
+from .git_prefetch import GitMirrorPrefetcher
 from .logging import BuildLogger
 from .platform_toolchain import PlatformToolchainPreparer, ShorebirdCacheValidator
+from .probe_cache import ProbeCache
 from .pub_setup_executor import PubSetupExecutor
 from .repository_workspace import RepositoryWorkspaceManager
 from .ruby_toolchain import RubyToolchainPreparer
 from .setup_executor import SetupExecutor
 from .workspace_pool import WorkspacePoolManager, WorkspaceSlotLease
+from .workspace_state import WorkspaceStateStore
 
 __all__ = [
+    "AsyncCommandRunner",
+    "AsyncExecutionEngine",
     "BuildLogger",
+    "CgroupManager",
     "CommandRunner",
+    "CoordinatorClient",
+    "CoordinatorUnavailableError",
+    "FlutterSdkManager",
+    "GitMirrorCache",
+    "GitMirrorPrefetcher",
     "PlatformToolchainPreparer",
+    "ProbeCache",
     "PubSetupExecutor",
     "RepositoryWorkspaceManager",
     "RubyToolchainPreparer",
@@ -20,4 +37,5 @@ __all__ = [
     "ShorebirdCacheValidator",
     "WorkspacePoolManager",
     "WorkspaceSlotLease",
+    "WorkspaceStateStore",
 ]
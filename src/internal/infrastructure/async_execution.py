@@ -0,0 +1,493 @@
+"""asyncio subprocess execution sharing one event loop across every build."""
+
+from __future__ import annotations
+
+import asyncio
+import concurrent.futures
+import logging
+import os
+import queue
+import signal
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Coroutine, Dict, List, Optional, Set
+
+import psutil
+
+from ..core.cancellation import CancellationToken, on_cancel
+from ..domain import ResourceUsage
+from .cgroups import BuildCgroup, current_cgroup
+from .command_runner import (
+    STREAM_TAIL_LINES,
+    SUPERVISE_INTERVAL,
+    CommandCancelledError,
+    CommandExecutionError,
+    CommandLimits,
+    CommandRunner,
+    CommandTimeoutError,
+    CompletedCommand,
+    OutputActivity,
+    command_limits,
+    report_usage,
+)
+from .output_pipeline import OutputPipeline
+from .terminal_output import TerminalLineSplitter, open_terminal, read_terminal
+
+logger = logging.getLogger(__name__)
+
+STOP_POLL_INTERVAL = 0.2
+STREAM_LINE_LIMIT = 4 * 1024 * 1024
+_EOF = object()
+
+
+class UsageSampler:
+    """Approximate a process tree's CPU and peak RSS by sampling it with psutil.
+
+    asyncio reaps its children itself, so wait4 accounting is not available
+    here; block I/O is left unmeasured.
+    """
+
+    def __init__(self, pid: int) -> None:
+        self.started_at = time.monotonic()
+        self.user_cpu_seconds: Optional[float] = None
+        self.system_cpu_seconds: Optional[float] = None
+        self.max_rss_kb: Optional[int] = None
+        try:
+            self._process: Optional[psutil.Process] = psutil.Process(pid)
+        except psutil.Error:
+            self._process = None
+
+    def sample(self) -> None:
+        if self._process is None:
+            return
+        try:
+            times = self._process.cpu_times()
+            tree = [self._process, *self._process.children(recursive=True)]
+        except psutil.Error:
+            return
+        self.user_cpu_seconds = times.user + times.children_user
+        self.system_cpu_seconds = times.system + times.children_system
+        rss = 0
+        for member in tree:
+            try:
+                rss += member.memory_info().rss
+            except psutil.Error:
+                continue
+        self.max_rss_kb = max(self.max_rss_kb or 0, rss // 1024)
+
+    def usage(self) -> ResourceUsage:
+        return ResourceUsage(
+            commands=1,
+            wall_seconds=time.monotonic() - self.started_at,
+            user_cpu_seconds=self.user_cpu_seconds,
+            system_cpu_seconds=self.system_cpu_seconds,
+            max_rss_kb=self.max_rss_kb,
+        )
+
+
+class AsyncExecutionEngine:
+    """Drive build subprocesses and their output streams from a single event loop.
+
+    The loop runs on one dedicated thread, so the number of threads stays the
+    same no matter how many commands are in flight. Synchronous pipeline code
+    hands work to the loop via :meth:`call` / :meth:`submit`. Line callbacks
+    run on the loop and must not block; :class:`AsyncCommandRunner` hands
+    ``run`` sinks, which may block, to an :class:`OutputPipeline` first.
+    """
+
+    def __init__(self) -> None:
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._processes: Set[asyncio.subprocess.Process] = set()
+
+    @property
+    def running(self) -> bool:
+        return self._loop is not None and self._loop.is_running()
+
+    def start(self) -> None:
+        with self._lock:
+            if self._thread is not None:
+                return
+            ready = threading.Event()
+            loop = asyncio.new_event_loop()
+
+            def run_loop() -> None:
+                asyncio.set_event_loop(loop)
+                loop.call_soon(ready.set)
+                loop.run_forever()
+
+            self._loop = loop
+            self._thread = threading.Thread(target=run_loop, name="async-execution-engine", daemon=True)
+            self._thread.start()
+            ready.wait()
+            logger.info("Async execution engine started")
+
+    def stop(self, timeout: float = 10.0) -> None:
+        """Terminate every tracked process group and stop the loop."""
+        with self._lock:
+            loop, thread = self._loop, self._thread
+            if loop is None or thread is None:
+                return
+            try:
+                asyncio.run_coroutine_threadsafe(self._terminate_all(), loop).result(timeout)
+            except Exception as exc:
+                logger.warning("Failed to terminate running commands on shutdown: %s", exc)
+            loop.call_soon_threadsafe(loop.stop)
+            thread.join(timeout)
+            loop.close()
+            self._loop = None
+            self._thread = None
+
+    def submit(self, coro: Coroutine[Any, Any, Any]) -> concurrent.futures.Future:
+        self.start()
+        return asyncio.run_coroutine_threadsafe(coro, self._loop)
+
+    def call(self, coro: Coroutine[Any, Any, Any]) -> Any:
+        """Run ``coro`` on the engine loop and block the calling thread for its result."""
+        if threading.current_thread() is self._thread:
+            raise RuntimeError("AsyncExecutionEngine.call() cannot be used from the engine loop")
+        return self.submit(coro).result()
+
+    async def spawn(
+        self,
+        command: List[str],
+        *,
+        env: Dict[str, str],
+        cwd: str,
+        cgroup: Optional[BuildCgroup] = None,
+        output_fd: Optional[int] = None,
+    ) -> asyncio.subprocess.Process:
+        """Start ``command`` with output on a pipe, or on ``output_fd`` (a pty slave) when given.
+
+        With ``cgroup`` the new process is moved into it right after spawn.
+        """
+        process = await asyncio.create_subprocess_exec(
+            *command,
+            stdout=asyncio.subprocess.PIPE if output_fd is None else output_fd,
+            stderr=asyncio.subprocess.STDOUT if output_fd is None else output_fd,
+            env=env,
+            cwd=cwd,
+            start_new_session=True,
+            limit=STREAM_LINE_LIMIT,
+        )
+        if cgroup is not None:
+            cgroup.add(process.pid)
+        self._processes.add(process)
+        return process
+
+    async def stream_lines(self, process: asyncio.subprocess.Process, on_line: Callable[[str], None]) -> None:
+        if process.stdout is None:
+            return
+        while True:
+            raw = await process.stdout.readline()
+            if not raw:
+                return
+            # readline only splits on "\n"; split progress frames on "\r" too, like the text-mode pipe does.
+            for line in raw.decode("utf-8", errors="replace").rstrip("\r\n").split("\r"):
+                on_line(line.rstrip())
+
+    async def stream_terminal(self, fd: int, on_line: Callable[[str], None]) -> None:
+        """Deliver lines read from pty master ``fd`` until the child side closes, then close it."""
+        loop = asyncio.get_running_loop()
+        splitter = TerminalLineSplitter()
+        closed = loop.create_future()
+
+        def readable() -> None:
+            try:
+                data = read_terminal(fd)
+            except BlockingIOError:
+                return
+            if not data:
+                loop.remove_reader(fd)
+                if not closed.done():
+                    closed.set_result(None)
+                return
+            for line in splitter.feed(data):
+                on_line(line)
+
+        os.set_blocking(fd, False)
+        loop.add_reader(fd, readable)
+        try:
+            await closed
+        finally:
+            loop.remove_reader(fd)
+            for line in splitter.flush():
+                on_line(line)
+            os.close(fd)
+
+    async def wait(
+        self,
+        process: asyncio.subprocess.Process,
+        limits: Optional[CommandLimits] = None,
+        activity: Optional[OutputActivity] = None,
+        command: Optional[List[str]] = None,
+        sampler: Optional[UsageSampler] = None,
+    ) -> int:
+        """Wait for ``process``, killing its group if it breaks ``limits`` and sampling its usage."""
+        try:
+            if (limits is None or not limits.active) and sampler is None:
+                return await process.wait()
+            activity = activity or OutputActivity()
+            while True:
+                if sampler is not None:
+                    sampler.sample()
+                try:
+                    return await asyncio.wait_for(asyncio.shield(process.wait()), timeout=SUPERVISE_INTERVAL)
+                except asyncio.TimeoutError:
+                    pass
+                violation = limits.violation(activity) if limits is not None else None
+                if violation:
+                    await self.terminate(process)
+                    raise CommandTimeoutError(command or [], violation)
+        finally:
+            if process.returncode is not None:
+                self._processes.discard(process)
+
+    async def terminate(self, process: asyncio.subprocess.Process, kill_after_seconds: float = 5.0) -> None:
+        if process.returncode is not None:
+            return
+        try:
+            os.killpg(process.pid, signal.SIGTERM)
+        except ProcessLookupError:
+            return
+        try:
+            await asyncio.wait_for(process.wait(), timeout=kill_after_seconds)
+            return
+        except asyncio.TimeoutError:
+            pass
+        try:
+            os.killpg(process.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            return
+        await process.wait()
+
+    async def run(
+        self,
+        command: List[str],
+        *,
+        env: Dict[str, str],
+        cwd: str,
+        check: bool = True,
+        should_stop: Optional[Callable[[], bool]] = None,
+        on_line: Optional[Callable[[str], None]] = None,
+        limits: Optional[CommandLimits] = None,
+        cgroup: Optional[BuildCgroup] = None,
+    ) -> CompletedCommand:
+        process = await self.spawn(command, env=env, cwd=cwd, cgroup=cgroup)
+        activity = OutputActivity()
+        sampler = UsageSampler(process.pid)
+        # Streamed output is only kept as a bounded tail for error reporting.
+        lines: "deque[str]" = deque(maxlen=STREAM_TAIL_LINES if on_line is not None else None)
+
+        def collect(line: str) -> None:
+            activity.touch()
+            lines.append(line)
+            if on_line is not None:
+                on_line(line)
+
+        loop = asyncio.get_running_loop()
+        canceled = asyncio.Event()
+        unregister = on_cancel(should_stop, lambda: loop.call_soon_threadsafe(canceled.set))
+        # Tokens wake the loop directly; plain callables still need polling.
+        poll_interval = None if should_stop is None or isinstance(should_stop, CancellationToken) else STOP_POLL_INTERVAL
+        reader = asyncio.ensure_future(self.stream_lines(process, collect))
+        waiter = asyncio.ensure_future(self.wait(process, limits, activity, command, sampler))
+        cancel_waiter = asyncio.ensure_future(canceled.wait())
+        try:
+            while True:
+                done, _ = await asyncio.wait(
+                    {waiter, cancel_waiter},
+                    timeout=poll_interval,
+                    return_when=asyncio.FIRST_COMPLETED,
+                )
+                if waiter in done:
+                    waiter.result()
+                    break
+                if should_stop and should_stop():
+                    await self.terminate(process)
+                    raise CommandCancelledError(command)
+            await reader
+        except CommandTimeoutError as exc:
+            raise CommandTimeoutError(command, exc.reason, "\n".join(lines)) from None
+        except asyncio.CancelledError:
+            await self.terminate(process)
+            raise
+        finally:
+            unregister()
+            cancel_waiter.cancel()
+            if not reader.done():
+                reader.cancel()
+        if should_stop and should_stop():
+            raise CommandCancelledError(command)
+
+        stdout = "\n".join(lines) + ("\n" if lines else "")
+        result = CompletedCommand(args=command, returncode=process.returncode, stdout=stdout, usage=sampler.usage())
+        if check and process.returncode != 0:
+            raise CommandExecutionError(command, process.returncode, stdout)
+        return result
+
+    async def _terminate_all(self) -> None:
+        await asyncio.gather(
+            *(self.terminate(process, kill_after_seconds=2.0) for process in list(self._processes)),
+            return_exceptions=True,
+        )
+
+
+def _off_loop(on_line: Callable[[str], None], name: str) -> OutputPipeline:
+    """Queue lines for ``on_line`` on the shared delivery pool so a slow sink never stalls the loop."""
+
+    def deliver(lines: List[str]) -> None:
+        for line in lines:
+            on_line(line)
+
+    return OutputPipeline(deliver, name=name)
+
+
+class AsyncProcessHandle:
+    """Popen-like view of a subprocess owned by the engine loop."""
+
+    def __init__(self, process: asyncio.subprocess.Process, args: List[str]) -> None:
+        self.process = process
+        self.args = args
+        self.pid = process.pid
+        self.activity = OutputActivity()
+        self.sampler = UsageSampler(process.pid)
+        self.reader: Optional[concurrent.futures.Future] = None
+        self.terminal_fd: Optional[int] = None
+
+    @property
+    def returncode(self) -> Optional[int]:
+        return self.process.returncode
+
+    def poll(self) -> Optional[int]:
+        return self.process.returncode
+
+
+class AsyncCommandRunner(CommandRunner):
+    """CommandRunner whose subprocesses and output streams live on an AsyncExecutionEngine."""
+
+    def __init__(
+        self,
+        engine: AsyncExecutionEngine,
+        limits: Callable[[List[str]], CommandLimits] = command_limits,
+    ) -> None:
+        super().__init__(limits)
+        self.engine = engine
+
+    def start(
+        self,
+        command: List[str],
+        *,
+        env: Dict[str, str],
+        cwd: str,
+        line_buffered: bool = False,
+        tty: bool = False,
+    ) -> AsyncProcessHandle:
+        if not tty:
+            # The build's cgroup is bound to this thread's context, not the loop's.
+            spawn = self.engine.spawn(command, env=env, cwd=cwd, cgroup=current_cgroup())
+            return AsyncProcessHandle(self.engine.call(spawn), command)
+
+        master, slave = open_terminal()
+        try:
+            spawn = self.engine.spawn(command, env=env, cwd=cwd, cgroup=current_cgroup(), output_fd=slave)
+            handle = AsyncProcessHandle(self.engine.call(spawn), command)
+        except BaseException:
+            os.close(master)
+            raise
+        finally:
+            os.close(slave)
+        handle.terminal_fd = master
+        return handle
+
+    def follow_output(self, process: AsyncProcessHandle, on_line: Callable[[str], None]) -> None:
+        """Call ``on_line`` on the engine loop for each line; it must not block (e.g. ``OutputPipeline.put``)."""
+
+        def deliver(line: str) -> None:
+            process.activity.touch()
+            on_line(line)
+
+        process.reader = self.engine.submit(self._stream(process, deliver))
+
+    def iter_lines(self, process: AsyncProcessHandle):
+        lines: "queue.Queue[object]" = queue.Queue()
+
+        def deliver(line: str) -> None:
+            process.activity.touch()
+            lines.put(line)
+
+        async def pump() -> None:
+            try:
+                await self._stream(process, deliver)
+            finally:
+                lines.put(_EOF)
+
+        self.engine.submit(pump())
+        while True:
+            line = lines.get()
+            if line is _EOF:
+                return
+            yield line
+
+    def wait(self, process: AsyncProcessHandle) -> int:
+        try:
+            returncode = self.engine.call(
+                self.engine.wait(
+                    process.process,
+                    self.limits(process.args),
+                    process.activity,
+                    process.args,
+                    process.sampler,
+                )
+            )
+        finally:
+            if process.reader is not None:
+                # Make sure every line reached the log before reporting completion, or the kill.
+                concurrent.futures.wait([process.reader])
+        report_usage(process.sampler.usage())
+        if process.reader is not None:
+            process.reader.result()
+        return returncode
+
+    def terminate(self, process: AsyncProcessHandle, *, kill_after_seconds: float = 5.0) -> None:
+        self.engine.call(self.engine.terminate(process.process, kill_after_seconds))
+
+    def _stream(self, process: AsyncProcessHandle, on_line: Callable[[str], None]):
+        if process.terminal_fd is not None:
+            return self.engine.stream_terminal(process.terminal_fd, on_line)
+        return self.engine.stream_lines(process.process, on_line)
+
+    def run(
+        self,
+        command: List[str],
+        *,
+        env: Dict[str, str],
+        cwd: str,
+        check: bool = True,
+        should_stop: Optional[Callable[[], bool]] = None,
+        on_line: Optional[Callable[[str], None]] = None,
+    ) -> CompletedCommand:
+        delivery = _off_loop(on_line, command[0]) if on_line is not None else None
+        try:
+            result = self.engine.call(
+                self.engine.run(
+                    command,
+                    env=env,
+                    cwd=cwd,
+                    check=False,
+                    should_stop=should_stop,
+                    on_line=delivery.put if delivery is not None else None,
+                    limits=self.limits(command),
+                    cgroup=current_cgroup(),
+                )
+            )
+        finally:
+            if delivery is not None:
+                delivery.close()
+        # Usage is reported here, on the caller's thread, where the stage recorder is bound.
+        report_usage(result.usage)
+        if check and result.returncode != 0:
+            raise CommandExecutionError(command, result.returncode, result.stdout)
+        return result
@@ -0,0 +1,310 @@
+"""Per-build cgroup v2 isolation on Linux hosts."""
+
+from __future__ import annotations
+
+import logging
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Dict, Iterator, Optional
+
+from ..core.config import get_build_cgroup_limit, get_build_cgroup_max_memory_pressure
+
+logger = logging.getLogger(__name__)
+
+CGROUP_ROOT = Path("/sys/fs/cgroup")
+CONTROLLERS = ("cpu", "memory", "io")
+# Usage fields that only grow over a build's life and can be summed across builds.
+CUMULATIVE_FIELDS = ("cpu_user_seconds", "cpu_system_seconds", "cpu_throttled_seconds", "io_read_bytes", "io_write_bytes")
+# Processes of the server itself; cgroup v2 forbids processes in a cgroup that delegates controllers.
+SUPERVISOR_GROUP = "supervisor"
+
+_current_cgroup: ContextVar[Optional["BuildCgroup"]] = ContextVar("build_cgroup", default=None)
+
+
+@dataclass(frozen=True)
+class CgroupLimits:
+    """Values written to a build cgroup's interface files; ``None`` leaves the kernel default."""
+
+    cpu_max: Optional[str] = None
+    cpu_weight: Optional[str] = None
+    memory_high: Optional[str] = None
+    io_weight: Optional[str] = None
+
+    @classmethod
+    def from_config(cls) -> "CgroupLimits":
+        return cls(
+            cpu_max=get_build_cgroup_limit("cpu_max"),
+            cpu_weight=get_build_cgroup_limit("cpu_weight"),
+            memory_high=get_build_cgroup_limit("memory_high"),
+            io_weight=get_build_cgroup_limit("io_weight"),
+        )
+
+    def files(self) -> Dict[str, str]:
+        values = {
+            "cpu.max": self.cpu_max,
+            "cpu.weight": self.cpu_weight,
+            "memory.high": self.memory_high,
+            "io.weight": self.io_weight,
+        }
+        return {name: value for name, value in values.items() if value}
+
+
+@dataclass
+class CgroupUsage:
+    """Counters read from a build cgroup."""
+
+    cpu_user_seconds: float = 0.0
+    cpu_system_seconds: float = 0.0
+    cpu_throttled_seconds: float = 0.0
+    memory_current_bytes: int = 0
+    memory_peak_bytes: int = 0
+    io_read_bytes: int = 0
+    io_write_bytes: int = 0
+
+    def to_dict(self) -> Dict[str, float]:
+        return asdict(self)
+
+
+def _read_keyed(path: Path) -> Dict[str, int]:
+    try:
+        text = path.read_text()
+    except OSError:
+        return {}
+    values = {}
+    for line in text.splitlines():
+        parts = line.split()
+        if len(parts) == 2 and parts[1].isdigit():
+            values[parts[0]] = int(parts[1])
+    return values
+
+
+def _read_int(path: Path) -> int:
+    try:
+        return int(path.read_text().strip())
+    except (OSError, ValueError):
+        return 0
+
+
+class BuildCgroup:
+    """Leaf cgroup holding every process started for one build."""
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self._peak_bytes = 0
+
+    def usage(self) -> CgroupUsage:
+        cpu = _read_keyed(self.path / "cpu.stat")
+        io_read = io_write = 0
+        try:
+            for line in (self.path / "io.stat").read_text().splitlines():
+                fields = dict(item.split("=", 1) for item in line.split()[1:] if "=" in item)
+                io_read += int(fields.get("rbytes", 0))
+                io_write += int(fields.get("wbytes", 0))
+        except (OSError, ValueError):
+            pass
+        current = _read_int(self.path / "memory.current")
+        # memory.peak only exists on newer kernels; otherwise keep the highest sample seen.
+        self._peak_bytes = max(self._peak_bytes, _read_int(self.path / "memory.peak"), current)
+        return CgroupUsage(
+            cpu_user_seconds=cpu.get("user_usec", 0) / 1_000_000,
+            cpu_system_seconds=cpu.get("system_usec", 0) / 1_000_000,
+            cpu_throttled_seconds=cpu.get("throttled_usec", 0) / 1_000_000,
+            memory_current_bytes=current,
+            memory_peak_bytes=self._peak_bytes,
+            io_read_bytes=io_read,
+            io_write_bytes=io_write,
+        )
+
+    def add(self, pid: int) -> bool:
+        """Move a just-started process into this cgroup.
+
+        Done from the parent after spawn rather than in ``preexec_fn``, which
+        is unsafe in a threaded server. If the move fails the process keeps
+        running, just without isolation.
+        """
+        try:
+            (self.path / "cgroup.procs").write_text(str(pid))
+            return True
+        except OSError as exc:
+            logger.warning("Could not move pid %s into %s, running it without isolation: %s", pid, self.path.name, exc)
+            return False
+
+    def close(self) -> CgroupUsage:
+        """Kill anything the build left behind (e.g. Gradle daemons) and remove the cgroup."""
+        usage = self.usage()
+        kill_file = self.path / "cgroup.kill"
+        try:
+            if kill_file.exists():
+                kill_file.write_text("1")
+            else:
+                for pid in (self.path / "cgroup.procs").read_text().split():
+                    try:
+                        os.kill(int(pid), 9)
+                    except ProcessLookupError:
+                        pass
+        except OSError:
+            pass
+        deadline = time.monotonic() + 5
+        while True:
+            try:
+                self.path.rmdir()
+                break
+            except FileNotFoundError:
+                break
+            except OSError:
+                if time.monotonic() > deadline:
+                    logger.warning("Could not remove build cgroup %s", self.path)
+                    break
+                time.sleep(0.05)
+        return usage
+
+
+class CgroupManager:
+    """Create per-build cgroups under the server's own (delegated) cgroup v2 subtree.
+
+    When cgroup v2 is not mounted or the subtree is not delegated to this user,
+    :meth:`create` returns ``None`` and builds run without isolation.
+    """
+
+    def __init__(
+        self,
+        root: Path = CGROUP_ROOT,
+        limits: Optional[CgroupLimits] = None,
+        max_memory_pressure: Optional[float] = None,
+        proc_self_cgroup: Path = Path("/proc/self/cgroup"),
+    ) -> None:
+        self.root = root
+        self.limits = limits or CgroupLimits.from_config()
+        self.max_memory_pressure = (
+            get_build_cgroup_max_memory_pressure() if max_memory_pressure is None else max_memory_pressure
+        )
+        self.proc_self_cgroup = proc_self_cgroup
+        self.base: Optional[Path] = None
+        self.live: Dict[str, BuildCgroup] = {}
+        self.totals = CgroupUsage()
+        self.completed_builds = 0
+        self._lock = threading.Lock()
+        self._prepared = False
+
+    @property
+    def available(self) -> bool:
+        with self._lock:
+            self._prepare()
+            return self.base is not None
+
+    def create(self, build_id: str) -> Optional[BuildCgroup]:
+        with self._lock:
+            self._prepare()
+            if self.base is None:
+                return None
+            path = self.base / f"build-{build_id}"
+            try:
+                path.mkdir(exist_ok=True)
+                for name, value in self.limits.files().items():
+                    try:
+                        (path / name).write_text(value)
+                    except OSError as exc:
+                        logger.warning("Ignoring cgroup limit %s=%s for %s: %s", name, value, build_id, exc)
+            except OSError as exc:
+                logger.warning("Could not create cgroup for %s, running without isolation: %s", build_id, exc)
+                return None
+            cgroup = BuildCgroup(path)
+            self.live[build_id] = cgroup
+            return cgroup
+
+    def release(self, build_id: str) -> Optional[CgroupUsage]:
+        with self._lock:
+            cgroup = self.live.pop(build_id, None)
+        if cgroup is None:
+            return None
+        usage = cgroup.close()
+        with self._lock:
+            self.completed_builds += 1
+            for name in CUMULATIVE_FIELDS:
+                setattr(self.totals, name, getattr(self.totals, name) + getattr(usage, name))
+        return usage
+
+    def snapshot(self) -> Dict[str, CgroupUsage]:
+        with self._lock:
+            live = dict(self.live)
+        return {build_id: cgroup.usage() for build_id, cgroup in live.items()}
+
+    def memory_pressure(self) -> Optional[float]:
+        """``some avg10`` of memory.pressure across all builds, in percent."""
+        if not self.available:
+            return None
+        try:
+            text = (self.base / "memory.pressure").read_text()
+        except OSError:
+            return None
+        match = re.search(r"some avg10=([\d.]+)", text)
+        return float(match.group(1)) if match else None
+
+    def admit(self) -> bool:
+        """Whether another build may start; used by the worker pool while builds are running."""
+        if self.max_memory_pressure <= 0:
+            return True
+        pressure = self.memory_pressure()
+        return pressure is None or pressure < self.max_memory_pressure
+
+    def _prepare(self) -> None:
+        if self._prepared:
+            return
+        self._prepared = True
+        try:
+            self.base = self._delegate()
+        except OSError as exc:
+            logger.warning("cgroup v2 delegation unavailable, builds run without isolation: %s", exc)
+            self.base = None
+
+    def _delegate(self) -> Optional[Path]:
+        if not (self.root / "cgroup.controllers").exists():
+            logger.info("cgroup v2 is not mounted at %s; builds run without isolation", self.root)
+            return None
+        relative = ""
+        for line in self.proc_self_cgroup.read_text().splitlines():
+            if line.startswith("0::"):
+                relative = line[3:].strip().lstrip("/")
+        base = self.root / relative
+        available = set((base / "cgroup.controllers").read_text().split())
+        wanted = [name for name in CONTROLLERS if name in available]
+        enabled = set((base / "cgroup.subtree_control").read_text().split())
+        missing = [name for name in wanted if name not in enabled]
+        if missing:
+            supervisor = base / SUPERVISOR_GROUP
+            supervisor.mkdir(exist_ok=True)
+            for pid in (base / "cgroup.procs").read_text().split():
+                try:
+                    (supervisor / "cgroup.procs").write_text(pid)
+                except ProcessLookupError:
+                    continue
+            (base / "cgroup.subtree_control").write_text(" ".join(f"+{name}" for name in missing))
+        logger.info("Build cgroups enabled under %s (controllers: %s)", base, ", ".join(wanted) or "none")
+        return base
+
+
+@contextmanager
+def running_in_cgroup(cgroup: Optional[BuildCgroup]) -> Iterator[None]:
+    """Start every command launched in this context inside ``cgroup``."""
+    token = _current_cgroup.set(cgroup)
+    try:
+        yield
+    finally:
+        _current_cgroup.reset(token)
+
+
+def current_cgroup() -> Optional[BuildCgroup]:
+    """The cgroup commands started in this context belong in, if any."""
+    return _current_cgroup.get()
+
+
+def join_current_cgroup(pid: int) -> None:
+    cgroup = _current_cgroup.get()
+    if cgroup is not None:
+        cgroup.add(pid)
@@ -2,12 +2,87 @@
 
 from __future__ import annotations
 
+import codecs
 import os
+import re
+import select
 import signal
 import subprocess
+import sys
+import threading
 import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
 from dataclasses import dataclass
-from typing import Callable, Dict, List, Optional
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional
+
+from ..core.cancellation import OperationCanceledError, on_cancel
+from ..core.config import get_command_idle_timeout, get_command_timeout
+from ..domain import ResourceUsage
+from .cgroups import join_current_cgroup
+from .terminal_output import TerminalLineSplitter, open_terminal, read_terminal
+
+# Lines kept for error reporting when a command's output is streamed instead of buffered.
+STREAM_TAIL_LINES = 200
+SUPERVISE_INTERVAL = 0.5
+PIPE_READ_SIZE = 65536
+# Universal newlines, like a text-mode pipe: progress bars redraw with a bare "\r".
+LINE_BREAK = re.compile(r"\r\n|\r|\n")
+
+COMMAND_CLASS_BY_EXECUTABLE = {
+    "git": "git",
+    "fvm": "flutter",
+    "flutter": "flutter",
+    "dart": "flutter",
+    "melos": "flutter",
+    "shorebird": "flutter",
+    "pod": "cocoapods",
+    "bundle": "ruby",
+    "gem": "ruby",
+    "rbenv": "ruby",
+    "ruby": "ruby",
+    "security": "security",
+    "bash": "build",
+    "fastlane": "build",
+}
+
+# ru_maxrss is reported in kilobytes on Linux and in bytes on macOS.
+RSS_UNITS_PER_KB = 1024 if sys.platform == "darwin" else 1
+
+_usage_recorder: ContextVar[Optional[Callable[[ResourceUsage], None]]] = ContextVar(
+    "command_usage_recorder",
+    default=None,
+)
+
+
+@contextmanager
+def recording_usage(recorder: Callable[[ResourceUsage], None]) -> Iterator[None]:
+    """Send the resource usage of every command run in this context to ``recorder``."""
+    token = _usage_recorder.set(recorder)
+    try:
+        yield
+    finally:
+        _usage_recorder.reset(token)
+
+
+def report_usage(usage: Optional[ResourceUsage]) -> None:
+    recorder = _usage_recorder.get()
+    if recorder is not None and usage is not None:
+        recorder(usage)
+
+
+def usage_from_rusage(wall_seconds: float, rusage) -> ResourceUsage:
+    return ResourceUsage(
+        commands=1,
+        wall_seconds=wall_seconds,
+        user_cpu_seconds=rusage.ru_utime,
+        system_cpu_seconds=rusage.ru_stime,
+        max_rss_kb=int(rusage.ru_maxrss // RSS_UNITS_PER_KB),
+        block_input_ops=rusage.ru_inblock,
+        block_output_ops=rusage.ru_oublock,
+    )
 
 
 @dataclass
@@ -17,6 +92,7 @@ class CompletedCommand:
     args: List[str]
     returncode: int
     stdout: str
+    usage: Optional[ResourceUsage] = None
 
 
 class CommandExecutionError(RuntimeError):
@@ -32,7 +108,7 @@ class CommandExecutionError(RuntimeError):
         super().__init__(summary)
 
 
-class CommandCancelledError(RuntimeError):
+class CommandCancelledError(OperationCanceledError):
     """Raised when a command is stopped because the build was canceled."""
 
     def __init__(self, command: List[str]) -> None:
@@ -40,9 +116,122 @@ class CommandCancelledError(RuntimeError):
         super().__init__(f"Command cancelled: {' '.join(command)}")
 
 
+class CommandTimeoutError(RuntimeError):
+    """Raised when a command is killed for running too long or going silent."""
+
+    def __init__(self, command: List[str], reason: str, output: str = "") -> None:
+        self.command = command
+        self.reason = reason
+        self.output = output
+        summary = f"Command killed ({reason}): {' '.join(command)}"
+        if output.strip():
+            summary = f"{summary}\n{output.strip()}"
+        super().__init__(summary)
+
+
+class OutputActivity:
+    """Start and last-output times of a running command, read by the watchdog."""
+
+    def __init__(self) -> None:
+        self.started_at = time.monotonic()
+        self.last_output_at = self.started_at
+
+    def touch(self) -> None:
+        self.last_output_at = time.monotonic()
+
+
+@dataclass(frozen=True)
+class CommandLimits:
+    """Wall-clock and no-output limits for one command; ``None`` disables a limit."""
+
+    timeout: Optional[float] = None
+    idle_timeout: Optional[float] = None
+
+    @property
+    def active(self) -> bool:
+        return bool(self.timeout or self.idle_timeout)
+
+    def violation(self, activity: OutputActivity, now: Optional[float] = None) -> Optional[str]:
+        now = time.monotonic() if now is None else now
+        if self.timeout and now - activity.started_at > self.timeout:
+            return f"exceeded {self.timeout:.0f}s time limit"
+        if self.idle_timeout and now - activity.last_output_at > self.idle_timeout:
+            return f"no output for {self.idle_timeout:.0f}s"
+        return None
+
+
+def classify_command(command: List[str]) -> str:
+    """Map a command to the class whose time limit applies (git, flutter, build, ...)."""
+    for part in command:
+        executable = Path(part).name
+        if executable in {"env", "exec"} or "=" in executable:
+            continue
+        return COMMAND_CLASS_BY_EXECUTABLE.get(executable, "default")
+    return "default"
+
+
+def command_limits(command: List[str]) -> CommandLimits:
+    """Limits configured through COMMAND_TIMEOUT_<CLASS>_SECONDS and COMMAND_IDLE_TIMEOUT_SECONDS."""
+    return CommandLimits(
+        timeout=get_command_timeout(classify_command(command)) or None,
+        idle_timeout=get_command_idle_timeout() or None,
+    )
+
+
+def line_logger(log: Callable[[str], None], prefix: str) -> Callable[[str], None]:
+    """Forward non-empty output lines to ``log`` behind ``prefix``."""
+
+    def emit(line: str) -> None:
+        if line.strip():
+            log(f"{prefix} {line.strip()}")
+
+    return emit
+
+
+class PipeLines:
+    """Read lines from a child's output pipe without blocking longer than asked."""
+
+    def __init__(self, stream) -> None:
+        self._stream = stream
+        self._fd = stream.fileno()
+        self._decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        self._pending = ""
+        self.closed = False
+
+    def read(self, timeout: float) -> List[str]:
+        """Lines that arrived within ``timeout``; closes the pipe at EOF."""
+        ready, _, _ = select.select([self._fd], [], [], timeout)
+        if not ready:
+            return []
+        data = os.read(self._fd, PIPE_READ_SIZE)
+        if not data:
+            lines = self._split(self._decoder.decode(b"", final=True), final=True)
+            self.close()
+            return lines
+        return self._split(self._decoder.decode(data))
+
+    def close(self) -> None:
+        self.closed = True
+        self._stream.close()
+
+    def _split(self, text: str, final: bool = False) -> List[str]:
+        text = self._pending + text
+        # A trailing "\r" may be the first half of "\r\n".
+        held = "\r" if text.endswith("\r") and not final else ""
+        parts = LINE_BREAK.split(text[: len(text) - len(held)])
+        self._pending = parts.pop() + held
+        if final and self._pending:
+            parts.append(self._pending)
+            self._pending = ""
+        return [part.rstrip() for part in parts]
+
+
 class CommandRunner:
     """Execute commands with a consistent subprocess configuration."""
 
+    def __init__(self, limits: Callable[[List[str]], CommandLimits] = command_limits) -> None:
+        self.limits = limits
+
     def start(
         self,
         command: List[str],
@@ -50,8 +239,16 @@ class CommandRunner:
         env: Dict[str, str],
         cwd: str,
         line_buffered: bool = False,
+        tty: bool = False,
     ) -> subprocess.Popen:
-        return subprocess.Popen(
+        """Start ``command``; with ``tty`` its output goes to a pseudo-terminal instead of a pipe.
+
+        Tools that buffer or hide progress when stdout is not a terminal
+        (xcodebuild, gradle, flutter) then stream it line by line.
+        """
+        if tty:
+            return self._start_in_terminal(command, env=env, cwd=cwd)
+        process = subprocess.Popen(
             command,
             stdout=subprocess.PIPE,
             stderr=subprocess.STDOUT,
@@ -61,9 +258,35 @@ class CommandRunner:
             cwd=cwd,
             start_new_session=True,
         )
+        join_current_cgroup(process.pid)
+        process.activity = OutputActivity()
+        return process
+
+    def _start_in_terminal(self, command: List[str], *, env: Dict[str, str], cwd: str) -> subprocess.Popen:
+        master, slave = open_terminal()
+        try:
+            process = subprocess.Popen(
+                command,
+                stdout=slave,
+                stderr=slave,
+                env=env,
+                cwd=cwd,
+                start_new_session=True,
+            )
+        except BaseException:
+            os.close(master)
+            raise
+        finally:
+            os.close(slave)
+        join_current_cgroup(process.pid)
+        process.terminal_fd = master
+        process.activity = OutputActivity()
+        return process
 
     def wait(self, process: subprocess.Popen) -> int:
-        return process.wait()
+        """Wait for ``process``, killing its group if it breaks its time or no-output limit."""
+        report_usage(self._supervise(process))
+        return process.returncode
 
     def terminate(self, process: subprocess.Popen, *, kill_after_seconds: float = 5.0) -> None:
         if process.poll() is not None:
@@ -86,11 +309,74 @@ class CommandRunner:
         except ProcessLookupError:
             return
 
+    def _reap(self, process: subprocess.Popen, timeout: float):
+        """Wait up to ``timeout`` for exit, reaping with wait4 to capture resource usage."""
+        deadline = time.monotonic() + timeout
+        delay = 0.005
+        while True:
+            if process.returncode is not None:
+                return True, None
+            try:
+                pid, status, rusage = os.wait4(process.pid, os.WNOHANG)
+            except ChildProcessError:
+                # Already reaped elsewhere (e.g. Popen.poll during terminate).
+                process.wait()
+                return True, None
+            if pid:
+                process.returncode = os.waitstatus_to_exitcode(status)
+                return True, rusage
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False, None
+            time.sleep(min(delay, remaining))
+            delay = min(delay * 2, 0.1)
+
+    def _signal_group(self, process: subprocess.Popen, sig: int) -> None:
+        if process.poll() is not None:
+            return
+        try:
+            os.killpg(process.pid, sig)
+        except ProcessLookupError:
+            return
+
     def iter_lines(self, process: subprocess.Popen):
+        activity = getattr(process, "activity", None)
+        terminal_fd = getattr(process, "terminal_fd", None)
+        if terminal_fd is not None:
+            yield from self._iter_terminal_lines(terminal_fd, activity)
+            return
         if process.stdout is None:
             return
-        for line in process.stdout:
-            yield line.rstrip()
+        try:
+            for line in process.stdout:
+                if activity is not None:
+                    activity.touch()
+                yield line.rstrip()
+        finally:
+            process.stdout.close()
+
+    def _iter_terminal_lines(self, fd: int, activity: Optional[OutputActivity]):
+        splitter = TerminalLineSplitter()
+        try:
+            while True:
+                data = read_terminal(fd)
+                if not data:
+                    break
+                if activity is not None:
+                    activity.touch()
+                yield from splitter.feed(data)
+            yield from splitter.flush()
+        finally:
+            os.close(fd)
+
+    def follow_output(self, process: subprocess.Popen, on_line: Callable[[str], None]) -> None:
+        """Deliver each output line to ``on_line`` in the background as it arrives."""
+
+        def pump() -> None:
+            for line in self.iter_lines(process):
+                on_line(line)
+
+        threading.Thread(target=pump, daemon=True).start()
 
     def run(
         self,
@@ -100,33 +386,40 @@ class CommandRunner:
         cwd: str,
         check: bool = True,
         should_stop: Optional[Callable[[], bool]] = None,
+        on_line: Optional[Callable[[str], None]] = None,
     ) -> CompletedCommand:
-        process = self.start(
-            command,
-            env=env,
-            cwd=cwd,
-        )
-        stdout = ""
-        while True:
-            if should_stop and should_stop():
-                self.terminate(process)
-                try:
-                    stdout, _ = process.communicate(timeout=1)
-                except subprocess.TimeoutExpired:
-                    stdout = ""
-                raise CommandCancelledError(command)
-            try:
-                stdout, _ = process.communicate(timeout=0.5)
-                break
-            except subprocess.TimeoutExpired:
-                continue
-        result = CompletedCommand(
-            args=command,
-            returncode=process.returncode,
-            stdout=stdout or "",
-        )
+        """Run ``command`` to completion.
+
+        Output is read on the calling thread between supervision checks, so a
+        command costs no extra thread. With ``on_line`` each output line is
+        delivered as it arrives and only the last ``STREAM_TAIL_LINES`` lines
+        are kept in the returned ``stdout``.
+        """
+        process = self.start(command, env=env, cwd=cwd, line_buffered=on_line is not None)
+        lines: deque[str] = deque(maxlen=STREAM_TAIL_LINES if on_line is not None else None)
+
+        def collect(line: str) -> None:
+            lines.append(line)
+            if on_line is not None:
+                on_line(line)
+
+        # A cancellation token signals the process group right away; the
+        # supervision loop then only has to reap it and escalate if needed.
+        unregister = on_cancel(should_stop, lambda: self._signal_group(process, signal.SIGTERM))
+        try:
+            usage = self._supervise(process, should_stop, on_line=collect)
+        except CommandTimeoutError as exc:
+            raise CommandTimeoutError(command, exc.reason, "\n".join(lines)) from None
+        finally:
+            unregister()
+        report_usage(usage)
+        if should_stop and should_stop():
+            raise CommandCancelledError(command)
+
+        stdout = "\n".join(lines) + ("\n" if lines else "")
+        result = CompletedCommand(args=command, returncode=process.returncode, stdout=stdout, usage=usage)
         if check and process.returncode != 0:
-            raise CommandExecutionError(command, process.returncode, result.stdout)
+            raise CommandExecutionError(command, process.returncode, stdout)
         return result
 
     def run_checked(
@@ -136,5 +429,53 @@ class CommandRunner:
         env: Dict[str, str],
         cwd: str,
         should_stop: Optional[Callable[[], bool]] = None,
+        on_line: Optional[Callable[[str], None]] = None,
     ) -> CompletedCommand:
-        return self.run(command, env=env, cwd=cwd, check=True, should_stop=should_stop)
+        return self.run(command, env=env, cwd=cwd, check=True, should_stop=should_stop, on_line=on_line)
+
+    def _supervise(
+        self,
+        process: subprocess.Popen,
+        should_stop: Optional[Callable[[], bool]] = None,
+        on_line: Optional[Callable[[str], None]] = None,
+    ) -> Optional[ResourceUsage]:
+        """Reap ``process`` while enforcing its limits; returns what it consumed.
+
+        With ``on_line`` the process output is also read here until EOF.
+        """
+        command = list(process.args)
+        limits = self.limits(command)
+        activity = getattr(process, "activity", None) or OutputActivity()
+        output = PipeLines(process.stdout) if on_line is not None and process.stdout is not None else None
+        usage: Optional[ResourceUsage] = None
+        try:
+            while True:
+                if should_stop and should_stop():
+                    self.terminate(process)
+                    raise CommandCancelledError(command)
+                reading = output is not None and not output.closed
+                if reading:
+                    for line in output.read(SUPERVISE_INTERVAL):
+                        activity.touch()
+                        on_line(line)
+                if usage is None:
+                    reaped, rusage = self._reap(process, 0 if reading else SUPERVISE_INTERVAL)
+                    if reaped:
+                        wall_seconds = time.monotonic() - activity.started_at
+                        usage = (
+                            ResourceUsage(commands=1, wall_seconds=wall_seconds)
+                            if rusage is None
+                            else usage_from_rusage(wall_seconds, rusage)
+                        )
+                if usage is not None:
+                    if output is None or output.closed:
+                        return usage
+                    continue
+                violation = limits.violation(activity)
+                if violation:
+                    # SIGTERM the whole group first, SIGKILL whatever survives.
+                    self.terminate(process)
+                    raise CommandTimeoutError(command, violation)
+        finally:
+            if output is not None and not output.closed:
+                output.close()
@@ -0,0 +1,56 @@
+"""HTTP client used by build agents to talk to the coordinator."""
+
+from __future__ import annotations
+
+import json
+import urllib.error
+import urllib.request
+from typing import Any, Dict, List, Optional
+
+AGENT_TOKEN_HEADER = "X-Agent-Token"
+
+
+class CoordinatorUnavailableError(RuntimeError):
+    """Raised when the coordinator cannot be reached or rejects a request."""
+
+
+class CoordinatorClient:
+    """Minimal JSON client for the coordinator's ``/agents`` API."""
+
+    def __init__(self, base_url: str, *, token: Optional[str] = None, request_timeout: float = 10.0) -> None:
+        self.base_url = base_url.rstrip("/")
+        self.token = token
+        self.request_timeout = request_timeout
+
+    def lease(self, agent_id: str, labels: List[str], wait_seconds: float) -> Optional[Dict[str, Any]]:
+        response = self._post(
+            "/agents/lease",
+            {"agent_id": agent_id, "labels": labels, "wait_seconds": wait_seconds},
+            timeout=wait_seconds + self.request_timeout,
+        )
+        return response.get("lease")
+
+    def send_events(self, build_id: str, agent_id: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+        return self._post(f"/agents/builds/{build_id}/events", {"agent_id": agent_id, **payload})
+
+    def complete(self, build_id: str, agent_id: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+        return self._post(f"/agents/builds/{build_id}/complete", {"agent_id": agent_id, **payload})
+
+    def _post(self, path: str, body: Dict[str, Any], *, timeout: Optional[float] = None) -> Dict[str, Any]:
+        headers = {"Content-Type": "application/json"}
+        if self.token:
+            headers[AGENT_TOKEN_HEADER] = self.token
+        request = urllib.request.Request(
+            f"{self.base_url}{path}",
+            data=json.dumps(body).encode("utf-8"),
+            headers=headers,
+            method="POST",
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=timeout or self.request_timeout) as response:
+                raw = response.read()
+        except (urllib.error.URLError, OSError) as exc:
+            raise CoordinatorUnavailableError(f"Coordinator request failed: POST {path}: {exc}") from exc
+        if not raw:
+            return {}
+        return json.loads(raw.decode("utf-8"))
@@ -0,0 +1,76 @@
+"""Content fingerprints used to decide whether a pipeline stage can be reused."""
+
+from __future__ import annotations
+
+import hashlib
+from pathlib import Path
+from typing import Dict, Iterable, Optional
+
+DEPENDENCY_INPUTS: Dict[str, tuple[str, ...]] = {
+    "pub": (
+        "pubspec.yaml",
+        "pubspec.lock",
+        "pubspec_overrides.yaml",
+        "melos.yaml",
+        ".fvmrc",
+        "packages/*/pubspec.yaml",
+        "packages/*/pubspec.lock",
+    ),
+    "android": (
+        "android/build.gradle",
+        "android/settings.gradle",
+        "android/app/build.gradle",
+        "android/gradle/wrapper/gradle-wrapper.properties",
+        "android/Gemfile",
+        "android/Gemfile.lock",
+    ),
+    "ios": (
+        "ios/Podfile",
+        "ios/Podfile.lock",
+        "ios/Gemfile",
+        "ios/Gemfile.lock",
+    ),
+}
+
+
+def fingerprint_files(root: Path, patterns: Iterable[str]) -> str:
+    """Hash the relative path and content of every file matching ``patterns`` under ``root``."""
+    digest = hashlib.sha256()
+    for pattern in patterns:
+        for path in sorted(root.glob(pattern)):
+            if not path.is_file():
+                continue
+            digest.update(str(path.relative_to(root)).encode("utf-8"))
+            digest.update(b"\0")
+            digest.update(path.read_bytes())
+            digest.update(b"\0")
+    return digest.hexdigest()[:16]
+
+
+def dependency_fingerprints(repo_dir: Path) -> Dict[str, str]:
+    """Fingerprint the manifest and lock files behind each dependency install step."""
+    return {name: fingerprint_files(repo_dir, patterns) for name, patterns in DEPENDENCY_INPUTS.items()}
+
+
+def read_head_commit(repo_dir: Path) -> Optional[str]:
+    """Resolve ``HEAD`` straight from ``.git`` without spawning git."""
+    git_dir = repo_dir / ".git"
+    head_file = git_dir / "HEAD"
+    if not head_file.is_file():
+        return None
+    head = head_file.read_text(encoding="utf-8").strip()
+    if not head.startswith("ref:"):
+        return head or None
+
+    ref = head.split(":", 1)[1].strip()
+    ref_file = git_dir / ref
+    if ref_file.is_file():
+        return ref_file.read_text(encoding="utf-8").strip() or None
+
+    packed_refs = git_dir / "packed-refs"
+    if packed_refs.is_file():
+        for line in packed_refs.read_text(encoding="utf-8").splitlines():
+            parts = line.split(" ", 1)
+            if len(parts) == 2 and parts[1].strip() == ref:
+                return parts[0].strip()
+    return None
@@ -0,0 +1,194 @@
+"""Inventory of installed FVM Flutter SDKs and the precache work shared between builds."""
+
+from __future__ import annotations
+
+import shutil
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from filelock import FileLock, Timeout
+
+from ..core.cancellation import OperationCanceledError
+from ..core.config import get_flutter_sdk_disk_budget_bytes, get_fvm_cache_dir, get_shared_cache_dir
+from .command_runner import CommandRunner, line_logger
+from .workspace_pool import _disk_usage
+from .workspace_state import STATE_DB_NAME, FlutterSdkState, WorkspaceStateStore
+
+# What `flutter precache --<platform>` leaves in the SDK once it has completed.
+PRECACHE_ARTIFACTS: Dict[str, Path] = {
+    "ios": Path("bin/cache/artifacts/engine/ios/Flutter.xcframework"),
+    "android": Path("bin/cache/artifacts/engine/android-arm64-release"),
+}
+PRECACHE_LOCK_POLL_SECONDS = 1.0
+# A build records its SDK before the slot does; this keeps a just-activated version from being evicted under it.
+EVICTION_GRACE_SECONDS = 3600.0
+
+
+class FlutterSdkManager:
+    """Track which FVM SDK versions are installed, how complete their precache is and when they were used.
+
+    Slots link ``.fvm/flutter_sdk`` to one shared SDK per version, so precache
+    runs once per version and platform: runs for the same SDK are serialized
+    with a lock file next to it, and a build that waited finds the artifacts in
+    place and skips its own run. With ``disk_budget_bytes`` the least recently
+    used versions no leased slot is on are removed.
+    """
+
+    def __init__(
+        self,
+        command_runner: CommandRunner,
+        *,
+        fvm_cache_dir: Optional[Path] = None,
+        disk_budget_bytes: Optional[int] = None,
+        state_store: Optional[WorkspaceStateStore] = None,
+    ) -> None:
+        self.command_runner = command_runner
+        self._fvm_cache_dir = fvm_cache_dir
+        self.disk_budget_bytes = get_flutter_sdk_disk_budget_bytes() if disk_budget_bytes is None else disk_budget_bytes
+        self.state_store = state_store or WorkspaceStateStore(lambda: get_shared_cache_dir() / STATE_DB_NAME)
+
+    @property
+    def versions_dir(self) -> Path:
+        return (self._fvm_cache_dir or get_fvm_cache_dir()) / "versions"
+
+    def sdk_dir(self, repo_path: Path) -> Path:
+        """The shared SDK a checkout's ``.fvm/flutter_sdk`` link points at."""
+        return (repo_path / ".fvm" / "flutter_sdk").resolve()
+
+    def artifact_path(self, repo_path: Path, platform: str) -> Path:
+        return repo_path / ".fvm" / "flutter_sdk" / PRECACHE_ARTIFACTS[platform]
+
+    def missing_platforms(self, repo_path: Path, platforms: Iterable[str]) -> List[str]:
+        return [platform for platform in platforms if not self.artifact_path(repo_path, platform).exists()]
+
+    def record_use(self, version: str, repo_path: Path) -> FlutterSdkState:
+        """Mark ``version`` as used now; measures its size the first time while a budget is set."""
+        sdk_dir = self.sdk_dir(repo_path)
+        state = self.state_store.sdk_states().get(version) or FlutterSdkState(version=version, path=str(sdk_dir))
+        state.path = str(sdk_dir)
+        state.last_used_at = time.time()
+        # Forget precache runs whose artifacts were removed since (e.g. a manual cache wipe).
+        state.precached = [platform for platform in state.precached if self.artifact_path(repo_path, platform).exists()]
+        if self.disk_budget_bytes > 0 and not state.disk_bytes and sdk_dir.is_dir():
+            state.disk_bytes = _disk_usage(sdk_dir)
+        self.state_store.record_sdk(state)
+        return state
+
+    def ensure_precached(
+        self,
+        build_id: str,
+        version: str,
+        platforms: Iterable[str],
+        *,
+        repo_path: Path,
+        env: Dict[str, str],
+        log,
+        reason: str = "",
+        should_cancel=None,
+    ) -> bool:
+        """Run ``fvm flutter precache`` for platforms the SDK has not completed; returns True when it ran.
+
+        A platform counts as complete once a precache run for it succeeded and
+        its artifact is still there. A missing artifact always triggers a run.
+        """
+        platforms = list(platforms)
+        sdk_dir = self.sdk_dir(repo_path)
+        with self._locked(sdk_dir, should_cancel):
+            state = self.state_store.sdk_states().get(version) or FlutterSdkState(version=version, path=str(sdk_dir))
+            missing = self.missing_platforms(repo_path, platforms)
+            needed = [platform for platform in platforms if platform in missing or platform not in state.precached]
+            if not needed:
+                log(f"[{build_id}] ⏭️ Flutter SDK {version} already precached for {', '.join(platforms)}")
+                return False
+            log(
+                f"[{build_id}] 🔄 Running required Flutter precache "
+                f"({version}, platforms={','.join(needed)}, reason={reason or 'not precached yet'})"
+            )
+            self.command_runner.run_checked(
+                ["fvm", "flutter", "precache", *(f"--{platform}" for platform in needed)],
+                env=env,
+                cwd=str(repo_path),
+                should_stop=should_cancel,
+                on_line=line_logger(log, f"[{build_id}][PRECACHE]"),
+            )
+            state.path = str(sdk_dir)
+            state.precached = sorted(set(state.precached) | set(needed))
+            state.last_used_at = time.time()
+            if self.disk_budget_bytes > 0 and sdk_dir.is_dir():
+                state.disk_bytes = _disk_usage(sdk_dir)
+            self.state_store.record_sdk(state)
+        return True
+
+    def inventory(self) -> Dict[str, FlutterSdkState]:
+        """Recorded SDKs plus versions found in the FVM cache that no build has used yet."""
+        states = self.state_store.sdk_states()
+        if self.versions_dir.is_dir():
+            for sdk_dir in self.versions_dir.iterdir():
+                if sdk_dir.is_dir() and sdk_dir.name not in states:
+                    states[sdk_dir.name] = FlutterSdkState(
+                        version=sdk_dir.name,
+                        path=str(sdk_dir),
+                        precached=[platform for platform, artifact in PRECACHE_ARTIFACTS.items() if (sdk_dir / artifact).exists()],
+                    )
+        return states
+
+    def evict_unused(self, build_id: str, keep: str, log) -> List[str]:
+        """Remove least recently used SDK versions until the rest fit in ``disk_budget_bytes``.
+
+        Versions of leased slots, ``keep`` and versions used within
+        ``EVICTION_GRACE_SECONDS`` stay. Only directories inside the FVM
+        versions cache are removed.
+        """
+        if self.disk_budget_bytes <= 0:
+            return []
+        states = self.inventory()
+        for state in states.values():
+            if not state.disk_bytes and Path(state.path).is_dir():
+                state.disk_bytes = _disk_usage(Path(state.path))
+                self.state_store.record_sdk(state)
+        total = sum(state.disk_bytes for state in states.values())
+        protected = self.state_store.leased_flutter_versions() | {keep}
+        recent = time.time() - EVICTION_GRACE_SECONDS
+        evicted: List[str] = []
+        for state in sorted(states.values(), key=lambda item: item.last_used_at):
+            if total <= self.disk_budget_bytes:
+                break
+            sdk_dir = Path(state.path)
+            if state.version in protected or state.last_used_at > recent or sdk_dir.parent != self.versions_dir.resolve():
+                continue
+            lock = FileLock(str(self._lock_path(sdk_dir)), timeout=0)
+            try:
+                lock.acquire()
+            except Timeout:
+                continue
+            try:
+                shutil.rmtree(sdk_dir, ignore_errors=True)
+            finally:
+                lock.release()
+            self.state_store.forget_sdk(state.version)
+            total -= state.disk_bytes
+            evicted.append(state.version)
+        if evicted:
+            log(f"[{build_id}] 🧹 Removed unused Flutter SDK version(s) {', '.join(evicted)} to stay within the SDK disk budget")
+        return evicted
+
+    def _lock_path(self, sdk_dir: Path) -> Path:
+        return sdk_dir.parent / f".{sdk_dir.name}.precache.lock"
+
+    @contextmanager
+    def _locked(self, sdk_dir: Path, should_cancel) -> Iterator[None]:
+        sdk_dir.parent.mkdir(parents=True, exist_ok=True)
+        lock = FileLock(str(self._lock_path(sdk_dir)))
+        while True:
+            try:
+                lock.acquire(timeout=PRECACHE_LOCK_POLL_SECONDS)
+                break
+            except Timeout:
+                if should_cancel and should_cancel():
+                    raise OperationCanceledError(f"Canceled while waiting for Flutter precache: {sdk_dir.name}")
+        try:
+            yield
+        finally:
+            lock.release()
@@ -0,0 +1,173 @@
+"""Branch-scoped git fetches that report how much they transferred."""
+
+from __future__ import annotations
+
+import re
+import time
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from ..core.config import get_git_fetch_depth, get_git_fetch_filter
+from .command_runner import CommandExecutionError, CommandRunner
+
+RECEIVED_BYTES = re.compile(r"Receiving objects:.*?,\s*([\d.]+)\s*(bytes|KiB|MiB|GiB)")
+BYTE_UNITS = {"bytes": 1, "KiB": 1024, "MiB": 1024 ** 2, "GiB": 1024 ** 3}
+MISSING_REF_MARKER = "couldn't find remote ref"
+
+
+@dataclass
+class GitFetchStrategy:
+    """How much history and which objects a fetch asks for (depth 0 means full history)."""
+
+    depth: int = 0
+    filter: Optional[str] = None
+
+    @classmethod
+    def from_config(cls) -> "GitFetchStrategy":
+        return cls(depth=get_git_fetch_depth(), filter=get_git_fetch_filter())
+
+    def options(self) -> List[str]:
+        options: List[str] = []
+        if self.depth > 0:
+            options += ["--depth", str(self.depth)]
+        if self.filter:
+            options.append(f"--filter={self.filter}")
+        return options
+
+
+@dataclass
+class GitFetchStats:
+    """Transfer size and duration of one fetch."""
+
+    source: str
+    ref: str
+    bytes: int
+    seconds: float
+
+    def describe(self) -> str:
+        size = self.bytes
+        for unit in ("bytes", "KiB", "MiB"):
+            if size < 1024:
+                break
+            size /= 1024
+        else:
+            unit = "GiB"
+        amount = f"{size:.0f}" if unit == "bytes" else f"{size:.1f}"
+        return f"{amount} {unit} in {self.seconds:.2f}s"
+
+    def to_dict(self) -> Dict[str, object]:
+        return asdict(self)
+
+
+def fetch_branch(
+    command_runner: CommandRunner,
+    *,
+    repo_path: Path,
+    remote: str,
+    branch_name: str,
+    destination: str,
+    strategy: GitFetchStrategy,
+    env: Dict[str, str],
+    should_cancel=None,
+) -> GitFetchStats:
+    """Fetch only ``refs/heads/<branch_name>`` from ``remote`` into ``destination``.
+
+    A branch missing on the remote is reported from the fetch itself, so no
+    separate ``ls-remote`` connection is needed.
+    """
+    try:
+        return _fetch(
+            command_runner,
+            repo_path=repo_path,
+            remote=remote,
+            ref=branch_name,
+            refspec=f"+refs/heads/{branch_name}:{destination}",
+            strategy=strategy,
+            env=env,
+            should_cancel=should_cancel,
+        )
+    except CommandExecutionError as exc:
+        if MISSING_REF_MARKER in exc.output:
+            raise ValueError(f"Branch '{branch_name}' does not exist in remote repository") from exc
+        raise
+
+
+def fetch_commit(
+    command_runner: CommandRunner,
+    *,
+    repo_path: Path,
+    remote: str,
+    commit_sha: str,
+    strategy: GitFetchStrategy,
+    env: Dict[str, str],
+    should_cancel=None,
+) -> GitFetchStats:
+    """Fetch one commit by SHA (for pinned commits that are no longer the branch tip)."""
+    try:
+        return _fetch(
+            command_runner,
+            repo_path=repo_path,
+            remote=remote,
+            ref=commit_sha,
+            refspec=commit_sha,
+            strategy=strategy,
+            env=env,
+            should_cancel=should_cancel,
+        )
+    except CommandExecutionError as exc:
+        raise ValueError(f"Commit {commit_sha} is not available in remote repository") from exc
+
+
+def has_commit(command_runner: CommandRunner, repo_path: Path, commit_sha: str, *, env: Dict[str, str]) -> bool:
+    result = command_runner.run(
+        ["git", "cat-file", "-e", f"{commit_sha}^{{commit}}"],
+        env=env,
+        cwd=str(repo_path),
+        check=False,
+    )
+    return result.returncode == 0
+
+
+def _fetch(
+    command_runner: CommandRunner,
+    *,
+    repo_path: Path,
+    remote: str,
+    ref: str,
+    refspec: str,
+    strategy: GitFetchStrategy,
+    env: Dict[str, str],
+    should_cancel=None,
+) -> GitFetchStats:
+    received: List[int] = []
+
+    def track(line: str) -> None:
+        # A line may still hold several "\r"-separated progress frames; the last one has the final size.
+        for amount, unit in RECEIVED_BYTES.findall(line):
+            received.append(int(float(amount) * BYTE_UNITS[unit]))
+
+    started = time.monotonic()
+    command_runner.run_checked(
+        [
+            "git",
+            # Keep every fetch as a pack: only index-pack reports the bytes it received.
+            "-c",
+            "fetch.unpackLimit=1",
+            "fetch",
+            "--progress",
+            *strategy.options(),
+            remote,
+            refspec,
+        ],
+        env=env,
+        cwd=str(repo_path),
+        should_stop=should_cancel,
+        on_line=track,
+    )
+    return GitFetchStats(
+        source=remote,
+        ref=ref,
+        bytes=received[-1] if received else 0,
+        seconds=round(time.monotonic() - started, 3),
+    )
@@ -0,0 +1,193 @@
+"""Shared bare mirrors that workspace slots borrow git objects from."""
+
+from __future__ import annotations
+
+import hashlib
+import shutil
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Dict, Iterator, Optional
+
+from filelock import FileLock, Timeout
+
+from ..core.cancellation import OperationCanceledError
+from ..core.config import get_shared_cache_dir
+from .command_runner import CommandRunner
+from .git_fetch import GitFetchStats, GitFetchStrategy, fetch_branch, fetch_commit, has_commit
+from .workspace_pool import _sanitize
+
+MIRROR_LOCK_POLL_SECONDS = 1.0
+FETCHED_MARKER_DIR = "ci-fetched-at"
+
+
+class GitMirrorCache:
+    """Keep one bare mirror per repository URL.
+
+    Only the mirror talks to the remote. Workspace slots list the mirror's
+    object store in ``objects/info/alternates`` (what ``git clone --reference``
+    sets up) and fetch from its local path, so syncing a slot is a ref update
+    and checkout instead of another download of the same objects.
+    """
+
+    def __init__(
+        self,
+        command_runner: CommandRunner,
+        root: Optional[Path] = None,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        self.command_runner = command_runner
+        self._root = root
+        self._clock = clock
+
+    @property
+    def root(self) -> Path:
+        return self._root or get_shared_cache_dir() / "mirrors"
+
+    def mirror_path(self, repo_url: str) -> Path:
+        repo_hash = hashlib.sha256(repo_url.encode("utf-8")).hexdigest()[:10]
+        return self.root / f"{_sanitize(Path(repo_url).stem or 'repo')}-{repo_hash}.git"
+
+    def update(
+        self,
+        repo_url: str,
+        branch_name: str,
+        *,
+        build_id: str,
+        env: Dict[str, str],
+        log,
+        should_cancel=None,
+    ) -> Optional[GitFetchStats]:
+        """Fetch ``branch_name`` into the mirror for ``repo_url``, creating it on first use.
+
+        Only that branch is fetched. Builds that queued on the mirror lock while
+        another build fetched the same branch reuse that fetch (and get ``None``).
+        """
+        requested_at = self._clock()
+        path = self.mirror_path(repo_url)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with self._locked(path, should_cancel):
+            if not (path / "HEAD").exists():
+                # Leftovers of an interrupted init would make git refuse the directory.
+                shutil.rmtree(path, ignore_errors=True)
+                log(f"[{build_id}] 🪞 Creating shared git mirror: {path.name}")
+                self.command_runner.run_checked(
+                    ["git", "init", "--bare", "-q", str(path)],
+                    env=env,
+                    cwd=str(path.parent),
+                    should_stop=should_cancel,
+                )
+                self.command_runner.run_checked(
+                    ["git", "remote", "add", "origin", repo_url],
+                    env=env,
+                    cwd=str(path),
+                    should_stop=should_cancel,
+                )
+                # Slots borrow objects through alternates; never prune ones a slot may still need.
+                self.command_runner.run_checked(
+                    ["git", "config", "gc.pruneExpire", "never"],
+                    env=env,
+                    cwd=str(path),
+                    should_stop=should_cancel,
+                )
+            elif self.fetched_at(path, branch_name) >= requested_at:
+                log(f"[{build_id}] ⏭️ Shared git mirror fetched {branch_name} while waiting; reusing it")
+                return None
+            else:
+                self.command_runner.run_checked(
+                    ["git", "remote", "set-url", "origin", repo_url],
+                    env=env,
+                    cwd=str(path),
+                    should_stop=should_cancel,
+                )
+            log(f"[{build_id}] 🔄 Fetching {branch_name} into shared git mirror: {path.name}")
+            # Full objects: slots read them straight from this store, so it cannot be partial or shallow.
+            stats = fetch_branch(
+                self.command_runner,
+                repo_path=path,
+                remote="origin",
+                branch_name=branch_name,
+                destination=f"refs/heads/{branch_name}",
+                strategy=GitFetchStrategy(),
+                env=env,
+                should_cancel=should_cancel,
+            )
+            marker = self._marker(path, branch_name)
+            marker.parent.mkdir(exist_ok=True)
+            marker.write_text(str(self._clock()), encoding="utf-8")
+        return stats
+
+    def ensure_commit(
+        self,
+        repo_url: str,
+        commit_sha: str,
+        *,
+        build_id: str,
+        env: Dict[str, str],
+        log,
+        should_cancel=None,
+    ) -> Optional[GitFetchStats]:
+        """Fetch ``commit_sha`` into the mirror unless it already has it (e.g. the branch moved on)."""
+        path = self.mirror_path(repo_url)
+        with self._locked(path, should_cancel):
+            if has_commit(self.command_runner, path, commit_sha, env=env):
+                return None
+            log(f"[{build_id}] 🔄 Fetching pinned commit {commit_sha[:12]} into shared git mirror")
+            return fetch_commit(
+                self.command_runner,
+                repo_path=path,
+                remote="origin",
+                commit_sha=commit_sha,
+                strategy=GitFetchStrategy(),
+                env=env,
+                should_cancel=should_cancel,
+            )
+
+    def contains(self, repo_url: str, branch_name: str, commit_sha: str, *, env: Dict[str, str]) -> bool:
+        """True when the mirror already tracks ``branch_name`` and has ``commit_sha`` (e.g. from a prefetch)."""
+        path = self.mirror_path(repo_url)
+        if not (path / "HEAD").exists():
+            return False
+        branch = self.command_runner.run(
+            ["git", "rev-parse", "--verify", "--quiet", f"refs/heads/{branch_name}"],
+            env=env,
+            cwd=str(path),
+            check=False,
+        )
+        return branch.returncode == 0 and has_commit(self.command_runner, path, commit_sha, env=env)
+
+    def fetched_at(self, path: Path, branch_name: str) -> float:
+        try:
+            return float(self._marker(path, branch_name).read_text(encoding="utf-8").strip())
+        except (OSError, ValueError):
+            return 0.0
+
+    def _marker(self, path: Path, branch_name: str) -> Path:
+        return path / FETCHED_MARKER_DIR / _sanitize(branch_name)
+
+    @staticmethod
+    def link_alternates(repo_path: Path, mirror_path: Path) -> bool:
+        """Make ``repo_path`` borrow objects from the mirror; returns True when the link was added."""
+        alternates = repo_path / ".git" / "objects" / "info" / "alternates"
+        target = str((mirror_path / "objects").resolve())
+        existing = alternates.read_text(encoding="utf-8").splitlines() if alternates.exists() else []
+        if target in existing:
+            return False
+        alternates.parent.mkdir(parents=True, exist_ok=True)
+        alternates.write_text("".join(f"{line}\n" for line in [*existing, target]), encoding="utf-8")
+        return True
+
+    @contextmanager
+    def _locked(self, path: Path, should_cancel) -> Iterator[None]:
+        lock = FileLock(f"{path}.lock")
+        while True:
+            try:
+                lock.acquire(timeout=MIRROR_LOCK_POLL_SECONDS)
+                break
+            except Timeout:
+                if should_cancel and should_cancel():
+                    raise OperationCanceledError(f"Canceled while waiting for git mirror: {path.name}")
+        try:
+            yield
+        finally:
+            lock.release()
@@ -0,0 +1,136 @@
+"""Background fetches that keep the shared git mirror close to the remote between builds."""
+
+from __future__ import annotations
+
+import logging
+import os
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+from ..core.config import (
+    get_mirror_prefetch_branches,
+    get_mirror_prefetch_concurrency,
+    get_mirror_prefetch_interval,
+    setup_git_credentials,
+)
+from .git_mirror import GitMirrorCache
+
+logger = logging.getLogger(__name__)
+
+PREFETCH_BUILD_ID = "mirror-prefetch"
+DEFAULT_JITTER = 0.2
+
+
+class GitMirrorPrefetcher:
+    """Periodically fetch tracked branches into the shared mirror.
+
+    Each round waits ``interval`` seconds give or take ``jitter`` (a fraction)
+    so servers sharing a remote do not fetch in lockstep. At most
+    ``concurrency`` fetches run at once and a branch already queued is not
+    queued again. Builds that were waiting on the mirror lock reuse a fetch
+    that finished meanwhile (see ``GitMirrorCache.update``).
+    """
+
+    def __init__(
+        self,
+        git_mirrors: GitMirrorCache,
+        repo_url: str,
+        branches: List[str],
+        *,
+        interval: float,
+        concurrency: int = 2,
+        jitter: float = DEFAULT_JITTER,
+        rng: Callable[[], float] = random.random,
+    ) -> None:
+        self.git_mirrors = git_mirrors
+        self.repo_url = repo_url
+        self.branches = list(branches)
+        self.interval = interval
+        self.jitter = jitter
+        self._rng = rng
+        self._executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix=PREFETCH_BUILD_ID)
+        self._queued: set[str] = set()
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._env: Optional[Dict[str, str]] = None
+
+    @classmethod
+    def from_config(cls, git_mirrors: Optional[GitMirrorCache]) -> Optional["GitMirrorPrefetcher"]:
+        """Prefetcher for ``REPO_URL``, or None when mirrors or prefetching are disabled."""
+        repo_url = os.environ.get("REPO_URL", "")
+        interval = get_mirror_prefetch_interval()
+        if git_mirrors is None or not repo_url or interval <= 0:
+            return None
+        return cls(
+            git_mirrors,
+            repo_url,
+            get_mirror_prefetch_branches(),
+            interval=interval,
+            concurrency=get_mirror_prefetch_concurrency(),
+        )
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name=PREFETCH_BUILD_ID, daemon=True)
+        self._thread.start()
+        logger.info(f"🪞 Mirror prefetch started for {', '.join(self.branches)} (every ~{self.interval:.0f}s)")
+
+    def stop(self) -> None:
+        self._stopped.set()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def on_push(self, branch_name: str) -> bool:
+        """Fetch a pushed branch right away when it is tracked."""
+        return branch_name in self.branches and self.request(branch_name)
+
+    def request(self, branch_name: str) -> bool:
+        """Queue a fetch of ``branch_name``; False when it is already queued or the prefetcher stopped."""
+        with self._lock:
+            if branch_name in self._queued or self._stopped.is_set():
+                return False
+            self._queued.add(branch_name)
+        self._executor.submit(self._fetch, branch_name)
+        return True
+
+    def next_delay(self) -> float:
+        return self.interval * (1 + self.jitter * (2 * self._rng() - 1))
+
+    def _run(self) -> None:
+        # A short random delay first, so a restart warms the mirror without every server fetching at once.
+        delay = self.interval * self.jitter * self._rng()
+        while not self._stopped.wait(delay):
+            for branch_name in self.branches:
+                self.request(branch_name)
+            delay = self.next_delay()
+
+    def _fetch(self, branch_name: str) -> None:
+        try:
+            stats = self.git_mirrors.update(
+                self.repo_url,
+                branch_name,
+                build_id=PREFETCH_BUILD_ID,
+                env=self._git_env(),
+                log=logger.info,
+                should_cancel=self._stopped.is_set,
+            )
+            if stats is not None:
+                logger.info(f"[{PREFETCH_BUILD_ID}] 🪞 {branch_name}: {stats.describe()}")
+        except Exception as exc:
+            logger.warning(f"[{PREFETCH_BUILD_ID}] ⚠️ Prefetching {branch_name} failed: {exc}")
+        finally:
+            with self._lock:
+                self._queued.discard(branch_name)
+
+    def _git_env(self) -> Dict[str, str]:
+        with self._lock:
+            if self._env is None:
+                env = dict(os.environ)
+                workspace = self.git_mirrors.root / f".{PREFETCH_BUILD_ID}"
+                workspace.mkdir(parents=True, exist_ok=True)
+                setup_git_credentials(workspace, env, self.repo_url)
+                self._env = env
+            return self._env
@@ -35,5 +35,14 @@ class BuildLogger:
             except OSError as exc:
                 logger.error("Failed to write build log %s: %s", self.log_file_path, exc)
 
+    def log_many(self, messages: list[str]) -> None:
+        with self._lock:
+            try:
+                with open(self.log_file_path, "a", encoding="utf-8") as file:
+                    file.write("".join(f"{message}\n" for message in messages))
+                    file.flush()
+            except OSError as exc:
+                logger.error("Failed to write build log %s: %s", self.log_file_path, exc)
+
     def get_log_path(self) -> str:
         return str(self.log_file_path)
@@ -0,0 +1,155 @@
+"""Bounded hand-off between a process output reader and a slower log consumer."""
+
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import Executor, ThreadPoolExecutor
+from dataclasses import asdict, dataclass
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple, Union
+
+logger = logging.getLogger(__name__)
+
+OUTPUT_QUEUE_CAPACITY = 10_000
+OUTPUT_BATCH_LINES = 500
+OUTPUT_DELIVERY_WORKERS = 4
+
+# Every pipeline is drained here, so consumer threads stay fixed however many builds are running.
+_delivery_pool = ThreadPoolExecutor(max_workers=OUTPUT_DELIVERY_WORKERS, thread_name_prefix="output-delivery")
+
+
+@dataclass
+class OutputPipelineStats:
+    """Counters describing how well the consumer keeps up with the reader."""
+
+    depth: int = 0
+    max_depth: int = 0
+    lines: int = 0
+    batches: int = 0
+    coalesced: int = 0
+    dropped: int = 0
+
+    def to_dict(self) -> Dict[str, int]:
+        return asdict(self)
+
+
+class _DroppedLines:
+    """Placeholder queued where lines were dropped, so the notice keeps its position."""
+
+    def __init__(self) -> None:
+        self.count = 1
+
+
+class OutputPipeline:
+    """Queue output lines without ever blocking the reader and deliver them in batches.
+
+    The reader only appends to a bounded deque, so a slow consumer can no
+    longer fill the pipe and stall the build process. A line whose
+    ``coalesce_key`` matches the newest queued line replaces it (e.g. progress
+    updates); when the queue is full new lines are dropped and the consumer
+    gets one notice with the count at the point where they were lost.
+
+    Pipelines have no thread of their own: a drain task on a shared bounded
+    pool delivers one batch at a time, and at most one such task per pipeline
+    is in flight, so lines reach the consumer in order.
+
+    With ``timed`` the consumer gets ``(arrival time, line)`` pairs, stamped
+    in :meth:`put`, so a consumer that falls behind still records when each
+    line was printed.
+    """
+
+    def __init__(
+        self,
+        consumer: Callable[[List[Any]], None],
+        *,
+        name: str = "output",
+        capacity: int = OUTPUT_QUEUE_CAPACITY,
+        batch_lines: int = OUTPUT_BATCH_LINES,
+        coalesce_key: Optional[Callable[[str], Optional[str]]] = None,
+        dropped_notice: Callable[[int], str] = lambda count: f"⚠️ {count} output line(s) dropped because logging fell behind",
+        executor: Optional[Executor] = None,
+        timed: bool = False,
+    ) -> None:
+        self.name = name
+        self.consumer = consumer
+        self.capacity = capacity
+        self.batch_lines = batch_lines
+        self.coalesce_key = coalesce_key
+        self.dropped_notice = dropped_notice
+        self.timed = timed
+        self.stats = OutputPipelineStats()
+        self._queue: Deque[Tuple[float, Union[str, _DroppedLines]]] = deque()
+        self._tail_key: Optional[str] = None
+        self._draining = False
+        self._condition = threading.Condition()
+        self._executor = executor or _delivery_pool
+
+    def put(self, line: str) -> None:
+        """Called by the reader; never blocks on the consumer."""
+        received_at = time.time()
+        with self._condition:
+            self._enqueue(received_at, line)
+            schedule = not self._draining
+            self._draining = True
+        if schedule:
+            self._executor.submit(self._drain)
+
+    def close(self, timeout: Optional[float] = None) -> OutputPipelineStats:
+        """Wait until everything queued so far has been delivered.
+
+        A reader that outlives close() still gets its lines delivered.
+        """
+        with self._condition:
+            self._condition.wait_for(lambda: not self._draining, timeout)
+        return self.stats
+
+    def _enqueue(self, received_at: float, line: str) -> None:
+        key = self.coalesce_key(line) if self.coalesce_key else None
+        if key is not None and self._queue and key == self._tail_key:
+            self._queue[-1] = (received_at, line)
+            self.stats.coalesced += 1
+            return
+        if len(self._queue) >= self.capacity:
+            self.stats.dropped += 1
+            if isinstance(self._queue[-1][1], _DroppedLines):
+                self._queue[-1][1].count += 1
+            else:
+                # Stamped with the first dropped line.
+                self._queue.append((received_at, _DroppedLines()))
+            self._tail_key = None
+            return
+        self._queue.append((received_at, line))
+        self._tail_key = key
+        self.stats.depth = len(self._queue)
+        self.stats.max_depth = max(self.stats.max_depth, self.stats.depth)
+
+    def _drain(self) -> None:
+        with self._condition:
+            items = [self._queue.popleft() for _ in range(min(self.batch_lines, len(self._queue)))]
+            if not self._queue:
+                self._tail_key = None
+            self.stats.depth = len(self._queue)
+        if items:
+            lines = [
+                (received_at, self.dropped_notice(item.count) if isinstance(item, _DroppedLines) else item)
+                for received_at, item in items
+            ]
+            self._deliver(lines if self.timed else [line for _, line in lines])
+        with self._condition:
+            if not self._queue:
+                self._draining = False
+                self._condition.notify_all()
+                return
+        # One batch per task, so a busy pipeline takes turns with the others on the pool.
+        self._executor.submit(self._drain)
+
+    def _deliver(self, batch: List[Any]) -> None:
+        try:
+            self.consumer(batch)
+        except Exception:
+            logger.exception("Output consumer for %s failed for %s line(s)", self.name, len(batch))
+        with self._condition:
+            self.stats.lines += len(batch)
+            self.stats.batches += 1
@@ -10,15 +10,20 @@ from pathlib import Path
 from typing import Dict
 
 from ..core import BuildRuntimeContext
-from .command_runner import CommandRunner
+from ..core.config import get_ruby_gem_helper_enabled
+from .command_runner import CommandRunner, line_logger
+from .flutter_sdk import FlutterSdkManager
+from .probe_cache import ProbeCache
+from .ruby_helper import RubyHelperPool
 from .ruby_toolchain import RubyToolchainPreparer
 
 
 class ShorebirdCacheValidator:
     """Validate Shorebird cached artifacts before patch builds."""
 
-    def __init__(self, command_runner: CommandRunner) -> None:
+    def __init__(self, command_runner: CommandRunner, probe_cache: ProbeCache | None = None) -> None:
         self.command_runner = command_runner
+        self.probes = probe_cache or ProbeCache(command_runner)
 
     def prepare_if_needed(self, build_id: str, context: BuildRuntimeContext, cwd: Path, log, should_cancel=None) -> None:
         if not context.is_shorebird_patch():
@@ -54,6 +59,7 @@ class ShorebirdCacheValidator:
             cwd=str(cwd),
             should_stop=should_cancel,
         )
+        self.probes.invalidate(["file", str(patch_binary)])
 
     def _detect_binary_architecture(
         self,
@@ -62,11 +68,11 @@ class ShorebirdCacheValidator:
         cwd: Path,
         should_cancel=None,
     ) -> str | None:
-        result = self.command_runner.run(
+        result = self.probes.run(
             ["file", str(binary_path)],
             env=env,
             cwd=str(cwd),
-            check=False,
+            watch=[binary_path],
             should_stop=should_cancel,
         )
         output = result.stdout.lower()
@@ -315,11 +321,21 @@ class PlatformToolchainPreparer:
         ruby_toolchain: RubyToolchainPreparer | None = None,
         shorebird_validator: ShorebirdCacheValidator | None = None,
         ios_keychain: IOSKeychainPreparer | None = None,
+        flutter_sdks: FlutterSdkManager | None = None,
     ) -> None:
         self.command_runner = command_runner
-        self.ruby_toolchain = ruby_toolchain or RubyToolchainPreparer(command_runner)
-        self.shorebird_validator = shorebird_validator or ShorebirdCacheValidator(command_runner)
+        # One cache for every probe so answers are shared across builds and platforms.
+        self.probe_cache = ProbeCache(command_runner)
+        self.gem_helpers = RubyHelperPool() if get_ruby_gem_helper_enabled() else None
+        self.ruby_toolchain = ruby_toolchain or RubyToolchainPreparer(command_runner, self.probe_cache, self.gem_helpers)
+        self.shorebird_validator = shorebird_validator or ShorebirdCacheValidator(command_runner, self.probe_cache)
         self.ios_keychain = ios_keychain or IOSKeychainPreparer(command_runner)
+        self.flutter_sdks = flutter_sdks or FlutterSdkManager(command_runner)
+
+    def close(self) -> None:
+        """Stop the long-lived Ruby gem helpers."""
+        if self.gem_helpers is not None:
+            self.gem_helpers.close_all()
 
     def prepare(
         self,
@@ -400,13 +416,18 @@ class PlatformToolchainPreparer:
                 self.ruby_toolchain.install_fastlane_plugins(ios_dir, context.env, build_id, log, should_cancel=should_cancel)
             return
 
-        self.ruby_toolchain.ensure_gem(
-            "cocoapods", context.env.get("COCOAPODS_VERSION"), ios_dir, context.env, build_id, log, should_cancel=should_cancel
-        )
-        self.ruby_toolchain.ensure_gem(
-            "fastlane", context.env.get("FASTLANE_VERSION"), ios_dir, context.env, build_id, log, should_cancel=should_cancel
+        self.ruby_toolchain.ensure_gems(
+            [
+                ("cocoapods", context.env.get("COCOAPODS_VERSION")),
+                ("fastlane", context.env.get("FASTLANE_VERSION")),
+                *((plugin_name, None) for plugin_name in self.ruby_toolchain.fastlane_plugins(ios_dir)),
+            ],
+            ios_dir,
+            context.env,
+            build_id,
+            log,
+            should_cancel=should_cancel,
         )
-        self.ruby_toolchain.install_fastlane_plugins(ios_dir, context.env, build_id, log, should_cancel=should_cancel)
 
     def _validate_ios_runtime_requirements(self, build_id: str, context: BuildRuntimeContext, log) -> None:
         strategy = self.ios_keychain._strategy(context)
@@ -518,18 +539,23 @@ class PlatformToolchainPreparer:
         should_cancel=None,
     ) -> None:
         project_root = ios_dir.parent
-        artifact_path = project_root / ".fvm" / "flutter_sdk" / "bin" / "cache" / "artifacts" / "engine" / "ios" / "Flutter.xcframework"
-        if artifact_path.exists():
+        if not self.flutter_sdks.missing_platforms(project_root, ["ios"]):
             return
 
-        log(f"[{build_id}] 📦 Flutter iOS engine artifact missing; running fvm flutter precache --ios")
-        self.command_runner.run_checked(
-            ["fvm", "flutter", "precache", "--ios"],
+        log(f"[{build_id}] 📦 Flutter iOS engine artifact missing")
+        # Waits for a precache of the same SDK another build may be running, then skips if it completed.
+        version = context.env.get("FLUTTER_SDK_VERSION") or self.flutter_sdks.sdk_dir(project_root).name
+        if self.flutter_sdks.ensure_precached(
+            build_id,
+            version,
+            ["ios"],
+            repo_path=project_root,
             env=context.env,
-            cwd=str(project_root),
-            should_stop=should_cancel,
-        )
-        context.env["IOS_FLUTTER_SDK_CHANGED"] = "true"
+            log=log,
+            reason="missing_ios_engine_artifact",
+            should_cancel=should_cancel,
+        ):
+            context.env["IOS_FLUTTER_SDK_CHANGED"] = "true"
 
     def _plan_ios_pod_install(self, build_id: str, context: BuildRuntimeContext, ios_dir: Path, log) -> None:
         requested_policy = (context.env.get("IOS_RUN_POD_INSTALL") or "auto").strip()
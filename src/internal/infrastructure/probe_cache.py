@@ -0,0 +1,104 @@
+"""Memoization of read-only toolchain probe commands."""
+
+from __future__ import annotations
+
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from ..core.config import get_probe_cache_ttl
+from .command_runner import CommandRunner, CompletedCommand
+
+# Environment that decides which ruby/gem binaries a probe talks to.
+RUBY_PROBE_ENV = ("PATH", "RBENV_VERSION", "GEM_HOME", "GEM_PATH")
+
+ProbeKey = Tuple[Tuple[str, ...], str, Tuple[Tuple[str, Optional[str]], ...]]
+
+
+@dataclass(frozen=True)
+class _ProbeEntry:
+    result: CompletedCommand
+    watched: Tuple[Tuple[str, Optional[int]], ...]
+    expires_at: float
+
+
+def _watch_state(paths: Iterable[Path]) -> Tuple[Tuple[str, Optional[int]], ...]:
+    state = []
+    for path in paths:
+        try:
+            mtime = path.stat().st_mtime_ns
+        except OSError:
+            mtime = None
+        state.append((str(path), mtime))
+    return tuple(state)
+
+
+def gem_watch_paths(env: Dict[str, str]) -> List[Path]:
+    """Directories whose mtime changes whenever a gem is installed into the active GEM_HOME."""
+    gem_home = env.get("GEM_HOME")
+    if not gem_home:
+        return []
+    root = Path(gem_home).expanduser()
+    return [root, root / "specifications"]
+
+
+class ProbeCache:
+    """Reuse the result of pure probe commands (``gem list -i``, ``file``, ...) for a TTL.
+
+    A result is keyed by the command, its working directory and the declared
+    environment variables, and is dropped early when a watched path's mtime
+    changes or when :meth:`invalidate` is called after an install.
+    """
+
+    def __init__(
+        self,
+        command_runner: CommandRunner,
+        ttl: Optional[float] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.command_runner = command_runner
+        self.ttl = get_probe_cache_ttl() if ttl is None else ttl
+        self._clock = clock
+        self._entries: Dict[ProbeKey, _ProbeEntry] = {}
+        self._lock = threading.Lock()
+
+    def run(
+        self,
+        command: List[str],
+        *,
+        env: Dict[str, str],
+        cwd: str,
+        env_keys: Sequence[str] = (),
+        watch: Iterable[Path] = (),
+        should_stop: Optional[Callable[[], bool]] = None,
+    ) -> CompletedCommand:
+        """Run ``command`` unchecked, or return its cached result if nothing it depends on changed."""
+        if self.ttl <= 0:
+            return self.command_runner.run(command, env=env, cwd=cwd, check=False, should_stop=should_stop)
+
+        watch = list(watch)
+        key: ProbeKey = (tuple(command), cwd, tuple((name, env.get(name)) for name in sorted(env_keys)))
+        watched = _watch_state(watch)
+        now = self._clock()
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is not None and entry.expires_at > now and entry.watched == watched:
+            return entry.result
+
+        result = self.command_runner.run(command, env=env, cwd=cwd, check=False, should_stop=should_stop)
+        # Re-read the watched paths so a change made while probing is not masked.
+        entry = _ProbeEntry(result=result, watched=_watch_state(watch), expires_at=self._clock() + self.ttl)
+        with self._lock:
+            self._entries[key] = entry
+        return result
+
+    def invalidate(self, command_prefix: Sequence[str] = ()) -> int:
+        """Drop cached results whose command starts with ``command_prefix`` (all when empty)."""
+        prefix = tuple(command_prefix)
+        with self._lock:
+            stale = [key for key in self._entries if key[0][: len(prefix)] == prefix]
+            for key in stale:
+                del self._entries[key]
+        return len(stale)
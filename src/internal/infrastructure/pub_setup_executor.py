@@ -8,7 +8,7 @@ from pathlib import Path
 from typing import Dict
 
 from ..core import BuildRuntimeContext
-from .command_runner import CommandRunner
+from .command_runner import CommandRunner, line_logger
 
 
 class PubSetupExecutor:
@@ -79,15 +79,13 @@ class PubSetupExecutor:
         should_cancel=None,
     ) -> None:
         log(f"[{build_id}] 🔧 Activating {package_name}")
-        result = self.command_runner.run_checked(
+        self.command_runner.run_checked(
             ["fvm", "dart", "pub", "global", "activate", package_name],
             env=env,
             cwd=str(repo_path),
             should_stop=should_cancel,
+            on_line=line_logger(log, f"[{build_id}][SETUP]"),
         )
-        for line in result.stdout.splitlines():
-            if line.strip():
-                log(f"[{build_id}][SETUP] {line.strip()}")
 
     def _run_pub_get(
         self,
@@ -119,10 +117,8 @@ class PubSetupExecutor:
                 cwd=str(repo_path),
                 check=False,
                 should_stop=should_cancel,
+                on_line=line_logger(log, f"[{build_id}][SETUP]"),
             )
-            for line in result.stdout.splitlines():
-                if line.strip():
-                    log(f"[{build_id}][SETUP] {line.strip()}")
             if result.returncode == 0:
                 log(f"[{build_id}] ✅ Dependency resolution succeeded with {' '.join(command)}")
                 return
@@ -130,15 +126,13 @@ class PubSetupExecutor:
         log(f"[{build_id}] ⚠️ Dependency resolution failed, repairing pub cache and retrying")
         self._log_git_dependency_access(repo_path, env, build_id, git_urls, log, should_cancel=should_cancel)
         self._reset_git_cache(pub_cache, build_id, log)
-        repair = self.command_runner.run_checked(
+        self.command_runner.run_checked(
             ["fvm", "flutter", "pub", "cache", "repair"],
             env=env,
             cwd=str(repo_path),
             should_stop=should_cancel,
+            on_line=line_logger(log, f"[{build_id}][SETUP]"),
         )
-        for line in repair.stdout.splitlines():
-            if line.strip():
-                log(f"[{build_id}][SETUP] {line.strip()}")
 
         retry_commands = []
         if has_melos:
@@ -151,10 +145,8 @@ class PubSetupExecutor:
                 cwd=str(repo_path),
                 check=False,
                 should_stop=should_cancel,
+                on_line=line_logger(log, f"[{build_id}][SETUP]"),
             )
-            for line in result.stdout.splitlines():
-                if line.strip():
-                    log(f"[{build_id}][SETUP] {line.strip()}")
             if result.returncode == 0:
                 log(f"[{build_id}] ✅ Dependency resolution recovered with {' '.join(command)}")
                 return
@@ -2,15 +2,23 @@
 
 from __future__ import annotations
 
-import hashlib
 import json
 import os
+from fnmatch import fnmatch
 from pathlib import Path
-from typing import Dict, Optional
+from typing import Dict, List, Optional
 
-from ..core.config import get_shared_cache_dir
-from .command_runner import CommandExecutionError, CommandRunner
-from .workspace_pool import WorkspacePoolManager, WorkspaceSlotLease
+from ..core.config import get_git_mirror_enabled, get_shared_cache_dir
+from .command_runner import CommandExecutionError, CommandRunner, line_logger
+from .fingerprints import DEPENDENCY_INPUTS, dependency_fingerprints, read_head_commit
+from .git_fetch import GitFetchStats, GitFetchStrategy, fetch_branch, fetch_commit, has_commit
+from .flutter_sdk import FlutterSdkManager
+from .git_mirror import GitMirrorCache
+from .workspace_clean import WorkspaceCleanPolicy
+from .workspace_pool import SlotWarmth, WorkspacePoolManager, WorkspaceSlotLease, WorkspaceSlotState
+
+# Files prepare() edits itself; they must not make a slot look dirty.
+SELF_MODIFIED_PATHS = ("melos.yaml",)
 
 
 class PreparedRepositoryResult:
@@ -23,12 +31,18 @@ class PreparedRepositoryResult:
         repo_dir: str,
         workspace_lease: WorkspaceSlotLease | None,
         flutter_version_changed: bool = False,
+        commit_sha: Optional[str] = None,
+        sync_skipped: bool = False,
+        fetches: Optional[List[GitFetchStats]] = None,
     ) -> None:
         self.flutter_version = flutter_version
         self.precache_ran = precache_ran
         self.repo_dir = repo_dir
         self.workspace_lease = workspace_lease
         self.flutter_version_changed = flutter_version_changed
+        self.commit_sha = commit_sha
+        self.sync_skipped = sync_skipped
+        self.fetches = fetches or []
 
 
 class RepositoryWorkspaceManager:
@@ -38,9 +52,17 @@ class RepositoryWorkspaceManager:
         self,
         command_runner: CommandRunner,
         workspace_pool: WorkspacePoolManager | None = None,
+        git_mirrors: GitMirrorCache | None = None,
+        clean_policy: WorkspaceCleanPolicy | None = None,
+        flutter_sdks: FlutterSdkManager | None = None,
     ) -> None:
         self.command_runner = command_runner
-        self.workspace_pool = workspace_pool or WorkspacePoolManager()
+        self.workspace_pool = workspace_pool or WorkspacePoolManager(command_runner=self.command_runner)
+        self.flutter_sdks = flutter_sdks or FlutterSdkManager(command_runner, state_store=self.workspace_pool.state_store)
+        if git_mirrors is None and get_git_mirror_enabled():
+            git_mirrors = GitMirrorCache(command_runner)
+        self.git_mirrors = git_mirrors
+        self.clean_policy = clean_policy or WorkspaceCleanPolicy.from_config()
 
     def prepare(
         self,
@@ -54,8 +76,12 @@ class RepositoryWorkspaceManager:
         platform: str,
         log,
         should_cancel=None,
+        preferred_slot_id: Optional[str] = None,
+        reuse_commit: Optional[str] = None,
+        target_commit: Optional[str] = None,
     ) -> PreparedRepositoryResult:
-        seeded_version = requested_flutter_version or self._read_previous_flutter_version(repo_url, branch_name)
+        previous_version = self._read_previous_flutter_version(repo_url, branch_name)
+        seeded_version = requested_flutter_version or previous_version
         workspace_lease = self.workspace_pool.acquire(
             build_id=build_id,
             repo_url=repo_url,
@@ -63,32 +89,62 @@ class RepositoryWorkspaceManager:
             flutter_version=seeded_version,
             platform=platform,
             cocoapods_version=env.get("COCOAPODS_VERSION"),
+            preferred_slot_id=preferred_slot_id,
+            warmth=self._slot_warmth(repo_url, branch_name, target_commit, env),
             log=log,
+            should_cancel=should_cancel,
         )
         repo_path = workspace_lease.repo_dir
+        # Slot state to store if prepare fails after the checkout moved.
+        checkout: Optional[Dict[str, object]] = None
 
         try:
-            self._sync_repository(
-                build_id=build_id,
-                repo_url=repo_url,
-                branch_name=branch_name,
-                repo_path=repo_path,
-                env=env,
-                log=log,
-                should_cancel=should_cancel,
-            )
+            head_commit = read_head_commit(repo_path)
+            sync_skipped = reuse_commit is not None and head_commit == reuse_commit
+            fetches: List[GitFetchStats] = []
+            if sync_skipped:
+                # Keep the checkout (and its build outputs) exactly as the checkpoint left it.
+                log(f"[{build_id}] ⏭️ Reusing checkout at {reuse_commit[:12]}; skipping repository sync")
+            else:
+                if head_commit is not None:
+                    target_commit = target_commit or self._lookup_branch_commit(repo_url, branch_name, env, should_cancel)
+                    sync_skipped = head_commit == target_commit and self._is_worktree_clean(repo_path, env, should_cancel)
+                if sync_skipped:
+                    # Build outputs stay; only tracked sources have to match the target commit.
+                    log(f"[{build_id}] ⏭️ Slot already at {target_commit[:12]} with a clean tree; skipping repository sync")
+                else:
+                    fetches = self._sync_repository(
+                        build_id=build_id,
+                        repo_url=repo_url,
+                        branch_name=branch_name,
+                        repo_path=repo_path,
+                        env=env,
+                        log=log,
+                        should_cancel=should_cancel,
+                        target_commit=target_commit,
+                        flutter_version=requested_flutter_version,
+                    ) or []
+            commit_sha = read_head_commit(repo_path)
 
             resolved_version = self._resolve_flutter_version(repo_path, requested_flutter_version)
+            checkout = {
+                "commit_sha": commit_sha,
+                "flutter_version": resolved_version,
+                "fingerprints": dependency_fingerprints(repo_path),
+            }
             if not resolved_version:
+                workspace_lease.record_state(**checkout)
                 log(f"[{build_id}] ⚠️ Flutter SDK version could not be resolved from request or repository")
                 return PreparedRepositoryResult(
                     flutter_version=None,
                     precache_ran=False,
                     repo_dir=str(repo_path),
                     workspace_lease=workspace_lease,
+                    commit_sha=commit_sha,
+                    sync_skipped=sync_skipped,
+                    fetches=fetches,
                 )
 
-            previous_version = self._read_previous_flutter_version(repo_url, branch_name)
             version_changed = previous_version is not None and previous_version != resolved_version
 
             log(f"[{build_id}] 🔧 Effective Flutter SDK version: {resolved_version}")
@@ -97,6 +153,7 @@ class RepositoryWorkspaceManager:
 
             self._ensure_melos_sdk_path(build_id, repo_path, log)
             self._run_fvm_use(build_id, repo_path, env, resolved_version, log, should_cancel=should_cancel)
+            self.flutter_sdks.record_use(resolved_version, repo_path)
 
             precache_ran = False
             should_precache_ios = platform in {"all", "ios"}
@@ -106,7 +163,7 @@ class RepositoryWorkspaceManager:
                 log,
             )
             if should_precache_ios and (version_changed or missing_ios_engine_artifacts):
-                self._run_flutter_precache(
+                precache_ran = self._run_flutter_precache(
                     build_id,
                     repo_path,
                     env,
@@ -120,17 +177,22 @@ class RepositoryWorkspaceManager:
                     ),
                     should_cancel=should_cancel,
                 )
-                precache_ran = True
+            self.flutter_sdks.evict_unused(build_id, resolved_version, log)
 
-            self._write_previous_flutter_version(repo_url, branch_name, resolved_version)
+            workspace_lease.record_state(**checkout, repo_url=repo_url, branch_name=branch_name)
             return PreparedRepositoryResult(
                 flutter_version=resolved_version,
                 precache_ran=precache_ran,
                 repo_dir=str(repo_path),
                 workspace_lease=workspace_lease,
                 flutter_version_changed=version_changed,
+                commit_sha=commit_sha,
+                sync_skipped=sync_skipped,
+                fetches=fetches,
             )
         except Exception:
+            if checkout is not None:
+                workspace_lease.record_state(**checkout)
             workspace_lease.release()
             raise
 
@@ -144,77 +206,275 @@ class RepositoryWorkspaceManager:
         env: Dict[str, str],
         log,
         should_cancel=None,
-    ) -> None:
-        fresh_clone = not (repo_path / ".git").exists()
-        if fresh_clone:
-            log(f"[{build_id}] 📦 Cloning repository into isolated workspace")
+        target_commit: Optional[str] = None,
+        flutter_version: Optional[str] = None,
+    ) -> List[GitFetchStats]:
+        if self.git_mirrors is not None:
+            return self._sync_from_mirror(
+                build_id=build_id,
+                repo_url=repo_url,
+                branch_name=branch_name,
+                repo_path=repo_path,
+                env=env,
+                log=log,
+                should_cancel=should_cancel,
+                target_commit=target_commit,
+                flutter_version=flutter_version,
+            )
+
+        if not (repo_path / ".git").exists():
+            log(f"[{build_id}] 📦 Initializing repository in isolated workspace")
             self.command_runner.run_checked(
-                ["git", "clone", "--depth", "1", "--single-branch", "--branch", branch_name, repo_url, str(repo_path)],
+                ["git", "init", "-q", str(repo_path)],
                 env=env,
                 cwd=str(repo_path.parent),
                 should_stop=should_cancel,
             )
-            return
+            self.command_runner.run_checked(
+                ["git", "remote", "add", "origin", repo_url],
+                env=env,
+                cwd=str(repo_path),
+                should_stop=should_cancel,
+            )
+        else:
+            self.command_runner.run_checked(
+                ["git", "remote", "set-url", "origin", repo_url],
+                env=env,
+                cwd=str(repo_path),
+                should_stop=should_cancel,
+            )
+
+        log(f"[{build_id}] 🔄 Fetching latest branch state from origin/{branch_name}")
+        strategy = GitFetchStrategy.from_config()
+        fetches = [
+            fetch_branch(
+                self.command_runner,
+                repo_path=repo_path,
+                remote="origin",
+                branch_name=branch_name,
+                destination=f"refs/remotes/origin/{branch_name}",
+                strategy=strategy,
+                env=env,
+                should_cancel=should_cancel,
+            )
+        ]
+        if target_commit and not has_commit(self.command_runner, repo_path, target_commit, env=env):
+            # The branch moved past the pinned commit (or it is beyond the fetch depth).
+            fetches.append(
+                fetch_commit(
+                    self.command_runner,
+                    repo_path=repo_path,
+                    remote="origin",
+                    commit_sha=target_commit,
+                    strategy=strategy,
+                    env=env,
+                    should_cancel=should_cancel,
+                )
+            )
+        for stats in fetches:
+            self._log_fetch(build_id, stats, log)
+        self._checkout_branch(repo_path, branch_name, target_commit, env, should_cancel)
+        self._clean_worktree(build_id, repo_path, flutter_version, env, log, should_cancel)
+        return fetches
 
+    def _sync_from_mirror(
+        self,
+        *,
+        build_id: str,
+        repo_url: str,
+        branch_name: str,
+        repo_path: Path,
+        env: Dict[str, str],
+        log,
+        should_cancel=None,
+        target_commit: Optional[str] = None,
+        flutter_version: Optional[str] = None,
+    ) -> List[GitFetchStats]:
+        fetches: List[GitFetchStats] = []
+        mirror_fetches: List[Optional[GitFetchStats]] = []
+        if target_commit and self.git_mirrors.contains(repo_url, branch_name, target_commit, env=env):
+            # Usually the background prefetch got there first; the sync stays local.
+            log(f"[{build_id}] ⚡ Shared git mirror already has {target_commit[:12]}; skipping remote fetch")
+        else:
+            mirror_fetches.append(
+                self.git_mirrors.update(
+                    repo_url,
+                    branch_name,
+                    build_id=build_id,
+                    env=env,
+                    log=log,
+                    should_cancel=should_cancel,
+                )
+            )
+        if target_commit:
+            mirror_fetches.append(
+                self.git_mirrors.ensure_commit(
+                    repo_url,
+                    target_commit,
+                    build_id=build_id,
+                    env=env,
+                    log=log,
+                    should_cancel=should_cancel,
+                )
+            )
+        for stats in mirror_fetches:
+            if stats is not None:
+                self._log_fetch(build_id, stats, log)
+                fetches.append(stats)
+        mirror_path = self.git_mirrors.mirror_path(repo_url)
+
+        if not (repo_path / ".git").exists():
+            log(f"[{build_id}] 📦 Creating workspace checkout from shared git mirror")
+            self.command_runner.run_checked(
+                ["git", "clone", "--no-checkout", "--reference", str(mirror_path), str(mirror_path), str(repo_path)],
+                env=env,
+                cwd=str(repo_path.parent),
+                should_stop=should_cancel,
+            )
+        elif self.git_mirrors.link_alternates(repo_path, mirror_path):
+            # Slots cloned before the mirror existed start borrowing its objects too.
+            log(f"[{build_id}] 🔗 Linked workspace objects to shared git mirror")
+
+        # Scripts and tools still see the real remote as origin.
         self.command_runner.run_checked(
             ["git", "remote", "set-url", "origin", repo_url],
             env=env,
             cwd=str(repo_path),
             should_stop=should_cancel,
         )
-
-        log(f"[{build_id}] 🔄 Fetching latest branch state from origin/{branch_name}")
+        log(f"[{build_id}] 🔄 Updating origin/{branch_name} from shared git mirror")
+        slot_stats = fetch_branch(
+            self.command_runner,
+            repo_path=repo_path,
+            remote=str(mirror_path),
+            branch_name=branch_name,
+            destination=f"refs/remotes/origin/{branch_name}",
+            strategy=GitFetchStrategy(),
+            env=env,
+            should_cancel=should_cancel,
+        )
+        self._log_fetch(build_id, slot_stats, log)
+        fetches.append(slot_stats)
+        # A pinned commit is readable through the mirror's object store even when no ref points at it.
+        self._checkout_branch(repo_path, branch_name, target_commit, env, should_cancel)
+        self._clean_worktree(build_id, repo_path, flutter_version, env, log, should_cancel)
+        return fetches
+
+    def _checkout_branch(
+        self,
+        repo_path: Path,
+        branch_name: str,
+        target_commit: Optional[str],
+        env: Dict[str, str],
+        should_cancel=None,
+    ) -> None:
         self.command_runner.run_checked(
-            ["git", "fetch", "origin"],
+            ["git", "checkout", "--force", "-B", branch_name, target_commit or f"origin/{branch_name}"],
             env=env,
             cwd=str(repo_path),
             should_stop=should_cancel,
         )
 
-        branch_exists = self.command_runner.run(
-            ["git", "ls-remote", "--heads", "origin", branch_name],
+    def _clean_worktree(
+        self,
+        build_id: str,
+        repo_path: Path,
+        flutter_version: Optional[str],
+        env: Dict[str, str],
+        log,
+        should_cancel=None,
+    ) -> None:
+        plan = self.clean_policy.plan(repo_path, self._resolve_flutter_version(repo_path, flutter_version))
+        self.command_runner.run_checked(
+            plan.command(),
             env=env,
             cwd=str(repo_path),
-            check=False,
             should_stop=should_cancel,
         )
-        if branch_exists.returncode != 0 or not branch_exists.stdout.strip():
-            raise ValueError(f"Branch '{branch_name}' does not exist in remote repository")
+        self.clean_policy.record(repo_path, plan)
+        if plan.kept:
+            log(
+                f"[{build_id}] 🧹 Kept incremental caches with unchanged inputs: {', '.join(plan.kept)}"
+                + (f" (wiped: {', '.join(plan.wiped)})" if plan.wiped else "")
+            )
+
+    def _slot_warmth(
+        self,
+        repo_url: str,
+        branch_name: str,
+        target_commit: Optional[str],
+        env: Dict[str, str],
+    ) -> SlotWarmth:
+        """Rank free slots by how little would have to change to reach the target.
+
+        Slots that already hold the target commit come first. Next come slots
+        whose diff to it touches no dependency manifest or lockfile, so their
+        pub/pod/Gradle caches stay valid, ordered by fewest changed files. Ties
+        go to the most recently used slot.
+        """
+        mirror_path = self.git_mirrors.mirror_path(repo_url) if self.git_mirrors is not None else None
+        if target_commit is None and mirror_path is not None and (mirror_path / "HEAD").exists():
+            # Not fetched yet for this build, but the last known tip is a close enough target.
+            target_commit = f"refs/heads/{branch_name}"
+
+        def score(state: WorkspaceSlotState, repo_dir: Path) -> tuple:
+            if state.commit_sha is None:
+                return (0, 0, 0, 0.0)
+            changed = self._changed_files(state.commit_sha, target_commit, mirror_path or repo_dir, env)
+            if changed is None:
+                return (1, 0, 0, state.last_used_at)
+            dependencies_match = not any(
+                fnmatch(path, pattern) for path in changed for patterns in DEPENDENCY_INPUTS.values() for pattern in patterns
+            )
+            return (2, int(dependencies_match), -len(changed), state.last_used_at)
+
+        return score
 
-        local_branch = self.command_runner.run(
-            ["git", "rev-parse", "--verify", branch_name],
+    def _changed_files(self, from_commit: str, target: Optional[str], git_dir: Path, env: Dict[str, str]) -> Optional[List[str]]:
+        if target is None or not git_dir.exists():
+            return None
+        result = self.command_runner.run(
+            ["git", "diff", "--name-only", from_commit, target],
             env=env,
-            cwd=str(repo_path),
+            cwd=str(git_dir),
             check=False,
-            should_stop=should_cancel,
         )
-        if local_branch.returncode == 0:
-            self.command_runner.run_checked(
-                ["git", "checkout", branch_name],
-                env=env,
-                cwd=str(repo_path),
-                should_stop=should_cancel,
-            )
-        else:
-            self.command_runner.run_checked(
-                ["git", "checkout", "-B", branch_name, f"origin/{branch_name}"],
-                env=env,
-                cwd=str(repo_path),
-                should_stop=should_cancel,
-            )
+        if result.returncode != 0:
+            return None
+        return [line for line in result.stdout.splitlines() if line]
 
-        self.command_runner.run_checked(
-            ["git", "reset", "--hard", f"origin/{branch_name}"],
+    def _lookup_branch_commit(
+        self,
+        repo_url: str,
+        branch_name: str,
+        env: Dict[str, str],
+        should_cancel=None,
+    ) -> Optional[str]:
+        """Resolve the remote branch tip with one ref lookup; ``None`` when the lookup fails."""
+        result = self.command_runner.run(
+            ["git", "ls-remote", repo_url, f"refs/heads/{branch_name}"],
             env=env,
-            cwd=str(repo_path),
+            cwd=str(get_shared_cache_dir()),
+            check=False,
             should_stop=should_cancel,
         )
-        self.command_runner.run_checked(
-            ["git", "clean", "-fdx"],
+        if result.returncode != 0 or not result.stdout.strip():
+            return None
+        return result.stdout.split()[0]
+
+    def _is_worktree_clean(self, repo_path: Path, env: Dict[str, str], should_cancel=None) -> bool:
+        """No tracked changes and no untracked files other than ignored build outputs."""
+        result = self.command_runner.run(
+            ["git", "status", "--porcelain", "--", ".", *(f":!{path}" for path in SELF_MODIFIED_PATHS)],
             env=env,
             cwd=str(repo_path),
+            check=False,
             should_stop=should_cancel,
         )
+        return result.returncode == 0 and not result.stdout.strip()
+
+    def _log_fetch(self, build_id: str, stats: GitFetchStats, log) -> None:
+        log(f"[{build_id}] 📥 Fetched {stats.ref} from {stats.source}: {stats.describe()}")
 
     def _resolve_flutter_version(
         self,
@@ -259,19 +519,16 @@ class RepositoryWorkspaceManager:
     ) -> None:
         log(f"[{build_id}] 📦 Running fvm use {flutter_version}")
         try:
-            result = self.command_runner.run_checked(
+            self.command_runner.run_checked(
                 ["fvm", "use", flutter_version, "--force", "--skip-pub-get", "--skip-setup"],
                 env=env,
                 cwd=str(repo_path),
                 should_stop=should_cancel,
+                on_line=line_logger(log, f"[{build_id}][FVM]"),
             )
         except CommandExecutionError as exc:
             raise RuntimeError(f"Failed to activate Flutter SDK {flutter_version}: {exc}") from exc
 
-        for line in result.stdout.splitlines():
-            if line.strip():
-                log(f"[{build_id}][FVM] {line.strip()}")
-
     def _ensure_melos_sdk_path(self, build_id: str, repo_path: Path, log) -> None:
         melos_path = repo_path / "melos.yaml"
         if not melos_path.exists():
@@ -295,37 +552,33 @@ class RepositoryWorkspaceManager:
         log,
         reason: str,
         should_cancel=None,
-    ) -> None:
-        log(
-            f"[{build_id}] 🔄 Running required Flutter iOS precache "
-            f"({flutter_version}, platform={platform}, reason={reason})"
-        )
+    ) -> bool:
+        """Precache iOS artifacts unless another build already did for this SDK; returns True when it ran."""
         try:
-            result = self.command_runner.run_checked(
-                ["fvm", "flutter", "precache", "--ios"],
+            return self.flutter_sdks.ensure_precached(
+                build_id,
+                flutter_version,
+                ["ios"],
+                repo_path=repo_path,
                 env=env,
-                cwd=str(repo_path),
-                should_stop=should_cancel,
+                log=log,
+                reason=f"{reason}, build platform={platform}",
+                should_cancel=should_cancel,
             )
         except CommandExecutionError as exc:
             raise RuntimeError(
                 f"Flutter SDK changed to {flutter_version} but fvm flutter precache --ios failed: {exc}"
             ) from exc
 
-        for line in result.stdout.splitlines():
-            if line.strip():
-                log(f"[{build_id}][PRECACHE] {line.strip()}")
-
     def _is_ios_engine_artifact_missing(self, build_id: str, repo_path: Path, log) -> bool:
-        artifact_path = self._ios_engine_artifact_path(repo_path)
-        if artifact_path.exists():
+        if not self.flutter_sdks.missing_platforms(repo_path, ["ios"]):
             return False
 
-        log(f"[{build_id}] ⚠️ Missing Flutter iOS engine artifact: {artifact_path}")
+        log(f"[{build_id}] ⚠️ Missing Flutter iOS engine artifact: {self._ios_engine_artifact_path(repo_path)}")
         return True
 
     def _ios_engine_artifact_path(self, repo_path: Path) -> Path:
-        return repo_path / ".fvm" / "flutter_sdk" / "bin" / "cache" / "artifacts" / "engine" / "ios" / "Flutter.xcframework"
+        return self.flutter_sdks.artifact_path(repo_path, "ios")
 
     def _build_precache_reason(
         self,
@@ -341,43 +594,5 @@ class RepositoryWorkspaceManager:
             reasons.append(f"missing_ios_engine_artifact:{self._ios_engine_artifact_path(repo_path)}")
         return ",".join(reasons) if reasons else "unknown"
 
-    def _metadata_file(self, repo_url: str, branch_name: str) -> Path:
-        shared_dir = get_shared_cache_dir() / "repo_state"
-        shared_dir.mkdir(parents=True, exist_ok=True)
-        key = hashlib.sha256(f"{repo_url}::{branch_name}".encode("utf-8")).hexdigest()
-        return shared_dir / f"{key}.json"
-
     def _read_previous_flutter_version(self, repo_url: str, branch_name: str) -> Optional[str]:
-        metadata_file = self._metadata_file(repo_url, branch_name)
-        if not metadata_file.exists():
-            return None
-
-        try:
-            data = json.loads(metadata_file.read_text(encoding="utf-8"))
-        except json.JSONDecodeError:
-            return None
-
-        version = data.get("flutter_sdk_version")
-        if not version:
-            return None
-        return str(version).strip() or None
-
-    def _write_previous_flutter_version(
-        self,
-        repo_url: str,
-        branch_name: str,
-        flutter_version: str,
-    ) -> None:
-        metadata_file = self._metadata_file(repo_url, branch_name)
-        metadata_file.write_text(
-            json.dumps(
-                {
-                    "repo_url": repo_url,
-                    "branch_name": branch_name,
-                    "flutter_sdk_version": flutter_version,
-                },
-                ensure_ascii=True,
-                indent=2,
-            ),
-            encoding="utf-8",
-        )
+        return self.workspace_pool.state_store.branch_flutter_version(repo_url, branch_name)
@@ -0,0 +1,176 @@
+"""Long-lived Ruby process answering RubyGems queries over a pipe."""
+
+from __future__ import annotations
+
+import json
+import selectors
+import subprocess
+import threading
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+# Reads one JSON request per line and answers with one JSON line. Specs are
+# reloaded per request so gems installed by ``gem install`` are seen at once.
+HELPER_SCRIPT = r"""
+require "json"
+$stdout.sync = true
+STDIN.each_line do |line|
+  reply =
+    begin
+      request = JSON.parse(line)
+      Gem::Specification.reset
+      case request["op"]
+      when "ping"
+        { "ok" => true, "ruby" => RUBY_VERSION, "rubygems" => Gem::VERSION }
+      when "installed"
+        installed = request["gems"].map do |name, requirement|
+          Gem::Specification.find_all_by_name(name, *Array(requirement)).any?
+        end
+        { "ok" => true, "installed" => installed }
+      else
+        { "ok" => false, "error" => "unknown op #{request["op"]}" }
+      end
+    rescue StandardError, ScriptError => e
+      { "ok" => false, "error" => e.message }
+    end
+  puts JSON.generate(reply)
+end
+"""
+
+HELPER_REPLY_TIMEOUT = 30.0
+# A helper that failed to start (e.g. its Ruby is not installed yet) is tried again after this long.
+HELPER_RETRY_SECONDS = 60.0
+# Environment that selects the ruby binary and gem directories a helper serves.
+HELPER_ENV_KEYS = ("PATH", "RBENV_VERSION", "GEM_HOME", "GEM_PATH")
+
+GemRequirement = Tuple[str, Optional[str]]
+
+
+class RubyHelperError(RuntimeError):
+    """Raised when the helper cannot be started or stops answering."""
+
+
+class RubyGemHelper:
+    """One ``ruby`` process serving gem presence queries for a fixed Ruby and GEM_HOME."""
+
+    def __init__(self, env: Dict[str, str], cwd: str) -> None:
+        self.env = dict(env)
+        self.cwd = cwd
+        self.ruby_version: Optional[str] = None
+        self._process: Optional[subprocess.Popen] = None
+        self._lock = threading.Lock()
+
+    def start(self) -> "RubyGemHelper":
+        try:
+            self._process = subprocess.Popen(
+                ["ruby", "-e", HELPER_SCRIPT],
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL,
+                text=True,
+                bufsize=1,
+                env=self.env,
+                cwd=self.cwd,
+                start_new_session=True,
+            )
+        except OSError as exc:
+            raise RubyHelperError(f"Unable to start Ruby helper: {exc}") from exc
+        self.ruby_version = self._request({"op": "ping"})["ruby"]
+        return self
+
+    @property
+    def alive(self) -> bool:
+        return self._process is not None and self._process.poll() is None
+
+    def installed(self, gems: Sequence[GemRequirement]) -> List[bool]:
+        """Whether each ``(name, requirement)`` is satisfied, like ``gem list -i name -v requirement``."""
+        reply = self._request({"op": "installed", "gems": [[name, requirement] for name, requirement in gems]})
+        return [bool(value) for value in reply["installed"]]
+
+    def close(self) -> None:
+        process, self._process = self._process, None
+        if process is None:
+            return
+        try:
+            if process.stdin is not None:
+                process.stdin.close()
+            process.wait(timeout=2)
+        except (OSError, subprocess.TimeoutExpired):
+            process.kill()
+            process.wait()
+        if process.stdout is not None:
+            process.stdout.close()
+
+    def _request(self, payload: Dict) -> Dict:
+        with self._lock:
+            process = self._process
+            if process is None or process.poll() is not None:
+                raise RubyHelperError("Ruby helper is not running")
+            try:
+                process.stdin.write(json.dumps(payload) + "\n")
+                process.stdin.flush()
+                line = self._read_reply(process)
+            except (OSError, ValueError) as exc:
+                self.close()
+                raise RubyHelperError(f"Ruby helper failed: {exc}") from exc
+        if not line:
+            self.close()
+            raise RubyHelperError("Ruby helper exited without answering")
+        reply = json.loads(line)
+        if not reply.get("ok"):
+            raise RubyHelperError(reply.get("error") or "Ruby helper request failed")
+        return reply
+
+    def _read_reply(self, process: subprocess.Popen) -> str:
+        with selectors.DefaultSelector() as selector:
+            selector.register(process.stdout, selectors.EVENT_READ)
+            if not selector.select(HELPER_REPLY_TIMEOUT):
+                raise ValueError(f"no reply within {HELPER_REPLY_TIMEOUT:.0f}s")
+        return process.stdout.readline()
+
+
+class RubyHelperPool:
+    """Start one helper per Ruby environment on first use and reuse it across builds.
+
+    A helper exits on its own when the server goes away and its stdin closes;
+    :meth:`close_all` stops them at shutdown.
+    """
+
+    def __init__(self, retry_seconds: float = HELPER_RETRY_SECONDS) -> None:
+        self.retry_seconds = retry_seconds
+        self._helpers: Dict[tuple, RubyGemHelper] = {}
+        self._failed_at: Dict[tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def helper_for(self, env: Dict[str, str], cwd: str) -> Optional[RubyGemHelper]:
+        """The helper for ``env``, or ``None`` if Ruby cannot run one (callers fall back to ``gem``)."""
+        key = self._key(env, cwd)
+        with self._lock:
+            helper = self._helpers.get(key)
+            if helper is not None and helper.alive:
+                return helper
+            failed_at = self._failed_at.get(key)
+            if failed_at is not None and time.monotonic() - failed_at < self.retry_seconds:
+                return None
+            try:
+                helper = RubyGemHelper(env, cwd).start()
+            except RubyHelperError:
+                self._helpers.pop(key, None)
+                self._failed_at[key] = time.monotonic()
+                return None
+            self._failed_at.pop(key, None)
+            self._helpers[key] = helper
+            return helper
+
+    def close_all(self) -> None:
+        with self._lock:
+            helpers = list(self._helpers.values())
+            self._helpers.clear()
+            self._failed_at.clear()
+        for helper in helpers:
+            helper.close()
+
+    def _key(self, env: Dict[str, str], cwd: str) -> tuple:
+        values = tuple(env.get(name) for name in HELPER_ENV_KEYS)
+        # Without RBENV_VERSION rbenv picks the Ruby from .ruby-version under cwd.
+        return values if env.get("RBENV_VERSION") else (*values, cwd)
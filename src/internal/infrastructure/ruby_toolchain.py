@@ -5,18 +5,29 @@ from __future__ import annotations
 import os
 import re
 from pathlib import Path
-from typing import Dict
+from typing import Dict, List, Sequence
 
-from .command_runner import CommandExecutionError, CommandRunner
+from .command_runner import CommandExecutionError, CommandRunner, line_logger
+from .probe_cache import RUBY_PROBE_ENV, ProbeCache, gem_watch_paths
+from .ruby_helper import GemRequirement, RubyHelperError, RubyHelperPool
 
 
 class RubyToolchainPreparer:
     """Resolve Ruby/Bundler/gem dependencies for mobile build directories."""
 
     _VERSION_PATTERN = re.compile(r"(\d+(?:\.\d+)+)")
+    _EXACT_VERSION_PATTERN = re.compile(r"^\d[\w.]*$")
+    _PLUGIN_PATTERN = re.compile(r"""gem\s+['"](fastlane-plugin-[^'"]+)['"]""")
 
-    def __init__(self, command_runner: CommandRunner) -> None:
+    def __init__(
+        self,
+        command_runner: CommandRunner,
+        probe_cache: ProbeCache | None = None,
+        gem_helpers: RubyHelperPool | None = None,
+    ) -> None:
         self.command_runner = command_runner
+        self.probes = probe_cache or ProbeCache(command_runner)
+        self.gem_helpers = gem_helpers
 
     def configure_environment(self, cwd: Path, env: Dict[str, str], build_id: str, log, should_cancel=None) -> None:
         self._prepend_rbenv_to_path(env)
@@ -59,38 +70,14 @@ class RubyToolchainPreparer:
     ) -> str | None:
         locked_version = self._parse_lockfile_bundler_version(cwd)
         if locked_version:
-            installed = self.command_runner.run(
-                ["gem", "list", "-i", "bundler", "-v", locked_version],
-                env=env,
-                cwd=str(cwd),
-                check=False,
-                should_stop=should_cancel,
-            )
-            if installed.returncode != 0:
+            if not self._gems_installed([("bundler", locked_version)], cwd, env, should_cancel)[0]:
                 log(f"[{build_id}] 💎 Installing bundler {locked_version} from Gemfile.lock")
-                self.command_runner.run_checked(
-                    ["gem", "install", "-N", "bundler", "-v", locked_version],
-                    env=env,
-                    cwd=str(cwd),
-                    should_stop=should_cancel,
-                )
+                self._install_gem(["gem", "install", "-N", "bundler", "-v", locked_version], cwd, env, should_cancel)
             return locked_version
 
-        installed = self.command_runner.run(
-            ["gem", "list", "-i", "bundler"],
-            env=env,
-            cwd=str(cwd),
-            check=False,
-            should_stop=should_cancel,
-        )
-        if installed.returncode != 0:
+        if not self._gems_installed([("bundler", None)], cwd, env, should_cancel)[0]:
             log(f"[{build_id}] 💎 Installing bundler")
-            self.command_runner.run_checked(
-                ["gem", "install", "-N", "bundler"],
-                env=env,
-                cwd=str(cwd),
-                should_stop=should_cancel,
-            )
+            self._install_gem(["gem", "install", "-N", "bundler"], cwd, env, should_cancel)
         return None
 
     def bundle_install(
@@ -115,17 +102,15 @@ class RubyToolchainPreparer:
         log(f"[{build_id}] 📦 Installing Ruby bundle in {cwd.name}")
         install_command = self._bundle_command(bundler_version, "install")
         try:
-            result = self.command_runner.run_checked(
+            self.command_runner.run_checked(
                 install_command,
                 env=env,
                 cwd=str(cwd),
                 should_stop=should_cancel,
+                on_line=line_logger(log, f"[{build_id}][SETUP]"),
             )
         except CommandExecutionError as exc:
             self._raise_bundle_install_error(cwd, env, exc)
-        for line in result.stdout.splitlines():
-            if line.strip():
-                log(f"[{build_id}][SETUP] {line.strip()}")
 
     def ensure_gem(
         self,
@@ -137,68 +122,67 @@ class RubyToolchainPreparer:
         log,
         should_cancel=None,
     ) -> None:
-        list_command = ["gem", "list", "-i", gem_name]
-        if version:
-            list_command.extend(["-v", version])
-        installed = self.command_runner.run(
-            list_command,
-            env=env,
-            cwd=str(cwd),
-            check=False,
-            should_stop=should_cancel,
-        )
-        if installed.returncode == 0:
-            log(f"[{build_id}] ✅ {gem_name} already available")
-            return
+        self.ensure_gems([(gem_name, version)], cwd, env, build_id, log, should_cancel=should_cancel)
 
-        install_command = ["gem", "install", "-N", gem_name]
-        if version:
-            install_command.extend(["-v", version])
-        log(f"[{build_id}] 💎 Installing {gem_name}{f' {version}' if version else ''}")
-        self.command_runner.run_checked(
-            install_command,
-            env=env,
-            cwd=str(cwd),
-            should_stop=should_cancel,
-        )
+    def ensure_gems(
+        self,
+        gems: Sequence[GemRequirement],
+        cwd: Path,
+        env: Dict[str, str],
+        build_id: str,
+        log,
+        should_cancel=None,
+    ) -> List[str]:
+        """Check all ``(name, version)`` pairs in one query and install the missing ones together.
+
+        Returns the names that had to be installed.
+        """
+        installed = self._gems_installed(gems, cwd, env, should_cancel)
+        missing = [(name, version) for (name, version), present in zip(gems, installed) if not present]
+        for name, version in gems:
+            if (name, version) not in missing:
+                log(f"[{build_id}] ✅ {name} already available")
+        if not missing:
+            return []
+
+        log(f"[{build_id}] 💎 Installing {', '.join(f'{name} {version}' if version else name for name, version in missing)}")
+        # `gem install name:version` only pins exact versions; ranges need their own `-v`.
+        batched = [(name, version) for name, version in missing if not version or self._EXACT_VERSION_PATTERN.match(version)]
+        if batched:
+            self._install_gem(
+                ["gem", "install", "-N", *(f"{name}:{version}" if version else name for name, version in batched)],
+                cwd,
+                env,
+                should_cancel,
+            )
+        for name, version in missing:
+            if (name, version) not in batched:
+                self._install_gem(["gem", "install", "-N", name, "-v", version], cwd, env, should_cancel)
+        return [name for name, _ in missing]
 
-    def install_fastlane_plugins(self, ios_dir: Path, env: Dict[str, str], build_id: str, log, should_cancel=None) -> None:
+    def fastlane_plugins(self, ios_dir: Path) -> List[str]:
         pluginfile = ios_dir / "fastlane" / "Pluginfile"
         if not pluginfile.exists():
-            return
+            return []
+        return [
+            match.group(1)
+            for line in pluginfile.read_text(encoding="utf-8").splitlines()
+            if (match := self._PLUGIN_PATTERN.search(line))
+        ]
 
-        plugin_pattern = re.compile(r"""gem\s+['"](fastlane-plugin-[^'"]+)['"]""")
-        for line in pluginfile.read_text(encoding="utf-8").splitlines():
-            match = plugin_pattern.search(line)
-            if not match:
-                continue
-            plugin_name = match.group(1)
-            installed = self.command_runner.run(
-                ["gem", "list", "-i", plugin_name],
-                env=env,
-                cwd=str(ios_dir),
-                check=False,
-                should_stop=should_cancel,
-            )
-            if installed.returncode == 0:
-                continue
-            log(f"[{build_id}] 🔌 Installing {plugin_name}")
-            self.command_runner.run_checked(
-                ["gem", "install", "-N", plugin_name],
-                env=env,
-                cwd=str(ios_dir),
-                should_stop=should_cancel,
-            )
+    def install_fastlane_plugins(self, ios_dir: Path, env: Dict[str, str], build_id: str, log, should_cancel=None) -> None:
+        plugins = self.fastlane_plugins(ios_dir)
+        if not plugins:
+            return
+        gems = [(plugin_name, None) for plugin_name in plugins]
+        missing = [name for (name, _), present in zip(gems, self._gems_installed(gems, ios_dir, env, should_cancel)) if not present]
+        if not missing:
+            return
+        log(f"[{build_id}] 🔌 Installing {', '.join(missing)}")
+        self._install_gem(["gem", "install", "-N", *missing], ios_dir, env, should_cancel)
 
     def ensure_digest_crc(self, cwd: Path, env: Dict[str, str], build_id: str, log, should_cancel=None) -> None:
-        installed = self.command_runner.run(
-            ["gem", "list", "-i", "digest-crc", "-v", "~> 0.4"],
-            env=env,
-            cwd=str(cwd),
-            check=False,
-            should_stop=should_cancel,
-        )
-        if installed.returncode == 0:
+        if self._gems_installed([("digest-crc", "~> 0.4")], cwd, env, should_cancel)[0]:
             return
 
         log(f"[{build_id}] 💎 Installing digest-crc ~> 0.4 for Android fastlane dependencies")
@@ -206,12 +190,7 @@ class RubyToolchainPreparer:
         last_error: CommandExecutionError | None = None
         for version in candidates:
             try:
-                self.command_runner.run_checked(
-                    ["gem", "install", "-N", "digest-crc", "-v", version],
-                    env=env,
-                    cwd=str(cwd),
-                    should_stop=should_cancel,
-                )
+                self._install_gem(["gem", "install", "-N", "digest-crc", "-v", version], cwd, env, should_cancel)
                 return
             except CommandExecutionError as exc:
                 last_error = exc
@@ -219,11 +198,12 @@ class RubyToolchainPreparer:
             raise last_error
 
     def current_ruby_version(self, cwd: Path, env: Dict[str, str], should_cancel=None) -> str | None:
-        result = self.command_runner.run(
+        result = self.probes.run(
             ["ruby", "-e", "print RUBY_VERSION"],
             env=env,
             cwd=str(cwd),
-            check=False,
+            env_keys=RUBY_PROBE_ENV,
+            watch=[cwd / ".ruby-version", cwd / ".tool-versions", self._rbenv_root() / "version"],
             should_stop=should_cancel,
         )
         version = result.stdout.strip()
@@ -289,7 +269,7 @@ class RubyToolchainPreparer:
         return None
 
     def _prepend_rbenv_to_path(self, env: Dict[str, str]) -> None:
-        rbenv_root = Path(os.environ.get("RBENV_ROOT", Path.home() / ".rbenv")).expanduser()
+        rbenv_root = self._rbenv_root()
         path_entries = env.get("PATH", "").split(":") if env.get("PATH") else []
         additions = [str(rbenv_root / "shims"), str(rbenv_root / "bin")]
         merged: list[str] = []
@@ -298,6 +278,47 @@ class RubyToolchainPreparer:
                 merged.append(entry)
         env["PATH"] = ":".join(merged)
 
+    def _rbenv_root(self) -> Path:
+        return Path(os.environ.get("RBENV_ROOT", Path.home() / ".rbenv")).expanduser()
+
+    def _gems_installed(
+        self,
+        gems: Sequence[GemRequirement],
+        cwd: Path,
+        env: Dict[str, str],
+        should_cancel=None,
+    ) -> List[bool]:
+        helper = self.gem_helpers.helper_for(env, str(cwd)) if self.gem_helpers else None
+        if helper is not None:
+            try:
+                return helper.installed(gems)
+            except RubyHelperError:
+                pass
+        return [self._gem_installed(name, version, cwd, env, should_cancel) for name, version in gems]
+
+    def _gem_installed(self, name: str, version: str | None, cwd: Path, env: Dict[str, str], should_cancel=None) -> bool:
+        result = self.probes.run(
+            ["gem", "list", "-i", name, *(["-v", version] if version else [])],
+            env=env,
+            cwd=str(cwd),
+            env_keys=RUBY_PROBE_ENV,
+            watch=gem_watch_paths(env),
+            should_stop=should_cancel,
+        )
+        return result.returncode == 0
+
+    def _install_gem(self, install_command: list[str], cwd: Path, env: Dict[str, str], should_cancel=None) -> None:
+        try:
+            self.command_runner.run_checked(
+                install_command,
+                env=env,
+                cwd=str(cwd),
+                should_stop=should_cancel,
+            )
+        finally:
+            # Even a failed install may have left gems behind.
+            self.probes.invalidate(["gem"])
+
     def _scope_gem_environment(self, env: Dict[str, str], ruby_version: str) -> None:
         gem_home_value = env.get("GEM_HOME")
         if not gem_home_value:
@@ -327,11 +348,12 @@ class RubyToolchainPreparer:
         log,
         should_cancel=None,
     ) -> str | None:
-        rbenv_exists = self.command_runner.run(
+        rbenv_exists = self.probes.run(
             ["rbenv", "versions", "--bare"],
             env=env,
             cwd=str(cwd),
-            check=False,
+            env_keys=("PATH",),
+            watch=[self._rbenv_root() / "versions"],
             should_stop=should_cancel,
         )
         if rbenv_exists.returncode != 0:
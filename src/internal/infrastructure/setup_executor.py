@@ -15,6 +15,9 @@ class SetupExecutor:
         self.pub_setup = PubSetupExecutor(command_runner)
         self.platform_toolchain = PlatformToolchainPreparer(command_runner)
 
+    def close(self) -> None:
+        self.platform_toolchain.close()
+
     def run_setup(
         self,
         *,
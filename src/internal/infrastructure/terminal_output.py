@@ -0,0 +1,103 @@
+"""Turn raw pseudo-terminal output into plain log lines."""
+
+from __future__ import annotations
+
+import codecs
+import os
+import pty
+import re
+import time
+from typing import Callable, List, Optional, Tuple
+
+# CSI (colors, cursor moves, erase), OSC (window titles, hyperlinks) and two-byte escapes.
+ANSI_ESCAPE = re.compile(r"\x1b\[[0-?]*[ -/]*[@-~]|\x1b\][^\x07\x1b]*(?:\x07|\x1b\\)|\x1b[@-Z\\-_]")
+REDRAW_INTERVAL = 1.0
+TERMINAL_READ_SIZE = 65536
+
+
+def strip_ansi(text: str) -> str:
+    return ANSI_ESCAPE.sub("", text)
+
+
+def open_terminal() -> Tuple[int, int]:
+    """Return ``(master, slave)`` descriptors of a new pseudo-terminal."""
+    return pty.openpty()
+
+
+def read_terminal(fd: int) -> bytes:
+    """Read from a pty master; ``b""`` once the child side has closed (Linux reports EIO)."""
+    try:
+        return os.read(fd, TERMINAL_READ_SIZE)
+    except BlockingIOError:
+        raise
+    except OSError:
+        return b""
+
+
+class TerminalLineSplitter:
+    """Split terminal output into discrete lines.
+
+    Escape sequences are stripped. A carriage return that is not part of
+    ``\\r\\n`` marks a redraw of the current line (progress bars, spinners);
+    such frames are emitted at most once per ``redraw_interval`` and only when
+    they changed, while the line that finally ends in a newline is always kept.
+    """
+
+    def __init__(self, redraw_interval: float = REDRAW_INTERVAL, clock: Callable[[], float] = time.monotonic) -> None:
+        self.redraw_interval = redraw_interval
+        self._clock = clock
+        self._decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        self._current = ""
+        self._pending_cr = False
+        self._last_frame: Optional[str] = None
+        self._last_frame_at: Optional[float] = None
+
+    def feed(self, data: bytes) -> List[str]:
+        return self._split(self._decoder.decode(data))
+
+    def flush(self) -> List[str]:
+        lines = self._split(self._decoder.decode(b"", final=True))
+        if self._pending_cr:
+            self._pending_cr = False
+            self._redraw(lines)
+        tail = strip_ansi(self._current).rstrip()
+        self._current = ""
+        if tail:
+            lines.append(tail)
+        return lines
+
+    def _split(self, text: str) -> List[str]:
+        lines: List[str] = []
+        for char in text:
+            if self._pending_cr:
+                self._pending_cr = False
+                if char == "\n":
+                    self._newline(lines)
+                    continue
+                self._redraw(lines)
+            if char == "\n":
+                self._newline(lines)
+            elif char == "\r":
+                # Wait for the next character to tell "\r\n" from a redraw.
+                self._pending_cr = True
+            else:
+                self._current += char
+        return lines
+
+    def _newline(self, lines: List[str]) -> None:
+        lines.append(strip_ansi(self._current).rstrip())
+        self._current = ""
+        self._last_frame = None
+        self._last_frame_at = None
+
+    def _redraw(self, lines: List[str]) -> None:
+        frame = strip_ansi(self._current).rstrip()
+        self._current = ""
+        if not frame or frame == self._last_frame:
+            return
+        now = self._clock()
+        if self._last_frame_at is not None and now - self._last_frame_at < self.redraw_interval:
+            return
+        lines.append(frame)
+        self._last_frame = frame
+        self._last_frame_at = now
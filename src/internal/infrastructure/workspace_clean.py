@@ -0,0 +1,109 @@
+"""Decide which incremental-build caches survive the clean step of a slot sync."""
+
+from __future__ import annotations
+
+import hashlib
+import json
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from ..core.config import get_workspace_clean_excludes, get_workspace_clean_policy
+from .fingerprints import dependency_fingerprints
+
+STAMP_FILE = "ci-incremental-caches.json"
+
+
+@dataclass(frozen=True)
+class CacheGroup:
+    """Untracked paths whose contents are only valid for one set of inputs."""
+
+    name: str
+    patterns: Tuple[str, ...]
+    # Keys of ``dependency_fingerprints`` the cache was built from, besides the Flutter SDK version.
+    inputs: Tuple[str, ...]
+
+
+CACHE_GROUPS: Tuple[CacheGroup, ...] = (
+    CacheGroup(
+        "pub",
+        (".dart_tool/", "/build/", "/.fvm/", ".flutter-plugins", ".flutter-plugins-dependencies"),
+        ("pub",),
+    ),
+    CacheGroup(
+        "ios",
+        ("/ios/Pods/", "/ios/.symlinks/", "/ios/Flutter/Generated.xcconfig", "/ios/Flutter/flutter_export_environment.sh"),
+        ("pub", "ios"),
+    ),
+    CacheGroup(
+        "android",
+        ("/android/.gradle/", "/android/local.properties"),
+        ("android",),
+    ),
+)
+
+
+@dataclass
+class CleanPlan:
+    """Outcome of checking each cache group against the new checkout."""
+
+    excludes: List[str] = field(default_factory=list)
+    kept: List[str] = field(default_factory=list)
+    wiped: List[str] = field(default_factory=list)
+    stamps: Dict[str, str] = field(default_factory=dict)
+
+    def command(self) -> List[str]:
+        # With -x, git clean ignores .gitignore but still honours -e patterns.
+        return ["git", "clean", "-fdx", *(arg for pattern in self.excludes for arg in ("-e", pattern))]
+
+
+class WorkspaceCleanPolicy:
+    """Keep cache groups whose inputs match the previous build of the slot; wipe the rest.
+
+    ``full`` restores the old behaviour of removing every untracked file.
+    The fingerprint each group was built for is stored under ``.git`` so it
+    survives the clean itself.
+    """
+
+    def __init__(self, mode: str = "preserve", extra_excludes: Tuple[str, ...] = ()) -> None:
+        self.mode = mode
+        self.extra_excludes = extra_excludes
+
+    @classmethod
+    def from_config(cls) -> "WorkspaceCleanPolicy":
+        return cls(get_workspace_clean_policy(), tuple(get_workspace_clean_excludes()))
+
+    def plan(self, repo_path: Path, flutter_version: Optional[str]) -> CleanPlan:
+        plan = CleanPlan(excludes=list(self.extra_excludes))
+        if self.mode == "full":
+            plan.wiped = [group.name for group in CACHE_GROUPS]
+            return plan
+
+        fingerprints = dependency_fingerprints(repo_path)
+        previous = self._read_stamps(repo_path)
+        for group in CACHE_GROUPS:
+            stamp = self._stamp(group, fingerprints, flutter_version)
+            plan.stamps[group.name] = stamp
+            if previous.get(group.name) == stamp:
+                plan.kept.append(group.name)
+                plan.excludes.extend(group.patterns)
+            else:
+                plan.wiped.append(group.name)
+        return plan
+
+    def record(self, repo_path: Path, plan: CleanPlan) -> None:
+        """Remember which inputs the caches left in the slot now belong to."""
+        stamp_file = repo_path / ".git" / STAMP_FILE
+        if self.mode == "full" or not stamp_file.parent.is_dir():
+            return
+        stamp_file.write_text(json.dumps(plan.stamps, indent=2, sort_keys=True), encoding="utf-8")
+
+    def _stamp(self, group: CacheGroup, fingerprints: Dict[str, str], flutter_version: Optional[str]) -> str:
+        parts = [f"flutter={flutter_version or ''}", *(f"{name}={fingerprints[name]}" for name in group.inputs)]
+        return hashlib.sha256("\n".join(parts).encode("utf-8")).hexdigest()[:16]
+
+    def _read_stamps(self, repo_path: Path) -> Dict[str, str]:
+        try:
+            return json.loads((repo_path / ".git" / STAMP_FILE).read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return {}
@@ -0,0 +1,88 @@
+"""Materialize a new workspace slot's checkout from a copy of a warm one."""
+
+from __future__ import annotations
+
+import os
+import shutil
+import sys
+from pathlib import Path
+from typing import Callable, Optional
+
+from ..core.cancellation import OperationCanceledError
+from .command_runner import CommandExecutionError, CommandRunner
+
+
+def clone_tree(
+    source: Path,
+    destination: Path,
+    command_runner: CommandRunner,
+    should_cancel: Optional[Callable[[], bool]] = None,
+) -> str:
+    """Copy the contents of ``source`` into ``destination``; returns the method that worked.
+
+    Tries a copy-on-write clone first (``cp --reflink=always`` on btrfs/xfs,
+    ``cp -c`` on APFS), then a copy that hardlinks git's content-addressed
+    objects, then a plain copy. ``destination`` is emptied before each try and
+    left empty when the build is canceled mid-copy.
+    """
+    errors = []
+    methods = (
+        ("reflink", lambda: _reflink(source, destination, command_runner, should_cancel)),
+        ("hardlink", lambda: _hardlink_objects(source, destination, should_cancel)),
+        ("copy", lambda: _copy(source, destination, should_cancel)),
+    )
+    for name, method in methods:
+        _empty(destination)
+        try:
+            method()
+            return name
+        except OperationCanceledError:
+            _empty(destination)
+            raise
+        except (OSError, shutil.Error, CommandExecutionError) as exc:
+            errors.append(f"{name}: {exc}")
+    _empty(destination)
+    raise OSError(f"Could not copy {source}: {'; '.join(errors)}")
+
+
+def _empty(destination: Path) -> None:
+    shutil.rmtree(destination, ignore_errors=True)
+    destination.mkdir(parents=True)
+
+
+def _reflink(source: Path, destination: Path, command_runner: CommandRunner, should_cancel) -> None:
+    # --reflink=always (not auto) so filesystems without CoW fall through to hardlinks instead of a full copy.
+    flags = ["-R", "-p", "-c"] if sys.platform == "darwin" else ["-a", "--reflink=always"]
+    command_runner.run_checked(
+        ["cp", *flags, f"{source}/.", str(destination)],
+        env=dict(os.environ),
+        cwd=str(destination),
+        should_stop=should_cancel,
+    )
+
+
+def _checked(copy: Callable[[str, str], object], should_cancel) -> Callable[[str, str], None]:
+    def copy_unless_canceled(src: str, dst: str) -> None:
+        if should_cancel and should_cancel():
+            raise OperationCanceledError(f"Canceled while copying workspace slot: {dst}")
+        copy(src, dst)
+
+    return copy_unless_canceled
+
+
+def _hardlink_objects(source: Path, destination: Path, should_cancel) -> None:
+    objects = source / ".git" / "objects"
+
+    def link_or_copy(src: str, dst: str) -> None:
+        relative = Path(src).relative_to(objects) if Path(src).is_relative_to(objects) else None
+        # Loose objects and packs are never modified in place; objects/info (alternates) is rewritten.
+        if relative is not None and relative.parts[0] != "info":
+            os.link(src, dst)
+        else:
+            shutil.copy2(src, dst)
+
+    shutil.copytree(source, destination, symlinks=True, copy_function=_checked(link_or_copy, should_cancel), dirs_exist_ok=True)
+
+
+def _copy(source: Path, destination: Path, should_cancel) -> None:
+    shutil.copytree(source, destination, symlinks=True, copy_function=_checked(shutil.copy2, should_cancel), dirs_exist_ok=True)
@@ -3,19 +3,37 @@
 from __future__ import annotations
 
 import hashlib
-import json
+import logging
+import os
 import re
+import shutil
+import threading
 import time
 from dataclasses import dataclass
 from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Tuple
 
 from filelock import FileLock, Timeout
 
-from ..core.config import get_shared_cache_dir
+from ..core.cancellation import OperationCanceledError, on_cancel
+from ..core.config import (
+    get_shared_cache_dir,
+    get_workspace_disk_budget_bytes,
+    get_workspace_max_slots,
+    get_workspace_slot_clone_enabled,
+)
+from .command_runner import CommandRunner
+from .workspace_clone import clone_tree
+from .workspace_state import STATE_DB_NAME, WorkspaceSlotState, WorkspaceStateStore
+
+logger = logging.getLogger(__name__)
 
 DEFAULT_SLOT_WAIT_TIMEOUT = 3600
 DEFAULT_MAX_SLOTS_PER_KEY = 2
 SLOT_LOCK_TIMEOUT = 0
+# Releases in this process wake waiters at once; this only bounds how late a release by another process is noticed.
+SLOT_RECHECK_SECONDS = 5.0
+EVICTED_PREFIX = ".evicted-"
 
 
 def _sanitize(value: str) -> str:
@@ -23,6 +41,10 @@ def _sanitize(value: str) -> str:
     return normalized[:80] or "default"
 
 
+# Scores a free slot from its recorded state and checkout; higher tuples are warmer.
+SlotWarmth = Callable[[WorkspaceSlotState, Path], Tuple[Any, ...]]
+
+
 @dataclass
 class WorkspaceSlotLease:
     """Exclusive lease for a reusable repository workspace slot."""
@@ -32,21 +54,82 @@ class WorkspaceSlotLease:
     repo_dir: Path
     slot_id: str
     _lock: FileLock
+    _pool: "WorkspacePoolManager"
+
+    def record_state(
+        self,
+        *,
+        commit_sha: Optional[str],
+        flutter_version: Optional[str],
+        fingerprints: Dict[str, str],
+        repo_url: Optional[str] = None,
+        branch_name: Optional[str] = None,
+    ) -> None:
+        """Store the checkout state; with ``repo_url``/``branch_name`` also the branch's Flutter version."""
+        self._pool.state_store.record_slot(
+            self.slot_dir,
+            WorkspaceSlotState(
+                commit_sha=commit_sha,
+                flutter_version=flutter_version,
+                fingerprints=dict(fingerprints),
+                last_used_at=time.time(),
+            ),
+            repo_url=repo_url,
+            branch_name=branch_name,
+        )
 
     def release(self) -> None:
-        metadata = self.slot_dir / "lease.json"
-        if metadata.exists():
-            metadata.unlink(missing_ok=True)
-        if self._lock.is_locked:
-            self._lock.release()
+        if not self._lock.is_locked:
+            return
+        disk_bytes = _disk_usage(self.slot_dir) if self._pool.disk_budget_bytes > 0 else None
+        self._pool.state_store.clear_lease(self.slot_dir, disk_bytes=disk_bytes)
+        self._lock.release()
+        self._pool._slot_released()
+
+
+def _disk_usage(path: Path) -> int:
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.lstat(os.path.join(root, name)).st_blocks * 512
+            except OSError:
+                continue
+    return total
 
 
 class WorkspacePoolManager:
-    """Allocate reusable workspace slots keyed by repo/branch/runtime inputs."""
+    """Allocate reusable workspace slots keyed by repo/branch/runtime inputs.
+
+    Slots of every key share one budget: ``max_total_slots`` slots and
+    ``disk_budget_bytes`` of checkouts (0 disables either). Going over it
+    evicts the least recently used slots nobody holds a lease on.
+
+    With ``clone_slots`` a new slot starts as a copy of an idle slot of the
+    same repository (see ``_seed_slot``) instead of an empty directory.
+    """
 
-    def __init__(self, *, max_slots_per_key: int = DEFAULT_MAX_SLOTS_PER_KEY, wait_timeout: int = DEFAULT_SLOT_WAIT_TIMEOUT) -> None:
+    def __init__(
+        self,
+        *,
+        max_slots_per_key: int = DEFAULT_MAX_SLOTS_PER_KEY,
+        wait_timeout: int = DEFAULT_SLOT_WAIT_TIMEOUT,
+        max_total_slots: Optional[int] = None,
+        disk_budget_bytes: Optional[int] = None,
+        state_store: Optional[WorkspaceStateStore] = None,
+        clone_slots: Optional[bool] = None,
+        command_runner: Optional[CommandRunner] = None,
+    ) -> None:
         self.max_slots_per_key = max_slots_per_key
         self.wait_timeout = wait_timeout
+        self.max_total_slots = get_workspace_max_slots() if max_total_slots is None else max_total_slots
+        self.disk_budget_bytes = get_workspace_disk_budget_bytes() if disk_budget_bytes is None else disk_budget_bytes
+        self.clone_slots = get_workspace_slot_clone_enabled() if clone_slots is None else clone_slots
+        self.state_store = state_store or WorkspaceStateStore(lambda: get_shared_cache_dir() / STATE_DB_NAME)
+        self.command_runner = command_runner or CommandRunner()
+        # Guards slot creation/eviction in this process and wakes waiters when a lease is released.
+        self._condition = threading.Condition()
+        self._releases = 0
 
     def acquire(
         self,
@@ -57,8 +140,12 @@ class WorkspacePoolManager:
         flutter_version: str | None,
         platform: str,
         cocoapods_version: str | None = None,
+        preferred_slot_id: str | None = None,
+        warmth: SlotWarmth | None = None,
         log,
+        should_cancel=None,
     ) -> WorkspaceSlotLease:
+        """Lease a free slot, trying the warmest ones first when ``warmth`` is given."""
         slot_key = self._slot_key(
             repo_url=repo_url,
             branch_name=branch_name,
@@ -71,30 +158,259 @@ class WorkspacePoolManager:
 
         deadline = time.time() + self.wait_timeout
         while True:
+            releases = self._releases
             existing = self._existing_slots(slot_root)
-            for slot_dir in existing:
-                lease = self._try_acquire_slot(slot_key, slot_dir, build_id, log)
-                if lease is not None:
-                    return lease
-
-            if len(existing) < self.max_slots_per_key:
-                slot_dir = slot_root / f"slot-{len(existing) + 1}"
-                slot_dir.mkdir(parents=True, exist_ok=True)
-                lease = self._try_acquire_slot(slot_key, slot_dir, build_id, log)
-                if lease is not None:
-                    return lease
-
-            if time.time() >= deadline:
+            if warmth is not None:
+                # Scoring can run git in the checkout, so only free slots are scored, afresh on every
+                # pass: a checkout may have moved while its slot was leased.
+                free = [slot_dir for slot_dir in existing if self._is_free(slot_dir)]
+                states = self.state_store.slot_states(free)
+                scores: Dict[Path, Tuple[Any, ...]] = {
+                    slot_dir: warmth(states.get(slot_dir, WorkspaceSlotState()), slot_dir / "repo") for slot_dir in free
+                }
+                # Stable sort: equally warm slots keep their slot-N order. Leased slots go last,
+                # in case they were released since.
+                free.sort(key=lambda path: scores[path], reverse=True)
+                existing = free + [slot_dir for slot_dir in existing if slot_dir not in scores]
+            if preferred_slot_id:
+                # Retries go back to the slot holding their checkpointed checkout when it is free.
+                existing.sort(key=lambda path: path.name != preferred_slot_id)
+            evicted: list[Path] = []
+            with self._condition:
+                lease = None
+                for slot_dir in existing:
+                    # Skip slots evicted since the listing above.
+                    if slot_dir.is_dir():
+                        lease = self._try_acquire_slot(slot_key, slot_dir, build_id, log, repo_url, branch_name)
+                    if lease is not None:
+                        return lease
+                if len(existing) < self.max_slots_per_key:
+                    lease, evicted = self._create_slot(slot_key, slot_root, build_id, log, repo_url, branch_name)
+            self._purge(evicted)
+            if lease is not None:
+                # Outside the condition: copying a checkout can take a while.
+                try:
+                    self._seed_slot(lease, build_id, log, repo_url=repo_url, branch_name=branch_name, should_cancel=should_cancel)
+                except BaseException:
+                    lease.release()
+                    raise
+                return lease
+
+            now = time.time()
+            if now >= deadline:
                 raise Timeout(f"Timed out waiting for workspace slot: {slot_key}")
-            time.sleep(1.0)
+            if self._wait_for_release(releases, min(SLOT_RECHECK_SECONDS, deadline - now), should_cancel):
+                raise OperationCanceledError(f"Canceled while waiting for workspace slot: {slot_key}")
+
+    def clear_stale_leases(self) -> list[Path]:
+        """Clear lease rows left by builds whose process died before releasing them.
+
+        A dead holder's lock file is unlocked by the OS, so a row whose slot
+        lock is free belongs to no running build. Without this its Flutter
+        version would count as in use forever (see ``leased_flutter_versions``).
+        """
+        cleared: list[Path] = []
+        for slot_dir, build_id in self.state_store.leases().items():
+            if not slot_dir.is_dir():
+                self.state_store.forget_slot(slot_dir)
+                cleared.append(slot_dir)
+                continue
+            lock = FileLock(str(slot_dir / ".lease.lock"), timeout=SLOT_LOCK_TIMEOUT)
+            try:
+                lock.acquire()
+            except (Timeout, OSError):
+                continue
+            try:
+                # Only while that build's row is still there: the slot may have been leased again since the listing.
+                self.state_store.clear_lease(slot_dir, build_id=build_id)
+            finally:
+                lock.release()
+            cleared.append(slot_dir)
+        if cleared:
+            logger.info(f"🧹 Cleared {len(cleared)} workspace slot lease(s) left by builds that are no longer running")
+        return cleared
+
+    def _is_free(self, slot_dir: Path) -> bool:
+        """Whether nobody holds ``slot_dir``'s lease right now (checked without keeping it)."""
+        lock = FileLock(str(slot_dir / ".lease.lock"), timeout=SLOT_LOCK_TIMEOUT)
+        try:
+            lock.acquire()
+        except (Timeout, OSError):
+            return False
+        lock.release()
+        return True
+
+    def _create_slot(
+        self, slot_key: str, slot_root: Path, build_id: str, log, repo_url: str, branch_name: str
+    ) -> Tuple[WorkspaceSlotLease | None, list[Path]]:
+        """Add a slot under ``slot_root``, evicting idle slots of any key to stay within ``max_total_slots``."""
+        evicted: list[Path] = []
+        if self.max_total_slots:
+            evicted = self._evict_idle_slots(lambda remaining: len(remaining) >= self.max_total_slots)
+            if evicted:
+                log(f"[{build_id}] 🧹 Evicted {len(evicted)} idle workspace slot(s) to stay within {self.max_total_slots} slots")
+            if len(self._all_slots()) >= self.max_total_slots:
+                return None, evicted
+        slot_root.mkdir(parents=True, exist_ok=True)
+        used = {path.name for path in self._existing_slots(slot_root)}
+        number = next(number for number in range(1, len(used) + 2) if f"slot-{number}" not in used)
+        slot_dir = slot_root / f"slot-{number}"
+        slot_dir.mkdir(parents=True, exist_ok=True)
+        return self._try_acquire_slot(slot_key, slot_dir, build_id, log, repo_url, branch_name), evicted
+
+    def _seed_slot(
+        self,
+        lease: WorkspaceSlotLease,
+        build_id: str,
+        log,
+        *,
+        repo_url: str,
+        branch_name: str,
+        should_cancel=None,
+    ) -> None:
+        """Copy the checkout of the best idle slot of the same repository into a new slot.
+
+        Idle slots of the same key come first, then the same branch, then the
+        most recently used. Repository and branch are compared as recorded in
+        the state store, not parsed back out of slot keys. Leased slots are
+        never copied: their build may be writing to them. The template stays
+        locked while it is copied, so it can be neither leased nor evicted
+        meanwhile.
+        """
+        if not self.clone_slots:
+            return
+        slots = [
+            slot_dir
+            for slot_dir in self._all_slots()
+            if slot_dir != lease.slot_dir and (slot_dir / "repo" / ".git").is_dir()
+        ]
+        states = self.state_store.slot_states(slots)
+        candidates = [slot_dir for slot_dir in slots if slot_dir in states and states[slot_dir].repo_url == repo_url]
+        candidates.sort(
+            key=lambda path: (
+                path.parent.name == lease.slot_key,
+                states[path].branch_name == branch_name,
+                states[path].last_used_at,
+            ),
+            reverse=True,
+        )
+        for template in candidates:
+            lock = FileLock(str(template / ".lease.lock"), timeout=SLOT_LOCK_TIMEOUT)
+            try:
+                lock.acquire()
+            except Timeout:
+                continue
+            try:
+                started = time.monotonic()
+                method = clone_tree(template / "repo", lease.repo_dir, self.command_runner, should_cancel)
+            except OSError as exc:
+                log(f"[{build_id}] ⚠️ Could not copy workspace slot {template.parent.name}/{template.name}: {exc}")
+                return
+            finally:
+                lock.release()
+            state = states[template]
+            if state.commit_sha:
+                lease.record_state(
+                    commit_sha=state.commit_sha,
+                    flutter_version=state.flutter_version,
+                    fingerprints=state.fingerprints,
+                )
+            log(
+                f"[{build_id}] 🐑 Seeded {lease.slot_id} from {template.parent.name}/{template.name} "
+                f"({method}, {time.monotonic() - started:.1f}s)"
+            )
+            return
+
+    def _slot_released(self) -> None:
+        with self._condition:
+            self._releases += 1
+            self._condition.notify_all()
+            evicted: list[Path] = []
+            if self.disk_budget_bytes:
+                evicted = self._evict_idle_slots(self._over_disk_budget)
+        if evicted:
+            logger.info(f"🧹 Evicted {len(evicted)} idle workspace slot(s) to stay within the disk budget")
+        self._purge(evicted)
+
+    def _over_disk_budget(self, remaining: list[Path]) -> bool:
+        states = self.state_store.slot_states(remaining)
+        return sum(state.disk_bytes for state in states.values()) > self.disk_budget_bytes
+
+    def _wait_for_release(self, releases: int, timeout: float, should_cancel) -> bool:
+        """Sleep until a lease is released, cancellation or ``timeout``; returns True when canceled."""
+
+        def wake() -> None:
+            with self._condition:
+                self._condition.notify_all()
+
+        unregister = on_cancel(should_cancel, wake)
+        try:
+            with self._condition:
+                if self._releases == releases and not (should_cancel and should_cancel()):
+                    self._condition.wait(timeout)
+        finally:
+            unregister()
+        return bool(should_cancel and should_cancel())
+
+    def _evict_idle_slots(self, over_budget: Callable[[list[Path]], bool]) -> list[Path]:
+        """Detach least recently used unleased slots until ``over_budget`` is satisfied.
+
+        Must be called with ``_condition`` held. Slots are only renamed here;
+        the returned directories are deleted by ``_purge`` outside the lock.
+        """
+        remaining = self._all_slots()
+        states = self.state_store.slot_states(remaining)
+        evicted: list[Path] = []
+        for slot_dir in sorted(remaining, key=lambda path: states.get(path, WorkspaceSlotState()).last_used_at):
+            if not over_budget(remaining):
+                break
+            detached = self._detach_idle_slot(slot_dir)
+            if detached is not None:
+                remaining.remove(slot_dir)
+                evicted.append(detached)
+        return evicted
+
+    def _detach_idle_slot(self, slot_dir: Path) -> Path | None:
+        lock = FileLock(str(slot_dir / ".lease.lock"), timeout=SLOT_LOCK_TIMEOUT)
+        try:
+            lock.acquire()
+        except Timeout:
+            return None
+        try:
+            token = hashlib.sha256(str(slot_dir).encode("utf-8")).hexdigest()[:10]
+            detached = slot_dir.parent.parent / f"{EVICTED_PREFIX}{token}-{time.time_ns()}"
+            slot_dir.rename(detached)
+        except OSError:
+            return None
+        finally:
+            lock.release()
+        self.state_store.forget_slot(slot_dir)
+        return detached
+
+    def _purge(self, evicted: list[Path]) -> None:
+        if not evicted:
+            return
+        # Also picks up slots detached by an eviction that was interrupted before deleting them.
+        for path in self._slots_root().glob(f"{EVICTED_PREFIX}*"):
+            shutil.rmtree(path, ignore_errors=True)
+
+    def _all_slots(self) -> list[Path]:
+        root = self._slots_root()
+        if not root.is_dir():
+            return []
+        return [path for path in root.glob("*/slot-*") if path.is_dir() and not path.parent.name.startswith(EVICTED_PREFIX)]
 
     def _existing_slots(self, slot_root: Path) -> list[Path]:
+        if not slot_root.is_dir():
+            return []
         return sorted(
             (path for path in slot_root.iterdir() if path.is_dir() and path.name.startswith("slot-")),
             key=lambda path: path.name,
         )
 
-    def _try_acquire_slot(self, slot_key: str, slot_dir: Path, build_id: str, log) -> WorkspaceSlotLease | None:
+    def _try_acquire_slot(
+        self, slot_key: str, slot_dir: Path, build_id: str, log, repo_url: str, branch_name: str
+    ) -> WorkspaceSlotLease | None:
         lock = FileLock(str(slot_dir / ".lease.lock"), timeout=SLOT_LOCK_TIMEOUT)
         try:
             lock.acquire()
@@ -103,20 +419,7 @@ class WorkspacePoolManager:
 
         repo_dir = slot_dir / "repo"
         repo_dir.mkdir(parents=True, exist_ok=True)
-        metadata = slot_dir / "lease.json"
-        metadata.write_text(
-            json.dumps(
-                {
-                    "build_id": build_id,
-                    "slot_key": slot_key,
-                    "slot_id": slot_dir.name,
-                    "leased_at": time.time(),
-                },
-                ensure_ascii=True,
-                indent=2,
-            ),
-            encoding="utf-8",
-        )
+        self.state_store.record_lease(slot_dir, build_id, repo_url=repo_url, branch_name=branch_name)
         log(f"[{build_id}] 🧩 Workspace slot acquired: {slot_key}/{slot_dir.name}")
         return WorkspaceSlotLease(
             slot_key=slot_key,
@@ -124,10 +427,14 @@ class WorkspacePoolManager:
             repo_dir=repo_dir,
             slot_id=slot_dir.name,
             _lock=lock,
+            _pool=self,
         )
 
+    def _slots_root(self) -> Path:
+        return get_shared_cache_dir() / "slots"
+
     def _slot_root(self, slot_key: str) -> Path:
-        return get_shared_cache_dir() / "slots" / slot_key
+        return self._slots_root() / slot_key
 
     def _slot_key(
         self,
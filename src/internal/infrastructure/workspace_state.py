@@ -0,0 +1,300 @@
+"""SQLite index of workspace slot, branch and Flutter SDK state shared by every build on this machine."""
+
+from __future__ import annotations
+
+import json
+import sqlite3
+import threading
+import time
+from contextlib import closing, contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+
+STATE_DB_NAME = "workspace_state.sqlite3"
+BUSY_TIMEOUT_SECONDS = 30.0
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS slots (
+    slot_dir TEXT PRIMARY KEY,
+    slot_key TEXT NOT NULL,
+    slot_id TEXT NOT NULL,
+    repo_url TEXT,
+    branch_name TEXT,
+    commit_sha TEXT,
+    flutter_version TEXT,
+    fingerprints TEXT NOT NULL DEFAULT '{}',
+    last_used_at REAL NOT NULL DEFAULT 0,
+    disk_bytes INTEGER NOT NULL DEFAULT 0,
+    lease_build_id TEXT,
+    leased_at REAL
+);
+CREATE INDEX IF NOT EXISTS slots_by_key ON slots (slot_key);
+CREATE TABLE IF NOT EXISTS branches (
+    repo_url TEXT NOT NULL,
+    branch_name TEXT NOT NULL,
+    flutter_version TEXT,
+    commit_sha TEXT,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (repo_url, branch_name)
+);
+CREATE TABLE IF NOT EXISTS flutter_sdks (
+    version TEXT PRIMARY KEY,
+    path TEXT NOT NULL,
+    precached TEXT NOT NULL DEFAULT '[]',
+    disk_bytes INTEGER NOT NULL DEFAULT 0,
+    last_used_at REAL NOT NULL DEFAULT 0
+);
+"""
+# Columns added after the first release; databases created before them get them on open.
+SLOT_COLUMNS_ADDED = {"repo_url": "TEXT", "branch_name": "TEXT"}
+
+
+@dataclass
+class WorkspaceSlotState:
+    """What a slot's checkout looked like after its last build."""
+
+    commit_sha: Optional[str] = None
+    flutter_version: Optional[str] = None
+    fingerprints: Dict[str, str] = field(default_factory=dict)
+    last_used_at: float = 0.0
+    # Measured when the lease is released, only while a disk budget is configured.
+    disk_bytes: int = 0
+    # Unsanitized, as the build asked for them; slot keys are lossy.
+    repo_url: Optional[str] = None
+    branch_name: Optional[str] = None
+
+    @classmethod
+    def from_row(cls, row: sqlite3.Row) -> "WorkspaceSlotState":
+        return cls(
+            commit_sha=row["commit_sha"],
+            flutter_version=row["flutter_version"],
+            fingerprints=json.loads(row["fingerprints"] or "{}"),
+            last_used_at=row["last_used_at"],
+            disk_bytes=row["disk_bytes"],
+            repo_url=row["repo_url"],
+            branch_name=row["branch_name"],
+        )
+
+
+@dataclass
+class FlutterSdkState:
+    """An installed FVM SDK version and what has been precached into it."""
+
+    version: str
+    path: str
+    precached: List[str] = field(default_factory=list)
+    disk_bytes: int = 0
+    last_used_at: float = 0.0
+
+    @classmethod
+    def from_row(cls, row: sqlite3.Row) -> "FlutterSdkState":
+        return cls(
+            version=row["version"],
+            path=row["path"],
+            precached=json.loads(row["precached"] or "[]"),
+            disk_bytes=row["disk_bytes"],
+            last_used_at=row["last_used_at"],
+        )
+
+
+class WorkspaceStateStore:
+    """One table row per slot and per repo/branch instead of JSON files next to each checkout.
+
+    Lookups by slot or branch are indexed, a prepare reads and writes each
+    table once, and ``snapshot`` shows the whole pool without walking slot
+    directories. Connections are opened per operation; WAL mode lets builds
+    read while another process writes.
+    """
+
+    def __init__(self, path: Path | Callable[[], Path]) -> None:
+        self._path = path
+        self._initialized: set[Path] = set()
+        self._init_lock = threading.Lock()
+
+    @property
+    def path(self) -> Path:
+        return self._path() if callable(self._path) else self._path
+
+    def slot_state(self, slot_dir: Path) -> WorkspaceSlotState:
+        return self.slot_states([slot_dir]).get(slot_dir, WorkspaceSlotState())
+
+    def slot_states(self, slot_dirs: Iterable[Path]) -> Dict[Path, WorkspaceSlotState]:
+        by_key = {str(slot_dir): slot_dir for slot_dir in slot_dirs}
+        if not by_key:
+            return {}
+        with self._connect() as connection:
+            rows = connection.execute(
+                f"SELECT * FROM slots WHERE slot_dir IN ({','.join('?' * len(by_key))})",
+                list(by_key),
+            ).fetchall()
+        return {by_key[row["slot_dir"]]: WorkspaceSlotState.from_row(row) for row in rows}
+
+    def record_slot(
+        self,
+        slot_dir: Path,
+        state: WorkspaceSlotState,
+        *,
+        repo_url: Optional[str] = None,
+        branch_name: Optional[str] = None,
+    ) -> None:
+        """Store the slot's checkout state, and the branch's Flutter version when given, in one transaction."""
+        with self._connect() as connection:
+            connection.execute(
+                """
+                INSERT INTO slots (slot_dir, slot_key, slot_id, commit_sha, flutter_version, fingerprints, last_used_at, disk_bytes)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (slot_dir) DO UPDATE SET
+                    commit_sha = excluded.commit_sha,
+                    flutter_version = excluded.flutter_version,
+                    fingerprints = excluded.fingerprints,
+                    last_used_at = excluded.last_used_at
+                """,
+                (
+                    str(slot_dir),
+                    slot_dir.parent.name,
+                    slot_dir.name,
+                    state.commit_sha,
+                    state.flutter_version,
+                    json.dumps(state.fingerprints, sort_keys=True),
+                    state.last_used_at,
+                    state.disk_bytes,
+                ),
+            )
+            if repo_url is not None and branch_name is not None and state.flutter_version:
+                connection.execute(
+                    """
+                    INSERT INTO branches (repo_url, branch_name, flutter_version, commit_sha, updated_at)
+                    VALUES (?, ?, ?, ?, ?)
+                    ON CONFLICT (repo_url, branch_name) DO UPDATE SET
+                        flutter_version = excluded.flutter_version,
+                        commit_sha = excluded.commit_sha,
+                        updated_at = excluded.updated_at
+                    """,
+                    (repo_url, branch_name, state.flutter_version, state.commit_sha, time.time()),
+                )
+
+    def record_lease(
+        self,
+        slot_dir: Path,
+        build_id: str,
+        *,
+        repo_url: Optional[str] = None,
+        branch_name: Optional[str] = None,
+    ) -> None:
+        """Mark the slot leased by ``build_id``; ``repo_url``/``branch_name`` are kept when not given."""
+        with self._connect() as connection:
+            connection.execute(
+                """
+                INSERT INTO slots (slot_dir, slot_key, slot_id, repo_url, branch_name, lease_build_id, leased_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (slot_dir) DO UPDATE SET
+                    repo_url = COALESCE(excluded.repo_url, repo_url),
+                    branch_name = COALESCE(excluded.branch_name, branch_name),
+                    lease_build_id = excluded.lease_build_id,
+                    leased_at = excluded.leased_at
+                """,
+                (str(slot_dir), slot_dir.parent.name, slot_dir.name, repo_url, branch_name, build_id, time.time()),
+            )
+
+    def clear_lease(self, slot_dir: Path, *, disk_bytes: Optional[int] = None, build_id: Optional[str] = None) -> None:
+        """Mark the slot free; slots that hold a checkout (or were measured) count as used now.
+
+        With ``build_id`` the lease is only cleared while that build still holds it.
+        """
+        with self._connect() as connection:
+            connection.execute(
+                """
+                UPDATE slots SET
+                    lease_build_id = NULL,
+                    leased_at = NULL,
+                    last_used_at = CASE WHEN commit_sha IS NOT NULL OR ? IS NOT NULL THEN ? ELSE last_used_at END,
+                    disk_bytes = COALESCE(?, disk_bytes)
+                WHERE slot_dir = ? AND (? IS NULL OR lease_build_id = ?)
+                """,
+                (disk_bytes, time.time(), disk_bytes, str(slot_dir), build_id, build_id),
+            )
+
+    def leases(self) -> Dict[Path, str]:
+        """Build id of every slot recorded as leased."""
+        with self._connect() as connection:
+            rows = connection.execute("SELECT slot_dir, lease_build_id FROM slots WHERE lease_build_id IS NOT NULL").fetchall()
+        return {Path(row["slot_dir"]): row["lease_build_id"] for row in rows}
+
+    def forget_slot(self, slot_dir: Path) -> None:
+        with self._connect() as connection:
+            connection.execute("DELETE FROM slots WHERE slot_dir = ?", (str(slot_dir),))
+
+    def branch_flutter_version(self, repo_url: str, branch_name: str) -> Optional[str]:
+        with self._connect() as connection:
+            row = connection.execute(
+                "SELECT flutter_version FROM branches WHERE repo_url = ? AND branch_name = ?",
+                (repo_url, branch_name),
+            ).fetchone()
+        return row["flutter_version"] if row is not None else None
+
+    def leased_flutter_versions(self) -> set[str]:
+        """Flutter versions recorded for leased slots; rows of dead builds go at startup (``clear_stale_leases``)."""
+        with self._connect() as connection:
+            rows = connection.execute(
+                "SELECT DISTINCT flutter_version FROM slots WHERE lease_build_id IS NOT NULL AND flutter_version IS NOT NULL"
+            ).fetchall()
+        return {row["flutter_version"] for row in rows}
+
+    def sdk_states(self) -> Dict[str, FlutterSdkState]:
+        with self._connect() as connection:
+            rows = connection.execute("SELECT * FROM flutter_sdks").fetchall()
+        return {row["version"]: FlutterSdkState.from_row(row) for row in rows}
+
+    def record_sdk(self, state: FlutterSdkState) -> None:
+        with self._connect() as connection:
+            connection.execute(
+                """
+                INSERT INTO flutter_sdks (version, path, precached, disk_bytes, last_used_at)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT (version) DO UPDATE SET
+                    path = excluded.path,
+                    precached = excluded.precached,
+                    disk_bytes = excluded.disk_bytes,
+                    last_used_at = excluded.last_used_at
+                """,
+                (state.version, state.path, json.dumps(sorted(state.precached)), state.disk_bytes, state.last_used_at),
+            )
+
+    def forget_sdk(self, version: str) -> None:
+        with self._connect() as connection:
+            connection.execute("DELETE FROM flutter_sdks WHERE version = ?", (version,))
+
+    def snapshot(self) -> Dict[str, List[Dict[str, Any]]]:
+        """Every slot, branch and Flutter SDK row, for operators."""
+        with self._connect() as connection:
+            slots = connection.execute("SELECT * FROM slots ORDER BY slot_key, slot_id").fetchall()
+            branches = connection.execute("SELECT * FROM branches ORDER BY repo_url, branch_name").fetchall()
+            sdks = connection.execute("SELECT * FROM flutter_sdks ORDER BY version").fetchall()
+        return {
+            "slots": [{**dict(row), "fingerprints": json.loads(row["fingerprints"] or "{}")} for row in slots],
+            "branches": [dict(row) for row in branches],
+            "flutter_sdks": [{**dict(row), "precached": json.loads(row["precached"] or "[]")} for row in sdks],
+        }
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        path = self.path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with closing(sqlite3.connect(str(path), timeout=BUSY_TIMEOUT_SECONDS)) as connection:
+            connection.row_factory = sqlite3.Row
+            self._ensure_schema(path, connection)
+            with connection:
+                yield connection
+
+    def _ensure_schema(self, path: Path, connection: sqlite3.Connection) -> None:
+        with self._init_lock:
+            if path in self._initialized:
+                return
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.executescript(SCHEMA)
+            columns = {row["name"] for row in connection.execute("PRAGMA table_info(slots)")}
+            for name, declaration in SLOT_COLUMNS_ADDED.items():
+                if name not in columns:
+                    connection.execute(f"ALTER TABLE slots ADD COLUMN {name} {declaration}")
+            self._initialized.add(path)
@@ -17,6 +17,16 @@ __all__ = [
     "CancelBuildResponse",
     "RootResponse",
     "CleanupResponse",
+    "AgentLeaseRequest",
+    "AgentLeaseResponse",
+    "AgentEventsRequest",
+    "AgentAckResponse",
+    "AgentInfo",
+    "AgentsResponse",
     "DiagnosticItem",
     "DiagnosticsResponse",
+    "WorkspaceSlotInfo",
+    "WorkspaceBranchInfo",
+    "FlutterSdkInfo",
+    "WorkspaceStateResponse",
 ]
@@ -17,4 +17,6 @@ class BuildPipelineRequestDto:
     build_name: Optional[str] = None
     build_number: Optional[str] = None
     branch_name: Optional[str] = None
+    priority: int = 0
+    commit_sha: Optional[str] = None
 
@@ -32,11 +32,22 @@ class BuildRequest(BaseModel):
         description="branch name 설정 (e.g. develop, feature/update-version)",
         example="develop"
     )
+    priority: int = Field(
+        default=0,
+        description="큐 우선순위 (높을수록 먼저 실행, 같으면 요청 순서)",
+        example=0
+    )
+    commit_sha: Optional[str] = Field(
+        default=None,
+        description="빌드할 커밋 SHA (지정하면 브랜치 최신 커밋 대신 이 커밋을 빌드)",
+        example=None
+    )
 
     @field_validator(
         "build_name",
         "build_number",
         "branch_name",
+        "commit_sha",
         mode="before",
     )
     @classmethod
@@ -81,6 +92,13 @@ class BuildStatusResponse(BaseModel):
     cancel_reason: Optional[str] = None
     cancel_requested_at: Optional[str] = None
     canceled_at: Optional[str] = None
+    assigned_agent: Optional[str] = None
+    priority: int = 0
+    target_commit: Optional[str] = None
+    commit_sha: Optional[str] = None
+    slot_id: Optional[str] = None
+    retry_of: Optional[str] = None
+    resume_from_stage: Optional[str] = None
     queue_key: Optional[str] = None
     platform_statuses: Dict = Field(default_factory=dict)
     processes: Dict
@@ -110,6 +128,13 @@ class BuildSummary(BaseModel):
     cancel_reason: Optional[str] = None
     cancel_requested_at: Optional[str] = None
     canceled_at: Optional[str] = None
+    assigned_agent: Optional[str] = None
+    priority: int = 0
+    target_commit: Optional[str] = None
+    commit_sha: Optional[str] = None
+    slot_id: Optional[str] = None
+    retry_of: Optional[str] = None
+    resume_from_stage: Optional[str] = None
     queue_key: Optional[str] = None
     platform_statuses: Dict = Field(default_factory=dict)
     stages: List[Dict] = Field(default_factory=list)
@@ -150,6 +175,44 @@ class CleanupResponse(BaseModel):
     message: str
 
 
+class AgentLeaseRequest(BaseModel):
+    """빌드 에이전트 작업 요청 모델"""
+    agent_id: str
+    labels: List[str] = Field(default_factory=list)
+    wait_seconds: float = Field(default=25.0, ge=0, le=60)
+
+
+class AgentLeaseResponse(BaseModel):
+    """빌드 에이전트 작업 할당 응답 모델"""
+    lease: Optional[Dict] = None
+
+
+class AgentEventsRequest(BaseModel):
+    """빌드 에이전트 로그/스테이지 이벤트 모델"""
+    agent_id: str
+    log_entries: List[Dict] = Field(default_factory=list)
+    state: Dict = Field(default_factory=dict)
+
+
+class AgentAckResponse(BaseModel):
+    """빌드 에이전트 이벤트 수신 응답 모델"""
+    accepted: bool
+    cancel_requested: bool = False
+
+
+class AgentInfo(BaseModel):
+    agent_id: str
+    labels: List[str]
+    last_seen: str
+    active_builds: List[str] = Field(default_factory=list)
+
+
+class AgentsResponse(BaseModel):
+    """등록된 빌드 에이전트 목록 응답 모델"""
+    agents: List[AgentInfo]
+    pending_builds: int = 0
+
+
 class DiagnosticItem(BaseModel):
     feature: str
     ready: bool
@@ -159,3 +222,39 @@ class DiagnosticItem(BaseModel):
 
 class DiagnosticsResponse(BaseModel):
     diagnostics: Dict[str, DiagnosticItem]
+
+
+class WorkspaceSlotInfo(BaseModel):
+    slot_dir: str
+    slot_key: str
+    slot_id: str
+    commit_sha: Optional[str] = None
+    flutter_version: Optional[str] = None
+    fingerprints: Dict[str, str] = Field(default_factory=dict)
+    last_used_at: float = 0.0
+    disk_bytes: int = 0
+    lease_build_id: Optional[str] = None
+    leased_at: Optional[float] = None
+
+
+class WorkspaceBranchInfo(BaseModel):
+    repo_url: str
+    branch_name: str
+    flutter_version: Optional[str] = None
+    commit_sha: Optional[str] = None
+    updated_at: float
+
+
+class FlutterSdkInfo(BaseModel):
+    version: str
+    path: str
+    precached: List[str] = Field(default_factory=list)
+    disk_bytes: int = 0
+    last_used_at: float = 0.0
+
+
+class WorkspaceStateResponse(BaseModel):
+    """워크스페이스 슬롯/브랜치/Flutter SDK 상태 조회 응답 모델"""
+    slots: List[WorkspaceSlotInfo]
+    branches: List[WorkspaceBranchInfo]
+    flutter_sdks: List[FlutterSdkInfo] = Field(default_factory=list)
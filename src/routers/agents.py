@@ -0,0 +1,62 @@
+"""Coordinator routes used by remote build agents."""
+
+from __future__ import annotations
+
+from fastapi import APIRouter, Depends
+
+from ..core.dependencies import get_build_coordinator
+from ..internal.application import BuildCoordinator
+from ..models import (
+    AgentAckResponse,
+    AgentEventsRequest,
+    AgentLeaseRequest,
+    AgentLeaseResponse,
+    AgentsResponse,
+)
+
+
+router = APIRouter(prefix="/agents", tags=["Build Agents"])
+
+
+@router.get("", response_model=AgentsResponse)
+def list_agents(coordinator: BuildCoordinator = Depends(get_build_coordinator)) -> AgentsResponse:
+    return {
+        "agents": coordinator.agents(),
+        "pending_builds": coordinator.dispatcher.pending_count(),
+    }
+
+
+# Long-polling endpoints are sync so FastAPI runs them in its threadpool
+# instead of blocking the event loop while waiting for work.
+@router.post("/lease", response_model=AgentLeaseResponse)
+def lease_build(
+    body: AgentLeaseRequest,
+    coordinator: BuildCoordinator = Depends(get_build_coordinator),
+) -> AgentLeaseResponse:
+    return {"lease": coordinator.lease(body.agent_id, body.labels, body.wait_seconds)}
+
+
+@router.post("/builds/{build_id}/events", response_model=AgentAckResponse)
+def record_build_events(
+    build_id: str,
+    body: AgentEventsRequest,
+    coordinator: BuildCoordinator = Depends(get_build_coordinator),
+) -> AgentAckResponse:
+    return coordinator.record_events(
+        build_id,
+        body.agent_id,
+        {"log_entries": body.log_entries, "state": body.state},
+    )
+
+
+@router.post("/builds/{build_id}/complete", response_model=AgentAckResponse)
+def complete_build(
+    build_id: str,
+    body: AgentEventsRequest,
+    coordinator: BuildCoordinator = Depends(get_build_coordinator),
+) -> AgentAckResponse:
+    return coordinator.complete(
+        build_id,
+        body.agent_id,
+        {"log_entries": body.log_entries, "state": body.state},
+    )
@@ -4,7 +4,7 @@ from __future__ import annotations
 
 from typing import Optional
 
-from fastapi import APIRouter, Depends, Form, HTTPException
+from fastapi import APIRouter, Depends, Form, HTTPException, Query
 from pydantic import ValidationError
 
 from ..core.dependencies import get_build_service, get_settings
@@ -75,6 +75,24 @@ async def cancel_build(
     }
 
 
+@router.post("/build/{build_id}/retry", response_model=ManualBuildResponse, tags=["Manual Build"])
+async def retry_build(
+    build_id: str,
+    from_stage: Optional[str] = Query(
+        None,
+        description="다시 시작할 stage (예: ios_build). 비우면 처음 완료되지 않은 stage부터",
+    ),
+    build_service: BuildService = Depends(get_build_service),
+) -> ManualBuildResponse:
+    try:
+        retry_build_id = build_service.retry_build(build_id, from_stage)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+    if not retry_build_id:
+        raise HTTPException(status_code=404, detail="Build not found")
+    return {"status": "retry queued", "build_id": retry_build_id}
+
+
 @router.post("/build/shorebird", response_model=ManualBuildResponse, tags=["Manual Build"])
 async def manual_shorebird_build(
     flavor: str = Form("", description="flavor 설정. 비우면 SHOREBIRD_PATCH_FLAVOR 또는 prod 사용. dev, stg, stage, prd, prod 지원"),
@@ -133,6 +151,7 @@ async def manual_build(
     build_name: Optional[str] = Form("", description="build name 설정"),
     build_number: Optional[str] = Form("", description="build number 설정"),
     branch_name: Optional[str] = Form("", description="branch name 설정"),
+    priority: int = Form(0, description="큐 우선순위 (높을수록 먼저 실행)"),
     build_service: BuildService = Depends(get_build_service),
 ) -> ManualBuildResponse:
     try:
@@ -142,6 +161,7 @@ async def manual_build(
             build_name=build_name,
             build_number=build_number,
             branch_name=branch_name,
+            priority=priority,
         )
     except ValidationError as exc:
         raise HTTPException(status_code=422, detail=exc.errors()) from exc
@@ -155,6 +175,8 @@ async def manual_build(
                 build_name=request_model.build_name,
                 build_number=request_model.build_number,
                 branch_name=request_model.branch_name,
+                priority=request_model.priority,
+                commit_sha=request_model.commit_sha,
             )
         )
     except ValueError as exc:
@@ -3,9 +3,11 @@
 from __future__ import annotations
 
 from fastapi import APIRouter, Depends
+from fastapi.responses import PlainTextResponse
 
-from ..core.dependencies import get_diagnostics
+from ..core.dependencies import get_build_service, get_diagnostics
 from ..models import DiagnosticsResponse, RootResponse
+from ..services.build_pipeline_service import BuildService
 
 
 router = APIRouter(tags=["Health Check"])
@@ -31,3 +33,38 @@ async def runtime_diagnostics(diagnostics=Depends(get_diagnostics)) -> Diagnosti
         }
     }
 
+
+
+def _render_metrics(metrics: dict) -> str:
+    lines = ["# TYPE ci_builds gauge"]
+    lines += [f'ci_builds{{status="{status}"}} {count}' for status, count in metrics["builds"].items()]
+    lines += ["# TYPE ci_builds_queued gauge", f"ci_builds_queued {metrics['queued']}"]
+    output = metrics["output"]
+    lines += ["# TYPE ci_build_output_queue_depth gauge", f"ci_build_output_queue_depth {output['depth']}"]
+    lines += ["# TYPE ci_build_output_queue_max_depth gauge", f"ci_build_output_queue_max_depth {output['max_depth']}"]
+    for name in ("lines", "coalesced", "dropped"):
+        lines += [f"# TYPE ci_build_output_{name}_total counter", f"ci_build_output_{name}_total {output[name]}"]
+    lines += ["# TYPE ci_build_cgroups_enabled gauge", f"ci_build_cgroups_enabled {int(metrics['cgroups_enabled'])}"]
+    if not metrics["cgroups_enabled"]:
+        return "\n".join(lines) + "\n"
+
+    if metrics.get("memory_pressure") is not None:
+        lines += ["# TYPE ci_build_memory_pressure gauge", f"ci_build_memory_pressure {metrics['memory_pressure']}"]
+    lines += ["# TYPE ci_build_cgroup_completed_total counter", f"ci_build_cgroup_completed_total {metrics['completed_builds']}"]
+    for name, value in metrics["totals"].items():
+        if name.startswith("memory_"):
+            continue
+        lines += [f"# TYPE ci_build_{name}_total counter", f"ci_build_{name}_total {value}"]
+    for name in ("cpu_user_seconds", "cpu_system_seconds", "memory_current_bytes", "memory_peak_bytes"):
+        lines.append(f"# TYPE ci_running_build_{name} gauge")
+        lines += [
+            f'ci_running_build_{name}{{build_id="{build_id}"}} {usage[name]}'
+            for build_id, usage in metrics["running"].items()
+        ]
+    return "\n".join(lines) + "\n"
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def metrics(build_service: BuildService = Depends(get_build_service)) -> str:
+    """Prometheus text exposition of build counts and per-build cgroup usage."""
+    return _render_metrics(build_service.resource_metrics())
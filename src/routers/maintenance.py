@@ -6,9 +6,10 @@ import threading
 
 from fastapi import APIRouter, Depends
 
-from ..core.dependencies import get_settings
+from ..core.dependencies import get_build_service, get_settings
 from ..core.settings import AppSettings
-from ..models import CleanupResponse
+from ..models import CleanupResponse, WorkspaceStateResponse
+from ..services.build_pipeline_service import BuildService
 from ..utils.cleanup import manual_cleanup
 
 
@@ -33,3 +34,9 @@ async def trigger_manual_cleanup(settings: AppSettings = Depends(get_settings))
             "message": f"Failed to start cleanup: {exc}",
         }
 
+
+
+@router.get("/workspace/state", response_model=WorkspaceStateResponse)
+async def workspace_state(build_service: BuildService = Depends(get_build_service)) -> WorkspaceStateResponse:
+    """Workspace slots (checkout, Flutter version, lease holder), per-branch state and installed Flutter SDKs."""
+    return build_service.workspace_state()
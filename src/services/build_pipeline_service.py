@@ -2,38 +2,78 @@
 
 from __future__ import annotations
 
+from dataclasses import asdict
+from typing import List, Optional
+
 from ..internal.application import (
+    BuildCoordinator,
     BuildEnvironmentAssembler,
     BuildOrchestrator,
+    BuildQueueStore,
     BuildRepository,
     BuildStatusPresenter,
     BuildRequestValidator,
     ConfigDiagnostics,
+    JobDispatcher,
     VersionResolver,
 )
-from ..internal.domain import BuildRequestData
-from ..internal.infrastructure import CommandRunner, RepositoryWorkspaceManager, SetupExecutor
+from ..internal.core.config import get_prewarm_platforms
+from ..internal.core.queue_manager import queue_manager
+from ..internal.domain import PREWARM_TRIGGER_SOURCE, BuildRequestData
+from ..internal.infrastructure import CgroupManager, CommandRunner, RepositoryWorkspaceManager, SetupExecutor
 from ..models import BuildPipelineRequestDto
 
+# Real builds queued at the same time go first.
+PREWARM_PRIORITY = -10
+
 
 class BuildService:
     """Facade kept for existing route and webhook integrations."""
 
-    def __init__(self, config_diagnostics: ConfigDiagnostics | None = None) -> None:
-        command_runner = CommandRunner()
+    def __init__(
+        self,
+        config_diagnostics: ConfigDiagnostics | None = None,
+        dispatcher: JobDispatcher | None = None,
+        repository=None,
+        command_runner: CommandRunner | None = None,
+        cgroups: CgroupManager | None = None,
+        queue_store: BuildQueueStore | None = None,
+    ) -> None:
+        command_runner = command_runner or CommandRunner()
         diagnostics = config_diagnostics or ConfigDiagnostics()
+        self.cgroups = cgroups
+        self.workspace_manager = RepositoryWorkspaceManager(command_runner)
+        self.setup_executor = SetupExecutor(command_runner)
         self.orchestrator = BuildOrchestrator(
-            repository=BuildRepository(),
+            repository=repository or BuildRepository(),
             validator=BuildRequestValidator(),
             version_resolver=VersionResolver(),
             command_runner=command_runner,
             config_diagnostics=diagnostics,
-            environment_assembler=BuildEnvironmentAssembler(
-                RepositoryWorkspaceManager(command_runner)
-            ),
-            setup_executor=SetupExecutor(command_runner),
+            environment_assembler=BuildEnvironmentAssembler(self.workspace_manager),
+            setup_executor=self.setup_executor,
             status_presenter=BuildStatusPresenter(),
+            dispatcher=dispatcher,
+            queue_store=queue_store,
+            cgroups=self.cgroups,
         )
+        self.coordinator = BuildCoordinator(self.orchestrator, dispatcher) if dispatcher is not None else None
+
+    def start(self) -> None:
+        """Hook into process-wide state; called once at startup, not at import."""
+        self.workspace_manager.workspace_pool.clear_stale_leases()
+        if self.cgroups is not None:
+            # Hold back queued builds while running ones are under memory pressure.
+            queue_manager.worker_pool.admission = self.cgroups.admit
+        if self.coordinator is not None:
+            self.coordinator.start()
+
+    def stop(self) -> None:
+        if self.coordinator is not None:
+            self.coordinator.stop()
+        if self.cgroups is not None and queue_manager.worker_pool.admission == self.cgroups.admit:
+            queue_manager.worker_pool.admission = None
+        self.setup_executor.close()
 
     def start_build_pipeline(self, request: BuildPipelineRequestDto) -> str:
         request = BuildRequestData(
@@ -44,9 +84,41 @@ class BuildService:
             build_name=request.build_name,
             build_number=request.build_number,
             branch_name=request.branch_name,
+            priority=request.priority,
+            commit_sha=request.commit_sha,
         )
         return self.orchestrator.start_build(request)
 
+    def start_prewarm(
+        self,
+        branch_name: str,
+        *,
+        flavor: str,
+        commit_sha: Optional[str] = None,
+        trigger_event_id: Optional[str] = None,
+    ) -> List[str]:
+        """Queue one pre-warm job per configured platform (slots are per platform)."""
+        return [
+            self.start_build_pipeline(
+                BuildPipelineRequestDto(
+                    flavor=flavor,
+                    platform=platform,
+                    trigger_source=PREWARM_TRIGGER_SOURCE,
+                    trigger_event_id=trigger_event_id,
+                    branch_name=branch_name,
+                    priority=PREWARM_PRIORITY,
+                    commit_sha=commit_sha,
+                )
+            )
+            for platform in get_prewarm_platforms()
+        ]
+
+    def retry_build(self, build_id: str, from_stage: str | None = None):
+        return self.orchestrator.retry_build(build_id, from_stage)
+
+    def recover_queued_builds(self, policy: str = "retry") -> int:
+        return self.orchestrator.recover_queued_builds(policy)
+
     def get_build_status(self, build_id: str):
         return self.orchestrator.get_build_status(build_id)
 
@@ -56,5 +128,15 @@ class BuildService:
     def cancel_build(self, build_id: str):
         return self.orchestrator.cancel_build(build_id)
 
+    def resource_metrics(self):
+        return self.orchestrator.resource_metrics()
+
+    def workspace_state(self):
+        state = self.workspace_manager.workspace_pool.state_store.snapshot()
+        # Also lists SDK versions installed in the FVM cache that no build has used yet.
+        sdks = self.workspace_manager.flutter_sdks.inventory()
+        state["flutter_sdks"] = [asdict(sdks[version]) for version in sorted(sdks)]
+        return state
+
 
 build_service = BuildService()
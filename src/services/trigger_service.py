@@ -9,6 +9,7 @@ import re
 from typing import Any, Dict, Optional
 
 from ..internal.application import WebhookPolicy
+from ..internal.infrastructure import GitMirrorPrefetcher
 from ..models import BuildPipelineRequestDto
 from .build_pipeline_service import BuildService, build_service
 
@@ -42,9 +43,11 @@ class GitHubActionService:
         self,
         build_service: BuildService | None = None,
         webhook_secret: Optional[str] = None,
+        mirror_prefetcher: GitMirrorPrefetcher | None = None,
     ) -> None:
         self.policy = WebhookPolicy()
         self.build_service = build_service or globals()["build_service"]
+        self.mirror_prefetcher = mirror_prefetcher
         self.verifier = HmacVerifier(webhook_secret or os.environ.get("GITHUB_WEBHOOK_SECRET"))
 
     def verify_signature(
@@ -60,16 +63,30 @@ class GitHubActionService:
         return False
 
     def handle(self, payload: Dict[str, Any], event_type: Optional[str], delivery_id: Optional[str]) -> Dict[str, str]:
+        pushed_branch = self.policy.pushed_branch(payload, event_type or "")
+        if pushed_branch and self.mirror_prefetcher is not None:
+            self.mirror_prefetcher.on_push(pushed_branch)
+
         trigger = self.policy.resolve(payload, event_type or "")
         if not trigger:
             return {"status": "ignored"}
 
+        if trigger.prewarm:
+            build_ids = self.build_service.start_prewarm(
+                trigger.branch_name,
+                flavor=trigger.flavor,
+                commit_sha=trigger.commit_sha,
+                trigger_event_id=delivery_id,
+            )
+            return {"status": "ok", "build_id": ",".join(build_ids)}
+
         build_id = self.build_service.start_build_pipeline(
             BuildPipelineRequestDto(
                 flavor=trigger.flavor,
                 platform=trigger.platform,
                 trigger_source="github",
                 trigger_event_id=delivery_id,
+                commit_sha=trigger.commit_sha,
             )
         )
         return {"status": "ok", "build_id": build_id}
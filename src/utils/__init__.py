@@ -3,10 +3,14 @@ Flutter CI/CD Server - Utils Package
 
 유틸리티 함수들
 - cleanup: 캐시 정리 스케줄러
+- prewarm: 워크스페이스 슬롯 사전 준비 스케줄러
 """
 from .cleanup import start_cleanup_scheduler, manual_cleanup
+from .prewarm import start_prewarm_scheduler, prewarm_branches
 
 __all__ = [
     "start_cleanup_scheduler", 
-    "manual_cleanup"
+    "manual_cleanup",
+    "start_prewarm_scheduler",
+    "prewarm_branches",
 ]
@@ -8,13 +8,14 @@ import time
 import shutil
 from datetime import datetime, timedelta
 from pathlib import Path
+from filelock import FileLock, Timeout
 from ..core.config import BUILDS_DIR, QUEUE_LOCKS_DIR, get_cache_cleanup_days
+from ..core.queue_manager import queue_manager
 import logging
 
 logger = logging.getLogger(__name__)
 
 # 상수 정의
-ORPHANED_LOCK_HOURS = 24  # 고아 락 파일 판정 시간 (시간)
 CLEANUP_SCHEDULE_TIME = "03:00"  # 정리 스케줄 시간
 SCHEDULER_CHECK_INTERVAL = 60  # 스케줄러 확인 간격 (초)
 
@@ -76,26 +77,33 @@ def cleanup_old_builds(days: int = None):
 
 def cleanup_orphaned_locks():
     """
-    고아 락 파일 정리
+    고아 락 정리
     
-    24시간 이상 된 락 파일은 고아로 간주하여 삭제합니다.
+    보유 프로세스가 죽었거나 하트비트가 TTL을 넘겨 끊긴 lease만 삭제합니다.
+    오래 실행 중인 빌드의 lease는 나이와 관계없이 유지됩니다.
+    이전 버전이 남긴 *.lock 파일은 아무도 잡고 있지 않을 때만 삭제합니다.
     """
     deleted_count = 0
     
     logger.info("🧹 Checking for orphaned lock files...")
     
     try:
+        for queue_key in queue_manager.lease_backend.purge_stale():
+            deleted_count += 1
+            logger.info(f"🗑️ Deleted stale lease: {queue_key}")
+            print(f"🗑️ Deleted stale lease: {queue_key}")
+        
         for lock_file in QUEUE_LOCKS_DIR.glob("*.lock"):
             try:
-                # 고아 락 파일 판정
-                lock_age = datetime.now() - datetime.fromtimestamp(lock_file.stat().st_mtime)
-                
-                if lock_age > timedelta(hours=ORPHANED_LOCK_HOURS):
+                # 다른 프로세스가 잡고 있으면 즉시 실패하므로 살아있는 락은 건드리지 않음
+                with FileLock(str(lock_file), timeout=0):
                     lock_file.unlink()
-                    deleted_count += 1
-                    logger.info(f"🗑️ Deleted orphaned lock: {lock_file.name}")
-                    print(f"🗑️ Deleted orphaned lock: {lock_file.name}")
+                deleted_count += 1
+                logger.info(f"🗑️ Deleted orphaned lock: {lock_file.name}")
+                print(f"🗑️ Deleted orphaned lock: {lock_file.name}")
                     
+            except Timeout:
+                continue
             except (OSError, PermissionError) as e:
                 logger.error(f"❌ Failed to delete lock {lock_file.name} (permission/OS error): {e}")
                 print(f"❌ Failed to delete lock {lock_file.name} (permission/OS error): {e}")
@@ -0,0 +1,68 @@
+"""
+Flutter CI/CD Server - Prewarm Scheduler Module
+
+설정된 브랜치의 워크스페이스 슬롯을 정해진 시각마다 미리 준비하는 스케줄러
+"""
+import schedule
+import time
+import logging
+from ..core.config import get_prewarm_branches, get_prewarm_schedule
+from ..internal.application import WebhookPolicy
+
+logger = logging.getLogger(__name__)
+
+SCHEDULER_CHECK_INTERVAL = 60  # 스케줄러 확인 간격 (초)
+
+
+def prewarm_branches(build_service, branches: list = None) -> list:
+    """
+    브랜치마다 사전 준비 작업을 큐에 넣음
+    
+    Args:
+        build_service: start_prewarm을 제공하는 빌드 서비스
+        branches: 대상 브랜치 목록. None이면 환경변수 사용
+    
+    Returns:
+        큐에 들어간 빌드 ID 목록
+    """
+    if branches is None:
+        branches = get_prewarm_branches()
+    
+    policy = WebhookPolicy()
+    build_ids = []
+    for branch_name in branches:
+        try:
+            build_ids.extend(build_service.start_prewarm(branch_name, flavor=policy.prewarm_flavor(branch_name)))
+        except Exception as e:
+            logger.error(f"❌ Failed to queue prewarm for {branch_name}: {e}")
+    
+    logger.info(f"🔥 Queued {len(build_ids)} prewarm job(s) for {', '.join(branches)}")
+    return build_ids
+
+
+def start_prewarm_scheduler(build_service, times: list = None):
+    """
+    사전 준비 스케줄러 시작
+    
+    정리 스케줄러와 섞이지 않도록 별도 Scheduler 인스턴스를 사용합니다.
+    
+    Args:
+        build_service: start_prewarm을 제공하는 빌드 서비스
+        times: 매일 실행할 HH:MM 목록. None이면 환경변수 사용
+    """
+    if times is None:
+        times = get_prewarm_schedule()
+    
+    scheduler = schedule.Scheduler()
+    for time_of_day in times:
+        scheduler.every().day.at(time_of_day).do(prewarm_branches, build_service)
+    
+    logger.info(f"🕒 Prewarm scheduler started (daily at {', '.join(times)})")
+    
+    while True:
+        try:
+            scheduler.run_pending()
+            time.sleep(SCHEDULER_CHECK_INTERVAL)
+        except Exception as e:
+            logger.error(f"❌ Prewarm scheduler error: {e}")
+            time.sleep(SCHEDULER_CHECK_INTERVAL)
@@ -4,7 +4,7 @@ import hashlib
 import hmac
 import os
 import unittest
-from unittest.mock import patch
+from unittest.mock import Mock, patch
 
 from src.models import BuildPipelineRequestDto
 from src.internal.application.webhook_policy import WebhookPolicy
@@ -36,6 +36,26 @@ class GitHubActionServiceTests(unittest.TestCase):
 
         self.assertEqual({"status": "ignored"}, result)
 
+    def test_handle_push_to_prewarm_branch_queues_prewarm_jobs(self) -> None:
+        build_service = Mock()
+        build_service.start_prewarm.return_value = ["prewarm-android", "prewarm-ios"]
+        mirror_prefetcher = Mock()
+        service = GitHubActionService(build_service=build_service, mirror_prefetcher=mirror_prefetcher)
+        payload = {"ref": "refs/heads/develop", "after": "0123456789abcdef0123456789abcdef01234567"}
+
+        with patch.dict(os.environ, {"PREWARM_BRANCHES": "develop", "DEV_BRANCH_NAME": "develop"}, clear=False):
+            result = service.handle(payload, "push", "delivery-2")
+
+        self.assertEqual({"status": "ok", "build_id": "prewarm-android,prewarm-ios"}, result)
+        build_service.start_prewarm.assert_called_once_with(
+            "develop",
+            flavor="dev",
+            commit_sha="0123456789abcdef0123456789abcdef01234567",
+            trigger_event_id="delivery-2",
+        )
+        build_service.start_build_pipeline.assert_not_called()
+        mirror_prefetcher.on_push.assert_called_once_with("develop")
+
 
 class WebhookPolicyTests(unittest.TestCase):
     def test_resolve_dev_for_merge_into_release_dev_prefix(self) -> None:
@@ -43,6 +63,7 @@ class WebhookPolicyTests(unittest.TestCase):
             "action": "closed",
             "pull_request": {
                 "merged": True,
+                "merge_commit_sha": "9f1c2d3e4b5a69788766554433221100ffeeddcc",
                 "base": {"ref": "release/dev-hotfix"},
                 "head": {"ref": "feature/offline-coupon"},
             },
@@ -52,6 +73,7 @@ class WebhookPolicyTests(unittest.TestCase):
 
         self.assertIsNotNone(trigger)
         self.assertEqual("dev", trigger.flavor)
+        self.assertEqual("9f1c2d3e4b5a69788766554433221100ffeeddcc", trigger.commit_sha)
 
     def test_resolve_returns_none_for_develop_to_main_merge(self) -> None:
         payload = {
@@ -67,6 +89,20 @@ class WebhookPolicyTests(unittest.TestCase):
 
         self.assertIsNone(trigger)
 
+    def test_resolve_push_only_prewarms_configured_branches(self) -> None:
+        with patch.dict(os.environ, {"PREWARM_BRANCHES": "develop,release/dev", "STAGE_BRANCH_NAME": "release/dev"}):
+            policy = WebhookPolicy()
+            trigger = policy.resolve({"ref": "refs/heads/release/dev", "after": "abc"}, "push")
+            other_branch = policy.resolve({"ref": "refs/heads/feature/x", "after": "abc"}, "push")
+            deleted = policy.resolve({"ref": "refs/heads/develop", "deleted": True}, "push")
+            tag = policy.resolve({"ref": "refs/tags/develop", "after": "abc"}, "push")
+
+        self.assertTrue(trigger.prewarm)
+        self.assertEqual(("stage", "release/dev", "abc"), (trigger.flavor, trigger.branch_name, trigger.commit_sha))
+        self.assertIsNone(other_branch)
+        self.assertIsNone(deleted)
+        self.assertIsNone(tag)
+
 
 class ShorebirdActionServiceTests(unittest.TestCase):
     def test_verify_signature_accepts_same_github_secret(self) -> None:
@@ -1,9 +1,14 @@
 from __future__ import annotations
 
+import os
+import tempfile
 import unittest
+from pathlib import Path
+from unittest.mock import patch
 
 from src.core.app import build_container
 from src.core.settings import AppSettings
+from src.internal.core.queue_manager import queue_manager
 
 
 class AppContainerTests(unittest.TestCase):
@@ -15,6 +20,42 @@ class AppContainerTests(unittest.TestCase):
             container.build_service.orchestrator.config_diagnostics,
         )
 
+    def test_threads_engine_is_the_default(self) -> None:
+        with patch.dict("os.environ", {}, clear=False):
+            os.environ.pop("EXECUTION_ENGINE", None)
+            container = build_container(AppSettings())
+
+        self.assertEqual("threads", container.settings.execution_engine)
+        self.assertIsNone(container.execution_engine)
+
+    def test_cgroup_admission_is_wired_on_start_not_at_construction(self) -> None:
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        # start() also tidies the workspace pool's lease rows.
+        patcher = patch("src.internal.infrastructure.workspace_pool.get_shared_cache_dir", return_value=Path(tmp.name))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        with patch("src.core.app.get_build_cgroup_enabled", return_value=True):
+            container = build_container(AppSettings())
+        self.addCleanup(container.build_service.stop)
+        cgroups = container.build_service.cgroups
+
+        self.assertIsNotNone(cgroups)
+        self.assertNotEqual(cgroups.admit, queue_manager.worker_pool.admission)
+        container.build_service.start()
+        self.assertEqual(cgroups.admit, queue_manager.worker_pool.admission)
+        container.build_service.stop()
+        self.assertIsNone(queue_manager.worker_pool.admission)
+
+    def test_stopping_the_build_service_closes_ruby_gem_helpers(self) -> None:
+        container = build_container(AppSettings())
+        toolchain = container.build_service.setup_executor.platform_toolchain
+
+        with patch.object(toolchain, "gem_helpers") as gem_helpers:
+            container.build_service.stop()
+
+        gem_helpers.close_all.assert_called_once_with()
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,154 @@
+from __future__ import annotations
+
+import os
+import threading
+import time
+import unittest
+
+from src.internal.infrastructure.async_execution import AsyncCommandRunner, AsyncExecutionEngine
+from src.internal.infrastructure.command_runner import (
+    CommandCancelledError,
+    CommandExecutionError,
+    CommandLimits,
+    CommandTimeoutError,
+    recording_usage,
+)
+from src.internal.infrastructure.output_pipeline import OUTPUT_DELIVERY_WORKERS
+
+
+class AsyncCommandRunnerTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.engine = AsyncExecutionEngine()
+        self.engine.start()
+        self.addCleanup(self.engine.stop)
+        self.runner = AsyncCommandRunner(self.engine)
+
+    def test_run_collects_output_and_checks_exit_code(self) -> None:
+        result = self.runner.run(["sh", "-c", "echo one; echo two >&2"], env=dict(os.environ), cwd=os.getcwd())
+
+        self.assertEqual(0, result.returncode)
+        self.assertEqual(["one", "two"], result.stdout.splitlines())
+        with self.assertRaises(CommandExecutionError):
+            self.runner.run(["sh", "-c", "exit 3"], env=dict(os.environ), cwd=os.getcwd())
+
+    def test_follow_output_streams_lines_before_wait_returns(self) -> None:
+        lines = []
+        process = self.runner.start(["sh", "-c", "echo a; echo b; exit 2"], env=dict(os.environ), cwd=os.getcwd())
+        self.runner.follow_output(process, lines.append)
+
+        returncode = self.runner.wait(process)
+
+        self.assertEqual(2, returncode)
+        self.assertEqual(2, process.returncode)
+        self.assertEqual(["a", "b"], lines)
+
+    def test_carriage_return_progress_frames_arrive_as_separate_lines(self) -> None:
+        lines = []
+        script = "printf 'Receiving objects:  50%% (1/2), 1.00 KiB\\rReceiving objects: 100%% (2/2), 2.00 MiB, done.\\r\\nok\\n'"
+
+        self.runner.run(["sh", "-c", script], env=dict(os.environ), cwd=os.getcwd(), on_line=lines.append)
+
+        self.assertEqual(
+            ["Receiving objects:  50% (1/2), 1.00 KiB", "Receiving objects: 100% (2/2), 2.00 MiB, done.", "ok"],
+            lines,
+        )
+
+    def test_should_stop_terminates_process_group(self) -> None:
+        stop = threading.Event()
+        threading.Timer(0.3, stop.set).start()
+        started = time.monotonic()
+
+        with self.assertRaises(CommandCancelledError):
+            self.runner.run(["sleep", "30"], env=dict(os.environ), cwd=os.getcwd(), should_stop=stop.is_set)
+
+        self.assertLess(time.monotonic() - started, 5)
+
+    def test_many_followed_commands_add_no_threads(self) -> None:
+        callback_threads = set()
+        before = threading.active_count()
+        processes = [
+            self.runner.start(["sh", "-c", "echo hi"], env=dict(os.environ), cwd=os.getcwd()) for _ in range(16)
+        ]
+        for process in processes:
+            # Followed output goes straight to the callback on the loop; callers pass a non-blocking sink.
+            self.runner.follow_output(process, lambda line: callback_threads.add(threading.current_thread()))
+
+        self.assertTrue(all(self.runner.wait(process) == 0 for process in processes))
+        self.assertEqual({self.engine._thread}, callback_threads)
+        self.assertLessEqual(threading.active_count(), before)
+
+    def test_run_sinks_share_a_bounded_set_of_threads(self) -> None:
+        callback_threads = set()
+
+        def run() -> None:
+            self.runner.run(
+                ["sh", "-c", "echo hi"],
+                env=dict(os.environ),
+                cwd=os.getcwd(),
+                on_line=lambda line: callback_threads.add(threading.current_thread()),
+            )
+
+        callers = [threading.Thread(target=run) for _ in range(16)]
+        for caller in callers:
+            caller.start()
+        for caller in callers:
+            caller.join(timeout=10)
+
+        self.assertLessEqual(len(callback_threads), OUTPUT_DELIVERY_WORKERS)
+        self.assertNotIn(self.engine._thread, callback_threads)
+
+    def test_lines_before_a_watchdog_kill_are_delivered_before_wait_raises(self) -> None:
+        lines = []
+
+        def lagging_sink(line: str) -> None:
+            time.sleep(0.5)
+            lines.append(line)
+
+        runner = AsyncCommandRunner(self.engine, limits=lambda command: CommandLimits(idle_timeout=0.3))
+        process = runner.start(["sh", "-c", "echo one; echo two; sleep 30"], env=dict(os.environ), cwd=os.getcwd())
+        runner.follow_output(process, lagging_sink)
+
+        with self.assertRaises(CommandTimeoutError):
+            runner.wait(process)
+
+        self.assertEqual(["one", "two"], lines)
+        self.assertTrue(process.reader.done())
+
+    def test_slow_line_callback_does_not_stall_other_commands(self) -> None:
+        slow_lines = []
+
+        def slow_sink(line: str) -> None:
+            time.sleep(0.5)
+            slow_lines.append(line)
+
+        slow = threading.Thread(
+            target=self.runner.run,
+            args=(["sh", "-c", "echo a; echo b; echo c"],),
+            kwargs={"env": dict(os.environ), "cwd": os.getcwd(), "on_line": slow_sink},
+        )
+        slow.start()
+        time.sleep(0.2)  # the sink is now sleeping on the first line
+        started = time.monotonic()
+        fast_lines = []
+        self.runner.run(["sh", "-c", "echo x; echo y"], env=dict(os.environ), cwd=os.getcwd(), on_line=fast_lines.append)
+        elapsed = time.monotonic() - started
+        slow.join(timeout=10)
+
+        self.assertLess(elapsed, 0.4)
+        self.assertEqual(["x", "y"], fast_lines)
+        self.assertEqual(["a", "b", "c"], slow_lines)
+
+    def test_run_reports_sampled_usage_even_when_the_command_fails(self) -> None:
+        recorded = []
+
+        with recording_usage(recorded.append), self.assertRaises(CommandExecutionError):
+            self.runner.run(["sh", "-c", "sleep 0.2; exit 1"], env=dict(os.environ), cwd=os.getcwd())
+
+        self.assertEqual(1, len(recorded))
+        self.assertEqual(1, recorded[0].commands)
+        self.assertGreater(recorded[0].wall_seconds, 0)
+        self.assertIsNone(recorded[0].block_input_ops)
+
+
+if __name__ == "__main__":
+    unittest.main()
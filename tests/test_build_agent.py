@@ -0,0 +1,157 @@
+from __future__ import annotations
+
+import tempfile
+import time
+import unittest
+from pathlib import Path
+from types import SimpleNamespace
+from unittest.mock import patch
+
+from src.internal.application.build_agent import AgentBuildRepository, BuildAgent
+from src.internal.application.build_coordinator import BuildCoordinator
+from src.internal.application.build_orchestrator import BuildOrchestrator
+from src.internal.application.build_status_presenter import BuildStatusPresenter
+from src.internal.application.job_dispatcher import JobDispatcher
+from src.internal.domain import BuildRequestData, BuildStatus
+
+
+class StubValidator:
+    def validate(self, request):
+        return request
+
+
+class ReadyDiagnostics:
+    def get_build_diagnostics(self, request):
+        return SimpleNamespace(ready=True, missing=[])
+
+
+class InProcessClient:
+    def __init__(self, coordinator: BuildCoordinator) -> None:
+        self.coordinator = coordinator
+
+    def lease(self, agent_id, labels, wait_seconds):
+        return self.coordinator.lease(agent_id, labels, wait_seconds)
+
+    def send_events(self, build_id, agent_id, payload):
+        return self.coordinator.record_events(build_id, agent_id, payload)
+
+    def complete(self, build_id, agent_id, payload):
+        return self.coordinator.complete(build_id, agent_id, payload)
+
+
+class LocalPipelineOrchestrator(BuildOrchestrator):
+    def _run_pipeline(self, job, request) -> None:
+        job.status = BuildStatus.RUNNING
+        job.mark_stage_running("android_build", "Android build started")
+        self._log(job, f"[{job.build_id}] building on agent")
+        job.mark_stage_completed("android_build", "Build completed successfully")
+        job.status = BuildStatus.COMPLETED
+        self.repository.save(job)
+
+
+def make_orchestrator(cls, repository, dispatcher=None):
+    return cls(
+        repository=repository,
+        validator=StubValidator(),
+        version_resolver=None,
+        command_runner=None,
+        config_diagnostics=ReadyDiagnostics(),
+        environment_assembler=None,
+        setup_executor=None,
+        status_presenter=BuildStatusPresenter(),
+        dispatcher=dispatcher,
+    )
+
+
+class BuildAgentTests(unittest.TestCase):
+    def test_agent_runs_leased_build_and_streams_state_to_coordinator(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp, patch(
+            "src.internal.infrastructure.logging.get_build_workspace",
+            side_effect=lambda build_id: Path(tmp) / build_id,
+        ):
+            dispatcher = JobDispatcher()
+            coordinator_orchestrator = make_orchestrator(BuildOrchestrator, AgentBuildRepository(), dispatcher)
+            coordinator = BuildCoordinator(coordinator_orchestrator, dispatcher)
+            build_id = coordinator_orchestrator.start_build(
+                BuildRequestData(flavor="dev", platform="android", branch_name="develop")
+            )
+
+            agent = BuildAgent(
+                make_orchestrator(LocalPipelineOrchestrator, AgentBuildRepository()),
+                InProcessClient(coordinator),
+                agent_id="agent-1",
+                labels=["android"],
+                poll_seconds=0,
+            )
+            ran = agent.run_once()
+
+        job = coordinator_orchestrator.repository.get(build_id)
+        self.assertTrue(ran)
+        self.assertEqual(BuildStatus.COMPLETED, job.status)
+        self.assertEqual("agent-1", job.assigned_agent)
+        self.assertEqual("completed", job.stages["android_build"].status.value)
+        self.assertTrue(any("building on agent" in line for line in job.logs))
+        self.assertFalse(dispatcher.is_leased(build_id))
+
+    def test_build_fails_when_its_agent_stops_and_no_agent_polls_again(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp, patch(
+            "src.internal.infrastructure.logging.get_build_workspace",
+            side_effect=lambda build_id: Path(tmp) / build_id,
+        ):
+            dispatcher = JobDispatcher(lease_timeout=0.2)
+            orchestrator = make_orchestrator(BuildOrchestrator, AgentBuildRepository(), dispatcher)
+            coordinator = BuildCoordinator(orchestrator, dispatcher, sweep_interval=0.05)
+            build_id = orchestrator.start_build(BuildRequestData(flavor="dev", platform="android"))
+            self.assertIsNotNone(coordinator.lease("agent-1", ["android"], 0))
+            job = orchestrator.repository.get(build_id)
+            job.mark_stage_running("android_build", "Android build started")
+            coordinator.record_events(build_id, "agent-1", {"state": {"status": "running", "stages": job.to_dict()["stages"]}})
+            coordinator.start()
+            self.addCleanup(coordinator.stop)
+
+            job = orchestrator.repository.get(build_id)
+            deadline = time.monotonic() + 5
+            while job.status != BuildStatus.FAILED and time.monotonic() < deadline:
+                time.sleep(0.02)
+
+        self.assertEqual(BuildStatus.FAILED, job.status)
+        self.assertFalse(dispatcher.is_leased(build_id))
+        self.assertTrue(any("stopped reporting" in line for line in job.logs))
+        self.assertEqual("failed", job.stages["android_build"].status.value)
+
+    def test_agent_finishing_without_a_final_status_fails_its_running_stages(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp, patch(
+            "src.internal.infrastructure.logging.get_build_workspace",
+            side_effect=lambda build_id: Path(tmp) / build_id,
+        ):
+            dispatcher = JobDispatcher()
+            orchestrator = make_orchestrator(BuildOrchestrator, AgentBuildRepository(), dispatcher)
+            coordinator = BuildCoordinator(orchestrator, dispatcher)
+            build_id = orchestrator.start_build(BuildRequestData(flavor="dev", platform="android"))
+            self.assertIsNotNone(coordinator.lease("agent-1", ["android"], 0))
+            job = orchestrator.repository.get(build_id)
+            job.mark_stage_running("android_build", "Android build started")
+
+            coordinator.complete(build_id, "agent-1", {"state": {"status": "running", "stages": job.to_dict()["stages"]}})
+
+        self.assertEqual(BuildStatus.FAILED, job.status)
+        self.assertEqual("failed", job.stages["android_build"].status.value)
+        self.assertIn("without a final status", job.stages["android_build"].message)
+
+    def test_canceling_queued_remote_build_removes_it_from_dispatch(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp, patch(
+            "src.internal.infrastructure.logging.get_build_workspace",
+            side_effect=lambda build_id: Path(tmp) / build_id,
+        ):
+            dispatcher = JobDispatcher()
+            orchestrator = make_orchestrator(BuildOrchestrator, AgentBuildRepository(), dispatcher)
+            build_id = orchestrator.start_build(BuildRequestData(flavor="dev", platform="ios"))
+
+            orchestrator.cancel_build(build_id)
+
+        self.assertEqual(0, dispatcher.pending_count())
+        self.assertEqual(BuildStatus.CANCELED, orchestrator.repository.get(build_id).status)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,10 +1,17 @@
 from __future__ import annotations
 
+import tempfile
+import time
 import unittest
+from datetime import datetime
+from pathlib import Path
+from types import SimpleNamespace
+from unittest.mock import patch
 
 from src.internal.application.build_orchestrator import BuildOrchestrator
 from src.core import BuildRuntimeContext
-from src.internal.domain import BuildJob, BuildRequestData
+from src.internal.domain import BuildJob, BuildRequestData, BuildStatus, ResourceUsage, StageStatus
+from src.internal.infrastructure.command_runner import CommandTimeoutError, report_usage
 
 
 class StubRepository:
@@ -22,8 +29,11 @@ class StubRepository:
 
 
 class StubSetupExecutor:
+    def __init__(self) -> None:
+        self.setup_runs = 0
+
     def run_setup(self, **kwargs) -> None:
-        return None
+        self.setup_runs += 1
 
     def prepare_platform_preflight(self, **kwargs) -> None:
         return None
@@ -43,7 +53,7 @@ class CapturingCommandRunner:
     def __init__(self) -> None:
         self.started_envs: list[dict[str, str]] = []
 
-    def start(self, command, *, env, cwd, line_buffered=False):
+    def start(self, command, *, env, cwd, line_buffered=False, tty=False):
         self.started_envs.append(dict(env))
         return FakeProcess()
 
@@ -53,11 +63,177 @@ class CapturingCommandRunner:
     def iter_lines(self, process):
         return iter(())
 
+    def follow_output(self, process, on_line) -> None:
+        return None
+
     def terminate(self, process, *, kill_after_seconds: float = 5.0) -> None:
         return None
 
 
+class HangingCommandRunner(CapturingCommandRunner):
+    def wait(self, process) -> int:
+        raise CommandTimeoutError(["bash", "build.sh"], "no output for 1200s")
+
+
+class MeteredCommandRunner(CapturingCommandRunner):
+    def wait(self, process) -> int:
+        report_usage(ResourceUsage(commands=1, wall_seconds=2.0, user_cpu_seconds=1.5, max_rss_kb=4096))
+        report_usage(ResourceUsage(commands=1, wall_seconds=1.0, user_cpu_seconds=0.5, max_rss_kb=1024))
+        return process.returncode
+
+
+class FailingIosToolchainExecutor(StubSetupExecutor):
+    def prepare_platform_toolchain(self, *, platform, context, **kwargs) -> None:
+        if platform == "ios":
+            raise RuntimeError("xcode-select: no developer tools")
+        super().prepare_platform_toolchain(context=context, **kwargs)
+
+
+class RecordingCommandRunner(CapturingCommandRunner):
+    def __init__(self, on_wait=None) -> None:
+        super().__init__()
+        self.on_wait = on_wait
+        self.calls: list[tuple[str, int]] = []
+        self.processes: list[FakeProcess] = []
+
+    def start(self, command, **kwargs):
+        super().start(command, **kwargs)
+        self.processes.append(FakeProcess())
+        return self.processes[-1]
+
+    def wait(self, process) -> int:
+        self.calls.append(("wait", self.processes.index(process)))
+        if self.on_wait is not None:
+            self.on_wait()
+        return process.returncode
+
+    def terminate(self, process, *, kill_after_seconds: float = 5.0) -> None:
+        self.calls.append(("terminate", self.processes.index(process)))
+
+
 class BuildOrchestratorTests(unittest.TestCase):
+    def test_build_stage_accumulates_resource_usage_of_its_commands(self) -> None:
+        orchestrator = BuildOrchestrator(
+            repository=StubRepository(),
+            validator=None,
+            version_resolver=None,
+            command_runner=MeteredCommandRunner(),
+            config_diagnostics=None,
+            environment_assembler=None,
+            setup_executor=StubSetupExecutor(),
+            status_presenter=None,
+        )
+        request = BuildRequestData(flavor="dev", platform="android", branch_name="develop")
+        job = BuildJob.create("build-android", request, "develop", "queue-1")
+        runtime = BuildRuntimeContext(env={}, repo_dir="/tmp/repo", workspace="/tmp/workspace")
+
+        self.assertTrue(orchestrator._run_build_scripts(job, runtime))
+
+        usage = job.stages["android_build"].resources
+        self.assertEqual(2, usage.commands)
+        self.assertEqual(3.0, usage.wall_seconds)
+        self.assertEqual(2.0, usage.user_cpu_seconds)
+        self.assertEqual(4096, usage.max_rss_kb)
+        self.assertIsNone(usage.system_cpu_seconds)
+        restored = BuildJob.from_dict(job.to_dict())
+        self.assertEqual(usage, restored.stages["android_build"].resources)
+
+    def test_build_killed_by_watchdog_records_reason_on_stage(self) -> None:
+        orchestrator = BuildOrchestrator(
+            repository=StubRepository(),
+            validator=None,
+            version_resolver=None,
+            command_runner=HangingCommandRunner(),
+            config_diagnostics=None,
+            environment_assembler=None,
+            setup_executor=StubSetupExecutor(),
+            status_presenter=None,
+        )
+        request = BuildRequestData(flavor="dev", platform="android", branch_name="develop")
+        job = BuildJob.create("build-android", request, "develop", "queue-1")
+        runtime = BuildRuntimeContext(env={}, repo_dir="/tmp/repo", workspace="/tmp/workspace")
+
+        success = orchestrator._run_build_scripts(job, runtime)
+
+        self.assertFalse(success)
+        stage = job.stages["android_build"]
+        self.assertEqual(StageStatus.FAILED, stage.status)
+        self.assertIn("no output for 1200s", stage.message)
+
+    def test_started_build_is_stopped_when_a_later_platform_setup_fails(self) -> None:
+        command_runner = RecordingCommandRunner()
+        orchestrator = BuildOrchestrator(
+            repository=StubRepository(),
+            validator=None,
+            version_resolver=None,
+            command_runner=command_runner,
+            config_diagnostics=None,
+            environment_assembler=None,
+            setup_executor=FailingIosToolchainExecutor(),
+            status_presenter=None,
+        )
+        request = BuildRequestData(flavor="dev", platform="all", branch_name="develop")
+        job = BuildJob.create("build-all", request, "develop", "queue-1")
+        runtime = BuildRuntimeContext(env={}, repo_dir="/tmp/repo", workspace="/tmp/workspace")
+
+        self.assertFalse(orchestrator._run_build_scripts(job, runtime))
+
+        self.assertEqual([("terminate", 0), ("wait", 0)], command_runner.calls)
+        self.assertEqual(StageStatus.FAILED, job.stages["android_build"].status)
+        self.assertEqual({}, orchestrator.output_pipelines)
+        self.assertEqual(0, orchestrator.output_metrics()["depth"])
+
+    def test_cancel_after_one_platform_stops_and_closes_the_others(self) -> None:
+        request = BuildRequestData(flavor="dev", platform="all", branch_name="develop")
+        job = BuildJob.create("build-all", request, "develop", "queue-1")
+        command_runner = RecordingCommandRunner(on_wait=job.cancel_token.cancel)
+        orchestrator = BuildOrchestrator(
+            repository=StubRepository(),
+            validator=None,
+            version_resolver=None,
+            command_runner=command_runner,
+            config_diagnostics=None,
+            environment_assembler=None,
+            setup_executor=StubSetupExecutor(),
+            status_presenter=None,
+        )
+        runtime = BuildRuntimeContext(env={}, repo_dir="/tmp/repo", workspace="/tmp/workspace")
+
+        self.assertFalse(orchestrator._run_build_scripts(job, runtime))
+
+        self.assertEqual([("wait", 0), ("terminate", 1), ("wait", 1)], command_runner.calls)
+        self.assertEqual(StageStatus.CANCELED, job.stages["ios_build"].status)
+        self.assertEqual({}, orchestrator.output_pipelines)
+
+    def test_build_output_is_logged_with_the_time_it_arrived(self) -> None:
+        command_runner = CapturingCommandRunner()
+        followed = []
+        command_runner.follow_output = lambda process, on_line: followed.append(on_line)
+        orchestrator = BuildOrchestrator(
+            repository=StubRepository(),
+            validator=None,
+            version_resolver=None,
+            command_runner=command_runner,
+            config_diagnostics=None,
+            environment_assembler=None,
+            setup_executor=StubSetupExecutor(),
+            status_presenter=None,
+        )
+        # A slow log sink holds the first batch, so the second line waits in the queue.
+        orchestrator.log_listeners.append(lambda job, entry: time.sleep(0.3) if entry.message.endswith("first") else None)
+        request = BuildRequestData(flavor="dev", platform="android", branch_name="develop")
+        job = BuildJob.create("build-android", request, "develop", "queue-1")
+        orchestrator._monitor_process_output(job, "android", FakeProcess())
+
+        followed[0]("first")
+        time.sleep(0.1)
+        put_at = datetime.now()
+        followed[0]("second")
+        orchestrator._close_output(job, "android")
+
+        second = next(entry for entry in job.log_entries if entry.message.endswith("second"))
+        self.assertLess(abs((datetime.fromisoformat(second.timestamp) - put_at).total_seconds()), 0.1)
+
     def test_run_build_scripts_uses_toolchain_updated_runtime_env(self) -> None:
         repository = StubRepository()
         command_runner = CapturingCommandRunner()
@@ -142,6 +318,151 @@ class BuildOrchestratorTests(unittest.TestCase):
 
         self.assertEqual(["build-cleanup"], cleanup_calls)
 
+    def test_prewarm_job_stops_after_dependencies_and_releases_its_slot(self) -> None:
+        repository = StubRepository()
+        command_runner = CapturingCommandRunner()
+        setup_executor = StubSetupExecutor()
+        released: list[str] = []
+
+        class StubVersionResolver:
+            def resolve(self, request):
+                return request
+
+        class StubLease:
+            def release(self) -> None:
+                released.append("slot-1")
+
+        class StubEnvironmentAssembler:
+            def assemble(self, job, versions, log, should_cancel=None):
+                job.commit_sha = "0123456789abcdef"
+                return BuildRuntimeContext(
+                    env={},
+                    repo_dir="/tmp/repo",
+                    workspace="/tmp/workspace",
+                    slot_id="slot-1",
+                    workspace_lease=StubLease(),
+                )
+
+        orchestrator = BuildOrchestrator(
+            repository=repository,
+            validator=None,
+            version_resolver=StubVersionResolver(),
+            command_runner=command_runner,
+            config_diagnostics=None,
+            environment_assembler=StubEnvironmentAssembler(),
+            setup_executor=setup_executor,
+            status_presenter=None,
+        )
+        request = BuildRequestData(flavor="dev", platform="ios", trigger_source="prewarm", branch_name="develop")
+        job = BuildJob.create("prewarm-1", request, "develop", "prewarm-1")
+
+        orchestrator._run_pipeline(job, request)
+
+        self.assertEqual("dependencies_installed", list(job.stages)[-1])
+        self.assertEqual(BuildStatus.COMPLETED, job.status)
+        self.assertEqual(1, setup_executor.setup_runs)
+        self.assertEqual([], command_runner.started_envs)
+        self.assertEqual(["slot-1"], released)
+
+
+def make_orchestrator(repository, command_runner=None, setup_executor=None) -> BuildOrchestrator:
+    return BuildOrchestrator(
+        repository=repository,
+        validator=None,
+        version_resolver=None,
+        command_runner=command_runner or CapturingCommandRunner(),
+        config_diagnostics=None,
+        environment_assembler=None,
+        setup_executor=setup_executor or StubSetupExecutor(),
+        status_presenter=None,
+    )
+
+
+class StubValidator:
+    def validate(self, request):
+        return request
+
+
+class ReadyDiagnostics:
+    def get_build_diagnostics(self, request):
+        return SimpleNamespace(ready=True, missing=[])
+
+
+class CheckpointRetryTests(unittest.TestCase):
+    def _failed_build(self) -> BuildJob:
+        request = BuildRequestData(flavor="dev", platform="all", branch_name="develop")
+        job = BuildJob.create("build-1", request, "develop", "build-1")
+        for name in ("request_validated", "environment_prepared", "repository_synced", "dependencies_installed"):
+            job.mark_stage_completed(name)
+        job.record_stage_inputs("repository_synced", {"commit_sha": "abc", "slot_id": "slot-1"})
+        job.record_stage_inputs("dependencies_installed", {"commit_sha": "abc", "slot_id": "slot-1", "pub": "p1"})
+        job.mark_stage_completed("android_build")
+        job.record_stage_inputs("android_build", {"commit_sha": "abc", "slot_id": "slot-1", "android": "a1"})
+        job.mark_stage_failed("ios_build", "codesign failed")
+        job.status = BuildStatus.FAILED
+        return job
+
+    def test_retry_build_carries_checkpoints_of_stages_before_from_stage(self) -> None:
+        repository = StubRepository()
+        original = self._failed_build()
+        repository.save(original)
+        orchestrator = make_orchestrator(repository)
+        orchestrator.validator = StubValidator()
+        orchestrator.config_diagnostics = ReadyDiagnostics()
+        dispatched = []
+        orchestrator._dispatch = lambda job, request, sequence: dispatched.append(job)
+
+        with tempfile.TemporaryDirectory() as tmp, patch(
+            "src.internal.infrastructure.logging.get_build_workspace",
+            side_effect=lambda build_id: Path(tmp) / build_id,
+        ):
+            retry_id = orchestrator.retry_build("build-1", "ios_build")
+
+        retry = repository.get(retry_id)
+        self.assertEqual([retry], dispatched)
+        self.assertEqual("build-1", retry.retry_of)
+        self.assertEqual("ios_build", retry.resume_from_stage)
+        self.assertEqual({"repository_synced", "dependencies_installed", "android_build"}, set(retry.checkpoints))
+        with self.assertRaises(ValueError):
+            orchestrator.retry_build("build-1", "not_a_stage")
+        original.status = BuildStatus.RUNNING
+        with self.assertRaises(ValueError):
+            orchestrator.retry_build("build-1")
+
+    def test_pipeline_skips_stages_whose_inputs_are_unchanged(self) -> None:
+        repository = StubRepository()
+        setup_executor = StubSetupExecutor()
+        command_runner = CapturingCommandRunner()
+        orchestrator = make_orchestrator(repository, command_runner, setup_executor)
+
+        with tempfile.TemporaryDirectory() as tmp:
+            repo_dir = Path(tmp) / "repo"
+            (repo_dir / "ios").mkdir(parents=True)
+            (repo_dir / "pubspec.lock").write_text("packages: {}\n", encoding="utf-8")
+            (repo_dir / "ios" / "Podfile.lock").write_text("PODS: []\n", encoding="utf-8")
+            runtime = BuildRuntimeContext(env={}, repo_dir=str(repo_dir), workspace=tmp)
+            first = BuildJob.create("first", BuildRequestData(flavor="dev", platform="all"), "develop", "first")
+            first.commit_sha = "abc"
+            first.slot_id = "slot-1"
+            self.assertTrue(orchestrator._run_setup_script(first, runtime))
+            self.assertTrue(orchestrator._run_build_scripts(first, runtime))
+
+            retry = BuildJob.create("retry", BuildRequestData(flavor="dev", platform="all"), "develop", "retry")
+            retry.retry_of = "first"
+            retry.commit_sha = "abc"
+            retry.slot_id = "slot-1"
+            retry.checkpoints = first.reusable_checkpoints("ios_toolchain_ready")
+            (repo_dir / "ios" / "Podfile.lock").write_text("PODS: [changed]\n", encoding="utf-8")
+            self.assertTrue(orchestrator._run_setup_script(retry, runtime))
+            self.assertTrue(orchestrator._run_build_scripts(retry, runtime))
+
+        self.assertEqual(1, setup_executor.setup_runs)
+        self.assertEqual(3, len(command_runner.started_envs))
+        self.assertEqual("first", retry.stages["dependencies_installed"].reused_from)
+        self.assertEqual("first", retry.stages["android_build"].reused_from)
+        self.assertEqual(StageStatus.COMPLETED, retry.stages["ios_build"].status)
+        self.assertIsNone(retry.stages["ios_build"].reused_from)
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,144 @@
+from __future__ import annotations
+
+import tempfile
+import threading
+import time
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+from src.internal.application.build_orchestrator import BuildOrchestrator
+from src.internal.application.build_queue_store import RUNNING, BuildQueueStore
+from src.internal.core.queue_manager import PriorityWorkerPool
+from src.internal.domain import BuildJob, BuildRequestData, BuildStatus, StageStatus
+
+
+class StubRepository:
+    def __init__(self) -> None:
+        self.jobs: dict[str, BuildJob] = {}
+
+    def save(self, job: BuildJob) -> None:
+        self.jobs[job.build_id] = job
+
+    def get(self, build_id: str):
+        return self.jobs.get(build_id)
+
+    def list_all(self):
+        return list(self.jobs.values())
+
+
+class RecordingOrchestrator(BuildOrchestrator):
+    def __init__(self, repository, queue_store) -> None:
+        super().__init__(
+            repository=repository,
+            validator=None,
+            version_resolver=None,
+            command_runner=None,
+            config_diagnostics=None,
+            environment_assembler=None,
+            setup_executor=None,
+            status_presenter=None,
+            queue_store=queue_store,
+        )
+        self.dispatched: list[str] = []
+
+    def _dispatch(self, job, request, sequence) -> None:
+        self.dispatched.append(job.build_id)
+
+
+def add_job(repository, store, build_id: str, priority: int = 0) -> BuildJob:
+    request = BuildRequestData(flavor="dev", platform="android", priority=priority)
+    job = BuildJob.create(build_id, request, "develop", build_id)
+    job.mark_stage_completed("request_validated", "Build request validated")
+    repository.save(job)
+    store.add(build_id, request, "develop", build_id)
+    return job
+
+
+class BuildQueueStoreTests(unittest.TestCase):
+    def test_store_reloads_entries_in_priority_then_submission_order(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "queue_state.json"
+            store = BuildQueueStore(path)
+            for build_id, priority in (("first", 0), ("urgent", 5), ("second", 0)):
+                store.add(build_id, BuildRequestData(flavor="dev", platform="ios", priority=priority), "main", build_id)
+            store.mark_running("first")
+
+            reloaded = BuildQueueStore(path)
+            added = reloaded.add("third", BuildRequestData(flavor="dev", platform="ios"), "main", "third")
+
+        self.assertEqual(["urgent", "first", "second", "third"], [entry.build_id for entry in reloaded.list_entries()])
+        self.assertEqual(RUNNING, reloaded.get("first").state)
+        self.assertEqual(4, added.sequence)
+
+    def test_recovery_requeues_pending_and_retries_running_builds(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp, patch(
+            "src.internal.infrastructure.logging.get_build_workspace",
+            side_effect=lambda build_id: Path(tmp) / build_id,
+        ):
+            repository = StubRepository()
+            store = BuildQueueStore(Path(tmp) / "queue_state.json")
+            running = add_job(repository, store, "running")
+            running.status = BuildStatus.RUNNING
+            running.mark_stage_completed("repository_synced", "synced")
+            store.mark_running("running")
+            add_job(repository, store, "queued")
+            finished = add_job(repository, store, "finished")
+            finished.status = BuildStatus.COMPLETED
+            orphan = BuildJob.create("orphan", BuildRequestData(flavor="dev", platform="ios"), "develop", "orphan")
+            orphan.status = BuildStatus.RUNNING
+            repository.save(orphan)
+
+            orchestrator = RecordingOrchestrator(repository, store)
+            recovered = orchestrator.recover_queued_builds("retry")
+
+        self.assertEqual(2, recovered)
+        self.assertEqual(["running", "queued"], orchestrator.dispatched)
+        self.assertEqual(BuildStatus.PENDING, running.status)
+        self.assertEqual(StageStatus.PENDING, running.stages["repository_synced"].status)
+        self.assertEqual(StageStatus.COMPLETED, running.stages["request_validated"].status)
+        self.assertIsNone(store.get("finished"))
+        self.assertEqual(BuildStatus.FAILED, orphan.status)
+
+    def test_fail_policy_fails_interrupted_builds_but_keeps_queued_ones(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp, patch(
+            "src.internal.infrastructure.logging.get_build_workspace",
+            side_effect=lambda build_id: Path(tmp) / build_id,
+        ):
+            repository = StubRepository()
+            store = BuildQueueStore(Path(tmp) / "queue_state.json")
+            running = add_job(repository, store, "running")
+            running.status = BuildStatus.RUNNING
+            store.mark_running("running")
+            add_job(repository, store, "queued")
+
+            orchestrator = RecordingOrchestrator(repository, store)
+            orchestrator.recover_queued_builds("fail")
+
+        self.assertEqual(["queued"], orchestrator.dispatched)
+        self.assertEqual(BuildStatus.FAILED, running.status)
+        self.assertIsNone(store.get("running"))
+
+
+class PriorityWorkerPoolTests(unittest.TestCase):
+    def test_pending_work_runs_by_priority_then_sequence_on_fixed_workers(self) -> None:
+        pool = PriorityWorkerPool(1)
+        release_blocker = threading.Event()
+        finished = threading.Event()
+        ran: list[str] = []
+        pool.submit(release_blocker.wait)
+        time.sleep(0.05)
+
+        pool.submit(lambda: ran.append("low-late"), priority=0, sequence=3)
+        pool.submit(lambda: ran.append("high"), priority=5, sequence=4)
+        pool.submit(lambda: ran.append("low-early"), priority=0, sequence=1)
+        pool.submit(finished.set, priority=-1)
+        release_blocker.set()
+        finished.wait(timeout=2)
+
+        self.assertEqual(["high", "low-early", "low-late"], ran)
+        self.assertEqual(1, len(pool.workers))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -47,6 +47,15 @@ class BuildRequestValidatorTests(unittest.TestCase):
 
         self.assertIsNone(validated.build_name)
 
+    def test_commit_sha_must_be_a_full_hex_sha(self) -> None:
+        request = BuildRequestData(flavor="dev", platform="android", commit_sha=" 9F1C2D3E4B5A69788766554433221100FFEEDDCC ")
+
+        self.assertEqual("9f1c2d3e4b5a69788766554433221100ffeeddcc", self.validator.validate(request).commit_sha)
+
+        request = BuildRequestData(flavor="dev", platform="android", commit_sha="HEAD~1")
+        with self.assertRaisesRegex(ValueError, "Invalid commit_sha"):
+            self.validator.validate(request)
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,163 @@
+from __future__ import annotations
+
+import os
+import tempfile
+import threading
+import time
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+from src.internal.core.cancellation import CancellationToken, OperationCanceledError
+from src.internal.core.lease_lock import FileLeaseBackend, LeaseLock, LeaseTimeout
+from src.internal.core.queue_manager import BuildQueueManager, PriorityWorkerPool
+from src.internal.infrastructure.async_execution import AsyncCommandRunner, AsyncExecutionEngine
+from src.internal.infrastructure.command_runner import CommandCancelledError, CommandRunner
+from src.internal.infrastructure.workspace_pool import WorkspacePoolManager
+
+# Every waiter below would otherwise sleep for at least a full poll interval.
+MAX_CANCEL_LATENCY = 0.5
+
+
+def cancel_later(token: CancellationToken, delay: float = 0.2) -> dict:
+    marks = {}
+
+    def fire() -> None:
+        marks["canceled_at"] = time.monotonic()
+        token.cancel()
+
+    threading.Timer(delay, fire).start()
+    return marks
+
+
+class CancellationTokenTests(unittest.TestCase):
+    def test_callbacks_run_once_and_late_registrations_fire_immediately(self) -> None:
+        token = CancellationToken()
+        calls = []
+        token.add_callback(lambda: calls.append("early"))
+        unregister = token.add_callback(lambda: calls.append("removed"))
+        unregister()
+
+        self.assertTrue(token.cancel())
+        self.assertFalse(token.cancel())
+        token.add_callback(lambda: calls.append("late"))
+
+        self.assertTrue(token())
+        self.assertEqual(["early", "late"], calls)
+
+
+class CancelLatencyTests(unittest.TestCase):
+    def assert_prompt(self, marks: dict) -> None:
+        latency = time.monotonic() - marks["canceled_at"]
+        self.assertLess(latency, MAX_CANCEL_LATENCY, f"cancel-to-release took {latency:.3f}s")
+
+    def test_running_command_is_killed_on_cancel(self) -> None:
+        token = CancellationToken()
+        marks = cancel_later(token)
+
+        with self.assertRaises(CommandCancelledError):
+            CommandRunner().run(["sleep", "30"], env=dict(os.environ), cwd=os.getcwd(), should_stop=token)
+
+        self.assert_prompt(marks)
+
+    def test_async_command_is_killed_on_cancel(self) -> None:
+        engine = AsyncExecutionEngine()
+        self.addCleanup(engine.stop)
+        token = CancellationToken()
+        marks = cancel_later(token)
+
+        with self.assertRaises(CommandCancelledError):
+            AsyncCommandRunner(engine).run(["sleep", "30"], env=dict(os.environ), cwd=os.getcwd(), should_stop=token)
+
+        self.assert_prompt(marks)
+
+    def test_queue_lease_waiter_wakes_on_cancel(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            backend = FileLeaseBackend(Path(tmp))
+            holder = LeaseLock("queue", backend, ttl=30)
+            holder.acquire()
+            self.addCleanup(holder.release)
+            token = CancellationToken()
+            marks = cancel_later(token)
+
+            with self.assertRaises(LeaseTimeout):
+                LeaseLock("queue", backend, ttl=30, poll_interval=10).acquire(should_cancel=token)
+
+            self.assert_prompt(marks)
+
+    def test_workspace_slot_waiter_wakes_on_cancel(self) -> None:
+        manager = WorkspacePoolManager(max_slots_per_key=1, wait_timeout=60)
+        acquire_kwargs = dict(
+            repo_url="git@github.com:org/repo.git",
+            branch_name="main",
+            flutter_version="3.24.0",
+            platform="android",
+            log=lambda _: None,
+        )
+        with tempfile.TemporaryDirectory() as tmp, patch(
+            "src.internal.infrastructure.workspace_pool.get_shared_cache_dir",
+            return_value=Path(tmp),
+        ):
+            busy = manager.acquire(build_id="build-1", **acquire_kwargs)
+            self.addCleanup(busy.release)
+            token = CancellationToken()
+            marks = cancel_later(token)
+
+            with self.assertRaises(OperationCanceledError):
+                manager.acquire(build_id="build-2", should_cancel=token, **acquire_kwargs)
+
+            self.assert_prompt(marks)
+
+    def test_stolen_queue_lease_stops_the_running_task(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            backend = FileLeaseBackend(Path(tmp))
+            manager = BuildQueueManager(lease_backend=backend)
+            manager.lease_ttl = 0.3
+            token = CancellationToken()
+            started = threading.Event()
+
+            def task() -> None:
+                started.set()
+                CommandRunner().run(["sleep", "30"], env=dict(os.environ), cwd=os.getcwd(), should_stop=token)
+
+            def steal() -> None:
+                started.wait(5)
+                # Another server took the lease over, e.g. after this one stalled past its TTL.
+                with backend._guard("queue"):
+                    record = backend._read_unlocked("queue")
+                    record.owner_id = "other-server"
+                    record.fencing_token += 1
+                    backend._write_unlocked(record)
+
+            threading.Thread(target=steal).start()
+            began = time.monotonic()
+
+            with self.assertRaises(CommandCancelledError):
+                manager.execute_with_queue("queue", "build-1", task, cancel_token=token)
+
+            self.assertTrue(token.canceled)
+            self.assertLess(time.monotonic() - began, 5)
+            self.assertEqual("other-server", backend.read("queue").owner_id)
+
+    def test_canceled_queued_build_never_takes_a_worker(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            manager = BuildQueueManager(lease_backend=FileLeaseBackend(Path(tmp)))
+            manager.worker_pool = PriorityWorkerPool(1)
+            release = threading.Event()
+            ran = []
+            manager.submit("queue-a", "build-1", release.wait)
+            manager.submit("queue-b", "build-2", lambda: ran.append("build-2"))
+
+            self.assertTrue(manager.cancel_pending("build-2"))
+            self.assertFalse(manager.cancel_pending("build-2"))
+            release.set()
+            manager.submit("queue-c", "build-3", lambda: ran.append("build-3"))
+            deadline = time.monotonic() + 5
+            while not ran and time.monotonic() < deadline:
+                time.sleep(0.01)
+
+        self.assertEqual(["build-3"], ran)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,172 @@
+from __future__ import annotations
+
+import os
+import tempfile
+import threading
+import time
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+from src.internal.core.queue_manager import PriorityWorkerPool
+from src.internal.infrastructure.cgroups import CgroupLimits, CgroupManager, current_cgroup, running_in_cgroup
+from src.internal.infrastructure.command_runner import CommandRunner
+
+
+class FakeCgroupTree:
+    """A writable directory laid out like a delegated cgroup v2 subtree."""
+
+    def __init__(self, root: Path) -> None:
+        self.root = root
+        self.base = root / "system.slice" / "ci.service"
+        self.base.mkdir(parents=True)
+        (root / "cgroup.controllers").write_text("cpuset cpu io memory pids\n")
+        (self.base / "cgroup.controllers").write_text("cpu io memory pids\n")
+        (self.base / "cgroup.subtree_control").write_text("\n")
+        (self.base / "cgroup.procs").write_text("4242\n")
+        self.proc_self_cgroup = root / "proc-self-cgroup"
+        self.proc_self_cgroup.write_text("0::/system.slice/ci.service\n")
+
+    def manager(self, **kwargs) -> CgroupManager:
+        kwargs.setdefault("limits", CgroupLimits())
+        kwargs.setdefault("max_memory_pressure", 40)
+        return CgroupManager(root=self.root, proc_self_cgroup=self.proc_self_cgroup, **kwargs)
+
+
+class CgroupManagerTests(unittest.TestCase):
+    def setUp(self) -> None:
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.tree = FakeCgroupTree(Path(tmp.name))
+
+    def test_falls_back_when_cgroup_v2_is_not_mounted(self) -> None:
+        (self.tree.root / "cgroup.controllers").unlink()
+        manager = self.tree.manager()
+
+        self.assertIsNone(manager.create("build-1"))
+        self.assertTrue(manager.admit())
+        self.assertIsNone(current_cgroup())
+
+    def test_delegates_controllers_and_applies_limits(self) -> None:
+        limits = CgroupLimits(cpu_max="200000 100000", memory_high="8G", io_weight="50")
+        manager = self.tree.manager(limits=limits)
+
+        cgroup = manager.create("build-1")
+
+        base = self.tree.base
+        self.assertEqual("4242", (base / "supervisor" / "cgroup.procs").read_text())
+        self.assertEqual("+cpu +memory +io", (base / "cgroup.subtree_control").read_text())
+        self.assertEqual(base / "build-build-1", cgroup.path)
+        self.assertEqual("200000 100000", (cgroup.path / "cpu.max").read_text())
+        self.assertEqual("8G", (cgroup.path / "memory.high").read_text())
+        self.assertFalse((cgroup.path / "cpu.weight").exists())
+
+    def test_started_commands_are_moved_into_the_bound_cgroup_from_the_parent(self) -> None:
+        cgroup = self.tree.manager().create("build-1")
+        (cgroup.path / "cgroup.procs").write_text("")
+        runner = CommandRunner()
+
+        with running_in_cgroup(cgroup):
+            process = runner.start(["sh", "-c", "exit 0"], env=dict(os.environ), cwd=os.getcwd())
+        runner.wait(process)
+        process.stdout.close()
+
+        self.assertEqual(str(process.pid), (cgroup.path / "cgroup.procs").read_text())
+
+    def test_command_runs_without_isolation_when_joining_the_cgroup_fails(self) -> None:
+        cgroup = self.tree.manager().create("build-1")
+        (cgroup.path / "cgroup.procs").mkdir()  # writing the pid now fails
+
+        with running_in_cgroup(cgroup):
+            result = CommandRunner().run(["sh", "-c", "echo isolated-or-not"], env=dict(os.environ), cwd=os.getcwd())
+
+        self.assertEqual("isolated-or-not\n", result.stdout)
+
+    def test_usage_is_read_from_cgroup_counters_and_summed_on_release(self) -> None:
+        manager = self.tree.manager()
+        cgroup = manager.create("build-1")
+        (cgroup.path / "cpu.stat").write_text("usage_usec 3500000\nuser_usec 3000000\nsystem_usec 500000\nthrottled_usec 250000\n")
+        (cgroup.path / "memory.current").write_text("1048576\n")
+        (cgroup.path / "io.stat").write_text("8:0 rbytes=4096 wbytes=8192 rios=1 wios=2\n259:0 rbytes=4096 wbytes=0\n")
+
+        usage = cgroup.usage()
+
+        self.assertEqual(3.0, usage.cpu_user_seconds)
+        self.assertEqual(0.25, usage.cpu_throttled_seconds)
+        self.assertEqual(1048576, usage.memory_peak_bytes)
+        self.assertEqual((8192, 8192), (usage.io_read_bytes, usage.io_write_bytes))
+        self.assertIn("build-1", manager.snapshot())
+
+        for name in ("cpu.stat", "memory.current", "io.stat"):
+            (cgroup.path / name).unlink()
+        manager.release("build-1")
+
+        self.assertFalse(cgroup.path.exists())
+        self.assertEqual({}, manager.snapshot())
+        self.assertEqual(1, manager.completed_builds)
+
+    def test_memory_pressure_holds_back_admission(self) -> None:
+        manager = self.tree.manager()
+        pressure = self.tree.base / "memory.pressure"
+        pressure.write_text("some avg10=55.20 avg60=30.00 avg300=10.00 total=1\nfull avg10=1.00 avg60=0 avg300=0 total=1\n")
+
+        self.assertEqual(55.2, manager.memory_pressure())
+        self.assertFalse(manager.admit())
+
+        pressure.write_text("some avg10=3.00 avg60=1.00 avg300=0.50 total=1\n")
+        self.assertTrue(manager.admit())
+
+
+class WorkerPoolAdmissionTests(unittest.TestCase):
+    def test_denied_admission_waits_for_running_work_but_never_starves_the_queue(self) -> None:
+        pool = PriorityWorkerPool(2, admission=lambda: False)
+        release = threading.Event()
+        started = []
+        pool.submit(lambda: (started.append("build-1"), release.wait()))
+        pool.submit(lambda: started.append("build-2"))
+        time.sleep(0.3)
+
+        self.assertEqual(["build-1"], started)
+        self.assertEqual(1, pool.pending_count())
+
+        release.set()
+        deadline = time.monotonic() + 5
+        while len(started) < 2 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(["build-1", "build-2"], started)
+
+
+class OrchestratorCgroupTests(unittest.TestCase):
+    def test_pipeline_commands_are_bound_to_the_build_cgroup(self) -> None:
+        from src.internal.application.build_orchestrator import BuildOrchestrator
+        from src.internal.domain import BuildJob, BuildRequestData
+
+        with tempfile.TemporaryDirectory() as tmp:
+            manager = FakeCgroupTree(Path(tmp)).manager()
+            orchestrator = BuildOrchestrator(
+                repository=type("Repo", (), {"save": lambda self, job: None})(),
+                validator=None,
+                version_resolver=None,
+                command_runner=None,
+                config_diagnostics=None,
+                environment_assembler=None,
+                setup_executor=None,
+                status_presenter=None,
+                cgroups=manager,
+            )
+            request = BuildRequestData(flavor="dev", platform="android", branch_name="develop")
+            job = BuildJob.create("build-1", request, "develop", "queue-1")
+            bound = []
+
+            with patch.object(orchestrator, "_run_pipeline_steps", side_effect=lambda *_: bound.append(current_cgroup())), \
+                    patch.object(orchestrator, "_log"):
+                orchestrator._run_pipeline(job, request)
+
+        self.assertIsNotNone(bound[0])
+        self.assertIsNone(current_cgroup())
+        self.assertEqual(0.0, job.cgroup_usage["cpu_user_seconds"])
+        self.assertEqual(1, manager.completed_builds)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,9 +1,20 @@
 from __future__ import annotations
 
+import os
 import tempfile
+import threading
+import time
 import unittest
 
-from src.internal.infrastructure.command_runner import CommandRunner
+from src.internal.infrastructure.command_runner import (
+    STREAM_TAIL_LINES,
+    CommandExecutionError,
+    CommandLimits,
+    CommandRunner,
+    CommandTimeoutError,
+    classify_command,
+    recording_usage,
+)
 
 
 class CommandRunnerTests(unittest.TestCase):
@@ -24,6 +35,137 @@ class CommandRunnerTests(unittest.TestCase):
         self.assertEqual(0, return_code)
         self.assertEqual(["hello"], output)
 
+    def test_run_streams_lines_before_the_command_exits(self) -> None:
+        arrivals = []
+        started = time.monotonic()
+
+        CommandRunner().run(
+            ["sh", "-c", "echo first; sleep 0.5; echo second"],
+            env=dict(os.environ),
+            cwd=os.getcwd(),
+            on_line=lambda line: arrivals.append((line, time.monotonic() - started)),
+        )
+
+        self.assertEqual(["first", "second"], [line for line, _ in arrivals])
+        self.assertLess(arrivals[0][1], 0.4)
+
+    def test_followed_output_pipe_is_closed_at_eof(self) -> None:
+        runner = CommandRunner()
+        lines = []
+        process = runner.start(["sh", "-c", "echo done"], env=dict(os.environ), cwd=os.getcwd())
+        runner.follow_output(process, lines.append)
+
+        runner.wait(process)
+        deadline = time.monotonic() + 5
+        while not process.stdout.closed and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+        self.assertEqual(["done"], lines)
+        self.assertTrue(process.stdout.closed)
+
+    def test_run_closes_the_output_pipe(self) -> None:
+        opened = []
+        runner = CommandRunner()
+        start = runner.start
+        runner.start = lambda *args, **kwargs: opened.append(start(*args, **kwargs)) or opened[-1]
+
+        runner.run(["sh", "-c", "echo done"], env=dict(os.environ), cwd=os.getcwd())
+
+        self.assertTrue(opened[0].stdout.closed)
+
+    def test_run_reads_output_on_the_calling_thread(self) -> None:
+        threads = set()
+        lines = []
+
+        def on_line(line: str) -> None:
+            threads.add(threading.current_thread())
+            lines.append(line)
+
+        result = CommandRunner().run(
+            ["sh", "-c", "printf 'a\\rb\\r\\nc'"],
+            env=dict(os.environ),
+            cwd=os.getcwd(),
+            on_line=on_line,
+        )
+
+        self.assertEqual({threading.current_thread()}, threads)
+        self.assertEqual(["a", "b", "c"], lines)
+        self.assertEqual("a\nb\nc\n", result.stdout)
+
+    def test_streaming_run_keeps_only_a_bounded_tail(self) -> None:
+        lines = []
+
+        with self.assertRaises(CommandExecutionError) as ctx:
+            CommandRunner().run(
+                ["sh", "-c", "seq 1 1000; exit 1"],
+                env=dict(os.environ),
+                cwd=os.getcwd(),
+                on_line=lines.append,
+            )
+
+        self.assertEqual(1000, len(lines))
+        tail = ctx.exception.output.splitlines()
+        self.assertEqual(STREAM_TAIL_LINES, len(tail))
+        self.assertEqual("1000", tail[-1])
+
+    def test_silent_command_is_killed_by_idle_watchdog(self) -> None:
+        runner = CommandRunner(limits=lambda command: CommandLimits(idle_timeout=0.5))
+        started = time.monotonic()
+
+        with self.assertRaises(CommandTimeoutError) as ctx:
+            runner.run(["sh", "-c", "echo started; sleep 30"], env=dict(os.environ), cwd=os.getcwd())
+
+        self.assertLess(time.monotonic() - started, 5)
+        self.assertIn("no output", ctx.exception.reason)
+        self.assertIn("started", ctx.exception.output)
+
+    def test_chatty_command_is_killed_at_wall_clock_limit(self) -> None:
+        runner = CommandRunner(limits=lambda command: CommandLimits(timeout=0.5, idle_timeout=0.4))
+
+        with self.assertRaises(CommandTimeoutError) as ctx:
+            runner.run(
+                ["sh", "-c", "while true; do echo tick; sleep 0.1; done"],
+                env=dict(os.environ),
+                cwd=os.getcwd(),
+                on_line=lambda line: None,
+            )
+
+        self.assertIn("time limit", ctx.exception.reason)
+
+    def test_commands_are_classified_for_their_time_limit(self) -> None:
+        self.assertEqual("git", classify_command(["git", "fetch", "origin"]))
+        self.assertEqual("flutter", classify_command(["fvm", "flutter", "pub", "get"]))
+        self.assertEqual("ruby", classify_command(["/usr/local/bin/bundle", "exec", "pod", "install"]))
+        self.assertEqual("security", classify_command(["security", "unlock-keychain"]))
+        self.assertEqual("build", classify_command(["bash", "scripts/build_ios.sh"]))
+        self.assertEqual("default", classify_command(["xcrun", "simctl"]))
+
+    def test_run_reports_resource_usage_to_the_active_recorder(self) -> None:
+        recorded = []
+
+        with recording_usage(recorded.append):
+            result = CommandRunner().run(
+                ["sh", "-c", "i=0; while [ $i -lt 20000 ]; do i=$((i+1)); done"],
+                env=dict(os.environ),
+                cwd=os.getcwd(),
+            )
+
+        self.assertEqual([result.usage], recorded)
+        usage = recorded[0]
+        self.assertEqual(1, usage.commands)
+        self.assertGreater(usage.wall_seconds, 0)
+        self.assertIsNotNone(usage.user_cpu_seconds)
+        self.assertGreater(usage.max_rss_kb, 0)
+
+    def test_usage_is_not_reported_outside_a_recording_context(self) -> None:
+        recorded = []
+        with recording_usage(recorded.append):
+            pass
+
+        CommandRunner().run(["true"], env=dict(os.environ), cwd=os.getcwd())
+
+        self.assertEqual([], recorded)
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,118 @@
+from __future__ import annotations
+
+import os
+import tempfile
+import threading
+import time
+import unittest
+from pathlib import Path
+
+from src.internal.infrastructure.command_runner import CompletedCommand
+from src.internal.infrastructure.flutter_sdk import EVICTION_GRACE_SECONDS, PRECACHE_ARTIFACTS, FlutterSdkManager
+from src.internal.infrastructure.workspace_state import FlutterSdkState, WorkspaceSlotState, WorkspaceStateStore
+
+
+class PrecacheRunner:
+    """Creates the requested precache artifacts in the checkout's SDK, slowly enough to overlap."""
+
+    def __init__(self) -> None:
+        self.calls: list[tuple[str, ...]] = []
+
+    def run_checked(self, command, *, env, cwd, should_stop=None, on_line=None):
+        self.calls.append(tuple(command))
+        time.sleep(0.1)
+        sdk_dir = Path(cwd) / ".fvm" / "flutter_sdk"
+        for flag in command[3:]:
+            (sdk_dir / PRECACHE_ARTIFACTS[flag.lstrip("-")]).mkdir(parents=True, exist_ok=True)
+        return CompletedCommand(args=list(command), returncode=0, stdout="")
+
+
+class FlutterSdkManagerTests(unittest.TestCase):
+    def setUp(self) -> None:
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.root = Path(tmp.name)
+        self.versions_dir = self.root / "fvm" / "versions"
+        self.store = WorkspaceStateStore(self.root / "state.sqlite3")
+        self.runner = PrecacheRunner()
+
+    def _manager(self, disk_budget_bytes: int = 0) -> FlutterSdkManager:
+        return FlutterSdkManager(
+            self.runner,  # type: ignore[arg-type]
+            fvm_cache_dir=self.root / "fvm",
+            disk_budget_bytes=disk_budget_bytes,
+            state_store=self.store,
+        )
+
+    def _checkout(self, name: str, version: str) -> Path:
+        """A slot checkout whose .fvm/flutter_sdk links to the shared SDK, like `fvm use` leaves it."""
+        sdk_dir = self.versions_dir / version
+        (sdk_dir / "bin").mkdir(parents=True, exist_ok=True)
+        (sdk_dir / "bin" / "flutter").write_bytes(b"x" * 4096)
+        repo_path = self.root / name
+        (repo_path / ".fvm").mkdir(parents=True)
+        os.symlink(sdk_dir, repo_path / ".fvm" / "flutter_sdk")
+        return repo_path
+
+    def test_concurrent_precache_of_one_sdk_runs_once(self) -> None:
+        manager = self._manager()
+        checkouts = [self._checkout(f"slot-{index}", "3.24.0") for index in range(3)]
+        results: list[bool] = []
+
+        def precache(repo_path: Path) -> None:
+            results.append(
+                manager.ensure_precached("build", "3.24.0", ["ios"], repo_path=repo_path, env={}, log=lambda _: None)
+            )
+
+        threads = [threading.Thread(target=precache, args=(repo_path,)) for repo_path in checkouts]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(timeout=10)
+
+        self.assertEqual([("fvm", "flutter", "precache", "--ios")], self.runner.calls)
+        self.assertEqual([False, False, True], sorted(results))
+        self.assertEqual(["ios"], self.store.sdk_states()["3.24.0"].precached)
+
+    def test_artifact_left_by_an_unrecorded_run_is_precached_once_more(self) -> None:
+        manager = self._manager()
+        repo_path = self._checkout("slot-1", "3.24.0")
+        (repo_path / ".fvm" / "flutter_sdk" / PRECACHE_ARTIFACTS["ios"]).mkdir(parents=True)
+
+        self.assertEqual([], manager.missing_platforms(repo_path, ["ios"]))
+        self.assertTrue(manager.ensure_precached("build", "3.24.0", ["ios"], repo_path=repo_path, env={}, log=lambda _: None))
+        self.assertFalse(manager.ensure_precached("build", "3.24.0", ["ios"], repo_path=repo_path, env={}, log=lambda _: None))
+
+    def test_inventory_includes_versions_no_build_has_used(self) -> None:
+        manager = self._manager()
+        used = self._checkout("slot-1", "3.24.0")
+        manager.record_use("3.24.0", used)
+        self._checkout("slot-2", "3.22.0")
+
+        inventory = manager.inventory()
+
+        self.assertEqual({"3.22.0", "3.24.0"}, set(inventory))
+        self.assertEqual(0.0, inventory["3.22.0"].last_used_at)
+        self.assertGreater(inventory["3.24.0"].last_used_at, 0)
+
+    def test_evicts_least_recently_used_versions_nobody_is_on(self) -> None:
+        manager = self._manager(disk_budget_bytes=1)
+        old = time.time() - 2 * EVICTION_GRACE_SECONDS
+        for index, version in enumerate(["3.10.0", "3.13.0", "3.16.0", "3.19.0"]):
+            self._checkout(f"slot-{index}", version)
+            self.store.record_sdk(FlutterSdkState(version=version, path=str(self.versions_dir / version), last_used_at=old + index))
+        # 3.13.0 is on a leased slot and 3.24.0 was just activated, so both stay.
+        leased = self.root / "slots" / "key" / "slot-1"
+        self.store.record_lease(leased, "build-running")
+        self.store.record_slot(leased, WorkspaceSlotState(commit_sha="abc", flutter_version="3.13.0"))
+        manager.record_use("3.24.0", self._checkout("slot-current", "3.24.0"))
+
+        evicted = manager.evict_unused("build", "3.24.0", log=lambda _: None)
+
+        self.assertEqual(["3.10.0", "3.16.0", "3.19.0"], evicted)
+        self.assertEqual(["3.13.0", "3.24.0"], sorted(path.name for path in self.versions_dir.iterdir() if path.is_dir()))
+        self.assertEqual({"3.13.0", "3.24.0"}, set(self.store.sdk_states()))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,87 @@
+from __future__ import annotations
+
+import tempfile
+import unittest
+from pathlib import Path
+
+from src.internal.infrastructure.command_runner import CommandRunner, CompletedCommand
+from src.internal.infrastructure.git_fetch import GitFetchStats, GitFetchStrategy, fetch_branch
+from tests.test_git_mirror import GIT_ENV, git
+
+
+class GitFetchStrategyTests(unittest.TestCase):
+    def test_options_follow_depth_and_filter(self) -> None:
+        self.assertEqual([], GitFetchStrategy().options())
+        self.assertEqual(["--depth", "1", "--filter=blob:none"], GitFetchStrategy(depth=1, filter="blob:none").options())
+
+    def test_describe_uses_binary_units(self) -> None:
+        self.assertEqual("512 bytes in 0.10s", GitFetchStats("origin", "main", 512, 0.1).describe())
+        self.assertEqual("1.5 MiB in 2.00s", GitFetchStats("origin", "main", 1536 * 1024, 2).describe())
+
+
+class ProgressRunner:
+    """Replays git's progress output with every frame of one line separated by "\r"."""
+
+    def run_checked(self, command, *, env, cwd, should_stop=None, on_line=None):
+        on_line(
+            "Receiving objects:  12% (1/8), 5.48 MiB | 5.4 MiB/s\r"
+            "Receiving objects:  75% (6/8), 5.52 MiB | 5.4 MiB/s\r"
+            "Receiving objects: 100% (8/8), 5.89 MiB | 5.6 MiB/s, done."
+        )
+        return CompletedCommand(args=list(command), returncode=0, stdout="")
+
+
+class FetchBranchTests(unittest.TestCase):
+    def setUp(self) -> None:
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        root = Path(tmp.name)
+        self.remote = root / "remote"
+        self.remote.mkdir()
+        git(self.remote, "init", "-q", "-b", "main")
+        (self.remote / "app.txt").write_text("x" * 4096, encoding="utf-8")
+        git(self.remote, "add", "app.txt")
+        git(self.remote, "commit", "-q", "-m", "init")
+        self.repo = root / "repo"
+        git(root, "init", "-q", str(self.repo))
+        git(self.repo, "remote", "add", "origin", f"file://{self.remote}")
+
+    def fetch(self, branch_name: str) -> GitFetchStats:
+        return fetch_branch(
+            CommandRunner(),
+            repo_path=self.repo,
+            remote="origin",
+            branch_name=branch_name,
+            destination=f"refs/remotes/origin/{branch_name}",
+            strategy=GitFetchStrategy(depth=1),
+            env=dict(GIT_ENV),
+        )
+
+    def test_reports_received_bytes_and_duration(self) -> None:
+        stats = self.fetch("main")
+
+        self.assertGreater(stats.bytes, 0)
+        self.assertGreaterEqual(stats.seconds, 0)
+        self.assertEqual(git(self.remote, "rev-parse", "HEAD"), git(self.repo, "rev-parse", "origin/main"))
+        self.assertEqual(0, self.fetch("main").bytes)
+
+    def test_multi_frame_progress_line_reports_the_final_size(self) -> None:
+        stats = fetch_branch(
+            ProgressRunner(),  # type: ignore[arg-type]
+            repo_path=self.repo,
+            remote="origin",
+            branch_name="main",
+            destination="refs/remotes/origin/main",
+            strategy=GitFetchStrategy(),
+            env=dict(GIT_ENV),
+        )
+
+        self.assertEqual(int(5.89 * 1024 ** 2), stats.bytes)
+
+    def test_missing_branch_comes_from_the_fetch_itself(self) -> None:
+        with self.assertRaisesRegex(ValueError, "Branch 'release' does not exist"):
+            self.fetch("release")
+
+
+if __name__ == "__main__":
+    unittest.main()
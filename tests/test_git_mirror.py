@@ -0,0 +1,192 @@
+from __future__ import annotations
+
+import os
+import subprocess
+import tempfile
+import unittest
+from pathlib import Path
+
+from src.internal.infrastructure.command_runner import CommandRunner
+from src.internal.infrastructure.git_mirror import GitMirrorCache
+from src.internal.infrastructure.repository_workspace import RepositoryWorkspaceManager
+from src.internal.infrastructure.workspace_pool import WorkspaceSlotState
+
+GIT_ENV = {
+    **os.environ,
+    "GIT_AUTHOR_NAME": "ci",
+    "GIT_AUTHOR_EMAIL": "ci@example.com",
+    "GIT_COMMITTER_NAME": "ci",
+    "GIT_COMMITTER_EMAIL": "ci@example.com",
+}
+
+
+def git(cwd: Path, *args: str) -> str:
+    return subprocess.run(["git", *args], cwd=cwd, env=GIT_ENV, check=True, capture_output=True, text=True).stdout.strip()
+
+
+class GitMirrorSyncTests(unittest.TestCase):
+    def setUp(self) -> None:
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.root = Path(tmp.name)
+        self.remote = self.root / "remote"
+        self.remote.mkdir()
+        git(self.remote, "init", "-q", "-b", "develop")
+        self.commit("pubspec.yaml", "name: app\n")
+        self.repo_url = str(self.remote)
+
+        self.runner = CommandRunner()
+        self.fetches: list[str] = []
+        original_run = self.runner.run
+
+        def counting_run(command, **kwargs):
+            if "fetch" in command[:4] and kwargs["cwd"].endswith(".git"):
+                self.fetches.append(kwargs["cwd"])
+            return original_run(command, **kwargs)
+
+        self.runner.run = counting_run  # type: ignore[method-assign]
+        self.mirrors = GitMirrorCache(self.runner, root=self.root / "mirrors")
+        self.manager = RepositoryWorkspaceManager(self.runner, git_mirrors=self.mirrors)
+
+    def commit(self, name: str, content: str) -> str:
+        (self.remote / name).write_text(content, encoding="utf-8")
+        git(self.remote, "add", name)
+        git(self.remote, "commit", "-q", "-m", f"update {name}")
+        return git(self.remote, "rev-parse", "HEAD")
+
+    def sync(
+        self,
+        slot: str,
+        build_id: str = "build-1",
+        branch_name: str = "develop",
+        target_commit: str | None = None,
+    ) -> Path:
+        repo_path = self.root / slot / "repo"
+        repo_path.mkdir(parents=True, exist_ok=True)
+        self.last_fetches = self.manager._sync_repository(
+            build_id=build_id,
+            repo_url=self.repo_url,
+            branch_name=branch_name,
+            repo_path=repo_path,
+            env=dict(GIT_ENV),
+            log=lambda _: None,
+            target_commit=target_commit,
+        )
+        return repo_path
+
+    def test_slots_check_out_from_one_mirror_and_borrow_its_objects(self) -> None:
+        slot1 = self.sync("slot-1")
+        slot2 = self.sync("slot-2", build_id="build-2")
+
+        mirror = self.mirrors.mirror_path(self.repo_url)
+        for slot in (slot1, slot2):
+            self.assertEqual(git(self.remote, "rev-parse", "HEAD"), git(slot, "rev-parse", "HEAD"))
+            self.assertEqual(self.repo_url, git(slot, "remote", "get-url", "origin"))
+            alternates = (slot / ".git" / "objects" / "info" / "alternates").read_text(encoding="utf-8")
+            self.assertIn(str((mirror / "objects").resolve()), alternates)
+        # One fetch per build request, both into the mirror; slots only update refs.
+        self.assertEqual([str(mirror), str(mirror)], self.fetches)
+        mirror_fetch, slot_fetch = self.last_fetches
+        self.assertEqual(("origin", "develop"), (mirror_fetch.source, mirror_fetch.ref))
+        self.assertEqual(str(mirror), slot_fetch.source)
+        self.assertEqual(0, slot_fetch.bytes)
+
+    def test_existing_slot_picks_up_new_commits_and_discards_local_changes(self) -> None:
+        slot = self.sync("slot-1")
+        (slot / "pubspec.yaml").write_text("dirty\n", encoding="utf-8")
+        (slot / "scratch").mkdir()
+        head = self.commit("README.md", "hello\n")
+
+        self.sync("slot-1", build_id="build-2")
+
+        self.assertEqual(head, git(slot, "rev-parse", "HEAD"))
+        self.assertEqual("name: app\n", (slot / "pubspec.yaml").read_text(encoding="utf-8"))
+        self.assertFalse((slot / "scratch").exists())
+
+    def test_build_that_waited_for_a_fresh_fetch_reuses_it(self) -> None:
+        self.sync("slot-1")
+        # A request issued before the last fetch finished (e.g. it queued on the mirror lock).
+        self.mirrors._clock = lambda: 0.0
+        self.fetches.clear()
+
+        self.sync("slot-2", build_id="build-2")
+
+        self.assertEqual([], self.fetches)
+        self.assertEqual([str(self.mirrors.mirror_path(self.repo_url))], [fetch.source for fetch in self.last_fetches])
+
+    def test_sync_to_a_commit_the_mirror_already_has_stays_local(self) -> None:
+        self.sync("slot-1")
+        head = self.commit("README.md", "prefetched\n")
+        self.mirrors.update(self.repo_url, "develop", build_id="mirror-prefetch", env=dict(GIT_ENV), log=lambda _: None)
+        self.fetches.clear()
+
+        slot = self.sync("slot-1", build_id="build-2", target_commit=head)
+
+        self.assertEqual([], self.fetches)
+        self.assertEqual(head, git(slot, "rev-parse", "HEAD"))
+        self.assertEqual([str(self.mirrors.mirror_path(self.repo_url))], [fetch.source for fetch in self.last_fetches])
+
+    def test_mirror_only_fetches_the_requested_branch(self) -> None:
+        git(self.remote, "branch", "feature/other")
+
+        self.sync("slot-1")
+
+        mirror = self.mirrors.mirror_path(self.repo_url)
+        self.assertEqual("refs/heads/develop", git(mirror, "for-each-ref", "--format=%(refname)", "refs/heads"))
+
+    def test_pinned_commit_is_checked_out_after_the_branch_moved_on(self) -> None:
+        pinned = git(self.remote, "rev-parse", "HEAD")
+        self.sync("slot-1")
+        self.commit("README.md", "newer\n")
+
+        slot = self.sync("slot-2", build_id="build-2", target_commit=pinned)
+
+        self.assertEqual(pinned, git(slot, "rev-parse", "HEAD"))
+        self.assertEqual("develop", git(slot, "rev-parse", "--abbrev-ref", "HEAD"))
+
+    def test_pinned_commit_missing_from_the_branch_is_fetched_by_sha(self) -> None:
+        git(self.remote, "config", "uploadpack.allowAnySHA1InWant", "true")
+        git(self.remote, "checkout", "-q", "-b", "feature")
+        pinned = self.commit("feature.txt", "merge result\n")
+        git(self.remote, "checkout", "-q", "develop")
+
+        slot = self.sync("slot-1", target_commit=pinned)
+
+        self.assertEqual(pinned, git(slot, "rev-parse", "HEAD"))
+        self.assertEqual(["develop", pinned], [fetch.ref for fetch in self.last_fetches[:2]])
+
+    def test_slot_warmth_prefers_the_smallest_diff_with_unchanged_dependencies(self) -> None:
+        base = git(self.remote, "rev-parse", "HEAD")
+        dependency_bump = self.commit("pubspec.yaml", "name: app\ndependencies: {http: 1.0.0}\n")
+        target = self.commit("README.md", "docs\n")
+        self.sync("slot-1")
+        warmth = self.manager._slot_warmth(self.repo_url, "develop", target, dict(GIT_ENV))
+        repo_dir = self.root / "slot-1" / "repo"
+
+        at_target = warmth(WorkspaceSlotState(commit_sha=target), repo_dir)
+        docs_behind = warmth(WorkspaceSlotState(commit_sha=dependency_bump, last_used_at=1.0), repo_dir)
+        deps_behind = warmth(WorkspaceSlotState(commit_sha=base, last_used_at=2.0), repo_dir)
+        never_used = warmth(WorkspaceSlotState(), repo_dir)
+
+        self.assertEqual([at_target, docs_behind, deps_behind, never_used], sorted(
+            [never_used, deps_behind, at_target, docs_behind], reverse=True
+        ))
+
+    def test_missing_branch_is_reported(self) -> None:
+        with self.assertRaisesRegex(ValueError, "Branch 'release' does not exist"):
+            self.sync("slot-1", branch_name="release")
+
+    def test_clone_only_slot_is_linked_to_the_mirror(self) -> None:
+        slot = self.root / "slot-1" / "repo"
+        slot.parent.mkdir()
+        git(self.root, "clone", "-q", self.repo_url, str(slot))
+
+        self.sync("slot-1")
+
+        alternates = slot / ".git" / "objects" / "info" / "alternates"
+        self.assertTrue(alternates.exists())
+        self.assertFalse(GitMirrorCache.link_alternates(slot, self.mirrors.mirror_path(self.repo_url)))
+
+
+if __name__ == "__main__":
+    unittest.main()
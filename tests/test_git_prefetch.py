@@ -0,0 +1,83 @@
+from __future__ import annotations
+
+import threading
+import unittest
+
+from src.internal.infrastructure.git_prefetch import GitMirrorPrefetcher
+
+
+class BlockingMirrors:
+    def __init__(self) -> None:
+        self.started: list[str] = []
+        self.release = threading.Event()
+        self.lock = threading.Lock()
+        self.running = 0
+        self.peak = 0
+        self.all_started = threading.Event()
+        self.expected = 0
+
+    def update(self, repo_url, branch_name, *, build_id, env, log, should_cancel=None):
+        with self.lock:
+            self.started.append(branch_name)
+            self.running += 1
+            self.peak = max(self.peak, self.running)
+            if len(self.started) >= self.expected:
+                self.all_started.set()
+        self.release.wait(5)
+        with self.lock:
+            self.running -= 1
+        return None
+
+
+def make_prefetcher(mirrors: BlockingMirrors, branches: list[str], concurrency: int = 2) -> GitMirrorPrefetcher:
+    prefetcher = GitMirrorPrefetcher(mirrors, "git@github.com:org/repo.git", branches, interval=60, concurrency=concurrency)
+    prefetcher._env = {}
+    return prefetcher
+
+
+class GitMirrorPrefetcherTests(unittest.TestCase):
+    def test_fetches_run_at_most_concurrency_at_a_time_and_are_not_queued_twice(self) -> None:
+        mirrors = BlockingMirrors()
+        mirrors.expected = 2
+        prefetcher = make_prefetcher(mirrors, ["develop", "staging", "main"])
+        self.addCleanup(prefetcher.stop)
+
+        queued = [prefetcher.request(branch) for branch in ("develop", "staging", "main", "develop")]
+        self.assertTrue(mirrors.all_started.wait(5))
+        mirrors.release.set()
+        prefetcher._executor.shutdown(wait=True)
+
+        self.assertEqual([True, True, True, False], queued)
+        self.assertEqual(2, mirrors.peak)
+        self.assertCountEqual(["develop", "staging", "main"], mirrors.started)
+
+    def test_push_only_fetches_tracked_branches(self) -> None:
+        mirrors = BlockingMirrors()
+        mirrors.release.set()
+        prefetcher = make_prefetcher(mirrors, ["develop"])
+        self.addCleanup(prefetcher.stop)
+
+        self.assertFalse(prefetcher.on_push("feature/x"))
+        self.assertTrue(prefetcher.on_push("develop"))
+        prefetcher._executor.shutdown(wait=True)
+
+        self.assertEqual(["develop"], mirrors.started)
+
+    def test_interval_is_jittered_around_the_configured_value(self) -> None:
+        values = iter([0.0, 1.0, 0.5])
+        prefetcher = GitMirrorPrefetcher(
+            BlockingMirrors(), "repo", ["develop"], interval=100, jitter=0.2, rng=lambda: next(values)
+        )
+        self.addCleanup(prefetcher.stop)
+
+        self.assertEqual([80.0, 120.0, 100.0], [prefetcher.next_delay() for _ in range(3)])
+
+    def test_stopped_prefetcher_queues_nothing(self) -> None:
+        prefetcher = make_prefetcher(BlockingMirrors(), ["develop"])
+        prefetcher.stop()
+
+        self.assertFalse(prefetcher.request("develop"))
+
+
+if __name__ == "__main__":
+    unittest.main()
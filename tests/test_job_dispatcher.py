@@ -0,0 +1,90 @@
+from __future__ import annotations
+
+import threading
+import time
+import unittest
+
+from src.internal.application.job_dispatcher import DispatchEntry, JobDispatcher, required_labels_for
+from src.internal.domain import BuildRequestData
+
+
+def make_entry(
+    build_id: str,
+    platform: str,
+    flutter_version: str | None = None,
+    priority: int = 0,
+) -> DispatchEntry:
+    return DispatchEntry(
+        build_id=build_id,
+        request=BuildRequestData(
+            flavor="dev",
+            platform=platform,
+            flutter_sdk_version=flutter_version,
+            priority=priority,
+        ),
+        branch_name="develop",
+        queue_key=build_id,
+        required_labels=required_labels_for(platform),
+    )
+
+
+class JobDispatcherTests(unittest.TestCase):
+    def test_lease_skips_jobs_the_agent_cannot_build(self) -> None:
+        dispatcher = JobDispatcher()
+        dispatcher.enqueue(make_entry("ios-build", "ios"))
+        dispatcher.enqueue(make_entry("android-build", "android"))
+
+        entry = dispatcher.lease("linux-agent", {"android"}, wait_seconds=0)
+
+        self.assertIsNotNone(entry)
+        self.assertEqual("android-build", entry.build_id)
+        self.assertIsNone(dispatcher.lease("linux-agent", {"android"}, wait_seconds=0))
+        self.assertEqual(1, dispatcher.pending_count())
+
+    def test_lease_prefers_job_matching_cached_flutter_version(self) -> None:
+        dispatcher = JobDispatcher()
+        dispatcher.enqueue(make_entry("older", "android", "3.22.0"))
+        dispatcher.enqueue(make_entry("cached", "android", "3.24.0"))
+
+        entry = dispatcher.lease("agent", {"android", "flutter:3.24.0"}, wait_seconds=0)
+
+        self.assertEqual("cached", entry.build_id)
+
+    def test_higher_priority_job_is_leased_first(self) -> None:
+        dispatcher = JobDispatcher()
+        dispatcher.enqueue(make_entry("cached", "android", "3.24.0"))
+        dispatcher.enqueue(make_entry("hotfix", "android", priority=10))
+
+        entry = dispatcher.lease("agent", {"android", "flutter:3.24.0"}, wait_seconds=0)
+
+        self.assertEqual("hotfix", entry.build_id)
+
+    def test_long_poll_wakes_when_job_is_enqueued(self) -> None:
+        dispatcher = JobDispatcher()
+        result: list[DispatchEntry | None] = []
+        waiter = threading.Thread(
+            target=lambda: result.append(dispatcher.lease("agent", {"android", "ios"}, wait_seconds=5)),
+        )
+        waiter.start()
+        time.sleep(0.05)
+        started = time.monotonic()
+        dispatcher.enqueue(make_entry("all-build", "all"))
+        waiter.join(timeout=2)
+
+        self.assertLess(time.monotonic() - started, 1.0)
+        self.assertEqual("all-build", result[0].build_id)
+
+    def test_expired_leases_are_reclaimed(self) -> None:
+        dispatcher = JobDispatcher(lease_timeout=0.0)
+        dispatcher.enqueue(make_entry("build-1", "android"))
+        dispatcher.lease("agent", {"android"}, wait_seconds=0)
+        time.sleep(0.01)
+
+        expired = dispatcher.expired_leases()
+
+        self.assertEqual(["build-1"], [entry.build_id for entry in expired])
+        self.assertFalse(dispatcher.heartbeat("build-1", "agent"))
+
+
+if __name__ == "__main__":
+    unittest.main()
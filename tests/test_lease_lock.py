@@ -0,0 +1,103 @@
+from __future__ import annotations
+
+import json
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from pathlib import Path
+
+from src.internal.core.lease_lock import FileLeaseBackend, LeaseLock, LeaseTimeout
+
+
+def write_record(root: Path, key: str, **overrides) -> None:
+    record = {
+        "key": key,
+        "owner_id": "other-owner",
+        "hostname": "other-host",
+        "pid": 1,
+        "pid_started_at": None,
+        "fencing_token": 7,
+        "acquired_at": time.time(),
+        "heartbeat_at": time.time(),
+        "ttl": 30.0,
+    }
+    record.update(overrides)
+    (root / f"{key}.lease.json").write_text(json.dumps(record), encoding="utf-8")
+
+
+class LeaseLockTests(unittest.TestCase):
+    def test_fencing_token_increases_across_holders(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            backend = FileLeaseBackend(Path(tmp))
+            with LeaseLock("queue", backend) as first:
+                first_token = first.fencing_token
+                with self.assertRaises(LeaseTimeout):
+                    LeaseLock("queue", backend, poll_interval=0.01).acquire(timeout=0.05)
+            with LeaseLock("queue", backend) as second:
+                self.assertGreater(second.fencing_token, first_token)
+
+    def test_lease_held_by_dead_local_process_is_taken_over_immediately(self) -> None:
+        finished = subprocess.Popen([sys.executable, "-c", "pass"])
+        finished.wait()
+
+        with tempfile.TemporaryDirectory() as tmp:
+            write_record(Path(tmp), "queue", hostname=socket.gethostname(), pid=finished.pid)
+            lock = LeaseLock("queue", FileLeaseBackend(Path(tmp)))
+
+            record = lock.acquire(timeout=0)
+            lock.release()
+
+        self.assertEqual(8, record.fencing_token)
+
+    def test_remote_lease_is_respected_until_heartbeat_expires(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            backend = FileLeaseBackend(Path(tmp))
+            write_record(Path(tmp), "queue", ttl=0.2)
+
+            with self.assertRaises(LeaseTimeout):
+                LeaseLock("queue", backend).acquire(timeout=0)
+            time.sleep(0.3)
+            lock = LeaseLock("queue", backend)
+            lock.acquire(timeout=0)
+            lock.release()
+
+    def test_heartbeat_keeps_lease_alive_past_ttl(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            backend = FileLeaseBackend(Path(tmp))
+            with LeaseLock("queue", backend, ttl=0.3) as holder:
+                time.sleep(0.6)
+                self.assertFalse(holder.lost)
+                with self.assertRaises(LeaseTimeout):
+                    LeaseLock("queue", backend).acquire(timeout=0)
+
+    def test_held_leases_share_one_heartbeat_thread(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            backend = FileLeaseBackend(Path(tmp))
+            leases = [LeaseLock(f"queue-{index}", backend, ttl=0.3) for index in range(10)]
+            for lease in leases:
+                lease.acquire(timeout=0)
+            time.sleep(0.6)
+
+            heartbeats = [thread for thread in threading.enumerate() if thread.name.startswith("lease-heartbeat")]
+            self.assertEqual(1, len(heartbeats))
+            self.assertFalse(any(lease.lost for lease in leases))
+            for lease in leases:
+                lease.release()
+
+    def test_purge_stale_keeps_live_leases(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            backend = FileLeaseBackend(Path(tmp))
+            write_record(Path(tmp), "dead", ttl=0.0, heartbeat_at=time.time() - 10)
+            with LeaseLock("live", backend):
+                purged = backend.purge_stale()
+                self.assertEqual(["dead"], purged)
+                self.assertTrue(backend.read("live").held)
+            self.assertFalse(backend.read("dead").held)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,145 @@
+from __future__ import annotations
+
+import os
+import threading
+import time
+import unittest
+
+from src.internal.infrastructure.command_runner import CommandRunner
+from src.internal.infrastructure.output_pipeline import OUTPUT_DELIVERY_WORKERS, OutputPipeline
+
+
+class OutputPipelineTests(unittest.TestCase):
+    def test_slow_consumer_does_not_stall_the_writing_process(self) -> None:
+        delivered: list[str] = []
+        batch_sizes: list[int] = []
+
+        def slow_consumer(lines: list[str]) -> None:
+            batch_sizes.append(len(lines))
+            delivered.extend(lines)
+            time.sleep(0.05)
+
+        pipeline = OutputPipeline(slow_consumer, capacity=100_000)
+        runner = CommandRunner()
+        # ~640KB of output: ten times a 64KB pipe buffer.
+        process = runner.start(
+            ["sh", "-c", "i=0; while [ $i -lt 20000 ]; do echo line-$i-................; i=$((i+1)); done"],
+            env=dict(os.environ),
+            cwd=os.getcwd(),
+        )
+        runner.follow_output(process, pipeline.put)
+        started = time.monotonic()
+        runner.wait(process)
+        elapsed = time.monotonic() - started
+        deadline = time.monotonic() + 10
+        while len(delivered) < 20000 and time.monotonic() < deadline:
+            time.sleep(0.05)
+        stats = pipeline.close()
+
+        self.assertLess(elapsed, 5)
+        self.assertEqual(20000, len(delivered))
+        self.assertEqual("line-0-................", delivered[0])
+        self.assertGreater(max(batch_sizes), 1)
+        self.assertEqual(0, stats.dropped)
+        self.assertEqual(0, stats.depth)
+
+    def test_timed_pipeline_stamps_lines_when_they_arrive(self) -> None:
+        gate = threading.Event()
+        batches: list[list[tuple[float, str]]] = []
+
+        def consumer(lines: list[tuple[float, str]]) -> None:
+            gate.wait()
+            batches.append(lines)
+
+        pipeline = OutputPipeline(consumer, timed=True)
+        pipeline.put("first")
+        time.sleep(0.1)  # the consumer now holds "first" and waits on the gate
+        put_at = time.time()
+        pipeline.put("second")
+        time.sleep(0.3)
+        gate.set()
+        pipeline.close()
+
+        self.assertEqual(["first", "second"], [line for batch in batches for _, line in batch])
+        second_at = batches[-1][-1][0]
+        self.assertAlmostEqual(put_at, second_at, delta=0.1)
+
+    def test_full_queue_drops_lines_and_reports_them_in_place(self) -> None:
+        gate = threading.Event()
+        batches: list[list[str]] = []
+
+        def consumer(lines: list[str]) -> None:
+            gate.wait()
+            batches.append(lines)
+
+        pipeline = OutputPipeline(consumer, capacity=3, batch_lines=10)
+        pipeline.put("first")
+        time.sleep(0.1)  # the consumer now holds "first" and waits on the gate
+        for line in ["a", "b", "c", "d", "e", "f"]:
+            pipeline.put(line)
+        gate.set()
+        stats = pipeline.close()
+
+        delivered = [line for batch in batches for line in batch]
+        self.assertEqual(["first", "a", "b", "c"], delivered[:4])
+        self.assertIn("3 output line(s) dropped", delivered[4])
+        self.assertEqual(3, stats.dropped)
+        self.assertEqual(3, stats.max_depth)
+
+    def test_consecutive_progress_lines_are_coalesced(self) -> None:
+        gate = threading.Event()
+        delivered: list[str] = []
+
+        def consumer(lines: list[str]) -> None:
+            gate.wait()
+            delivered.extend(lines)
+
+        pipeline = OutputPipeline(consumer, coalesce_key=lambda line: "p" if line.startswith("PROGRESS:") else None)
+        pipeline.put("start")
+        time.sleep(0.1)
+        for line in ["PROGRESS:a:x:10%", "PROGRESS:a:x:20%", "PROGRESS:a:x:30%", "done", "PROGRESS:b:y:5%"]:
+            pipeline.put(line)
+        gate.set()
+        stats = pipeline.close()
+
+        self.assertEqual(["start", "PROGRESS:a:x:30%", "done", "PROGRESS:b:y:5%"], delivered)
+        self.assertEqual(2, stats.coalesced)
+
+    def test_lines_arriving_after_close_are_still_delivered(self) -> None:
+        delivered: list[str] = []
+        pipeline = OutputPipeline(delivered.extend)
+        pipeline.close()
+
+        pipeline.put("late")
+        pipeline.close(timeout=5)
+
+        self.assertEqual(["late"], delivered)
+
+    def test_many_pipelines_share_the_bounded_delivery_pool(self) -> None:
+        threads: set[str] = set()
+        delivered: list[str] = []
+        lock = threading.Lock()
+
+        def consumer(lines: list[str]) -> None:
+            time.sleep(0.01)
+            with lock:
+                threads.add(threading.current_thread().name)
+                delivered.extend(lines)
+
+        before = threading.active_count()
+        pipelines = [OutputPipeline(consumer, name=f"build-{index}") for index in range(20)]
+        for index, pipeline in enumerate(pipelines):
+            for line in range(10):
+                pipeline.put(f"{index}-{line}")
+        for pipeline in pipelines:
+            pipeline.close(timeout=10)
+
+        self.assertEqual(200, len(delivered))
+        self.assertLessEqual(len(threads), OUTPUT_DELIVERY_WORKERS)
+        self.assertLessEqual(threading.active_count() - before, OUTPUT_DELIVERY_WORKERS)
+        for index in range(20):
+            self.assertEqual([f"{index}-{line}" for line in range(10)], [line for line in delivered if line.startswith(f"{index}-")])
+
+
+if __name__ == "__main__":
+    unittest.main()
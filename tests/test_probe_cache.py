@@ -0,0 +1,118 @@
+from __future__ import annotations
+
+import os
+import tempfile
+import unittest
+from pathlib import Path
+
+from src.internal.infrastructure.command_runner import CompletedCommand
+from src.internal.infrastructure.probe_cache import ProbeCache
+from src.internal.infrastructure.ruby_toolchain import RubyToolchainPreparer
+
+
+class CountingRunner:
+    def __init__(self, returncodes=None) -> None:
+        self.calls: list[tuple[str, ...]] = []
+        self.returncodes = list(returncodes or [])
+
+    def run(self, command, *, env, cwd, check=True, should_stop=None, on_line=None):
+        self.calls.append(tuple(command))
+        returncode = self.returncodes.pop(0) if self.returncodes else 0
+        return CompletedCommand(args=list(command), returncode=returncode, stdout="arm64\n")
+
+    def run_checked(self, command, *, env, cwd, should_stop=None, on_line=None):
+        return self.run(command, env=env, cwd=cwd, should_stop=should_stop, on_line=on_line)
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 100.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class ProbeCacheTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.runner = CountingRunner()
+        self.clock = FakeClock()
+        self.cache = ProbeCache(self.runner, ttl=60, clock=self.clock)
+
+    def probe(self, env=None, watch=()):
+        return self.cache.run(
+            ["gem", "list", "-i", "cocoapods"],
+            env=env or {"GEM_HOME": "/gems"},
+            cwd="/repo",
+            env_keys=("GEM_HOME",),
+            watch=watch,
+        )
+
+    def test_repeated_probe_within_ttl_runs_once(self) -> None:
+        first = self.probe()
+        second = self.probe()
+
+        self.assertIs(first, second)
+        self.assertEqual(1, len(self.runner.calls))
+
+        self.clock.now += 61
+        self.probe()
+        self.assertEqual(2, len(self.runner.calls))
+
+    def test_declared_env_and_watched_mtime_are_part_of_the_key(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            specs = Path(tmp) / "specifications"
+            specs.mkdir()
+            self.probe(watch=[specs])
+            self.probe(env={"GEM_HOME": "/gems", "UNRELATED": "x"}, watch=[specs])
+            self.assertEqual(1, len(self.runner.calls))
+
+            self.probe(env={"GEM_HOME": "/other-gems"}, watch=[specs])
+            self.assertEqual(2, len(self.runner.calls))
+
+            stat = specs.stat()
+            os.utime(specs, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+            self.probe(watch=[specs])
+            self.assertEqual(3, len(self.runner.calls))
+
+    def test_invalidate_drops_matching_commands_only(self) -> None:
+        self.probe()
+        self.cache.run(["file", "/bin/patch"], env={}, cwd="/repo")
+
+        self.assertEqual(1, self.cache.invalidate(["gem"]))
+        self.probe()
+        self.cache.run(["file", "/bin/patch"], env={}, cwd="/repo")
+
+        self.assertEqual(3, len(self.runner.calls))
+
+
+class RubyToolchainProbeTests(unittest.TestCase):
+    def test_installed_gem_is_probed_once_across_builds(self) -> None:
+        runner = CountingRunner()
+        preparer = RubyToolchainPreparer(runner, ProbeCache(runner, ttl=60))
+        env = {"GEM_HOME": "/nonexistent/gems"}
+
+        for build_id in ("build-1", "build-2"):
+            preparer.ensure_gem("cocoapods", "1.15.2", Path("/repo/ios"), env, build_id, lambda _: None)
+
+        self.assertEqual([("gem", "list", "-i", "cocoapods", "-v", "1.15.2")], runner.calls)
+
+    def test_install_invalidates_cached_negative_answer(self) -> None:
+        runner = CountingRunner(returncodes=[1])
+        preparer = RubyToolchainPreparer(runner, ProbeCache(runner, ttl=60))
+        env = {"GEM_HOME": "/nonexistent/gems"}
+
+        preparer.ensure_gem("fastlane", None, Path("/repo/ios"), env, "build-1", lambda _: None)
+        preparer.ensure_gem("fastlane", None, Path("/repo/ios"), env, "build-2", lambda _: None)
+
+        self.assertEqual(
+            [
+                ("gem", "list", "-i", "fastlane"),
+                ("gem", "install", "-N", "fastlane"),
+                ("gem", "list", "-i", "fastlane"),
+            ],
+            runner.calls,
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -7,7 +7,9 @@ from pathlib import Path
 from unittest.mock import patch
 
 from src.internal.infrastructure.command_runner import CompletedCommand
+from src.internal.infrastructure.flutter_sdk import FlutterSdkManager
 from src.internal.infrastructure.repository_workspace import RepositoryWorkspaceManager
+from src.internal.infrastructure.workspace_state import WorkspaceStateStore
 
 
 @dataclass
@@ -16,6 +18,10 @@ class FakeWorkspaceLease:
     slot_dir: Path
     repo_dir: Path
     slot_id: str = "slot-1"
+    state: dict | None = None
+
+    def record_state(self, **state) -> None:
+        self.state = state
 
     def release(self) -> None:
         return
@@ -26,7 +32,6 @@ class CapturingRepositoryWorkspaceManager(RepositoryWorkspaceManager):
         super().__init__(command_runner=None)  # type: ignore[arg-type]
         self.calls: list[tuple[str, str]] = []
         self.previous_version: str | None = None
-        self.written_version: str | None = None
         self.next_repo_dir: Path | None = None
 
         class FakePool:
@@ -44,9 +49,16 @@ class CapturingRepositoryWorkspaceManager(RepositoryWorkspaceManager):
                 )
 
         self.workspace_pool = FakePool(self)
+        self.state_dir = tempfile.TemporaryDirectory()
+        self.flutter_sdks = FlutterSdkManager(
+            None,  # type: ignore[arg-type]
+            disk_budget_bytes=0,
+            state_store=WorkspaceStateStore(Path(self.state_dir.name) / "state.sqlite3"),
+        )
 
     def _sync_repository(self, **kwargs) -> None:  # type: ignore[override]
         self.calls.append(("sync", kwargs["branch_name"]))
+        self.sync_target = kwargs.get("target_commit")
 
     def _run_fvm_use(self, build_id, repo_path, env, flutter_version, log, should_cancel=None) -> None:
         self.calls.append(("fvm_use", flutter_version))
@@ -61,31 +73,23 @@ class CapturingRepositoryWorkspaceManager(RepositoryWorkspaceManager):
         log,
         reason,
         should_cancel=None,
-    ) -> None:
+    ) -> bool:
         self.calls.append(("precache", f"{flutter_version}:{platform}"))
+        return True
 
     def _read_previous_flutter_version(self, repo_url: str, branch_name: str) -> str | None:
         return self.previous_version
 
-    def _write_previous_flutter_version(
-        self,
-        repo_url: str,
-        branch_name: str,
-        flutter_version: str,
-    ) -> None:
-        self.written_version = flutter_version
-        self.calls.append(("write_version", flutter_version))
-
 
 class FakeCommandRunner:
     def __init__(self) -> None:
         self.calls: list[tuple[str, ...]] = []
 
-    def run_checked(self, command, *, env, cwd, should_stop=None):
+    def run_checked(self, command, *, env, cwd, should_stop=None, on_line=None):
         self.calls.append(tuple(command))
         return CompletedCommand(args=list(command), returncode=0, stdout="")
 
-    def run(self, command, *, env, cwd, check=True, should_stop=None):
+    def run(self, command, *, env, cwd, check=True, should_stop=None, on_line=None):
         self.calls.append(tuple(command))
         return CompletedCommand(args=list(command), returncode=0, stdout="")
 
@@ -117,7 +121,8 @@ class RepositoryWorkspaceManagerTests(unittest.TestCase):
         self.assertTrue(prepared.precache_ran)
         self.assertIn(("fvm_use", "3.24.0"), manager.calls)
         self.assertIn(("precache", "3.24.0:ios"), manager.calls)
-        self.assertEqual("3.24.0", manager.written_version)
+        self.assertEqual("3.24.0", prepared.workspace_lease.state["flutter_version"])
+        self.assertEqual("develop", prepared.workspace_lease.state["branch_name"])
 
     def test_prepare_runs_precache_when_ios_engine_artifact_is_missing(self) -> None:
         manager = CapturingRepositoryWorkspaceManager()
@@ -198,39 +203,129 @@ class RepositoryWorkspaceManagerTests(unittest.TestCase):
         self.assertFalse(prepared.precache_ran)
         self.assertNotIn(("precache", "3.24.0:android"), manager.calls)
 
-    def test_sync_repository_uses_shallow_clone_for_fresh_workspace(self) -> None:
-        runner = FakeCommandRunner()
-        manager = RepositoryWorkspaceManager(runner)
+    def test_prepare_reuses_checkout_when_head_matches_checkpoint_commit(self) -> None:
+        manager = CapturingRepositoryWorkspaceManager()
+        manager.previous_version = "3.24.0"
+        logs: list[str] = []
 
         with tempfile.TemporaryDirectory() as tmp:
-            repo_path = Path(tmp) / "repo"
-            repo_path.mkdir()
+            repo_dir = Path(tmp) / "repo"
+            (repo_dir / ".git" / "refs" / "heads").mkdir(parents=True)
+            (repo_dir / ".git" / "HEAD").write_text("ref: refs/heads/develop\n", encoding="utf-8")
+            (repo_dir / ".git" / "refs" / "heads" / "develop").write_text("abc123\n", encoding="utf-8")
+            manager.next_repo_dir = repo_dir
 
-            manager._sync_repository(
+            prepared = manager.prepare(
                 build_id="build-1",
                 repo_url="git@github.com:org/repo.git",
-                branch_name="main",
-                repo_path=repo_path,
+                branch_name="develop",
+                repo_dir=str(repo_dir),
+                env={},
+                requested_flutter_version="3.24.0",
+                platform="android",
+                log=logs.append,
+                reuse_commit="abc123",
+            )
+
+        self.assertTrue(prepared.sync_skipped)
+        self.assertEqual("abc123", prepared.commit_sha)
+        self.assertNotIn(("sync", "develop"), manager.calls)
+
+    def prepare_at_head(self, manager, head: str, **kwargs):
+        with tempfile.TemporaryDirectory() as tmp:
+            repo_dir = Path(tmp) / "repo"
+            (repo_dir / ".git" / "refs" / "heads").mkdir(parents=True)
+            (repo_dir / ".git" / "HEAD").write_text("ref: refs/heads/develop\n", encoding="utf-8")
+            (repo_dir / ".git" / "refs" / "heads" / "develop").write_text(f"{head}\n", encoding="utf-8")
+            manager.next_repo_dir = repo_dir
+
+            return manager.prepare(
+                build_id="build-2",
+                repo_url="git@github.com:org/repo.git",
+                branch_name="develop",
+                repo_dir=str(repo_dir),
                 env={},
+                requested_flutter_version="3.24.0",
+                platform="android",
                 log=lambda _: None,
+                **kwargs,
             )
 
+    def test_prepare_skips_sync_when_clean_slot_is_at_target_commit(self) -> None:
+        manager = CapturingRepositoryWorkspaceManager()
+        manager.command_runner = FakeCommandRunner()
+
+        prepared = self.prepare_at_head(manager, "abc123", target_commit="abc123")
+
+        self.assertTrue(prepared.sync_skipped)
+        self.assertNotIn(("sync", "develop"), manager.calls)
+        self.assertEqual(("git", "status", "--porcelain", "--", ".", ":!melos.yaml"), manager.command_runner.calls[-1])
+
+    def test_prepare_syncs_dirty_slot_to_the_target_commit(self) -> None:
+        manager = CapturingRepositoryWorkspaceManager()
+        manager.command_runner = FakeCommandRunner()
+        manager.command_runner.run = lambda command, **kwargs: CompletedCommand(
+            args=list(command), returncode=0, stdout=" M lib/main.dart\n"
+        )
+
+        prepared = self.prepare_at_head(manager, "abc123", target_commit="abc123")
+
+        self.assertFalse(prepared.sync_skipped)
+        self.assertEqual("abc123", manager.sync_target)
+
+    def test_prepare_resolves_target_from_one_ref_lookup_when_unpinned(self) -> None:
+        manager = CapturingRepositoryWorkspaceManager()
+        manager.command_runner = FakeCommandRunner()
+        manager.command_runner.run = lambda command, **kwargs: CompletedCommand(
+            args=list(command), returncode=0, stdout="def456\trefs/heads/develop\n" if "ls-remote" in command else ""
+        )
+
+        prepared = self.prepare_at_head(manager, "abc123")
+
+        self.assertFalse(prepared.sync_skipped)
+        self.assertEqual("def456", manager.sync_target)
+
+    def test_sync_repository_fetches_only_the_branch_without_mirror(self) -> None:
+        runner = FakeCommandRunner()
+        with patch("src.internal.infrastructure.repository_workspace.get_git_mirror_enabled", return_value=False):
+            manager = RepositoryWorkspaceManager(runner)
+
+        with tempfile.TemporaryDirectory() as tmp:
+            repo_path = Path(tmp) / "repo"
+            repo_path.mkdir()
+
+            with patch.dict("os.environ", {"GIT_FETCH_DEPTH": "5", "GIT_FETCH_FILTER": "blob:none"}):
+                fetches = manager._sync_repository(
+                    build_id="build-1",
+                    repo_url="git@github.com:org/repo.git",
+                    branch_name="main",
+                    repo_path=repo_path,
+                    env={},
+                    log=lambda _: None,
+                )
+
         self.assertEqual(
             [
+                ("git", "init", "-q", str(repo_path)),
+                ("git", "remote", "add", "origin", "git@github.com:org/repo.git"),
                 (
                     "git",
-                    "clone",
+                    "-c",
+                    "fetch.unpackLimit=1",
+                    "fetch",
+                    "--progress",
                     "--depth",
-                    "1",
-                    "--single-branch",
-                    "--branch",
-                    "main",
-                    "git@github.com:org/repo.git",
-                    str(repo_path),
-                )
+                    "5",
+                    "--filter=blob:none",
+                    "origin",
+                    "+refs/heads/main:refs/remotes/origin/main",
+                ),
+                ("git", "checkout", "--force", "-B", "main", "origin/main"),
+                ("git", "clean", "-fdx"),
             ],
             runner.calls,
         )
+        self.assertEqual(["main"], [fetch.ref for fetch in fetches])
 
     def test_run_fvm_use_uses_non_interactive_flags(self) -> None:
         runner = FakeCommandRunner()
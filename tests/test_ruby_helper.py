@@ -0,0 +1,155 @@
+from __future__ import annotations
+
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+from src.internal.infrastructure.command_runner import CompletedCommand
+from src.internal.infrastructure.probe_cache import ProbeCache
+from src.internal.infrastructure.ruby_helper import RubyGemHelper, RubyHelperError, RubyHelperPool
+from src.internal.infrastructure.ruby_toolchain import RubyToolchainPreparer
+
+
+def ruby_works(cwd: str) -> bool:
+    if not shutil.which("ruby"):
+        return False
+    return os.system(f"cd {cwd} && ruby -e 'exit 0' >/dev/null 2>&1") == 0
+
+
+class RecordingRunner:
+    def __init__(self) -> None:
+        self.calls: list[tuple[str, ...]] = []
+
+    def run(self, command, *, env, cwd, check=True, should_stop=None, on_line=None):
+        self.calls.append(tuple(command))
+        return CompletedCommand(args=list(command), returncode=1, stdout="")
+
+    def run_checked(self, command, *, env, cwd, should_stop=None, on_line=None):
+        self.calls.append(tuple(command))
+        return CompletedCommand(args=list(command), returncode=0, stdout="")
+
+
+class StubHelper:
+    def __init__(self, answers: dict[str, bool]) -> None:
+        self.answers = answers
+        self.queries: list[list] = []
+
+    def installed(self, gems):
+        self.queries.append(list(gems))
+        return [self.answers.get(name, False) for name, _ in gems]
+
+
+class StubHelperPool:
+    def __init__(self, helper) -> None:
+        self.helper = helper
+
+    def helper_for(self, env, cwd):
+        return self.helper
+
+
+class FlakyStart:
+    """RubyGemHelper.start that fails until ``ready`` is set, like a Ruby rbenv has not installed yet."""
+
+    def __init__(self) -> None:
+        self.ready = False
+        self.attempts = 0
+        self.closed = 0
+
+    def start(self, helper: RubyGemHelper) -> RubyGemHelper:
+        self.attempts += 1
+        if not self.ready:
+            raise RubyHelperError("rbenv: version `3.3.0' is not installed")
+        return helper
+
+    def close(self, helper: RubyGemHelper) -> None:
+        self.closed += 1
+
+
+class RubyHelperPoolTests(unittest.TestCase):
+    def test_failed_start_is_retried_after_the_retry_window(self) -> None:
+        flaky = FlakyStart()
+        pool = RubyHelperPool(retry_seconds=0.2)
+        env = {"RBENV_VERSION": "3.3.0"}
+
+        with patch.object(RubyGemHelper, "start", lambda helper: flaky.start(helper)), patch.object(
+            RubyGemHelper, "close", lambda helper: flaky.close(helper)
+        ), patch.object(RubyGemHelper, "alive", True):
+            self.assertIsNone(pool.helper_for(env, "/tmp"))
+            flaky.ready = True
+            self.assertIsNone(pool.helper_for(env, "/tmp"))
+            self.assertEqual(1, flaky.attempts)
+            time.sleep(0.25)
+            helper = pool.helper_for(env, "/tmp")
+            self.assertIsNotNone(helper)
+            self.assertIs(helper, pool.helper_for(env, "/tmp"))
+            self.assertEqual(2, flaky.attempts)
+            pool.close_all()
+
+        self.assertEqual(1, flaky.closed)
+
+
+class RubyGemHelperTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp, True)
+        if not ruby_works(self.tmp):
+            self.skipTest("ruby is not available")
+        self.pool = RubyHelperPool()
+        self.addCleanup(self.pool.close_all)
+
+    def test_helper_answers_presence_queries_and_is_reused(self) -> None:
+        env = dict(os.environ)
+        helper = self.pool.helper_for(env, self.tmp)
+
+        self.assertIsNotNone(helper)
+        self.assertEqual(
+            [True, True, False, False],
+            helper.installed([("json", None), ("json", ">= 0"), ("json", "< 0.0.1"), ("no-such-gem-xyz", None)]),
+        )
+        self.assertIs(helper, self.pool.helper_for(env, self.tmp))
+
+    def test_missing_ruby_falls_back_to_no_helper(self) -> None:
+        self.assertIsNone(self.pool.helper_for({"PATH": self.tmp}, self.tmp))
+
+
+class BatchedGemInstallTests(unittest.TestCase):
+    def test_missing_gems_are_found_in_one_query_and_installed_in_one_command(self) -> None:
+        runner = RecordingRunner()
+        helper = StubHelper({"cocoapods": True})
+        preparer = RubyToolchainPreparer(runner, ProbeCache(runner, ttl=0), StubHelperPool(helper))
+        logs: list[str] = []
+
+        installed = preparer.ensure_gems(
+            [("cocoapods", "1.15.2"), ("fastlane", "2.228.0"), ("fastlane-plugin-shorebird", None), ("digest-crc", "~> 0.4")],
+            Path("/repo/ios"),
+            {"GEM_HOME": "/nonexistent/gems"},
+            "build-1",
+            logs.append,
+        )
+
+        self.assertEqual(["fastlane", "fastlane-plugin-shorebird", "digest-crc"], installed)
+        self.assertEqual(1, len(helper.queries))
+        self.assertEqual(
+            [
+                ("gem", "install", "-N", "fastlane:2.228.0", "fastlane-plugin-shorebird"),
+                ("gem", "install", "-N", "digest-crc", "-v", "~> 0.4"),
+            ],
+            runner.calls,
+        )
+        self.assertIn("[build-1] ✅ cocoapods already available", logs)
+
+    def test_without_a_helper_each_gem_is_probed_with_gem_list(self) -> None:
+        runner = RecordingRunner()
+        preparer = RubyToolchainPreparer(runner, ProbeCache(runner, ttl=0), StubHelperPool(None))
+
+        preparer.ensure_gems([("fastlane", None)], Path("/repo/ios"), {}, "build-1", lambda _: None)
+
+        self.assertEqual([("gem", "list", "-i", "fastlane"), ("gem", "install", "-N", "fastlane")], runner.calls)
+
+
+if __name__ == "__main__":
+    unittest.main()
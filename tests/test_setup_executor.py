@@ -21,15 +21,17 @@ class FakeCommandRunner:
             CompletedCommand(args=command, returncode=returncode, stdout=stdout)
         )
 
-    def run(self, command, *, env, cwd, check=True, should_stop=None):
+    def run(self, command, *, env, cwd, check=True, should_stop=None, on_line=None):
         self.calls.append(tuple(command))
         queue = self.responses.get(tuple(command), [])
-        if queue:
-            return queue.pop(0)
-        return CompletedCommand(args=list(command), returncode=0, stdout="")
+        result = queue.pop(0) if queue else CompletedCommand(args=list(command), returncode=0, stdout="")
+        if on_line is not None:
+            for line in result.stdout.splitlines():
+                on_line(line)
+        return result
 
-    def run_checked(self, command, *, env, cwd, should_stop=None):
-        result = self.run(command, env=env, cwd=cwd, check=True, should_stop=should_stop)
+    def run_checked(self, command, *, env, cwd, should_stop=None, on_line=None):
+        result = self.run(command, env=env, cwd=cwd, check=True, should_stop=should_stop, on_line=on_line)
         if result.returncode != 0:
             raise RuntimeError(f"unexpected failure for {' '.join(command)}")
         return result
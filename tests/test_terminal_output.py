@@ -0,0 +1,96 @@
+from __future__ import annotations
+
+import os
+import unittest
+
+from src.internal.infrastructure.async_execution import AsyncCommandRunner, AsyncExecutionEngine
+from src.internal.infrastructure.command_runner import CommandRunner
+from src.internal.infrastructure.terminal_output import TerminalLineSplitter, strip_ansi
+
+# Reports whether stdout is a terminal, then redraws a progress line three times.
+PROGRESS_SCRIPT = (
+    "if [ -t 1 ]; then echo tty; else echo pipe; fi; "
+    "printf '\\033[32mDownloading\\033[0m 10%%\\r'; printf 'Downloading 50%%\\r'; printf 'Downloading 100%%\\n'; "
+    "echo done"
+)
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class TerminalLineSplitterTests(unittest.TestCase):
+    def test_strips_escape_sequences(self) -> None:
+        self.assertEqual(
+            "BUILD SUCCESSFUL link",
+            strip_ansi("\x1b[1m\x1b[32mBUILD SUCCESSFUL\x1b[0m \x1b]8;;https://x\x07link\x1b]8;;\x07\x1b[2K"),
+        )
+
+    def test_crlf_is_a_plain_newline_even_across_reads(self) -> None:
+        splitter = TerminalLineSplitter()
+
+        self.assertEqual([], splitter.feed(b"first\r"))
+        self.assertEqual(["first", "second"], splitter.feed(b"\nsecond\r\n"))
+
+    def test_redraws_are_throttled_and_the_final_line_is_kept(self) -> None:
+        clock = FakeClock()
+        splitter = TerminalLineSplitter(redraw_interval=1.0, clock=clock)
+
+        lines = splitter.feed(b"pods 1/9\rpods 2/9\rpods 3/9\r")
+        clock.now = 1.5
+        lines += splitter.feed(b"pods 3/9\rpods 8/9\rpods 9/9\n")
+
+        # "pods 3/9" is only known to be a finished frame once the next read starts redrawing it.
+        self.assertEqual(["pods 1/9", "pods 3/9", "pods 9/9"], lines)
+
+    def test_multibyte_characters_split_across_reads(self) -> None:
+        splitter = TerminalLineSplitter()
+        data = "✅ 완료\n".encode("utf-8")
+
+        lines = splitter.feed(data[:2]) + splitter.feed(data[2:])
+
+        self.assertEqual(["✅ 완료"], lines)
+
+    def test_flush_returns_an_unterminated_tail(self) -> None:
+        splitter = TerminalLineSplitter()
+        splitter.feed(b"\x1b[33mwaiting")
+
+        self.assertEqual(["waiting"], splitter.flush())
+
+
+class TerminalModeRunnerTests(unittest.TestCase):
+    def assert_terminal_output(self, runner: CommandRunner) -> None:
+        process = runner.start(["sh", "-c", PROGRESS_SCRIPT], env=dict(os.environ), cwd=os.getcwd(), tty=True)
+        lines = list(runner.iter_lines(process))
+
+        self.assertEqual(0, runner.wait(process))
+        self.assertEqual("tty", lines[0])
+        self.assertEqual("Downloading 10%", lines[1])
+        self.assertEqual(["Downloading 100%", "done"], lines[-2:])
+
+    def test_thread_runner_streams_a_pseudo_terminal(self) -> None:
+        self.assert_terminal_output(CommandRunner())
+
+    def test_async_runner_streams_a_pseudo_terminal(self) -> None:
+        engine = AsyncExecutionEngine()
+        engine.start()
+        self.addCleanup(engine.stop)
+
+        self.assert_terminal_output(AsyncCommandRunner(engine))
+
+    def test_pipe_mode_is_unchanged(self) -> None:
+        runner = CommandRunner()
+        process = runner.start(["sh", "-c", PROGRESS_SCRIPT], env=dict(os.environ), cwd=os.getcwd())
+
+        lines = list(runner.iter_lines(process))
+        runner.wait(process)
+
+        self.assertEqual("pipe", lines[0])
+
+
+if __name__ == "__main__":
+    unittest.main()
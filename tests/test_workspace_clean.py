@@ -0,0 +1,102 @@
+from __future__ import annotations
+
+import tempfile
+import unittest
+from pathlib import Path
+
+from src.internal.infrastructure.command_runner import CommandRunner
+from src.internal.infrastructure.git_mirror import GitMirrorCache
+from src.internal.infrastructure.repository_workspace import RepositoryWorkspaceManager
+from src.internal.infrastructure.workspace_clean import WorkspaceCleanPolicy
+from tests.test_git_mirror import GIT_ENV, git
+
+CACHE_FILES = {
+    "pub": ".dart_tool/package_config.json",
+    "ios": "ios/Pods/Manifest.lock",
+    "android": "android/.gradle/8.7/checksums.bin",
+}
+
+
+class WorkspaceCleanPolicyTests(unittest.TestCase):
+    def setUp(self) -> None:
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.root = Path(tmp.name)
+        self.remote = self.root / "remote"
+        (self.remote / "ios").mkdir(parents=True)
+        (self.remote / "android").mkdir()
+        git(self.remote, "init", "-q", "-b", "develop")
+        self.commit({".fvmrc": '{"flutter":"3.24.0"}', "pubspec.lock": "a: 1\n", "ios/Podfile.lock": "PODS: []\n"})
+        self.slot = self.root / "slot-1" / "repo"
+        self.slot.mkdir(parents=True)
+
+    def commit(self, files: dict[str, str]) -> None:
+        for name, content in files.items():
+            (self.remote / name).write_text(content, encoding="utf-8")
+        git(self.remote, "add", "-A")
+        git(self.remote, "commit", "-q", "-m", "update")
+
+    def sync(self, policy: WorkspaceCleanPolicy) -> None:
+        runner = CommandRunner()
+        manager = RepositoryWorkspaceManager(
+            runner,
+            git_mirrors=GitMirrorCache(runner, root=self.root / "mirrors"),
+            clean_policy=policy,
+        )
+        manager._sync_repository(
+            build_id="build-1",
+            repo_url=str(self.remote),
+            branch_name="develop",
+            repo_path=self.slot,
+            env=dict(GIT_ENV),
+            log=lambda _: None,
+        )
+
+    def build_outputs(self) -> None:
+        for relative in [*CACHE_FILES.values(), "scratch/tmp.txt"]:
+            path = self.slot / relative
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_text("cached", encoding="utf-8")
+
+    def surviving(self) -> list[str]:
+        return [group for group, relative in CACHE_FILES.items() if (self.slot / relative).exists()]
+
+    def test_caches_survive_while_their_inputs_match(self) -> None:
+        self.sync(WorkspaceCleanPolicy())
+        self.build_outputs()
+
+        self.sync(WorkspaceCleanPolicy())
+
+        self.assertEqual(["pub", "ios", "android"], self.surviving())
+        self.assertFalse((self.slot / "scratch").exists())
+
+    def test_only_caches_with_changed_inputs_are_wiped(self) -> None:
+        self.sync(WorkspaceCleanPolicy())
+        self.build_outputs()
+        self.commit({"ios/Podfile.lock": "PODS: [Firebase]\n"})
+
+        self.sync(WorkspaceCleanPolicy())
+
+        self.assertEqual(["pub", "android"], self.surviving())
+
+    def test_flutter_sdk_change_wipes_every_cache(self) -> None:
+        self.sync(WorkspaceCleanPolicy())
+        self.build_outputs()
+        self.commit({".fvmrc": '{"flutter":"3.27.1"}'})
+
+        self.sync(WorkspaceCleanPolicy())
+
+        self.assertEqual([], self.surviving())
+
+    def test_full_policy_wipes_everything_except_configured_excludes(self) -> None:
+        self.sync(WorkspaceCleanPolicy())
+        self.build_outputs()
+
+        self.sync(WorkspaceCleanPolicy("full", extra_excludes=("/scratch/",)))
+
+        self.assertEqual([], self.surviving())
+        self.assertTrue((self.slot / "scratch" / "tmp.txt").exists())
+
+
+if __name__ == "__main__":
+    unittest.main()
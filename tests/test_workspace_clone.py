@@ -0,0 +1,75 @@
+from __future__ import annotations
+
+import os
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+from src.internal.core.cancellation import OperationCanceledError
+from src.internal.infrastructure.command_runner import CommandExecutionError, CommandRunner
+from src.internal.infrastructure.workspace_clone import clone_tree
+
+
+def _unsupported(*args) -> None:
+    raise CommandExecutionError(["cp"], 1, "cp: failed to clone: Operation not supported")
+
+
+class CloneTreeTests(unittest.TestCase):
+    def setUp(self) -> None:
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.source = Path(tmp.name) / "source"
+        self.destination = Path(tmp.name) / "destination"
+        objects = self.source / ".git" / "objects"
+        (objects / "ab").mkdir(parents=True)
+        (objects / "info").mkdir()
+        (objects / "ab" / "cdef").write_bytes(b"object")
+        (objects / "info" / "alternates").write_text("/mirror/objects\n", encoding="utf-8")
+        (self.source / ".dart_tool").mkdir()
+        (self.source / ".dart_tool" / "package_config.json").write_text("{}", encoding="utf-8")
+        (self.source / "ios").mkdir()
+        os.symlink("../.dart_tool", self.source / "ios" / "dart_tool")
+
+    def test_falls_back_to_hardlinking_only_git_objects(self) -> None:
+        with patch("src.internal.infrastructure.workspace_clone._reflink", _unsupported):
+            method = clone_tree(self.source, self.destination, CommandRunner())
+
+        self.assertEqual("hardlink", method)
+        copied = self.destination / ".git" / "objects"
+        self.assertTrue(os.path.samefile(self.source / ".git/objects/ab/cdef", copied / "ab" / "cdef"))
+        self.assertFalse(os.path.samefile(self.source / ".git/objects/info/alternates", copied / "info" / "alternates"))
+        self.assertFalse(os.path.samefile(self.source / ".dart_tool/package_config.json", self.destination / ".dart_tool/package_config.json"))
+        self.assertTrue((self.destination / "ios" / "dart_tool").is_symlink())
+
+    def test_plain_copy_is_the_last_resort(self) -> None:
+        def no_links(src, dst) -> None:
+            raise OSError("cross-device link")
+
+        with patch("src.internal.infrastructure.workspace_clone._reflink", _unsupported), patch(
+            "src.internal.infrastructure.workspace_clone.os.link", no_links
+        ):
+            method = clone_tree(self.source, self.destination, CommandRunner())
+
+        self.assertEqual("copy", method)
+        self.assertEqual(b"object", (self.destination / ".git/objects/ab/cdef").read_bytes())
+        self.assertFalse(os.path.samefile(self.source / ".git/objects/ab/cdef", self.destination / ".git/objects/ab/cdef"))
+
+    def test_cancel_stops_the_copy_and_leaves_the_destination_empty(self) -> None:
+        checks: list[int] = []
+
+        def should_cancel() -> bool:
+            # Canceled once the first file is in place.
+            checks.append(1)
+            return len(checks) > 1
+
+        with patch("src.internal.infrastructure.workspace_clone._reflink", _unsupported):
+            with self.assertRaises(OperationCanceledError):
+                clone_tree(self.source, self.destination, CommandRunner(), should_cancel)
+
+        self.assertEqual(2, len(checks))
+        self.assertEqual([], list(self.destination.iterdir()))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,12 +1,24 @@
 from __future__ import annotations
 
 import tempfile
+import threading
+import time
 import unittest
 from pathlib import Path
 from unittest.mock import patch
 
+from filelock import Timeout
+
+from src.internal.core.cancellation import OperationCanceledError
 from src.internal.infrastructure.workspace_pool import WorkspacePoolManager
 
+ACQUIRE = dict(
+    repo_url="git@github.com:org/repo.git",
+    flutter_version="3.24.0",
+    platform="android",
+    log=lambda _: None,
+)
+
 
 class WorkspacePoolManagerTests(unittest.TestCase):
     def test_acquire_allocates_additional_slot_when_existing_slot_is_busy(self) -> None:
@@ -39,6 +51,226 @@ class WorkspacePoolManagerTests(unittest.TestCase):
                 lease1.release()
                 lease2.release()
 
+    def test_acquire_prefers_the_warmest_free_slot_and_records_its_state(self) -> None:
+        manager = WorkspacePoolManager(max_slots_per_key=3, wait_timeout=1)
+        acquire = dict(
+            repo_url="git@github.com:org/repo.git",
+            branch_name="main",
+            flutter_version="3.24.0",
+            platform="android",
+            log=lambda _: None,
+        )
+
+        with tempfile.TemporaryDirectory() as tmp:
+            shared_root = Path(tmp) / "shared"
+            with patch("src.internal.infrastructure.workspace_pool.get_shared_cache_dir", return_value=shared_root):
+                leases = [manager.acquire(build_id=f"build-{index}", **acquire) for index in range(3)]
+                for lease, commit in zip(leases, ["aaa", "bbb", None]):
+                    if commit:
+                        lease.record_state(commit_sha=commit, flutter_version="3.24.0", fingerprints={"pub": commit})
+                    lease.release()
+
+                lease = manager.acquire(
+                    build_id="build-4",
+                    warmth=lambda state, repo_dir: (state.commit_sha == "bbb", state.commit_sha is not None),
+                    **acquire,
+                )
+
+                self.assertEqual("slot-2", lease.slot_id)
+                state = manager.state_store.slot_state(lease.slot_dir)
+                self.assertEqual({"pub": "bbb"}, state.fingerprints)
+                self.assertGreater(state.last_used_at, 0)
+                lease.release()
+
+    def test_only_free_slots_are_scored_and_only_after_the_wait(self) -> None:
+        manager = WorkspacePoolManager(max_slots_per_key=2, wait_timeout=10)
+        acquire = dict(
+            repo_url="git@github.com:org/repo.git",
+            branch_name="main",
+            flutter_version="3.24.0",
+            platform="android",
+            log=lambda _: None,
+        )
+
+        with tempfile.TemporaryDirectory() as tmp:
+            shared_root = Path(tmp) / "shared"
+            with patch("src.internal.infrastructure.workspace_pool.get_shared_cache_dir", return_value=shared_root):
+                busy = [manager.acquire(build_id=f"build-{index}", **acquire) for index in range(2)]
+                scored: list[str] = []
+                acquired = []
+
+                def warmth(state, repo_dir):
+                    scored.append(repo_dir.parent.name)
+                    return (state.commit_sha is not None,)
+
+                def wait_for_slot() -> None:
+                    lease = manager.acquire(build_id="build-3", warmth=warmth, **acquire)
+                    acquired.append(lease.slot_id)
+                    lease.release()
+
+                waiter = threading.Thread(target=wait_for_slot)
+                waiter.start()
+                time.sleep(0.3)
+                busy[0].record_state(commit_sha="abc", flutter_version="3.24.0", fingerprints={})
+                busy[0].release()
+                waiter.join(timeout=10)
+                busy[1].release()
+
+        self.assertEqual(["slot-1"], acquired)
+        # Both slots were leased on the first pass; slot-1 is scored once it is free, slot-2 never.
+        self.assertEqual(["slot-1"], scored)
+
+
+class WorkspacePoolBudgetTests(unittest.TestCase):
+    def setUp(self) -> None:
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.slots_root = Path(tmp.name) / "slots"
+        patcher = patch("src.internal.infrastructure.workspace_pool.get_shared_cache_dir", return_value=Path(tmp.name))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_waiter_wakes_as_soon_as_a_lease_is_released(self) -> None:
+        manager = WorkspacePoolManager(max_slots_per_key=1, wait_timeout=60, max_total_slots=0, disk_budget_bytes=0)
+        busy = manager.acquire(build_id="build-1", branch_name="main", **ACQUIRE)
+        acquired = []
+
+        def wait_for_slot() -> None:
+            lease = manager.acquire(build_id="build-2", branch_name="main", **ACQUIRE)
+            acquired.append((time.monotonic(), lease.slot_id))
+            lease.release()
+
+        waiter = threading.Thread(target=wait_for_slot)
+        waiter.start()
+        time.sleep(0.2)
+        released_at = time.monotonic()
+        busy.release()
+        waiter.join(timeout=10)
+
+        self.assertEqual(1, len(acquired))
+        self.assertLess(acquired[0][0] - released_at, 1.0)
+        self.assertEqual("slot-1", acquired[0][1])
+
+    def test_slot_budget_evicts_the_least_recently_used_idle_slot(self) -> None:
+        manager = WorkspacePoolManager(max_slots_per_key=2, wait_timeout=1, max_total_slots=2, disk_budget_bytes=0)
+        for branch in ("old", "recent"):
+            lease = manager.acquire(build_id=f"build-{branch}", branch_name=branch, **ACQUIRE)
+            lease.record_state(commit_sha=branch, flutter_version="3.24.0", fingerprints={})
+            lease.release()
+            time.sleep(0.01)
+
+        lease = manager.acquire(build_id="build-new", branch_name="new", **ACQUIRE)
+
+        self.assertEqual("slot-1", lease.slot_id)
+        remaining = sorted(path.parent.name.split("__")[2] for path in self.slots_root.glob("*/slot-*"))
+        self.assertEqual(["new", "recent"], remaining)
+        self.assertEqual([], list(self.slots_root.glob(".evicted-*")))
+        lease.release()
+
+    def test_leased_slots_are_never_evicted(self) -> None:
+        manager = WorkspacePoolManager(max_slots_per_key=2, wait_timeout=0, max_total_slots=1, disk_budget_bytes=0)
+        busy = manager.acquire(build_id="build-1", branch_name="main", **ACQUIRE)
+        self.addCleanup(busy.release)
+
+        with self.assertRaises(Timeout):
+            manager.acquire(build_id="build-2", branch_name="feature", **ACQUIRE)
+
+        self.assertTrue(busy.repo_dir.is_dir())
+
+    def test_disk_budget_evicts_older_slots_on_release(self) -> None:
+        manager = WorkspacePoolManager(max_slots_per_key=2, wait_timeout=1, max_total_slots=0, disk_budget_bytes=100 * 1024)
+        first = manager.acquire(build_id="build-1", branch_name="main", **ACQUIRE)
+        second = manager.acquire(build_id="build-2", branch_name="main", **ACQUIRE)
+        for lease in (first, second):
+            (lease.repo_dir / "artifact.bin").write_bytes(b"x" * 64 * 1024)
+
+        first.release()
+        self.assertTrue(first.slot_dir.is_dir())
+        self.assertGreaterEqual(manager.state_store.slot_state(first.slot_dir).disk_bytes, 64 * 1024)
+
+        second.release()
+        self.assertFalse(first.slot_dir.exists())
+        self.assertTrue(second.slot_dir.is_dir())
+
+    def test_leases_of_dead_builds_are_cleared_and_live_ones_kept(self) -> None:
+        manager = WorkspacePoolManager(max_slots_per_key=2, wait_timeout=0, max_total_slots=0, disk_budget_bytes=0)
+        running = manager.acquire(build_id="build-running", branch_name="main", **ACQUIRE)
+        self.addCleanup(running.release)
+        running.record_state(commit_sha="def", flutter_version="3.24.0", fingerprints={})
+        crashed = manager.acquire(build_id="build-crashed", branch_name="main", **ACQUIRE)
+        crashed.record_state(commit_sha="abc", flutter_version="3.22.0", fingerprints={})
+        # What a killed process leaves behind: its lock is gone, its row is not.
+        crashed._lock.release()
+
+        self.assertEqual({"3.22.0", "3.24.0"}, manager.state_store.leased_flutter_versions())
+        self.assertEqual([crashed.slot_dir], manager.clear_stale_leases())
+
+        self.assertEqual({"3.24.0"}, manager.state_store.leased_flutter_versions())
+        self.assertEqual({running.slot_dir: "build-running"}, manager.state_store.leases())
+
+
+class WorkspacePoolCloneTests(unittest.TestCase):
+    def setUp(self) -> None:
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        patcher = patch("src.internal.infrastructure.workspace_pool.get_shared_cache_dir", return_value=Path(tmp.name))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.manager = WorkspacePoolManager(max_slots_per_key=2, wait_timeout=0, max_total_slots=0, disk_budget_bytes=0, clone_slots=True)
+
+    def _warm_slot(self, commit_sha: str, **acquire):
+        lease = self.manager.acquire(build_id=f"build-{commit_sha}", **acquire)
+        (lease.repo_dir / ".git").mkdir(exist_ok=True)
+        (lease.repo_dir / "HEAD_COMMIT").write_text(commit_sha, encoding="utf-8")
+        lease.record_state(commit_sha=commit_sha, flutter_version="3.24.0", fingerprints={"pub": commit_sha})
+        return lease
+
+    def test_new_slot_starts_as_a_copy_of_an_idle_slot_of_the_same_branch(self) -> None:
+        self._warm_slot("ios", branch_name="main", **{**ACQUIRE, "platform": "ios"}).release()
+        # Used more recently, but for another branch.
+        self._warm_slot("feature", branch_name="feature", **ACQUIRE).release()
+
+        lease = self.manager.acquire(build_id="build-2", branch_name="main", **ACQUIRE)
+        self.addCleanup(lease.release)
+
+        self.assertEqual("ios", (lease.repo_dir / "HEAD_COMMIT").read_text(encoding="utf-8"))
+        state = self.manager.state_store.slot_state(lease.slot_dir)
+        self.assertEqual(("ios", {"pub": "ios"}), (state.commit_sha, state.fingerprints))
+
+    def test_branches_are_matched_whole_not_by_slot_key_prefix(self) -> None:
+        self._warm_slot("feat", branch_name="feat", **{**ACQUIRE, "platform": "ios"}).release()
+        # Its slot key starts with the "feat" key's branch part, and it was used more recently.
+        self._warm_slot("feat-x", branch_name="feat__x", **ACQUIRE).release()
+        # Same sanitized name, different repository: never a template.
+        self._warm_slot("fork", branch_name="feat", **{**ACQUIRE, "repo_url": "git@github.com:fork/repo.git"}).release()
+
+        lease = self.manager.acquire(build_id="build-2", branch_name="feat", **ACQUIRE)
+        self.addCleanup(lease.release)
+
+        self.assertEqual("feat", (lease.repo_dir / "HEAD_COMMIT").read_text(encoding="utf-8"))
+
+    def test_canceled_copy_releases_the_new_slot(self) -> None:
+        self._warm_slot("main", branch_name="main", **{**ACQUIRE, "platform": "ios"}).release()
+
+        with patch("src.internal.infrastructure.workspace_clone._reflink", side_effect=OperationCanceledError("canceled")):
+            with self.assertRaises(OperationCanceledError):
+                self.manager.acquire(build_id="build-2", branch_name="main", should_cancel=lambda: True, **ACQUIRE)
+
+        lease = self.manager.acquire(build_id="build-3", branch_name="main", **ACQUIRE)
+        self.addCleanup(lease.release)
+        self.assertEqual("slot-1", lease.slot_id)
+
+    def test_leased_slots_are_not_copied(self) -> None:
+        busy = self._warm_slot("busy", branch_name="main", **ACQUIRE)
+        self.addCleanup(busy.release)
+
+        lease = self.manager.acquire(build_id="build-2", branch_name="main", **ACQUIRE)
+        self.addCleanup(lease.release)
+
+        self.assertEqual("slot-2", lease.slot_id)
+        self.assertEqual([], list(lease.repo_dir.iterdir()))
+        self.assertIsNone(self.manager.state_store.slot_state(lease.slot_dir).commit_sha)
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,83 @@
+from __future__ import annotations
+
+import sqlite3
+import tempfile
+import unittest
+from pathlib import Path
+
+from src.internal.infrastructure.workspace_state import WorkspaceSlotState, WorkspaceStateStore
+
+
+class WorkspaceStateStoreTests(unittest.TestCase):
+    def setUp(self) -> None:
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.root = Path(tmp.name)
+        self.store = WorkspaceStateStore(self.root / "state.sqlite3")
+        self.slot_dir = self.root / "slots" / "repo__develop__ios" / "slot-1"
+
+    def test_unknown_slot_and_branch_have_empty_state(self) -> None:
+        self.assertEqual(WorkspaceSlotState(), self.store.slot_state(self.slot_dir))
+        self.assertIsNone(self.store.branch_flutter_version("git@github.com:org/repo.git", "develop"))
+
+    def test_record_slot_stores_checkout_and_branch_version_together(self) -> None:
+        self.store.record_lease(self.slot_dir, "build-1")
+        self.store.record_slot(
+            self.slot_dir,
+            WorkspaceSlotState(commit_sha="abc", flutter_version="3.24.0", fingerprints={"pub": "f1"}, last_used_at=5.0),
+            repo_url="git@github.com:org/repo.git",
+            branch_name="develop",
+        )
+
+        state = self.store.slot_state(self.slot_dir)
+        self.assertEqual(("abc", "3.24.0", {"pub": "f1"}), (state.commit_sha, state.flutter_version, state.fingerprints))
+        self.assertEqual("3.24.0", self.store.branch_flutter_version("git@github.com:org/repo.git", "develop"))
+        snapshot = self.store.snapshot()
+        self.assertEqual("build-1", snapshot["slots"][0]["lease_build_id"])
+        self.assertEqual("repo__develop__ios", snapshot["slots"][0]["slot_key"])
+        self.assertEqual(["develop"], [row["branch_name"] for row in snapshot["branches"]])
+
+    def test_clear_lease_keeps_checkout_and_updates_disk_usage(self) -> None:
+        self.store.record_lease(self.slot_dir, "build-1")
+        self.store.record_slot(self.slot_dir, WorkspaceSlotState(commit_sha="abc", last_used_at=1.0))
+
+        self.store.clear_lease(self.slot_dir, disk_bytes=2048)
+
+        row = self.store.snapshot()["slots"][0]
+        self.assertIsNone(row["lease_build_id"])
+        self.assertEqual(2048, row["disk_bytes"])
+        self.assertGreater(row["last_used_at"], 1.0)
+        self.assertEqual("abc", row["commit_sha"])
+
+    def test_forget_slot_removes_only_that_slot(self) -> None:
+        other = self.slot_dir.with_name("slot-2")
+        for slot_dir in (self.slot_dir, other):
+            self.store.record_slot(slot_dir, WorkspaceSlotState(commit_sha=slot_dir.name))
+
+        self.store.forget_slot(self.slot_dir)
+
+        self.assertEqual([other], list(self.store.slot_states([self.slot_dir, other])))
+
+    def test_database_from_before_the_repo_columns_is_migrated(self) -> None:
+        path = self.root / "old.sqlite3"
+        with sqlite3.connect(str(path)) as connection:
+            connection.execute(
+                """
+                CREATE TABLE slots (
+                    slot_dir TEXT PRIMARY KEY, slot_key TEXT NOT NULL, slot_id TEXT NOT NULL, commit_sha TEXT,
+                    flutter_version TEXT, fingerprints TEXT NOT NULL DEFAULT '{}', last_used_at REAL NOT NULL DEFAULT 0,
+                    disk_bytes INTEGER NOT NULL DEFAULT 0, lease_build_id TEXT, leased_at REAL
+                )
+                """
+            )
+        store = WorkspaceStateStore(path)
+
+        store.record_lease(self.slot_dir, "build-1", repo_url="git@github.com:org/repo.git", branch_name="feat__x")
+        store.record_lease(self.slot_dir, "build-2")
+
+        state = store.slot_state(self.slot_dir)
+        self.assertEqual(("git@github.com:org/repo.git", "feat__x"), (state.repo_url, state.branch_name))
+
+
+if __name__ == "__main__":
+    unittest.main()